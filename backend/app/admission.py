@@ -0,0 +1,268 @@
+"""
+Admission control for /ingest/*.
+
+  - API keys are validated through a small TTL cache, so steady-state
+    ingest does no key query. Unknown keys are cached for
+    INGEST_API_KEY_MISS_CACHE_SECONDS only. The cache is cleared after any
+    commit in this process that writes a School or SchoolApiKey; keys
+    changed elsewhere (another worker, SQL) take effect within
+    INGEST_API_KEY_CACHE_SECONDS.
+  - Each SchoolApiKey has a token bucket (rate/burst from the school, or the
+    global defaults). The in-process check is O(1); with
+    RATE_LIMIT_BACKEND=redis the bucket lives in Redis and is shared by all
+    workers.
+  - A per-process concurrency gate caps in-flight DB-bound ingest work
+    below the connection pool size.
+
+Rejections are immediate 429s with Retry-After rather than queueing.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from . import session_changes
+from .config import settings
+from .metrics import INGEST_REJECTED_OVERLOADED, INGEST_REJECTED_RATE_LIMITED
+from .models import School, SchoolApiKey
+from .session_changes import Changes
+
+
+logger = logging.getLogger("k12.admission")
+
+
+# -------------------------
+# API key cache
+# -------------------------
+@dataclass(frozen=True)
+class KeyGrant:
+    key_id: int
+    rate_per_sec: float
+    burst: int
+
+
+class ApiKeyCache:
+    def __init__(self, ttl_seconds: float, miss_ttl_seconds: float, max_entries: int = 10_000):
+        self.ttl = ttl_seconds
+        self.miss_ttl = miss_ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[int, str], tuple[float, KeyGrant | None]] = OrderedDict()
+        # invalidate() runs from after_commit in worker threads
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, school_id: int, api_key: str) -> KeyGrant | None:
+        cache_key = (school_id, api_key)
+        now = time.monotonic()
+        hit = self._entries.get(cache_key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+
+        row = (
+            db.query(SchoolApiKey.id, School.ingest_rate_per_sec, School.ingest_burst)
+            .join(School, School.id == SchoolApiKey.school_id)
+            .filter(
+                SchoolApiKey.school_id == school_id,
+                SchoolApiKey.key == api_key,
+                SchoolApiKey.is_active == True,  # noqa: E712
+            )
+            .first()
+        )
+        grant = None
+        if row is not None:
+            grant = KeyGrant(
+                key_id=row[0],
+                rate_per_sec=settings.ingest_rate_per_sec if row[1] is None else row[1],
+                burst=settings.ingest_burst if row[2] is None else row[2],
+            )
+
+        ttl = self.ttl if grant is not None else self.miss_ttl
+        if ttl > 0:
+            with self._lock:
+                self._entries[cache_key] = (now + ttl, grant)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return grant
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# -------------------------
+# Token buckets
+# -------------------------
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: int, now: float):
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, rate: float, burst: int, now: float) -> float:
+        """
+        Consumes one token. Returns 0 on success, else seconds until one is available.
+        """
+        self.tokens = min(float(burst), self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / rate
+
+
+class LocalRateLimiter:
+    def __init__(self, max_keys: int = 50_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[int, TokenBucket] = OrderedDict()
+
+    async def check(self, grant: KeyGrant) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(grant.key_id)
+        if bucket is None:
+            bucket = TokenBucket(grant.burst, now)
+            self._buckets[grant.key_id] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(grant.key_id)
+        return bucket.take(grant.rate_per_sec, grant.burst, now)
+
+
+_REDIS_TOKEN_BUCKET = """
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter:
+    """
+    Same bucket semantics, stored in Redis so all workers share one limit.
+    Fails open if Redis is unreachable: rate limiting must never take
+    ingest down.
+    """
+
+    def __init__(self, redis_url: str):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(redis_url)
+        self._script = self._redis.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def check(self, grant: KeyGrant) -> float:
+        try:
+            wait = await self._script(
+                keys=[f"k12:ingest:bucket:{grant.key_id}"],
+                args=[grant.rate_per_sec, grant.burst, time.time()],
+            )
+            return float(wait)
+        except Exception:
+            logger.exception("redis rate limiter unavailable; admitting request")
+            return 0.0
+
+
+# -------------------------
+# Concurrency gate
+# -------------------------
+class ConcurrencyGate:
+    """
+    Non-blocking in-flight counter. Ingest handlers run on the event loop,
+    so plain integer updates are safe here.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+
+    def try_enter(self) -> bool:
+        if self.in_flight >= self.limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def leave(self) -> None:
+        self.in_flight -= 1
+
+
+def _too_many(retry_after: float, detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+api_keys = ApiKeyCache(settings.ingest_api_key_cache_seconds, settings.ingest_api_key_miss_cache_seconds)
+
+
+def _changes_committed(changes: Changes) -> None:
+    # Keys and per-school limits are few and rarely change: drop everything
+    if changes.api_keys or changes.school_rows:
+        api_keys.invalidate()
+
+
+def install() -> None:
+    """
+    Clears the API key cache after commits that write keys or schools.
+    """
+    session_changes.subscribe(_changes_committed)
+    session_changes.install()
+
+
+rate_limiter = (
+    RedisRateLimiter(settings.redis_url)
+    if settings.rate_limit_backend == "redis"
+    else LocalRateLimiter()
+)
+ingest_gate = ConcurrencyGate(settings.ingest_max_concurrency)
+
+
+async def ingest_slot():
+    """
+    FastAPI dependency wrapping the DB-bound part of an ingest request.
+    """
+    if not ingest_gate.try_enter():
+        INGEST_REJECTED_OVERLOADED.inc()
+        raise _too_many(1, "Ingest overloaded, retry later")
+    try:
+        yield
+    finally:
+        ingest_gate.leave()
+
+
+async def admit(db: Session, school_id: int, api_key: str) -> KeyGrant:
+    """
+    Validates the API key and charges one token to its bucket.
+    Raises 401 for unknown keys and 429 when the bucket is empty.
+    """
+    grant = api_keys.get(db, school_id, api_key)
+    if grant is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    if grant.rate_per_sec <= 0 or grant.burst < 1:
+        # An explicit 0 rate or burst on the school suspends its ingest
+        INGEST_REJECTED_RATE_LIMITED.inc()
+        raise _too_many(60, "Ingest is disabled for this school")
+
+    wait = await rate_limiter.check(grant)
+    if wait > 0:
+        INGEST_REJECTED_RATE_LIMITED.inc()
+        raise _too_many(wait, "Rate limit exceeded for this API key")
+    return grant
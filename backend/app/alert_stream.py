@@ -0,0 +1,152 @@
+"""
+Per-school live alert feed (Server-Sent Events).
+
+create_alert and the ack endpoint publish to an in-process broker; each
+connected console holds a bounded queue for its school. With
+ALERT_STREAM_BACKEND=redis every worker publishes to a Redis channel and
+delivers what it receives from it, so a console connected to any worker
+sees alerts raised on all of them.
+
+SSE ids are alert ids. A reconnecting client (Last-Event-ID) is first
+sent the alerts created after that id from the database, then the live
+feed. Acknowledgements carry no id and are not replayed.
+"""
+import asyncio
+import json
+import logging
+
+from .config import settings
+from .models import Alert
+from .schemas import AlertOut
+
+
+logger = logging.getLogger("k12.alert_stream")
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+REDIS_CHANNEL = "k12:alerts"
+
+
+def serialize_alert(alert: Alert) -> dict:
+    return AlertOut.model_validate(alert).model_dump(mode="json")
+
+
+def format_sse(event: str, data: dict, event_id: int | None = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    def __init__(self, school_id: int):
+        self.school_id = school_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Set when the client fell too far behind; it must reconnect and resume
+        self.overflowed = False
+
+
+class AlertBroker:
+    def __init__(self):
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._redis = None
+        self._listener: asyncio.Task | None = None
+        self._publishing: set[asyncio.Task] = set()
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if settings.alert_stream_backend == "redis":
+            import redis.asyncio as aioredis
+
+            self._redis = aioredis.from_url(settings.redis_url)
+            self._listener = asyncio.create_task(self._listen(), name="alert-stream-listener")
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(REDIS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._deliver(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("alert stream redis listener failed; reconnecting")
+                await asyncio.sleep(1.0)
+
+    # -------------------------
+    # Subscribe / publish
+    # -------------------------
+    def subscribe(self, school_id: int) -> Subscription:
+        sub = Subscription(school_id)
+        self._subscribers.setdefault(school_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.school_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.school_id]
+
+    def publish(self, school_id: int, event: str, alert: Alert) -> None:
+        """
+        Safe to call from the event loop or from a threadpool (sync routes).
+        """
+        if self._loop is None:
+            return
+        message = {"school_id": school_id, "event": event, "data": serialize_alert(alert)}
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._dispatch(message)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, message)
+
+    def _dispatch(self, message: dict) -> None:
+        if self._redis is not None:
+            task = asyncio.create_task(self._publish_redis(message))
+            self._publishing.add(task)
+            task.add_done_callback(self._publishing.discard)
+        else:
+            self._deliver(message)
+
+    async def _publish_redis(self, message: dict) -> None:
+        try:
+            await self._redis.publish(REDIS_CHANNEL, json.dumps(message))
+        except Exception:
+            logger.exception("alert stream redis publish failed; delivering locally only")
+            self._deliver(message)
+
+    def _deliver(self, message: dict) -> None:
+        for sub in self._subscribers.get(message["school_id"], ()):
+            if sub.overflowed:
+                continue
+            try:
+                sub.queue.put_nowait((message["event"], message["data"]))
+            except asyncio.QueueFull:
+                sub.overflowed = True
+                logger.warning("alert stream subscriber for school %s overflowed", sub.school_id)
+
+    def subscriber_count(self) -> int:
+        return sum(len(s) for s in self._subscribers.values())
+
+
+alert_broker = AlertBroker()
@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
+from .device_status import record_status
 from .models import Alert, Device, User
 from .emailer import send_email
+from .metrics import record_alert
+from .alert_stream import alert_broker
 
 
 # Defaults (you will move these into PolicyRule records per school)
@@ -40,11 +43,13 @@ async def create_alert(
     db.add(alert)
     db.commit()
     db.refresh(alert)
+    record_alert(alert_type)
+    alert_broker.publish(school_id, "alert", alert)
 
     # Notify admins (simple MVP)
     subject = f"[{severity.upper()}] K12 Asset Guardian alert: {alert_type}"
     for email in get_admin_emails(db, school_id):
-        await send_email(email, subject, message)
+        await send_email(subject, email, message)
 
     return alert
 
@@ -79,14 +84,15 @@ def offline_sweep(db: Session, school_id: int | None = None) -> int:
         q = q.filter(Device.school_id == school_id)
 
     devices = q.all()
-    changed = 0
+    transitions = []
 
     for d in devices:
         if d.last_seen and d.last_seen < cutoff and d.status != "offline":
             d.status = "offline"
-            changed += 1
+            transitions.append((d.id, d.school_id, "offline", d.last_seen))
 
-    if changed:
+    if transitions:
+        record_status(db, transitions, "sweep")
         db.commit()
 
-    return changed
+    return len(transitions)
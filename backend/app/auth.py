@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
@@ -38,13 +38,27 @@ def create_access_token(user_id: int) -> str:
     )
 
 
-def decode_access_token(token: str) -> Optional[int]:
+def create_stream_token(user_id: int) -> str:
+    """
+    Short-lived token for the alert stream's query string, which ends up in
+    access logs. It is only accepted there, never as a bearer token.
+    """
+    expire = datetime.utcnow() + timedelta(seconds=settings.alert_stream_token_seconds)
+    to_encode = {"sub": str(user_id), "exp": expire, "scope": "alert_stream"}
+    return jwt.encode(
+        to_encode, settings.jwt_secret, algorithm=settings.jwt_algorithm
+    )
+
+
+def decode_access_token(token: str, scope: Optional[str] = None) -> Optional[int]:
     try:
         payload = jwt.decode(
             token,
             settings.jwt_secret,
             algorithms=[settings.jwt_algorithm],
         )
+        if payload.get("scope") != scope:
+            return None
         return int(payload.get("sub"))
     except JWTError:
         return None
@@ -53,11 +67,7 @@ def decode_access_token(token: str) -> Optional[int]:
 # -------------------------
 # Dependencies
 # -------------------------
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
-    user_id = decode_access_token(token)
+def _load_user(db: Session, user_id: Optional[int]) -> User:
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,6 +84,28 @@ def get_current_user(
     return user
 
 
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> User:
+    return _load_user(db, decode_access_token(token))
+
+
+def get_stream_user(
+    token: Optional[str] = Depends(OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)),
+    stream_token: Optional[str] = Query(default=None),
+    db: Session = Depends(get_db),
+) -> User:
+    """
+    Like get_current_user, but also accepts ?stream_token= (see
+    create_stream_token) because browser EventSource cannot send an
+    Authorization header.
+    """
+    if token:
+        return _load_user(db, decode_access_token(token))
+    return _load_user(db, decode_access_token(stream_token or "", scope="alert_stream"))
+
+
 def require_admin(user: User = Depends(get_current_user)) -> User:
     if not user.is_admin:
         raise HTTPException(
@@ -22,6 +22,89 @@ class Settings(BaseSettings):
     smtp_password: str = ""
     smtp_from: str = "K12 Asset Guardian <no-reply@k12guardian.local>"
 
+    # Ingest idempotency (in-process seen-set in front of the DB constraint)
+    ingest_dedup_window_seconds: int = 900
+    ingest_dedup_max_keys: int = 500_000
+
+    # Ingest admission control (per-school overrides live on School)
+    ingest_rate_per_sec: float = 50.0
+    ingest_burst: int = 200
+    ingest_max_concurrency: int = 10  # keep below pool_size + max_overflow
+    ingest_api_key_cache_seconds: float = 60.0
+    ingest_api_key_miss_cache_seconds: float = 2.0  # unknown keys; bounds DB lookups from bad clients
+    rate_limit_backend: str = "memory"  # memory|redis (redis shares buckets across workers)
+    redis_url: str = "redis://localhost:6379/0"
+
+    # Ingest write-behind buffer (buffered mode returns 202 and flushes in batches)
+    ingest_mode: str = "sync"  # sync|buffered
+    ingest_buffer_backend: str = "memory"  # memory|redis
+    ingest_buffer_max: int = 50_000
+    ingest_flush_batch_size: int = 500
+    ingest_flush_interval_ms: int = 200
+    ingest_flush_workers: int = 1
+    ingest_drain_timeout_seconds: float = 30.0
+    ingest_retry_max_seconds: float = 30.0  # backoff cap while the database is unavailable
+
+    # DHCP lease index (time-aware IP correlation)
+    dhcp_lease_retention_days: int = 7
+    dhcp_index_refresh_seconds: float = 30.0
+
+    # Device heartbeats (coalesced in memory, written once per interval)
+    heartbeat_flush_interval_seconds: float = 15.0
+    heartbeat_cache_max_devices: int = 200_000
+
+    # Live alert stream (SSE)
+    alert_stream_backend: str = "memory"  # memory|redis (redis fans out across workers)
+    alert_stream_heartbeat_seconds: float = 15.0
+    alert_stream_replay_limit: int = 500  # rows per replay query; the whole backlog is sent
+    alert_stream_token_seconds: int = 60  # lifetime of ?stream_token= (checked when connecting)
+
+    # Conditional GET / list response cache
+    response_cache_backend: str = "memory"  # memory|redis (redis shares generations across workers)
+    response_cache_max_entries: int = 512
+
+    # Policy engine (compiled rule sets, cached per school)
+    policy_rules_refresh_seconds: float = 30.0
+    policy_timezone: str = "UTC"  # hour/minute/weekday in rule conditions
+
+    # Sliding-window policy rules (in-memory counters, optional JSON snapshot)
+    policy_window_max_keys: int = 100_000  # per rule
+    policy_window_snapshot_path: str = ""  # empty disables snapshots
+    policy_window_snapshot_seconds: float = 60.0
+
+    # Hourly event rollups and raw-event retention
+    rollup_interval_seconds: float = 60.0  # 0 disables the in-app worker
+    rollup_batch_size: int = 5000
+    rollup_lag_seconds: float = 30.0  # leave the newest rows for in-flight transactions
+    event_retention_days: int = 0  # 0 keeps raw events forever
+    event_retention_batch_size: int = 5000
+
+    # Interned event sources/domains/categories (per-process LRU, entries per table)
+    intern_cache_size: int = 100_000
+
+    # Cold-tier event archive (gzip NDJSON segments + mmap index; empty dir disables)
+    event_archive_dir: str = ""
+    event_archive_after_days: int = 30  # also the minimum retention age while the archive is enabled
+    event_archive_batch_size: int = 50_000
+    event_archive_block_rows: int = 256
+
+    # Per-school fleet health counters (in memory, rebuilt from the DB periodically)
+    fleet_health_reconcile_seconds: float = 300.0  # 0 reconciles only at startup
+
+    # Bulk device import (CSV/NDJSON upload, upserted per batch)
+    device_import_batch_size: int = 5000
+    device_import_max_bytes: int = 100 * 1024 * 1024
+    device_import_max_errors: int = 1000  # rows listed in the error report
+
+    # Subnet -> school map export (bearer token for syslog_ingest; empty disables)
+    subnet_export_token: str = ""
+
+    # SQL query profiler (opt-in)
+    sql_profiler_enabled: bool = False
+    sql_profiler_slow_ms: float = 100.0
+    sql_profiler_repeat_threshold: int = 10  # same statement shape N+ times => likely N+1
+    sql_profiler_log_sample_rate: float = 0.01  # fraction of requests logged outside development
+
     class Config:
         env_prefix = ""
         case_sensitive = False
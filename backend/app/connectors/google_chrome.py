@@ -1,10 +1,14 @@
+import json
 import os
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+from ..device_status import record_status
+from ..interning import sources
 from ..models import Device
 from ..models_ext import ExternalDeviceId, Event
 
@@ -50,6 +54,19 @@ def _parse_rfc3339(dt_str: str | None) -> datetime | None:
         return None
 
 
+def _insert_device(db: Session, device: Device) -> bool:
+    """
+    Inserts `device` in a savepoint. Returns False if its serial was added to
+    the school since it was looked up (by an import or POST /devices).
+    """
+    try:
+        with db.begin_nested():
+            db.add(device)
+    except IntegrityError:
+        return False
+    return True
+
+
 def sync_chromebooks_for_customer(
     db: Session,
     school_id: int,
@@ -61,6 +78,8 @@ def sync_chromebooks_for_customer(
     Creates/updates Device rows and stores ExternalDeviceId(source='google') for google deviceId.
     """
     admin_svc, _ = _google_clients()
+    # Interned before the first write (see app.interning)
+    source_id = sources.id(db, "google")
 
     page_token = None
     synced = 0
@@ -75,6 +94,7 @@ def sync_chromebooks_for_customer(
         ).execute()
 
         items = resp.get("chromeosdevices", []) or []
+        transitions = []
         for g in items:
             synced += 1
 
@@ -92,12 +112,10 @@ def sync_chromebooks_for_customer(
             last_seen = _parse_rfc3339(last_sync_raw)
 
             # Find or create device
-            device = (
-                db.query(Device)
-                .filter(Device.school_id == school_id, Device.serial_number == serial)
-                .first()
-            )
+            lookup = db.query(Device).filter(Device.school_id == school_id, Device.serial_number == serial)
+            device = lookup.first()
 
+            created = False
             if not device:
                 device = Device(
                     school_id=school_id,
@@ -108,12 +126,17 @@ def sync_chromebooks_for_customer(
                     status="online" if last_seen else "unknown",
                     last_seen=last_seen,
                 )
-                db.add(device)
-                db.flush()  # get device.id
-            else:
+                created = _insert_device(db, device)  # flushed: device.id is set
+                if created:
+                    transitions.append((device.id, school_id, device.status, last_seen))
+                else:
+                    device = lookup.one()
+            if not created:
                 if asset_tag and device.asset_tag != asset_tag:
                     device.asset_tag = asset_tag
                 if last_seen:
+                    if device.status != "online":
+                        transitions.append((device.id, school_id, "online", last_seen))
                     device.last_seen = last_seen
                     device.status = "online"
 
@@ -143,9 +166,9 @@ def sync_chromebooks_for_customer(
                     device_id=device.id,
                     event_type="inventory_sync",
                     severity="info",
-                    source="google",
+                    source_id=source_id,
                     message=f"Synced Chromebook {asset_tag}",
-                    payload={
+                    payload=json.dumps({
                         "serial": serial,
                         "asset_tag": asset_tag,
                         "model": model,
@@ -153,10 +176,11 @@ def sync_chromebooks_for_customer(
                         "org_unit": org_unit,
                         "google_device_id": google_device_id,
                         "lastSync": last_sync_raw,
-                    },
+                    }),
                 )
             )
 
+        record_status(db, transitions, "google")
         db.commit()
 
         page_token = resp.get("nextPageToken")
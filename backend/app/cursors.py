@@ -0,0 +1,34 @@
+"""
+Opaque keyset-pagination cursors.
+
+A cursor is the sort key of the last row on a page: a timestamp followed
+by integers (e.g. created_at, id), as unpadded URL-safe base64 of a JSON
+array with the timestamp in ISO-8601.
+"""
+import base64
+from datetime import datetime
+
+import orjson
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(at: datetime, *keys: int) -> str:
+    raw = orjson.dumps([at.isoformat(), *keys])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple:
+    """
+    Returns (datetime, int, ...) with `size` items; raises CursorError if
+    the cursor is malformed or of another shape.
+    """
+    try:
+        at, *keys = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(keys) != size - 1:
+            raise ValueError(cursor)
+        return (datetime.fromisoformat(at), *(int(k) for k in keys))
+    except (ValueError, TypeError):
+        raise CursorError("Invalid cursor")
@@ -0,0 +1,105 @@
+"""
+Ingest idempotency.
+
+Each event gets a dedup key: the client's idempotency key if one was sent,
+otherwise a content hash of (source, device identity, url/domain, action,
+timestamp). Events without a timestamp and without a client key get no
+dedup key; two identical page views a second apart are legitimately
+different events.
+
+Keys are checked against an in-process, time-bucketed seen-set before any
+DB work. A unique (school_id, dedup_key) index on events backs it up across
+workers and restarts.
+"""
+import hashlib
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import Event
+
+
+def event_dedup_key(
+    school_id: int,
+    source: str,
+    client_key: str | None,
+    device_ids: tuple,
+    target: str | None,
+    action: str | None,
+    timestamp: str | None,
+) -> str | None:
+    """
+    Returns a 64-char hex key, or None if the event cannot be deduplicated.
+    """
+    if client_key:
+        material = f"client\x1f{school_id}\x1f{source}\x1f{client_key}"
+    elif timestamp:
+        parts = (str(school_id), source, *device_ids, target or "", action or "", timestamp)
+        material = "content\x1f" + "\x1f".join(parts)
+    else:
+        return None
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def is_stored(db: Session, school_id: int, dedup_key: str | None) -> bool:
+    """
+    True if an event with this dedup key is stored for the school. Used to
+    tell a lost insert race (a duplicate) from any other integrity error.
+    """
+    if not dedup_key:
+        return False
+    stmt = select(Event.id).where(Event.school_id == school_id, Event.dedup_key == dedup_key).limit(1)
+    return db.scalar(stmt) is not None
+
+
+class SeenSet:
+    """
+    Approximate recent-key memory with bounded size.
+
+    Keys live in `n_buckets` sets, each covering `window / n_buckets`
+    seconds. Lookups check every bucket (a handful of set probes); the
+    oldest bucket is dropped whole when time moves on or when the current
+    bucket is full, so memory never exceeds `max_keys`.
+    """
+
+    def __init__(self, window_seconds: float, max_keys: int, n_buckets: int = 6):
+        self.bucket_seconds = max(1.0, window_seconds / n_buckets)
+        self.n_buckets = n_buckets
+        self.max_per_bucket = max(1, max_keys // n_buckets)
+        self._buckets: deque[set] = deque([set()], maxlen=n_buckets)
+        self._bucket_started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rotate(self, now: float) -> None:
+        elapsed = now - self._bucket_started
+        if elapsed < self.bucket_seconds and len(self._buckets[-1]) < self.max_per_bucket:
+            return
+        steps = min(self.n_buckets, max(1, int(elapsed // self.bucket_seconds)))
+        for _ in range(steps):
+            self._buckets.append(set())
+        self._bucket_started = now
+
+    def seen(self, key: str) -> bool:
+        k = key[:32]
+        # add() rotates the deque from flusher threads; iterate under the lock
+        with self._lock:
+            return any(k in bucket for bucket in self._buckets)
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._rotate(time.monotonic())
+            self._buckets[-1].add(key[:32])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(b) for b in self._buckets)
+
+
+seen_events = SeenSet(
+    window_seconds=settings.ingest_dedup_window_seconds,
+    max_keys=settings.ingest_dedup_max_keys,
+)
@@ -0,0 +1,282 @@
+"""
+Bulk device import and export.
+
+Import reads a CSV (header row) or NDJSON upload that has been spooled to
+a file, one row at a time. Each row is validated, and duplicate serials
+within the file are rejected (the first one is kept). Rows are upserted
+DEVICE_IMPORT_BATCH_SIZE at a time on (school_id, serial_number) with a
+single INSERT ... ON CONFLICT DO UPDATE per batch, committed per batch.
+Only the fields a row provides are updated on existing devices; empty CSV
+cells and missing or null NDJSON keys count as not provided. New devices
+start as "unknown", with the serial as asset tag if none is given. Rows that fail
+are reported by line number; the error list is capped at
+DEVICE_IMPORT_MAX_ERRORS (the count is not).
+
+Bulk statements bypass the session hooks, so each batch updates the
+response-cache generation, fleet health counters and heartbeat device
+cache itself.
+
+Export streams a school's devices as CSV or NDJSON from a server-side
+cursor (yield_per), so the fleet is never held in memory at once. The
+export generators own their session; the route closes the generator when
+the response ends, including on client disconnect, which releases the
+connection at once instead of at garbage collection.
+"""
+import csv
+import io
+from contextlib import closing
+from typing import IO, Iterator
+
+import orjson
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .fleet_health import fleet_health
+from .heartbeats import heartbeat_tracker
+from .models import Device
+from .response_cache import generations
+from .serialization import DEVICE_COLUMNS, DEVICE_FIELDS
+
+
+FORMATS = ("csv", "ndjson")
+IMPORT_FIELDS = ("serial_number", "asset_tag", "device_name", "device_type", "assigned_to")
+
+# DeviceOut fields plus device_name, so an export can be imported back
+EXPORT_FIELDS = DEVICE_FIELDS + ("device_name",)
+_EXPORT_COLUMNS = DEVICE_COLUMNS + [Device.device_name]
+_EXPORT_CHUNK = 1000
+
+
+class DeviceImportRow(BaseModel):
+    serial_number: str = Field(min_length=1, max_length=128)
+    asset_tag: str | None = Field(default=None, max_length=100)
+    device_name: str | None = Field(default=None, max_length=255)
+    device_type: str | None = Field(default=None, min_length=1, max_length=50)
+    assigned_to: str | None = Field(default=None, max_length=255)
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _strip(cls, value):
+        return value.strip() if isinstance(value, str) else value
+
+
+class ImportReport:
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+
+    def error(self, line: int, message: str, serial_number: str | None = None) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "serial_number": serial_number, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+# -------------------------
+# Parsing
+# -------------------------
+def _csv_rows(f: IO[bytes]) -> Iterator[tuple[int, dict | None, str | None]]:
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    try:
+        for raw in reader:
+            # Empty cells are "not provided"; unknown columns are ignored
+            yield reader.line_num, {k: v for k, v in raw.items() if k in IMPORT_FIELDS and v}, None
+    except (csv.Error, UnicodeDecodeError) as e:
+        yield reader.line_num, None, f"Unreadable CSV: {e}"
+    finally:
+        text.detach()
+
+
+def _ndjson_rows(f: IO[bytes]) -> Iterator[tuple[int, dict | None, str | None]]:
+    for line_num, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield line_num, None, "Invalid JSON"
+            continue
+        if not isinstance(raw, dict):
+            yield line_num, None, "Expected a JSON object"
+            continue
+        yield line_num, {k: v for k, v in raw.items() if k in IMPORT_FIELDS and v is not None}, None
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+
+
+# -------------------------
+# Upsert
+# -------------------------
+def _upsert(db: Session, school_id: int, batch: list[DeviceImportRow], report: ImportReport) -> None:
+    serials = [r.serial_number for r in batch]
+    existing = set(
+        db.scalars(
+            select(Device.serial_number).where(Device.school_id == school_id, Device.serial_number.in_(serials))
+        )
+    )
+
+    # One statement per set of provided fields (CSV files have just one)
+    groups: dict[tuple[str, ...], list[dict]] = {}
+    for r in batch:
+        provided = r.model_dump(exclude_unset=True)
+        row = {
+            "school_id": school_id,
+            "serial_number": r.serial_number,
+            "asset_tag": r.asset_tag or r.serial_number,
+            "device_name": r.device_name,
+            "device_type": r.device_type or "Chromebook",
+            "assigned_to": r.assigned_to or "",
+            "status": "unknown",
+        }
+        groups.setdefault(tuple(sorted(provided)), []).append(row)
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    changed = []
+    for fields, rows in groups.items():
+        if dialect_insert is None:
+            changed += _merge_rows(db, fields, rows)
+            continue
+        # Core table insert: skips the ORM bulk-insert bookkeeping per row
+        stmt = dialect_insert(Device.__table__)
+        # DO UPDATE even with nothing to set, so RETURNING reports the row
+        set_ = {f: stmt.excluded[f] for f in fields if f != "serial_number"}
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["school_id", "serial_number"],
+            set_=set_ or {"serial_number": stmt.excluded.serial_number},
+        ).returning(Device.id, Device.school_id, Device.status, Device.battery_percent)
+        changed += db.connection().execute(stmt, rows).all()
+    db.commit()
+
+    report.created += len(batch) - len(existing)
+    report.updated += len(existing)
+    generations.bump({school_id})
+    fleet_health.devices_changed(changed)
+    heartbeat_tracker.forget(row[0] for row in changed)
+
+
+def _merge_rows(db: Session, fields: tuple[str, ...], rows: list[dict]) -> list[tuple]:
+    # Portable fallback: one lookup per row
+    changed = []
+    for row in rows:
+        device = db.execute(
+            select(Device.id, Device.school_id, Device.status, Device.battery_percent)
+            .where(Device.school_id == row["school_id"], Device.serial_number == row["serial_number"])
+        ).first()
+        if device is None:
+            device_id = db.execute(insert(Device).values(**row).returning(Device.id)).scalar_one()
+            changed.append((device_id, row["school_id"], row["status"], None))
+        else:
+            values = {f: row[f] for f in fields if f != "serial_number"}
+            if values:
+                db.execute(update(Device).where(Device.id == device.id).values(**values))
+            changed.append(tuple(device))
+    return changed
+
+
+def import_devices(
+    db: Session,
+    school_id: int,
+    f: IO[bytes],
+    fmt: str,
+    batch_size: int | None = None,
+    max_errors: int | None = None,
+) -> dict:
+    """
+    Imports devices from a spooled upload (see module docstring). Returns
+    the report: created, updated, failed, errors.
+    """
+    batch_size = batch_size or settings.device_import_batch_size
+    report = ImportReport(settings.device_import_max_errors if max_errors is None else max_errors)
+    rows = _csv_rows(f) if fmt == "csv" else _ndjson_rows(f)
+
+    seen: dict[str, int] = {}
+    batch: list[DeviceImportRow] = []
+    for line_num, raw, problem in rows:
+        if problem is not None:
+            report.error(line_num, problem)
+            continue
+        try:
+            row = DeviceImportRow.model_validate(raw)
+        except ValidationError as e:
+            serial = raw.get("serial_number")
+            report.error(line_num, _validation_message(e), serial if isinstance(serial, str) else None)
+            continue
+        first = seen.setdefault(row.serial_number, line_num)
+        if first != line_num:
+            report.error(line_num, f"Duplicate serial_number (first on line {first})", row.serial_number)
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _upsert(db, school_id, batch, report)
+            batch = []
+    if batch:
+        _upsert(db, school_id, batch, report)
+    return report.as_dict()
+
+
+# -------------------------
+# Export
+# -------------------------
+def _export_rows(school_id: int) -> Iterator[tuple]:
+    # Own session: the response streams after the request's session is closed
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(*_EXPORT_COLUMNS)
+            .where(Device.school_id == school_id)
+            .order_by(Device.id)
+            .execution_options(yield_per=_EXPORT_CHUNK)
+        )
+        yield from result
+    finally:
+        db.close()
+
+
+def export_csv(school_id: int) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_FIELDS)
+    with closing(_export_rows(school_id)) as rows:
+        for n, row in enumerate(rows, start=1):
+            writer.writerow(v.isoformat() if hasattr(v, "isoformat") else v for v in row)
+            if n % _EXPORT_CHUNK == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    yield buf.getvalue()
+
+
+def export_ndjson(school_id: int) -> Iterator[bytes]:
+    chunk = []
+    with closing(_export_rows(school_id)) as rows:
+        for row in rows:
+            chunk.append(orjson.dumps(dict(zip(EXPORT_FIELDS, row))))
+            if len(chunk) >= _EXPORT_CHUNK:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
@@ -0,0 +1,156 @@
+"""
+Device status history and availability.
+
+Device.status only holds the current value. Every transition is also
+appended to device_status_intervals (one row per change: device, status,
+start_at); an interval ends where the device's next one starts, so no row
+is ever updated.
+
+Writers pass the transitions they saw in one call per batch:
+
+  offline sweep   offline from the device's last_seen
+  heartbeats      online from the heartbeat; after a silence longer than
+                  the offline threshold, also offline from the previous one
+  Google sync     the device's status from its lastSync
+
+record_status() drops rows that would not change the device's latest
+recorded status and never starts an interval before the latest one (late
+reports are moved up to it), so the history stays ordered.
+
+Availability over [since, until) is computed in one streaming pass over
+two sorted queries: the interval in effect at `since` for each device (one
+index probe per device) and the intervals starting inside the range. It
+reads this table only, never raw events.
+"""
+import heapq
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from .models import Device, DeviceStatusInterval
+
+
+_LOOKUP_CHUNK = 500
+
+
+def _latest(db: Session, device_ids: list[int]) -> dict[int, tuple[str, datetime]]:
+    latest = {}
+    for start in range(0, len(device_ids), _LOOKUP_CHUNK):
+        chunk = device_ids[start:start + _LOOKUP_CHUNK]
+        last_ids = (
+            select(func.max(DeviceStatusInterval.id))
+            .where(DeviceStatusInterval.device_id.in_(chunk))
+            .group_by(DeviceStatusInterval.device_id)
+        )
+        for device_id, status, start_at in db.execute(
+            select(DeviceStatusInterval.device_id, DeviceStatusInterval.status, DeviceStatusInterval.start_at)
+            .where(DeviceStatusInterval.id.in_(last_ids))
+        ):
+            latest[device_id] = (status, start_at)
+    return latest
+
+
+def record_status(db: Session, rows: list[tuple[int, int, str, datetime]], source: str) -> int:
+    """
+    Appends (device_id, school_id, status, start_at) transitions, in order,
+    in the caller's transaction. Returns the number of intervals written.
+    """
+    if not rows:
+        return 0
+    latest = _latest(db, sorted({r[0] for r in rows}))
+    now = datetime.utcnow()
+    values = []
+    for device_id, school_id, status, start_at in rows:
+        prev = latest.get(device_id)
+        start_at = min(start_at or now, now)
+        if prev is not None:
+            if prev[0] == status:
+                continue
+            start_at = max(start_at, prev[1])
+        latest[device_id] = (status, start_at)
+        values.append(
+            {"device_id": device_id, "school_id": school_id, "status": status, "source": source, "start_at": start_at}
+        )
+    if values:
+        db.execute(insert(DeviceStatusInterval), values)
+    return len(values)
+
+
+# -------------------------
+# Availability
+# -------------------------
+def _intervals(db: Session, school_id: int, since: datetime, until: datetime, device_id: int | None):
+    columns = (
+        DeviceStatusInterval.device_id,
+        DeviceStatusInterval.start_at,
+        DeviceStatusInterval.id,
+        DeviceStatusInterval.status,
+    )
+    order = (DeviceStatusInterval.device_id, DeviceStatusInterval.start_at, DeviceStatusInterval.id)
+
+    # Interval in effect at `since`: the device's last one starting before it
+    in_effect = (
+        select(DeviceStatusInterval.id)
+        .where(DeviceStatusInterval.device_id == Device.id, DeviceStatusInterval.start_at < since)
+        .order_by(DeviceStatusInterval.start_at.desc(), DeviceStatusInterval.id.desc())
+        .limit(1)
+        .correlate(Device)
+        .scalar_subquery()
+    )
+    devices = select(in_effect).where(Device.school_id == school_id)
+    if device_id is not None:
+        devices = devices.where(Device.id == device_id)
+    before = select(*columns).where(DeviceStatusInterval.id.in_(devices)).order_by(*order)
+
+    inside = select(*columns).where(
+        DeviceStatusInterval.school_id == school_id,
+        DeviceStatusInterval.start_at >= since,
+        DeviceStatusInterval.start_at < until,
+    )
+    if device_id is not None:
+        inside = inside.where(DeviceStatusInterval.device_id == device_id)
+    inside = inside.order_by(*order)
+
+    return heapq.merge(
+        db.execute(before).tuples(),
+        db.execute(inside).tuples(),
+        key=lambda r: r[:3],
+    )
+
+
+def status_seconds(
+    db: Session,
+    school_id: int,
+    since: datetime,
+    until: datetime,
+    device_id: int | None = None,
+) -> dict[int, Counter]:
+    """
+    Seconds each device spent in each status within [since, until). Time
+    after now and before a device's first interval is not counted.
+    """
+    until = min(until, datetime.utcnow())
+    totals: dict[int, Counter] = defaultdict(Counter)
+    if until <= since:
+        return totals
+
+    current = None  # (device_id, start, status)
+    for dev, start_at, _id, status in _intervals(db, school_id, since, until, device_id):
+        if current is not None and current[0] == dev:
+            totals[dev][current[2]] += (start_at - current[1]).total_seconds()
+        elif current is not None:
+            totals[current[0]][current[2]] += (until - current[1]).total_seconds()
+        current = (dev, max(start_at, since), status)
+    if current is not None:
+        totals[current[0]][current[2]] += (until - current[1]).total_seconds()
+    return totals
+
+
+def availability_ratio(seconds: Counter) -> float | None:
+    """
+    Share of time online out of time online or offline.
+    """
+    known = seconds["online"] + seconds["offline"]
+    return seconds["online"] / known if known else None
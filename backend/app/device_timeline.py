@@ -0,0 +1,106 @@
+"""
+Per-device timeline: events, alerts and status changes in one feed.
+
+Each source is read newest first by its own range scan:
+
+  event   events (school_id, device_id, created_at, id)
+  alert   alerts (device_id, created_at, id)
+  status  device_status_intervals (device_id, start_at, id)
+
+and the three sorted streams are merged lazily (heapq.merge). Every item
+has the sort key (at, kind rank, id), which is unique, so the cursor
+(app.cursors) is just the last item's key. The next page asks each source
+only for rows below it, and at most limit + 1 rows per source, so memory
+stays bounded by the page size however many events the device has.
+"""
+import heapq
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from .cursors import encode_cursor
+from .models import Alert, Device, DeviceStatusInterval, Event
+from .serialization import ALERT_COLUMNS, ALERT_FIELDS, EVENT_COLUMNS, events_to_dicts
+
+
+KINDS = ("event", "alert", "status")
+_RANK = {kind: rank for rank, kind in enumerate(KINDS)}
+
+
+def _below(ts_col, id_col, rank: int, cursor: tuple[datetime, int, int] | None):
+    """
+    Condition for rows of a source with `rank` whose key is below the cursor.
+    """
+    if cursor is None:
+        return None
+    at, c_rank, c_id = cursor
+    if rank < c_rank:
+        return ts_col <= at
+    if rank > c_rank:
+        return ts_col < at
+    return tuple_(ts_col, id_col) < tuple_(at, c_id)
+
+
+def _scan(db: Session, stmt, ts_col, id_col, kind: str, cursor, since, until, limit: int):
+    rank = _RANK[kind]
+    for condition in (
+        _below(ts_col, id_col, rank, cursor),
+        ts_col >= since if since is not None else None,
+        ts_col < until if until is not None else None,
+    ):
+        if condition is not None:
+            stmt = stmt.where(condition)
+    stmt = stmt.order_by(ts_col.desc(), id_col.desc()).limit(limit + 1)
+    return [(ts, rank, row) for ts, row in ((getattr(r, ts_col.key), r) for r in db.execute(stmt))]
+
+
+def device_timeline(
+    db: Session,
+    device: Device,
+    kinds: set[str],
+    cursor: tuple[datetime, int, int] | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = 100,
+) -> tuple[list[dict], str | None]:
+    """
+    One page of the device's timeline, newest first. Returns (items,
+    next cursor or None).
+    """
+    streams = []
+    if "event" in kinds:
+        stmt = select(*EVENT_COLUMNS).where(Event.school_id == device.school_id, Event.device_id == device.id)
+        streams.append(_scan(db, stmt, Event.created_at, Event.id, "event", cursor, since, until, limit))
+    if "alert" in kinds:
+        stmt = select(*ALERT_COLUMNS).where(Alert.device_id == device.id)
+        streams.append(_scan(db, stmt, Alert.created_at, Alert.id, "alert", cursor, since, until, limit))
+    if "status" in kinds:
+        stmt = select(
+            DeviceStatusInterval.id, DeviceStatusInterval.status,
+            DeviceStatusInterval.source, DeviceStatusInterval.start_at,
+        ).where(DeviceStatusInterval.device_id == device.id)
+        streams.append(
+            _scan(db, stmt, DeviceStatusInterval.start_at, DeviceStatusInterval.id, "status", cursor, since, until, limit)
+        )
+
+    merged = heapq.merge(*streams, key=lambda item: (item[0], item[1], item[2].id), reverse=True)
+    page = [item for _, item in zip(range(limit + 1), merged)]
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        at, rank, row = page[-1]
+        next_cursor = encode_cursor(at, rank, row.id)
+
+    events = iter(events_to_dicts(db, [row for _, rank, row in page if rank == _RANK["event"]]))
+    items = []
+    for at, rank, row in page:
+        kind = KINDS[rank]
+        if kind == "event":
+            data = next(events)
+        elif kind == "alert":
+            data = dict(zip(ALERT_FIELDS, row))
+        else:
+            data = {"status": row.status, "source": row.source}
+        items.append({"kind": kind, "id": row.id, "at": at, "data": data})
+    return items, next_cursor
@@ -1,9 +1,12 @@
 import os
+import time
 from email.message import EmailMessage
 from typing import Iterable, Optional, Sequence
 
 import aiosmtplib
 
+from .metrics import EMAIL_SEND_FAILURES, EMAIL_SEND_SECONDS
+
 
 def _get_env(name: str, default: Optional[str] = None) -> Optional[str]:
     val = os.getenv(name)
@@ -80,13 +83,20 @@ async def send_email(
     if bcc_addrs:
         rcpt.extend(list(bcc_addrs))
 
-    await aiosmtplib.send(
-        msg,
-        hostname=smtp_host,
-        port=smtp_port,
-        username=smtp_user,
-        password=smtp_pass,
-        start_tls=use_tls,
-        recipients=rcpt,
-    )
+    start = time.perf_counter()
+    try:
+        await aiosmtplib.send(
+            msg,
+            hostname=smtp_host,
+            port=smtp_port,
+            username=smtp_user,
+            password=smtp_pass,
+            start_tls=use_tls,
+            recipients=rcpt,
+        )
+    except Exception:
+        EMAIL_SEND_FAILURES.inc()
+        raise
+    finally:
+        EMAIL_SEND_SECONDS.observe(time.perf_counter() - start)
     return True
@@ -0,0 +1,290 @@
+"""
+Cold-tier event archive.
+
+Raw events older than EVENT_ARCHIVE_AFTER_DAYS are moved out of the
+database into immutable segment files under EVENT_ARCHIVE_DIR:
+
+    <dir>/<school_id>/<YYYY-MM-DD>/<first_id>-<last_id>.ndjson.gz
+    <dir>/<school_id>/<YYYY-MM-DD>/<first_id>-<last_id>.idx
+
+Days are UTC days of events.created_at; events without a school go under
+school 0. A segment holds one archive pass's events for one school and day,
+sorted by (device_id, created_at, id) and written as NDJSON in blocks of
+EVENT_ARCHIVE_BLOCK_ROWS lines, each block its own gzip member (the file is
+still a valid .gz). The sidecar .idx has one fixed-size record per event in
+the same order:
+
+    device_id int64 | created_at µs int64 | block offset uint64 | block length uint32 | line uint32
+
+so it is sorted by (device_id, ts). Readers mmap it, binary-search the
+device's range and decompress only the blocks that hold matches.
+
+Segment data and index are fsynced and renamed into place (index last, so
+an .idx means a complete segment) before the rows are deleted. If the
+process dies in between, the next pass archives those rows again; queries
+drop duplicate ids. Only events already counted by the hourly rollup are
+archived (see app.rollups).
+"""
+import bisect
+import gzip
+import logging
+import mmap
+import os
+import struct
+import zlib
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import orjson
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .event_fields import lookup_names, unpack_payload
+from .metrics import EVENTS_ARCHIVED
+from .models import Event
+
+
+logger = logging.getLogger("k12.event_archive")
+
+_RECORD = struct.Struct("<qqQII")
+_EPOCH = datetime(1970, 1, 1)
+_US = timedelta(microseconds=1)
+_DELETE_CHUNK = 1000
+
+DATA_SUFFIX = ".ndjson.gz"
+INDEX_SUFFIX = ".idx"
+
+
+def _micros(ts: datetime) -> int:
+    return (ts - _EPOCH) // _US
+
+
+# -------------------------
+# Writing
+# -------------------------
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_segment(day_dir: str, events: list[dict], block_rows: int) -> str:
+    """
+    Writes one segment for `events` (archived event dicts of one school and
+    day, created_at as datetime) and returns its base path.
+    """
+    events = sorted(events, key=lambda e: (e["device_id"] or 0, e["created_at"], e["id"]))
+    base = os.path.join(day_dir, f"{min(e['id'] for e in events)}-{max(e['id'] for e in events)}")
+    os.makedirs(day_dir, exist_ok=True)
+
+    records = bytearray()
+    with open(base + DATA_SUFFIX + ".tmp", "wb") as data:
+        for start in range(0, len(events), block_rows):
+            block = events[start:start + block_rows]
+            raw = b"".join(orjson.dumps(e) + b"\n" for e in block)
+            compressed = gzip.compress(raw, mtime=0)
+            offset = data.tell()
+            data.write(compressed)
+            for line, e in enumerate(block):
+                records += _RECORD.pack(e["device_id"] or 0, _micros(e["created_at"]), offset, len(compressed), line)
+        data.flush()
+        os.fsync(data.fileno())
+    with open(base + INDEX_SUFFIX + ".tmp", "wb") as index:
+        index.write(records)
+        index.flush()
+        os.fsync(index.fileno())
+
+    os.replace(base + DATA_SUFFIX + ".tmp", base + DATA_SUFFIX)
+    os.replace(base + INDEX_SUFFIX + ".tmp", base + INDEX_SUFFIX)
+    _fsync_dir(day_dir)
+    return base
+
+
+def _archived(row, source_names: dict, domain_names: dict, category_names: dict) -> dict:
+    source = source_names[row.source_id]
+    domain = domain_names.get(row.domain_id)
+    category = category_names.get(row.category_id)
+    return {
+        "id": row.id,
+        "school_id": row.school_id,
+        "device_id": row.device_id,
+        "source": source,
+        "event_type": row.event_type,
+        "severity": row.severity,
+        "message": row.message,
+        "domain": domain,
+        "category": category,
+        "action": row.action,
+        "payload": unpack_payload(row.payload, source, row.event_type, domain, category),
+        "dedup_key": row.dedup_key,
+        "created_at": row.created_at,
+    }
+
+
+def archive_events(
+    db: Session,
+    up_to_id: int,
+    archive_dir: str | None = None,
+    after_days: int | None = None,
+    batch_size: int | None = None,
+    block_rows: int | None = None,
+) -> int:
+    """
+    Moves events older than `after_days` with id <= up_to_id into segment
+    files, one batch (one transaction) at a time. Returns the number moved.
+    """
+    archive_dir = settings.event_archive_dir if archive_dir is None else archive_dir
+    after_days = settings.event_archive_after_days if after_days is None else after_days
+    batch_size = batch_size or settings.event_archive_batch_size
+    block_rows = block_rows or settings.event_archive_block_rows
+    if not archive_dir or after_days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=after_days)
+
+    total = 0
+    while True:
+        rows = db.execute(
+            select(
+                Event.id, Event.school_id, Event.device_id, Event.source_id, Event.event_type,
+                Event.severity, Event.message, Event.domain_id, Event.category_id, Event.action,
+                Event.payload, Event.dedup_key, Event.created_at,
+            )
+            .where(Event.id <= up_to_id, Event.created_at < cutoff)
+            .order_by(Event.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            db.rollback()
+            return total
+
+        names = lookup_names(db, rows)
+        groups: dict[tuple[int, date], list] = defaultdict(list)
+        for r in rows:
+            groups[(r.school_id or 0, r.created_at.date())].append(_archived(r, *names))
+        for (school_id, day), group in groups.items():
+            write_segment(os.path.join(archive_dir, str(school_id), day.isoformat()), group, block_rows)
+
+        ids = [r.id for r in rows]
+        for start in range(0, len(ids), _DELETE_CHUNK):
+            db.execute(delete(Event).where(Event.id.in_(ids[start:start + _DELETE_CHUNK])))
+        db.commit()
+        EVENTS_ARCHIVED.inc(len(ids))
+        total += len(ids)
+        if len(rows) < batch_size:
+            return total
+
+
+# -------------------------
+# Reading
+# -------------------------
+class _Keys:
+    """
+    Sequence view of the index's (device_id, ts) keys, for bisect.
+    """
+
+    __slots__ = ("buf", "n")
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.n = len(buf) // _RECORD.size
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, i: int) -> tuple[int, int]:
+        device_id, ts, _off, _len, _line = _RECORD.unpack_from(self.buf, i * _RECORD.size)
+        return device_id, ts
+
+
+class Segment:
+    def __init__(self, base: str):
+        self.base = base
+
+    def _read_blocks(self, wanted: dict[tuple[int, int], set[int] | None]) -> list[dict]:
+        """
+        Decompresses the given (offset, length) blocks. With a set of line
+        numbers only those lines are parsed; None parses the whole block.
+        """
+        out = []
+        with open(self.base + DATA_SUFFIX, "rb") as f:
+            for (offset, length), lines in sorted(wanted.items()):
+                f.seek(offset)
+                block = zlib.decompress(f.read(length), wbits=31).splitlines()
+                if lines is None:
+                    out.extend(orjson.loads(b) for b in block)
+                else:
+                    out.extend(orjson.loads(block[i]) for i in sorted(lines))
+        return out
+
+    def query(self, since: datetime, until: datetime, device_id: int | None) -> list[dict]:
+        lo_ts, hi_ts = _micros(since), _micros(until)
+        with open(self.base + INDEX_SUFFIX, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                keys = _Keys(buf)
+                if device_id is None:
+                    lo, hi = 0, len(keys)
+                else:
+                    lo = bisect.bisect_left(keys, (device_id, lo_ts))
+                    hi = bisect.bisect_left(keys, (device_id, hi_ts), lo)
+                wanted: dict[tuple[int, int], set[int]] = {}
+                for i in range(lo, hi):
+                    _dev, ts, offset, length, line = _RECORD.unpack_from(buf, i * _RECORD.size)
+                    if lo_ts <= ts < hi_ts:
+                        wanted.setdefault((offset, length), set()).add(line)
+        return self._read_blocks(wanted) if wanted else []
+
+
+class ArchiveReader:
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+
+    def segments(self, school_id: int, day: date) -> list[Segment]:
+        day_dir = os.path.join(self.archive_dir, str(school_id), day.isoformat())
+        try:
+            names = os.listdir(day_dir)
+        except FileNotFoundError:
+            return []
+        return [
+            Segment(os.path.join(day_dir, name[: -len(INDEX_SUFFIX)]))
+            for name in sorted(names)
+            if name.endswith(INDEX_SUFFIX)
+        ]
+
+    def query(
+        self,
+        school_id: int,
+        since: datetime,
+        until: datetime,
+        device_id: int | None = None,
+        limit: int = 1000,
+    ) -> tuple[list[dict], int]:
+        """
+        Archived events of a school in [since, until), oldest first, at most
+        `limit`. Only the day directories in the range are opened. Returns
+        (events, segments read).
+        """
+        events: list[dict] = []
+        seen: set[int] = set()
+        read = 0
+        day = since.date()
+        while day <= until.date() and len(events) < limit:
+            found = []
+            for segment in self.segments(school_id, day):
+                read += 1
+                found.extend(segment.query(since, until, device_id))
+            found.sort(key=lambda e: (e["created_at"], e["id"]))
+            for event in found:
+                if event["id"] not in seen:
+                    seen.add(event["id"])
+                    events.append(event)
+            day += timedelta(days=1)
+        return events[:limit], read
+
+
+archive_reader = ArchiveReader(settings.event_archive_dir)
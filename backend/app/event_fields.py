@@ -0,0 +1,148 @@
+"""
+Event columns derived from the ingest payload.
+
+Searches and rollups filter on columns rather than parsing payloads or
+LIKE-matching their text:
+
+  source_id, domain_id, category_id  interned names (app.interning)
+  action                             lowercased event.action
+
+The domain falls back to the URL's host; domain and action are lowercased
+and cut to the column width.
+
+The stored payload is compact JSON without the values the row already
+holds: top-level "source" and event.type / event.domain / event.category,
+each dropped only when the column reproduces it exactly, and only from
+payloads with an event object. unpack_payload() puts them back, so readers
+see the payload as it was ingested (every writer sets "source" and
+event.type, which are restored whenever missing).
+"""
+import json
+from urllib.parse import urlsplit
+
+from sqlalchemy.orm import Session
+
+from .interning import categories, domains, sources
+
+
+SOURCE_MAX = 50
+DOMAIN_MAX = 255
+ACTION_MAX = 20
+CATEGORY_MAX = 100
+
+
+def normalize_domain(domain, url=None) -> str | None:
+    if not domain and url:
+        try:
+            domain = urlsplit(str(url)).hostname
+        except ValueError:
+            domain = None
+    if not domain:
+        return None
+    return str(domain).strip().lower()[:DOMAIN_MAX] or None
+
+
+def normalize_action(action) -> str | None:
+    if not action:
+        return None
+    return str(action).strip().lower()[:ACTION_MAX] or None
+
+
+def _category(event: dict) -> str | None:
+    category = event.get("category")
+    return category[:CATEGORY_MAX] if isinstance(category, str) and category else None
+
+
+def _event(payload: dict) -> dict | None:
+    event = payload.get("event")
+    return event if isinstance(event, dict) else None
+
+
+# -------------------------
+# Payload packing
+# -------------------------
+def pack_payload(payload: dict, source: str, event_type: str, domain: str | None, category: str | None) -> str:
+    stored = dict(payload)
+    event = _event(payload)
+    if event is not None:
+        # unpack_payload() restores these for payloads with an event object only
+        if stored.get("source") == source:
+            del stored["source"]
+        event = dict(event)
+        for key, value in (("type", event_type), ("domain", domain), ("category", category)):
+            if key in event and event[key] == value and value is not None:
+                del event[key]
+        stored["event"] = event
+    return json.dumps(stored, separators=(",", ":"))
+
+
+def unpack_payload(raw: str | None, source: str, event_type: str, domain: str | None, category: str | None):
+    """
+    Rebuilds an ingested payload from its stored text and the row's names.
+    Text that is not a JSON object is returned as is.
+    """
+    if raw is None:
+        return None
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        return raw
+    if not isinstance(payload, dict):
+        return payload
+    event = _event(payload)
+    if event is not None:
+        # Only ingest payloads (those with an event object) carry these keys;
+        # pack_payload never drops a None, so None means it was not dropped
+        payload.setdefault("source", source)
+        event.setdefault("type", event_type)
+        if domain is not None:
+            event.setdefault("domain", domain)
+        if category is not None:
+            event.setdefault("category", category)
+    return payload
+
+
+# -------------------------
+# Row values
+# -------------------------
+def event_values(db: Session, records: list[tuple[str, str, dict]]) -> list[dict]:
+    """
+    Column values (source_id, domain_id, category_id, action, payload) for
+    (source, event_type, payload) records, resolving all names in one pass.
+    Call before the session writes (see app.interning).
+    """
+    parsed = []
+    for source, event_type, payload in records:
+        source = str(source)[:SOURCE_MAX]
+        event = _event(payload) or {}
+        domain = normalize_domain(event.get("domain"), event.get("url"))
+        parsed.append((source, event_type, payload, event, domain, _category(event)))
+
+    source_ids = sources.ids(db, {p[0] for p in parsed})
+    domain_ids = domains.ids(db, {p[4] for p in parsed if p[4]})
+    category_ids = categories.ids(db, {p[5] for p in parsed if p[5]})
+
+    values = []
+    for source, event_type, payload, event, domain, category in parsed:
+        values.append(
+            {
+                "source_id": source_ids[source],
+                "domain_id": domain_ids.get(domain) if domain else None,
+                "category_id": category_ids.get(category) if category else None,
+                "action": normalize_action(event.get("action")),
+                "payload": pack_payload(payload, source, event_type, domain, category),
+            }
+        )
+    return values
+
+
+def lookup_names(db: Session, rows) -> tuple[dict[int, str], dict[int, str], dict[int, str]]:
+    """
+    (source, domain, category) id -> name maps for rows with source_id,
+    domain_id and category_id attributes; at most one query per table.
+    """
+    return (
+        sources.names(db, {r.source_id for r in rows}),
+        domains.names(db, {r.domain_id for r in rows}),
+        categories.names(db, {r.category_id for r in rows}),
+    )
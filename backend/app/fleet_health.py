@@ -0,0 +1,273 @@
+"""
+Per-school fleet health counters.
+
+GET /schools/{id}/health reports devices, online, offline, low battery and
+open alerts by severity from memory, so a dashboard load costs the same for
+ten devices or a hundred thousand.
+
+The counters are kept up to date incrementally:
+
+  - ORM writes (device create, Google sync, offline sweep, alert create and
+    acknowledge) arrive after each commit from app.session_changes, as
+    the touched devices and open alert deltas.
+  - Heartbeats write with executemany UPDATEs that bypass the session, so
+    the heartbeat flusher calls devices_changed() itself.
+
+Device state is kept per device (school, status, low battery), so a change
+is applied as a transition from the last state seen and repeated updates
+are idempotent. Alerts are counted by deltas.
+
+Counters are per process and only see this worker's writes. Every
+FLEET_HEALTH_RECONCILE_SECONDS they are rebuilt from the database (one scan
+of devices, one GROUP BY over unacknowledged alerts), which corrects drift
+from other workers or writes made outside the app. Updates that arrive
+while the scan runs are journaled: device states are replayed onto the
+rebuilt counters (they are idempotent), and schools whose alert deltas
+raced the scan keep their live alert counts until the next pass.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import false, func, select
+from sqlalchemy.orm import Session
+
+from . import session_changes
+from .alerts import DEFAULT_LOW_BATTERY_THRESHOLD
+from .config import settings
+from .database import SessionLocal
+from .metrics import FLEET_HEALTH_DRIFT, FLEET_HEALTH_RECONCILE_SECONDS
+from .models import Alert, Device
+from .session_changes import Changes
+
+
+logger = logging.getLogger("k12.fleet_health")
+
+
+def _low(battery: int | None) -> bool:
+    return battery is not None and battery <= DEFAULT_LOW_BATTERY_THRESHOLD
+
+
+class _School:
+    __slots__ = ("devices", "statuses", "low_battery", "open_alerts")
+
+    def __init__(self):
+        self.devices = 0
+        self.statuses: Counter = Counter()
+        self.low_battery = 0
+        self.open_alerts: Counter = Counter()
+
+    def key(self) -> tuple:
+        return (
+            self.devices,
+            frozenset((+self.statuses).items()),
+            self.low_battery,
+            frozenset((+self.open_alerts).items()),
+        )
+
+
+class FleetHealth:
+    def __init__(self, reconcile_interval: float):
+        self.reconcile_interval = reconcile_interval
+        self._devices: dict[int, tuple[int, str | None, bool]] = {}
+        self._schools: dict[int, _School] = {}
+        self._reconciled_at: datetime | None = None
+        self._lock = threading.Lock()
+        # Updates applied while reconcile() scans, replayed onto its result
+        self._journal: list[tuple[int, int | None, str | None, int | None]] | None = None
+        self._raced_alerts: set[int] = set()
+        self._task: asyncio.Task | None = None
+
+    # Updates (caller holds the lock)
+    def _school(self, school_id: int) -> _School:
+        school = self._schools.get(school_id)
+        if school is None:
+            school = self._schools[school_id] = _School()
+        return school
+
+    def _set_device(self, device_id: int, school_id: int, status: str | None, battery: int | None) -> None:
+        state = (school_id, status, _low(battery))
+        prev = self._devices.get(device_id)
+        if prev == state:
+            return
+        if prev is not None:
+            school = self._school(prev[0])
+            school.devices -= 1
+            school.statuses[prev[1]] -= 1
+            school.low_battery -= prev[2]
+        school = self._school(school_id)
+        school.devices += 1
+        school.statuses[status] += 1
+        school.low_battery += state[2]
+        self._devices[device_id] = state
+
+    def _remove_device(self, device_id: int) -> None:
+        prev = self._devices.pop(device_id, None)
+        if prev is not None:
+            school = self._school(prev[0])
+            school.devices -= 1
+            school.statuses[prev[1]] -= 1
+            school.low_battery -= prev[2]
+
+    def devices_changed(self, rows) -> None:
+        """
+        Applies (device_id, school_id, status, battery_percent) states.
+        """
+        with self._lock:
+            for device_id, school_id, status, battery in rows:
+                self._set_device(device_id, school_id, status, battery)
+                if self._journal is not None:
+                    self._journal.append((device_id, school_id, status, battery))
+
+    def apply(self, devices: dict, removed: set[int], alerts: Counter) -> None:
+        with self._lock:
+            for device_id, (school_id, status, battery) in devices.items():
+                self._set_device(device_id, school_id, status, battery)
+            for device_id in removed:
+                self._remove_device(device_id)
+            for (school_id, severity), delta in alerts.items():
+                self._school(school_id).open_alerts[severity] += delta
+            if self._journal is not None:
+                self._journal.extend((device_id, *state) for device_id, state in devices.items())
+                self._journal.extend((device_id, None, None, None) for device_id in removed)
+                self._raced_alerts.update(school_id for school_id, _ in alerts)
+
+    # Reads
+    def snapshot(self, school_id: int) -> dict:
+        with self._lock:
+            school = self._schools.get(school_id) or _School()
+            open_alerts = {severity: n for severity, n in school.open_alerts.items() if n > 0}
+            return {
+                "school_id": school_id,
+                "devices": school.devices,
+                "online": school.statuses["online"],
+                "offline": school.statuses["offline"],
+                "low_battery": school.low_battery,
+                "open_alerts": open_alerts,
+                "open_alerts_total": sum(open_alerts.values()),
+                "reconciled_at": self._reconciled_at,
+            }
+
+    # Reconciliation
+    def reconcile(self, db: Session) -> int:
+        """
+        Rebuilds all counters from the database. Returns the number of
+        schools whose counters had drifted (0 on the first pass).
+        """
+        with self._lock:
+            self._journal = []
+            self._raced_alerts = set()
+        try:
+            devices, schools = self._scan(db)
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+
+        empty = _School().key()
+        with self._lock:
+            live_devices, live_schools = self._devices, self._schools
+            journal, self._journal = self._journal, None
+            # Replay onto the rebuilt state (the update methods act on self)
+            self._devices, self._schools = devices, schools
+            for device_id, school_id, status, battery in journal:
+                if school_id is None:
+                    self._remove_device(device_id)
+                else:
+                    self._set_device(device_id, school_id, status, battery)
+            # Whether the scan saw these alert writes is unknown: keep the live counts
+            for school_id in self._raced_alerts:
+                live = live_schools.get(school_id)
+                self._school(school_id).open_alerts = Counter(live.open_alerts) if live else Counter()
+
+            first = self._reconciled_at is None
+            drifted = sum(
+                1
+                for sid in set(self._schools) | set(live_schools)
+                if (self._schools[sid].key() if sid in self._schools else empty)
+                != (live_schools[sid].key() if sid in live_schools else empty)
+            )
+            self._reconciled_at = datetime.utcnow()
+        if first:
+            return 0
+        if drifted:
+            FLEET_HEALTH_DRIFT.inc(drifted)
+        return drifted
+
+    def _scan(self, db: Session) -> tuple[dict, dict]:
+        devices: dict[int, tuple[int, str | None, bool]] = {}
+        schools: dict[int, _School] = {}
+        rows = db.execute(
+            select(Device.id, Device.school_id, Device.status, Device.battery_percent)
+            .execution_options(yield_per=10_000)
+        )
+        for device_id, school_id, status, battery in rows:
+            low = _low(battery)
+            devices[device_id] = (school_id, status, low)
+            school = schools.get(school_id)
+            if school is None:
+                school = schools[school_id] = _School()
+            school.devices += 1
+            school.statuses[status] += 1
+            school.low_battery += low
+        for school_id, severity, n in db.execute(
+            select(Alert.school_id, Alert.severity, func.count())
+            .where(Alert.acknowledged == false())
+            .group_by(Alert.school_id, Alert.severity)
+        ):
+            schools.setdefault(school_id, _School()).open_alerts[severity] = n
+        db.rollback()
+        return devices, schools
+
+    def _reconcile_once(self) -> int:
+        db = SessionLocal()
+        start = time.perf_counter()
+        try:
+            return self.reconcile(db)
+        finally:
+            FLEET_HEALTH_RECONCILE_SECONDS.observe(time.perf_counter() - start)
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                drifted = await asyncio.to_thread(self._reconcile_once)
+                if drifted:
+                    logger.info("fleet health counters corrected for %d school(s)", drifted)
+            except Exception:
+                logger.exception("fleet health reconcile failed; will retry next interval")
+
+    async def start(self) -> None:
+        try:
+            await asyncio.to_thread(self._reconcile_once)
+        except Exception:
+            logger.exception("initial fleet health reconcile failed")
+        if self.reconcile_interval > 0:
+            self._task = asyncio.create_task(self._run(), name="fleet-health-reconcile")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+fleet_health = FleetHealth(settings.fleet_health_reconcile_seconds)
+
+
+def _changes_committed(changes: Changes) -> None:
+    if changes.devices or changes.removed_devices or changes.open_alerts:
+        fleet_health.apply(changes.devices, set(changes.removed_devices), changes.open_alerts)
+
+
+def install() -> None:
+    """
+    Applies device/alert writes committed on any ORM Session.
+    """
+    session_changes.subscribe(_changes_committed)
+    session_changes.install()
@@ -0,0 +1,356 @@
+"""
+Coalesced device heartbeats.
+
+Heartbeats only touch memory: the latest (last_seen, battery, ip) per
+device overwrites the previous one in a pending map. Every
+HEARTBEAT_FLUSH_INTERVAL_SECONDS the map is swapped out and written with a
+single executemany UPDATE on devices, so the write rate depends on the
+number of devices and the interval, not on how often each device checks in.
+
+The last flushed state per device is kept too, so status changes are only
+written on transitions: a device coming back online (it was marked offline,
+or its previous heartbeat is older than the offline threshold) goes to the
+device status history (app.device_status) in the same transaction as the
+flush. Thresholds are evaluated only when battery drops to or below the
+low-battery threshold.
+
+The serial -> device and per-device state caches are LRUs of
+HEARTBEAT_CACHE_MAX_DEVICES entries. Committed device writes and deletes
+(app.session_changes, device import) evict the devices they touch; evicted
+devices with pending heartbeats are reloaded at flush. If a flush fails,
+devices deleted in the meantime are dropped rather than retried.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from . import session_changes
+from .alerts import DEFAULT_LOW_BATTERY_THRESHOLD, DEFAULT_OFFLINE_THRESHOLD_MINUTES, evaluate_device_thresholds
+from .config import settings
+from .database import SessionLocal
+from .device_status import record_status
+from .fleet_health import fleet_health
+from .metrics import HEARTBEAT_FLUSH_SECONDS, HEARTBEATS_RECEIVED
+from .models import Device, DeviceNetworkIdentity
+from .response_cache import generations
+from .schemas import Heartbeat
+from .session_changes import Changes
+
+
+logger = logging.getLogger("k12.heartbeats")
+
+OFFLINE_AFTER = timedelta(minutes=DEFAULT_OFFLINE_THRESHOLD_MINUTES)
+
+
+@dataclass(slots=True)
+class _Known:
+    school_id: int
+    serial: str
+    status: str | None
+    battery: int | None
+    last_seen: datetime | None
+    ip: str | None = None
+
+
+def _utc_naive(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _write(pending: dict[int, tuple], ip_changes: dict[int, str], transitions: list[tuple]) -> None:
+    db = SessionLocal()
+    try:
+        with_battery = []
+        without_battery = []
+        for device_id, (seen, battery, _ip) in pending.items():
+            row = {"id": device_id, "last_seen": seen, "status": "online", "is_online": True}
+            if battery is None:
+                without_battery.append(row)
+            else:
+                row["battery_percent"] = battery
+                with_battery.append(row)
+        # ORM bulk UPDATE by primary key: one executemany per column set
+        if with_battery:
+            db.execute(update(Device), with_battery)
+        if without_battery:
+            db.execute(update(Device), without_battery)
+
+        if ip_changes:
+            _write_ips(db, pending, ip_changes)
+        record_status(db, transitions, "heartbeat")
+        db.commit()
+    finally:
+        db.close()
+
+
+def _write_ips(db: Session, pending: dict[int, tuple], ip_changes: dict[int, str]) -> None:
+    existing = dict(
+        db.query(DeviceNetworkIdentity.device_id, DeviceNetworkIdentity.id)
+        .filter(
+            DeviceNetworkIdentity.source == "heartbeat",
+            DeviceNetworkIdentity.device_id.in_(ip_changes),
+        )
+        .all()
+    )
+    updates = []
+    inserts = []
+    for device_id, ip in ip_changes.items():
+        seen = pending[device_id][0]
+        if device_id in existing:
+            updates.append({"id": existing[device_id], "ip_address": ip, "last_seen": seen})
+        else:
+            inserts.append({"device_id": device_id, "ip_address": ip, "last_seen": seen, "source": "heartbeat"})
+    if updates:
+        db.execute(update(DeviceNetworkIdentity), updates)
+    if inserts:
+        db.execute(insert(DeviceNetworkIdentity), inserts)
+
+
+_KNOWN_COLUMNS = (
+    Device.id, Device.school_id, Device.serial_number, Device.status, Device.battery_percent, Device.last_seen
+)
+
+
+class HeartbeatTracker:
+    def __init__(self, flush_interval: float, max_devices: int | None = None):
+        self.flush_interval = flush_interval
+        self.max_devices = max_devices or settings.heartbeat_cache_max_devices
+        self._serials: dict[tuple[int, str], int] = {}
+        self._known: OrderedDict[int, _Known] = OrderedDict()
+        self._pending: dict[int, tuple[datetime, int | None, str | None]] = {}
+        self._task: asyncio.Task | None = None
+        # Devices written elsewhere, evicted on the event loop before the next use
+        self._stale: set[int] = set()
+        self._stale_lock = threading.Lock()
+
+    def forget(self, device_ids) -> None:
+        """
+        Evicts devices whose row changed or was deleted. Safe from any thread.
+        """
+        with self._stale_lock:
+            self._stale.update(device_ids)
+
+    def _drop_stale(self) -> None:
+        with self._stale_lock:
+            stale, self._stale = self._stale, set()
+        for device_id in stale:
+            self._evict(device_id)
+
+    def _evict(self, device_id: int) -> None:
+        known = self._known.pop(device_id, None)
+        if known is not None and self._serials.get((known.school_id, known.serial)) == device_id:
+            del self._serials[(known.school_id, known.serial)]
+
+    def _remember(self, device_id, school_id, serial, status, battery, last_seen) -> _Known:
+        self._evict(device_id)
+        self._serials[(school_id, serial)] = device_id
+        known = self._known[device_id] = _Known(school_id, serial, status, battery, last_seen)
+        while len(self._known) > self.max_devices:
+            self._evict(next(iter(self._known)))
+        return known
+
+    def _resolve(self, db: Session, school_id: int, serials: set[str]) -> dict[str, int]:
+        ids = {}
+        missing = []
+        for serial in serials:
+            device_id = self._serials.get((school_id, serial))
+            if device_id is None:
+                missing.append(serial)
+            else:
+                ids[serial] = device_id
+                self._known.move_to_end(device_id)
+        if missing:
+            rows = db.execute(
+                select(*_KNOWN_COLUMNS).where(Device.school_id == school_id, Device.serial_number.in_(missing))
+            ).all()
+            for row in rows:
+                ids[row.serial_number] = row.id
+                self._remember(*row)
+        return ids
+
+    def _load(self, device_ids: list[int]) -> list[tuple]:
+        # Devices with pending heartbeats that were evicted since accept()
+        db = SessionLocal()
+        try:
+            return db.execute(select(*_KNOWN_COLUMNS).where(Device.id.in_(device_ids))).all()
+        finally:
+            db.close()
+
+    def _existing(self, device_ids: list[int]) -> set[int]:
+        db = SessionLocal()
+        try:
+            return set(db.scalars(select(Device.id).where(Device.id.in_(device_ids))))
+        finally:
+            db.close()
+
+    def accept(self, db: Session, school_id: int, beats: list[Heartbeat]) -> tuple[int, list[str]]:
+        """
+        Records heartbeats in memory. Only unknown serials cost a query.
+        Returns (accepted count, unknown serials).
+        """
+        self._drop_stale()
+        ids = self._resolve(db, school_id, {b.serial_number for b in beats})
+
+        now = datetime.utcnow()
+        accepted = 0
+        unknown = []
+        for b in beats:
+            device_id = ids.get(b.serial_number)
+            if device_id is None:
+                unknown.append(b.serial_number)
+                continue
+
+            seen = min(_utc_naive(b.observed_at), now) if b.observed_at else now
+            battery = b.battery_percent
+            ip = b.ip or None
+            prev = self._pending.get(device_id)
+            if prev is not None:
+                if prev[0] > seen:
+                    continue
+                battery = battery if battery is not None else prev[1]
+                ip = ip or prev[2]
+            self._pending[device_id] = (seen, battery, ip)
+            accepted += 1
+
+        HEARTBEATS_RECEIVED.inc(accepted)
+        return accepted, unknown
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        start = time.perf_counter()
+
+        self._drop_stale()
+        # Held by reference: accept() may evict them while the write runs
+        states = {device_id: self._known[device_id] for device_id in pending if device_id in self._known}
+        missing = [device_id for device_id in pending if device_id not in states]
+        if missing:
+            try:
+                rows = await asyncio.to_thread(self._load, missing)
+            except Exception:
+                self._requeue(pending)
+                raise
+            for row in rows:
+                states[row.id] = self._remember(*row)
+            for device_id in missing:
+                if device_id not in states:
+                    del pending[device_id]  # deleted since the heartbeat
+            if not pending:
+                return 0
+
+        transitions = []
+        status_changes = []
+        ip_changes = {}
+        for device_id, (seen, battery, ip) in pending.items():
+            known = states[device_id]
+            silent = known.last_seen is not None and seen - known.last_seen > OFFLINE_AFTER
+            back_online = known.status == "offline" or silent
+            if silent:
+                # Offline since the previous heartbeat, whether or not a sweep noticed
+                status_changes.append((device_id, known.school_id, "offline", known.last_seen))
+            if back_online or known.status != "online":
+                status_changes.append((device_id, known.school_id, "online", seen))
+            battery_crossed = (
+                battery is not None
+                and battery <= DEFAULT_LOW_BATTERY_THRESHOLD
+                and (known.battery is None or known.battery > DEFAULT_LOW_BATTERY_THRESHOLD)
+            )
+            if battery_crossed:
+                transitions.append(device_id)
+            if ip and ip != known.ip:
+                ip_changes[device_id] = ip
+
+        try:
+            await asyncio.to_thread(_write, pending, ip_changes, status_changes)
+        except Exception:
+            try:
+                # A deleted device fails every batch it is in: retry only live ones
+                existing = await asyncio.to_thread(self._existing, list(pending))
+            except Exception:
+                existing = set(pending)
+            for device_id in set(pending) - existing:
+                del pending[device_id]
+                self._evict(device_id)
+            self._requeue(pending)
+            raise
+        finally:
+            HEARTBEAT_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+        # Bulk UPDATEs bypass the session hooks that bump list generations
+        # and update fleet health counters
+        generations.bump({known.school_id for known in states.values()})
+
+        for device_id, (seen, battery, ip) in pending.items():
+            known = states[device_id]
+            known.status = "online"
+            known.last_seen = seen
+            if battery is not None:
+                known.battery = battery
+            if ip:
+                known.ip = ip
+        fleet_health.devices_changed(
+            (device_id, known.school_id, "online", known.battery) for device_id, known in states.items()
+        )
+
+        if transitions:
+            await self._evaluate(transitions)
+        return len(pending)
+
+    def _requeue(self, pending: dict) -> None:
+        # Keep the newest values for the next attempt unless fresher ones arrived
+        for device_id, value in pending.items():
+            self._pending.setdefault(device_id, value)
+
+    async def _evaluate(self, device_ids: list[int]) -> None:
+        db = SessionLocal()
+        try:
+            for device in db.query(Device).filter(Device.id.in_(device_ids)).all():
+                await evaluate_device_thresholds(db, device)
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("heartbeat flush failed; will retry next interval")
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="heartbeat-flusher")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("final heartbeat flush failed")
+
+
+heartbeat_tracker = HeartbeatTracker(settings.heartbeat_flush_interval_seconds)
+
+
+def _changes_committed(changes: Changes) -> None:
+    if changes.devices or changes.removed_devices:
+        heartbeat_tracker.forget([*changes.devices, *changes.removed_devices])
+
+
+def install() -> None:
+    """
+    Evicts cached devices after commits that write or delete them.
+    """
+    session_changes.subscribe(_changes_committed)
+    session_changes.install()
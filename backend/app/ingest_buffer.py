@@ -0,0 +1,456 @@
+"""
+Write-behind ingest (INGEST_MODE=buffered).
+
+Ingest handlers validate the key, check the dedup seen-set, push a
+normalized record into a bounded queue and return 202. Background flushers
+then take batches and, per batch:
+
+  - correlate devices with one IN query per identifier kind and school,
+  - drop records whose dedup key is already stored,
+  - bulk insert the events (ON CONFLICT DO NOTHING on the dedup index),
+  - evaluate policy with each school's rules loaded once.
+
+A batch that fails on a data error (IntegrityError, DataError, ...) is
+split and retried one record at a time, and a record that still fails is
+dropped. A batch that fails because the database is unavailable
+(OperationalError, a lost connection, pool timeout) is kept in process and
+retried before anything else is taken from the queue, with exponential
+backoff up to INGEST_RETRY_MAX_SECONDS; the queue fills meanwhile and
+ingest answers 429.
+
+The queue is in-process (asyncio.Queue) or a Redis list
+(INGEST_BUFFER_BACKEND=redis) shared by all workers. Records taken from
+Redis by a worker that then crashes are lost (including batches it holds
+for retry); in-process records are lost on a hard kill. Shutdown drains the queue for up to
+INGEST_DRAIN_TIMEOUT_SECONDS.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .dedup import seen_events
+from .event_fields import event_values
+from .metrics import (
+    CORRELATION_UNMATCHED,
+    INGEST_BUFFER_DEPTH,
+    INGEST_FLUSH_FAILURES,
+    INGEST_FLUSH_SECONDS,
+    INGEST_REJECTED_BUFFER_FULL,
+    record_correlation,
+    record_duplicate,
+    record_ingest,
+)
+from .leases import lease_index, parse_event_time
+from .models import Device, DeviceNetworkIdentity, Event
+from .policy_engine import RuleSet, evaluate_event, get_rules
+
+
+logger = logging.getLogger("k12.ingest_buffer")
+
+
+# -------------------------
+# Queues
+# -------------------------
+class MemoryQueue:
+    def __init__(self, max_size: int):
+        self._q: asyncio.Queue | None = None
+        self.max_size = max_size
+
+    def _queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running loop
+        if self._q is None:
+            self._q = asyncio.Queue(maxsize=self.max_size)
+        return self._q
+
+    async def offer(self, record: dict) -> bool:
+        try:
+            self._queue().put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def take(self, max_items: int, wait_seconds: float) -> list[dict]:
+        q = self._queue()
+        loop = asyncio.get_running_loop()
+        try:
+            batch = [await asyncio.wait_for(q.get(), wait_seconds)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = loop.time() + wait_seconds
+        while len(batch) < max_items:
+            try:
+                batch.append(q.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(q.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def size(self) -> int:
+        return self._queue().qsize()
+
+    def depth(self) -> int:
+        return self._q.qsize() if self._q is not None else 0
+
+
+class RedisQueue:
+    KEY = "k12:ingest:buffer"
+
+    def __init__(self, redis_url: str, max_size: int):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(redis_url)
+        self.max_size = max_size
+
+    async def offer(self, record: dict) -> bool:
+        # LLEN then RPUSH is not atomic; the bound is approximate across workers
+        if await self._redis.llen(self.KEY) >= self.max_size:
+            return False
+        await self._redis.rpush(self.KEY, json.dumps(record))
+        return True
+
+    async def take(self, max_items: int, wait_seconds: float) -> list[dict]:
+        raw = await self._redis.lpop(self.KEY, max_items)
+        if not raw:
+            await asyncio.sleep(wait_seconds)
+            return []
+        return [json.loads(r) for r in raw]
+
+    async def size(self) -> int:
+        return await self._redis.llen(self.KEY)
+
+
+# -------------------------
+# Batch flush (runs in a worker thread)
+# -------------------------
+def _correlate(db: Session, school_id: int, records: list[dict]) -> None:
+    """
+    Resolves record["device_id"] with the same precedence as the synchronous
+    path (serial -> asset tag -> MAC -> IP), using one query per kind. IPs
+    go through the DHCP lease index first, as of each event's time.
+    """
+    wanted = {kind: set() for kind in ("serial", "asset", "mac", "ip")}
+    for r in records:
+        for kind, value in r["ids"].items():
+            if value:
+                wanted[kind].add(value)
+
+    found: dict[str, dict[str, int]] = {kind: {} for kind in wanted}
+    if wanted["serial"]:
+        found["serial"] = dict(
+            db.query(Device.serial_number, Device.id)
+            .filter(Device.school_id == school_id, Device.serial_number.in_(wanted["serial"]))
+            .all()
+        )
+    if wanted["asset"]:
+        found["asset"] = dict(
+            db.query(Device.asset_tag, Device.id)
+            .filter(Device.school_id == school_id, Device.asset_tag.in_(wanted["asset"]))
+            .all()
+        )
+    for kind, column in (("mac", DeviceNetworkIdentity.mac_address), ("ip", DeviceNetworkIdentity.ip_address)):
+        if wanted[kind]:
+            found[kind] = dict(
+                db.query(column, Device.id)
+                .join(Device, DeviceNetworkIdentity.device_id == Device.id)
+                .filter(Device.school_id == school_id, column.in_(wanted[kind]))
+                .all()
+            )
+
+    for r in records:
+        device_id = None
+        for kind in ("serial", "asset", "mac", "ip"):
+            value = r["ids"].get(kind)
+            if not value:
+                continue
+            if kind == "ip":
+                covered, device_id = lease_index.lookup(db, school_id, value, parse_event_time(r.get("observed_at")))
+                if not covered:
+                    device_id = found["ip"].get(value)
+            else:
+                device_id = found[kind].get(value)
+            record_correlation(kind, device_id is not None)
+            if device_id is not None:
+                break
+        if device_id is None:
+            CORRELATION_UNMATCHED.inc()
+        r["device_id"] = device_id
+
+
+def _drop_stored_duplicates(db: Session, school_id: int, records: list[dict]) -> list[dict]:
+    keys = {r["dedup_key"] for r in records if r["dedup_key"]}
+    stored = set()
+    if keys:
+        stored = {
+            k
+            for (k,) in db.query(Event.dedup_key)
+            .filter(Event.school_id == school_id, Event.dedup_key.in_(keys))
+            .all()
+        }
+
+    fresh = []
+    for r in records:
+        key = r["dedup_key"]
+        if key and key in stored:
+            record_duplicate(r["source"])
+            continue
+        if key:
+            stored.add(key)  # also drops repeats inside the batch
+        fresh.append(r)
+    return fresh
+
+
+def _insert_events(db: Session, records: list[dict], values: dict[int, dict]) -> None:
+    rows = [
+        {
+            "school_id": r["school_id"],
+            "device_id": r["device_id"],
+            "event_type": r["event_type"],
+            "severity": r["severity"],
+            "message": r["message"],
+            "dedup_key": r["dedup_key"],
+            **values[id(r)],
+        }
+        for r in records
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        db.execute(insert(Event), rows)
+        return
+    stmt = dialect_insert(Event).on_conflict_do_nothing(index_elements=["school_id", "dedup_key"])
+    db.execute(stmt, rows)
+
+
+def _store_batch(db: Session, records: list[dict]) -> dict[int, tuple[list, RuleSet, dict[int, Device]]]:
+    """
+    Stores one batch and returns, per school, the correlated records to
+    evaluate together with the school's rules and their devices.
+    """
+    by_school: dict[int, list[dict]] = defaultdict(list)
+    for r in records:
+        by_school[r["school_id"]].append(r)
+    # Interned ids for the whole batch, resolved before anything is written
+    values = dict(
+        zip(
+            map(id, records),
+            event_values(db, [(r["source"], r["event_type"], r["payload"]) for r in records]),
+        )
+    )
+
+    stored = []
+    matched: dict[int, list[dict]] = {}
+    for school_id, school_records in by_school.items():
+        school_records = _drop_stored_duplicates(db, school_id, school_records)
+        if not school_records:
+            continue
+        _correlate(db, school_id, school_records)
+        _insert_events(db, school_records, values)
+        stored.extend(school_records)
+        with_device = [r for r in school_records if r["device_id"] is not None]
+        if with_device:
+            matched[school_id] = with_device
+    db.commit()
+
+    for r in stored:
+        if r["dedup_key"]:
+            seen_events.add(r["dedup_key"])
+        record_ingest(r["source"])
+
+    # Loaded after the commit so they are not expired when evaluation reads them
+    to_evaluate = {}
+    for school_id, school_matched in matched.items():
+        devices = {
+            d.id: d
+            for d in db.query(Device).filter(Device.id.in_({r["device_id"] for r in school_matched})).all()
+        }
+        to_evaluate[school_id] = (school_matched, get_rules(db, school_id), devices)
+    return to_evaluate
+
+
+def _is_unavailable(exc: Exception) -> bool:
+    """
+    True when the database could not be reached, rather than the records
+    being at fault: splitting the batch would not help.
+    """
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    return isinstance(exc, (OperationalError, InterfaceError, PoolTimeoutError))
+
+
+# -------------------------
+# Buffer
+# -------------------------
+class IngestBuffer:
+    def __init__(self):
+        self.enabled = settings.ingest_mode == "buffered"
+        self.batch_size = settings.ingest_flush_batch_size
+        self.interval = settings.ingest_flush_interval_ms / 1000.0
+        self._queue = None
+        self._tasks: list[asyncio.Task] = []
+        self._closing = False
+        # Dedup keys queued in this process and not yet flushed
+        self._queued: set[str] = set()
+        # Records whose flush failed because the database was unavailable
+        self._pending: list[dict] = []
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+
+    def _get_queue(self):
+        if self._queue is None:
+            if settings.ingest_buffer_backend == "redis":
+                self._queue = RedisQueue(settings.redis_url, settings.ingest_buffer_max)
+            else:
+                self._queue = MemoryQueue(settings.ingest_buffer_max)
+        return self._queue
+
+    async def accept(self, record: dict) -> JSONResponse:
+        if self._closing:
+            raise HTTPException(status_code=503, detail="Shutting down", headers={"Retry-After": "5"})
+        key = record["dedup_key"]
+        if key and key in self._queued:
+            # Retry of a record still waiting in this process's queue
+            record_duplicate(record["source"])
+            return JSONResponse(status_code=200, content={"ok": True, "duplicate": True})
+        queue = self._get_queue()
+        if not await queue.offer(record):
+            INGEST_REJECTED_BUFFER_FULL.inc()
+            raise HTTPException(status_code=429, detail="Ingest buffer full", headers={"Retry-After": "1"})
+        if key and isinstance(queue, MemoryQueue):
+            # Only this process flushes it. Redis records may be flushed by
+            # another worker; the dedup index catches those retries instead.
+            # seen_events is only updated once the record is committed.
+            self._queued.add(key)
+        return JSONResponse(status_code=202, content={"ok": True, "queued": True})
+
+    def _release(self, records: list[dict]) -> None:
+        for r in records:
+            if r["dedup_key"]:
+                self._queued.discard(r["dedup_key"])
+
+    def _retry_later(self, records: list[dict]) -> None:
+        self._pending.extend(records)
+        self._retry_delay = min(max(self._retry_delay * 2, self.interval), settings.ingest_retry_max_seconds)
+        self._retry_at = time.monotonic() + self._retry_delay
+
+    async def _next_batch(self, queue, wait_seconds: float) -> list[dict]:
+        if self._pending:
+            # Held back while the database was unavailable: these go first
+            await asyncio.sleep(max(0.0, self._retry_at - time.monotonic()))
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            return batch
+        return await queue.take(self.batch_size, wait_seconds)
+
+    async def flush(self, records: list[dict]) -> None:
+        db = SessionLocal()
+        start = time.perf_counter()
+        try:
+            try:
+                to_evaluate = await asyncio.to_thread(_store_batch, db, records)
+            except Exception as e:
+                db.rollback()
+                if _is_unavailable(e):
+                    INGEST_FLUSH_FAILURES.inc()
+                    self._retry_later(records)
+                    logger.warning(
+                        "database unavailable, retrying %d ingest records in %.1fs: %s",
+                        len(records), self._retry_delay, e,
+                    )
+                    return
+                if len(records) == 1:
+                    INGEST_FLUSH_FAILURES.inc()
+                    logger.exception("dropping ingest record that failed to store")
+                    # Not stored: a client retry must be accepted again
+                    self._release(records)
+                    return
+                # Isolate the bad record(s) instead of losing the whole batch
+                for r in records:
+                    await self.flush([r])
+                return
+            # Stored keys are in seen_events now (see _store_batch)
+            self._release(records)
+            self._retry_delay = 0.0
+
+            for school_id, (matched, rules, devices) in to_evaluate.items():
+                for r in matched:
+                    await evaluate_event(
+                        db=db,
+                        school_id=school_id,
+                        device=devices.get(r["device_id"]),
+                        event_type=r["event_type"],
+                        payload=r["policy"],
+                        rules=rules,
+                        source=r["source"],
+                        at=parse_event_time(r.get("observed_at")),
+                    )
+        except Exception:
+            logger.exception("policy evaluation failed for buffered batch")
+        finally:
+            db.close()
+            INGEST_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+    async def _run(self) -> None:
+        queue = self._get_queue()
+        while not self._closing:
+            batch = await self._next_batch(queue, self.interval)
+            if batch:
+                await self.flush(batch)
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        self._closing = False
+        queue = self._get_queue()
+        if isinstance(queue, MemoryQueue):
+            INGEST_BUFFER_DEPTH.set_function(queue.depth)
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"ingest-flusher-{i}")
+            for i in range(settings.ingest_flush_workers)
+        ]
+
+    async def stop(self) -> None:
+        """
+        Stops accepting, lets flushers finish their current batch, then drains
+        what is left for up to INGEST_DRAIN_TIMEOUT_SECONDS.
+        """
+        if not self.enabled:
+            return
+        self._closing = True
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        queue = self._get_queue()
+        deadline = time.monotonic() + settings.ingest_drain_timeout_seconds
+        while time.monotonic() < deadline:
+            if self._pending and self._retry_at > deadline:
+                break
+            batch = await self._next_batch(queue, 0.01)
+            if not batch:
+                break
+            await self.flush(batch)
+
+        remaining = await queue.size() + len(self._pending)
+        if remaining:
+            logger.warning("ingest buffer shut down with %d records left in the queue", remaining)
+
+
+ingest_buffer = IngestBuffer()
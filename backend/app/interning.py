@@ -0,0 +1,145 @@
+"""
+Interned event values.
+
+Sources, domains and categories repeat across millions of events, so events
+store integer ids into the event_sources / event_domains / event_categories
+dictionaries instead of the text. Each table has a per-process cache mapping
+name -> id and id -> name. It is bounded by INTERN_CACHE_SIZE and evicts
+least recently used entries. Ingest resolves ids from memory; only names
+never seen by this process cost a query.
+
+New names are inserted on their own connection and committed at once
+(INSERT ... ON CONFLICT DO NOTHING, then SELECT), so an id is never cached
+for a row that a rolled-back ingest transaction took with it. Resolve ids
+before the session writes anything: SQLite allows one writer at a time.
+Ids are never deleted or reused, so cached entries never go stale.
+"""
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import EventCategory, EventDomain, EventSource
+
+
+class InternTable:
+    def __init__(self, model, max_entries: int):
+        self.model = model
+        self.max_entries = max_entries
+        self._by_name: OrderedDict[str, int] = OrderedDict()
+        self._by_id: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    # Cache
+    def _remember(self, name: str, id_: int) -> None:
+        with self._lock:
+            if name in self._by_name:
+                self._by_name.move_to_end(name)
+                return
+            self._by_name[name] = id_
+            self._by_id[id_] = name
+            while len(self._by_name) > self.max_entries:
+                old_name, old_id = self._by_name.popitem(last=False)
+                self._by_id.pop(old_id, None)
+
+    def _cached_id(self, name: str) -> int | None:
+        with self._lock:
+            id_ = self._by_name.get(name)
+            if id_ is not None:
+                self._by_name.move_to_end(name)
+            return id_
+
+    # Lookups
+    def _select(self, db: Session, names: list[str]) -> dict[str, int]:
+        found = {}
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            for id_, name in db.execute(
+                select(self.model.id, self.model.name).where(self.model.name.in_(chunk))
+            ):
+                found[name] = id_
+        return found
+
+    def _create(self, db: Session, names: list[str]) -> None:
+        engine = db.get_bind().engine
+        rows = [{"name": n} for n in names]
+        dialect = engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            for row in rows:
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(self.model), [row])
+                except IntegrityError:
+                    pass  # created concurrently
+            return
+        with engine.begin() as conn:
+            conn.execute(dialect_insert(self.model).on_conflict_do_nothing(index_elements=["name"]), rows)
+
+    def ids(self, db: Session, names: Iterable[str], create: bool = True) -> dict[str, int]:
+        """
+        Maps names to ids, creating missing ones unless create=False (then
+        unknown names are left out).
+        """
+        result = {}
+        missing = []
+        for name in set(names):
+            id_ = self._cached_id(name)
+            if id_ is None:
+                missing.append(name)
+            else:
+                result[name] = id_
+        if not missing:
+            return result
+
+        found = self._select(db, missing)
+        if create and len(found) < len(missing):
+            self._create(db, [n for n in missing if n not in found])
+            found = self._select(db, missing)
+        for name, id_ in found.items():
+            self._remember(name, id_)
+        result.update(found)
+        return result
+
+    def id(self, db: Session, name: str | None, create: bool = True) -> int | None:
+        if name is None:
+            return None
+        id_ = self._cached_id(name)
+        if id_ is not None:
+            return id_
+        return self.ids(db, (name,), create=create).get(name)
+
+    def names(self, db: Session, ids: Iterable[int | None]) -> dict[int, str]:
+        """
+        Maps ids back to names in one query for whatever is not cached.
+        """
+        result = {}
+        missing = []
+        with self._lock:
+            for id_ in set(ids):
+                if id_ is None:
+                    continue
+                name = self._by_id.get(id_)
+                if name is None:
+                    missing.append(id_)
+                else:
+                    result[id_] = name
+        for start in range(0, len(missing), 500):
+            for id_, name in db.execute(
+                select(self.model.id, self.model.name).where(self.model.id.in_(missing[start:start + 500]))
+            ):
+                self._remember(name, id_)
+                result[id_] = name
+        return result
+
+
+sources = InternTable(EventSource, settings.intern_cache_size)
+domains = InternTable(EventDomain, settings.intern_cache_size)
+categories = InternTable(EventCategory, settings.intern_cache_size)
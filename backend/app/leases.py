@@ -0,0 +1,231 @@
+"""
+Time-aware IP -> device resolution from DHCP leases.
+
+DeviceIpLease rows are append-only. Per school, the index keeps one
+timeline per IP: parallel sorted lists of lease starts, explicit ends and
+device ids. An event at time t resolves with one bisect over that IP's
+starts (O(log n)). The device is the one on the latest lease starting at
+or before t, unless that lease had expired by t. A later lease for the
+same IP implicitly ends the previous one, so no row is ever updated.
+
+Each worker loads a school lazily (leases from the last
+DHCP_LEASE_RETENTION_DAYS). It pulls newer rows by id at most every
+DHCP_INDEX_REFRESH_SECONDS, so leases ingested by other workers show up
+within that delay, and drops leases that started before the retention
+window at the same time. The query runs outside the index lock; only
+folding the rows in is locked. The maintenance pass (app.rollups) deletes
+those rows from device_ip_leases with purge_leases().
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import Device, DeviceIpLease, DeviceNetworkIdentity
+from .schemas import DhcpLease
+
+
+def parse_event_time(value) -> datetime | None:
+    """
+    Parses an ISO-8601 event timestamp into naive UTC; None if absent/invalid.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        ts = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+class _IpTimeline:
+    __slots__ = ("starts", "ends", "devices")
+
+    def __init__(self):
+        self.starts: list[datetime] = []
+        self.ends: list[datetime | None] = []
+        self.devices: list[int | None] = []
+
+    def add(self, start: datetime, end: datetime | None, device_id: int | None) -> None:
+        # Leases mostly arrive in time order, making this an append
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.devices.insert(i, device_id)
+
+    def evict_before(self, cutoff: datetime) -> None:
+        i = bisect_left(self.starts, cutoff)
+        if i:
+            del self.starts[:i], self.ends[:i], self.devices[:i]
+
+    def at(self, ts: datetime) -> int | None:
+        i = bisect_right(self.starts, ts) - 1
+        if i < 0:
+            return None
+        end = self.ends[i]
+        if end is not None and ts >= end:
+            return None
+        return self.devices[i]
+
+
+class _SchoolLeases:
+    __slots__ = ("timelines", "max_id", "refreshed_at")
+
+    def __init__(self):
+        self.timelines: dict[str, _IpTimeline] = {}
+        self.max_id = 0
+        self.refreshed_at = 0.0
+
+
+class LeaseIndex:
+    def __init__(self, retention_days: int, refresh_seconds: float):
+        self.retention = timedelta(days=retention_days)
+        self.refresh_seconds = refresh_seconds
+        self._schools: dict[int, _SchoolLeases] = {}
+        # Lookups come from request handlers and from ingest flush threads
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session, school_id: int, force: bool = False) -> None:
+        with self._lock:
+            school = self._schools.get(school_id)
+            if school is None:
+                school = self._schools[school_id] = _SchoolLeases()
+            elif not force and time.monotonic() - school.refreshed_at < self.refresh_seconds:
+                return
+            since_id = school.max_id
+
+        # Outside the lock: other schools' lookups must not wait on this query
+        cutoff = datetime.utcnow() - self.retention
+        rows = db.execute(
+            select(
+                DeviceIpLease.id,
+                DeviceIpLease.ip_address,
+                DeviceIpLease.start_at,
+                DeviceIpLease.end_at,
+                DeviceIpLease.device_id,
+            )
+            .where(
+                DeviceIpLease.school_id == school_id,
+                DeviceIpLease.id > since_id,
+                DeviceIpLease.start_at >= cutoff,
+            )
+            .order_by(DeviceIpLease.id)
+        ).all()
+
+        with self._lock:
+            for lease_id, ip, start, end, device_id in rows:
+                if lease_id <= school.max_id:
+                    continue  # folded in by a concurrent refresh
+                timeline = school.timelines.get(ip)
+                if timeline is None:
+                    timeline = school.timelines[ip] = _IpTimeline()
+                timeline.add(start, end, device_id)
+                school.max_id = lease_id
+            if not force:
+                # Same window as a fresh load, so all workers resolve alike
+                for ip in list(school.timelines):
+                    timeline = school.timelines[ip]
+                    timeline.evict_before(cutoff)
+                    if not timeline.starts:
+                        del school.timelines[ip]
+            school.refreshed_at = time.monotonic()
+
+    def lookup(self, db: Session, school_id: int, ip: str, at: datetime | None) -> tuple[bool, int | None]:
+        """
+        Returns (covered, device_id). covered is False when no lease for
+        this IP is known, so callers can fall back to static identities.
+        """
+        self.refresh(db, school_id)
+        with self._lock:
+            timeline = self._schools[school_id].timelines.get(ip)
+            if timeline is None:
+                return False, None
+            return True, timeline.at(at or datetime.utcnow())
+
+
+lease_index = LeaseIndex(settings.dhcp_lease_retention_days, settings.dhcp_index_refresh_seconds)
+
+
+def ingest_leases(db: Session, school_id: int, source: str, leases: list[DhcpLease]) -> dict:
+    """
+    Bulk-stores leases (MAC -> device via network identities) and folds them
+    into this worker's index.
+    """
+    macs = set()
+    for lease in leases:
+        if lease.mac:
+            macs.update((lease.mac.lower(), lease.mac.upper()))
+    mac_to_device = {}
+    if macs:
+        mac_to_device = {
+            mac.lower(): device_id
+            for mac, device_id in db.query(DeviceNetworkIdentity.mac_address, Device.id)
+            .join(Device, DeviceNetworkIdentity.device_id == Device.id)
+            .filter(Device.school_id == school_id, DeviceNetworkIdentity.mac_address.in_(macs))
+            .all()
+        }
+
+    rows = []
+    unmatched = 0
+    for lease in leases:
+        start = parse_event_time(lease.start) or datetime.utcnow()
+        mac = lease.mac.lower() if lease.mac else None
+        if lease.action == "release":
+            device_id = None
+            end = None
+        else:
+            device_id = mac_to_device.get(mac) if mac else None
+            if device_id is None:
+                unmatched += 1
+            end = parse_event_time(lease.end)
+            if end is None and lease.lease_seconds:
+                end = start + timedelta(seconds=lease.lease_seconds)
+        rows.append(
+            {
+                "school_id": school_id,
+                "device_id": device_id,
+                "ip_address": lease.ip,
+                "mac_address": mac,
+                "hostname": lease.hostname,
+                "source": source,
+                "start_at": start,
+                "end_at": end,
+            }
+        )
+
+    if rows:
+        db.execute(insert(DeviceIpLease), rows)
+        db.commit()
+        lease_index.refresh(db, school_id, force=True)
+    return {"stored": len(rows), "unmatched_macs": unmatched}
+
+
+def purge_leases(db: Session, retention_days: int | None = None, batch_size: int | None = None) -> int:
+    """
+    Deletes leases that started before the retention window (the index no
+    longer loads them). Returns the number deleted.
+    """
+    retention_days = settings.dhcp_lease_retention_days if retention_days is None else retention_days
+    batch_size = batch_size or settings.event_retention_batch_size
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+    total = 0
+    while True:
+        ids = db.scalars(
+            select(DeviceIpLease.id).where(DeviceIpLease.start_at < cutoff).limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+        db.execute(delete(DeviceIpLease).where(DeviceIpLease.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
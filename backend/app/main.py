@@ -1,4 +1,6 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from .config import settings
@@ -18,16 +20,63 @@ from .auth import (
     require_admin,
 )
 from .alerts import offline_sweep
-
-from .routers import schools, devices, alerts, ingest, goguardian
+from .metrics import RouteLatencyMiddleware, register_db_pool, render_latest
+from .ingest_buffer import ingest_buffer
+from .heartbeats import heartbeat_tracker, install as install_heartbeats
+from .alert_stream import alert_broker
+from .policy_windows import window_store
+from .rollups import rollup_worker
+from .fleet_health import fleet_health, install as install_fleet_health
+from . import admission
+from . import query_profiler
+from . import response_cache
+
+from .routers import schools, devices, alerts, ingest, goguardian, heartbeats, subnets, policies, reports, archive, events
 from .connectors.google_chrome import sync_chromebooks_for_customer
 
 
-app = FastAPI(title=settings.app_name)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background workers start with the app and drain on shutdown
+    await alert_broker.start()
+    await window_store.start()
+    await ingest_buffer.start()
+    await heartbeat_tracker.start()
+    await rollup_worker.start()
+    await fleet_health.start()
+    yield
+    await fleet_health.stop()
+    await rollup_worker.stop()
+    await heartbeat_tracker.stop()
+    await ingest_buffer.stop()
+    await window_store.stop()
+    await alert_broker.stop()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app.add_middleware(RouteLatencyMiddleware)
+register_db_pool(engine)
+response_cache.install()
+install_fleet_health()
+install_heartbeats()
+admission.install()
+
+if settings.sql_profiler_enabled:
+    query_profiler.install(engine)
+    app.add_middleware(query_profiler.QueryProfilerMiddleware)
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "service": "k-12-asset-guardian"}
 
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
 # Create tables (MVP). For production use Alembic migrations.
 Base.metadata.create_all(bind=engine)
 
@@ -37,6 +86,12 @@ app.include_router(devices.router)
 app.include_router(alerts.router)
 app.include_router(ingest.router)
 app.include_router(goguardian.router)
+app.include_router(heartbeats.router)
+app.include_router(subnets.router)
+app.include_router(policies.router)
+app.include_router(reports.router)
+app.include_router(archive.router)
+app.include_router(events.router)
 
 
 # -------------------------
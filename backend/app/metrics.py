@@ -0,0 +1,285 @@
+"""
+Prometheus metrics for the backend.
+
+All label combinations are bound once at import time (or once per route),
+so hot paths only do a dict lookup and an `inc()` / `observe()`.
+"""
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+
+# -------------------------
+# Label vocabularies
+# -------------------------
+# Ingest sources are client supplied; anything unknown is folded into "other"
+# to keep label cardinality bounded.
+KNOWN_SOURCES = (
+    "goguardian",
+    "sonicwall",
+    "lightspeed",
+    "securly",
+    "umbrella",
+    "google",
+    "unknown",
+    "other",
+)
+CORRELATION_METHODS = ("serial", "asset", "mac", "ip")
+ALERT_TYPES = ("security", "threshold", "offline", "other")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# -------------------------
+# Metric families
+# -------------------------
+HTTP_REQUEST_SECONDS = Histogram(
+    "k12_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status_class"),
+    buckets=LATENCY_BUCKETS,
+)
+
+INGEST_EVENTS = Counter(
+    "k12_ingest_events_total",
+    "Events accepted by the ingest endpoints.",
+    ("source",),
+)
+
+INGEST_DUPLICATES = Counter(
+    "k12_ingest_duplicates_total",
+    "Retried/duplicate events acknowledged without a write.",
+    ("source",),
+)
+
+INGEST_REJECTED = Counter(
+    "k12_ingest_rejected_total",
+    "Ingest requests shed with 429.",
+    ("reason",),
+)
+
+INGEST_BUFFER_DEPTH = Gauge(
+    "k12_ingest_buffer_depth",
+    "Records waiting in this worker's in-process ingest buffer.",
+)
+
+INGEST_FLUSH_SECONDS = Histogram(
+    "k12_ingest_flush_duration_seconds",
+    "Time to store and evaluate one buffered ingest batch.",
+    buckets=LATENCY_BUCKETS,
+)
+
+INGEST_FLUSH_FAILURES = Counter(
+    "k12_ingest_flush_failures_total",
+    "Buffered ingest records dropped because they could not be stored.",
+)
+
+HEARTBEATS_RECEIVED = Counter(
+    "k12_heartbeats_received_total",
+    "Device heartbeats accepted (before coalescing).",
+)
+
+HEARTBEAT_FLUSH_SECONDS = Histogram(
+    "k12_heartbeat_flush_duration_seconds",
+    "Time to write one coalesced heartbeat batch.",
+    buckets=LATENCY_BUCKETS,
+)
+
+DEVICE_CORRELATION = Counter(
+    "k12_device_correlation_total",
+    "Device correlation lookups by method and outcome.",
+    ("method", "result"),
+)
+
+POLICY_EVAL_SECONDS = Histogram(
+    "k12_policy_evaluation_seconds",
+    "Time spent in policy_engine.evaluate_event.",
+    buckets=LATENCY_BUCKETS,
+)
+
+ALERTS_CREATED = Counter(
+    "k12_alerts_created_total",
+    "Alerts created.",
+    ("alert_type",),
+)
+
+EMAIL_SEND_SECONDS = Histogram(
+    "k12_email_send_duration_seconds",
+    "SMTP send latency.",
+    buckets=LATENCY_BUCKETS,
+)
+
+EMAIL_SEND_FAILURES = Counter(
+    "k12_email_send_failures_total",
+    "SMTP sends that raised.",
+)
+
+ROLLUP_EVENTS = Counter(
+    "k12_rollup_events_total",
+    "Raw events folded into the hourly rollup.",
+)
+
+ROLLUP_RUN_SECONDS = Histogram(
+    "k12_rollup_run_duration_seconds",
+    "Time for one rollup + retention pass.",
+    buckets=LATENCY_BUCKETS,
+)
+
+EVENTS_PRUNED = Counter(
+    "k12_events_pruned_total",
+    "Raw events deleted by the retention policy.",
+)
+
+EVENTS_ARCHIVED = Counter(
+    "k12_events_archived_total",
+    "Raw events moved to the cold-tier archive.",
+)
+
+FLEET_HEALTH_DRIFT = Counter(
+    "k12_fleet_health_drift_total",
+    "Schools whose in-memory health counters were corrected by reconciliation.",
+)
+
+FLEET_HEALTH_RECONCILE_SECONDS = Histogram(
+    "k12_fleet_health_reconcile_duration_seconds",
+    "Time to rebuild fleet health counters from the database.",
+    buckets=LATENCY_BUCKETS,
+)
+
+SQL_REPEATED_SHAPES = Counter(
+    "k12_sql_repeated_shapes_total",
+    "Statement shapes run SQL_PROFILER_REPEAT_THRESHOLD+ times in one request (likely N+1).",
+    ("route",),
+)
+
+
+# -------------------------
+# Pre-bound children
+# -------------------------
+INGEST_BY_SOURCE = {s: INGEST_EVENTS.labels(source=s) for s in KNOWN_SOURCES}
+_INGEST_OTHER = INGEST_BY_SOURCE["other"]
+
+DUPLICATES_BY_SOURCE = {s: INGEST_DUPLICATES.labels(source=s) for s in KNOWN_SOURCES}
+_DUPLICATES_OTHER = DUPLICATES_BY_SOURCE["other"]
+
+INGEST_REJECTED_RATE_LIMITED = INGEST_REJECTED.labels(reason="rate_limited")
+INGEST_REJECTED_OVERLOADED = INGEST_REJECTED.labels(reason="overloaded")
+INGEST_REJECTED_BUFFER_FULL = INGEST_REJECTED.labels(reason="buffer_full")
+
+CORRELATION_HIT = {
+    m: DEVICE_CORRELATION.labels(method=m, result="hit") for m in CORRELATION_METHODS
+}
+CORRELATION_MISS = {
+    m: DEVICE_CORRELATION.labels(method=m, result="miss") for m in CORRELATION_METHODS
+}
+CORRELATION_UNMATCHED = DEVICE_CORRELATION.labels(method="none", result="miss")
+
+ALERTS_BY_TYPE = {t: ALERTS_CREATED.labels(alert_type=t) for t in ALERT_TYPES}
+_ALERTS_OTHER = ALERTS_BY_TYPE["other"]
+
+
+def record_ingest(source: str) -> None:
+    INGEST_BY_SOURCE.get(source, _INGEST_OTHER).inc()
+
+
+def record_duplicate(source: str) -> None:
+    DUPLICATES_BY_SOURCE.get(source, _DUPLICATES_OTHER).inc()
+
+
+def record_correlation(method: str, hit: bool) -> None:
+    (CORRELATION_HIT if hit else CORRELATION_MISS)[method].inc()
+
+
+def record_alert(alert_type: str) -> None:
+    ALERTS_BY_TYPE.get(alert_type, _ALERTS_OTHER).inc()
+
+
+# -------------------------
+# DB pool stats (read at scrape time)
+# -------------------------
+class DBPoolCollector:
+    """
+    Reports SQLAlchemy pool occupancy when Prometheus scrapes.
+    Pools without size accounting (e.g. StaticPool) are skipped.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        stats = (
+            ("k12_db_pool_size", "Configured pool size.", "size"),
+            ("k12_db_pool_checked_out", "Connections currently checked out.", "checkedout"),
+            ("k12_db_pool_checked_in", "Idle connections in the pool.", "checkedin"),
+            ("k12_db_pool_overflow", "Connections above pool size.", "overflow"),
+        )
+        for name, doc, attr in stats:
+            fn = getattr(pool, attr, None)
+            if fn is None:
+                continue
+            g = GaugeMetricFamily(name, doc)
+            g.add_metric([], fn())
+            yield g
+
+
+def register_db_pool(engine) -> None:
+    REGISTRY.register(DBPoolCollector(engine))
+
+
+# -------------------------
+# ASGI middleware
+# -------------------------
+_STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+class RouteLatencyMiddleware:
+    """
+    Observes request latency keyed by the matched route template, so
+    `/devices/12` and `/devices/13` share one series. Children are bound the
+    first time a route is seen; after that a request costs one dict lookup.
+    """
+
+    def __init__(self, app, histogram: Histogram = HTTP_REQUEST_SECONDS):
+        self.app = app
+        self.histogram = histogram
+        self._children: dict = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            key = (scope["method"], path, status_holder[0] // 100)
+            child = self._children.get(key)
+            if child is None:
+                status_class = _STATUS_CLASSES[key[2] - 1] if 1 <= key[2] <= 5 else "5xx"
+                child = self.histogram.labels(method=key[0], route=path, status_class=status_class)
+                self._children[key] = child
+            child.observe(elapsed)
+
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
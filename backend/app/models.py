@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import JSON, Boolean, DateTime, Float, ForeignKey, Index, Integer, String, Text, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .db import Base
@@ -18,8 +18,10 @@ class User(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
+    school_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("schools.id"), nullable=True, index=True)
+
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
-    hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
+    password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
 
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
@@ -38,6 +40,10 @@ class School(Base):
     district: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     customer_code: Mapped[Optional[str]] = mapped_column(String(100), unique=True, index=True, nullable=True)
 
+    # Ingest admission limits; NULL falls back to the global settings
+    ingest_rate_per_sec: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    ingest_burst: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -62,19 +68,28 @@ class School(Base):
 
 class Device(Base):
     __tablename__ = "devices"
+    __table_args__ = (
+        # Ingest/sync correlation always looks devices up within a school
+        Index("ix_devices_school_serial", "school_id", "serial_number", unique=True),
+        Index("ix_devices_school_asset_tag", "school_id", "asset_tag"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False, index=True)
+    school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False)
 
     # Identifiers
-    asset_tag: Mapped[Optional[str]] = mapped_column(String(100), index=True, nullable=True)
-    serial_number: Mapped[Optional[str]] = mapped_column(String(128), index=True, nullable=True)
+    asset_tag: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    serial_number: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
     device_name: Mapped[Optional[str]] = mapped_column(String(255), index=True, nullable=True)
 
+    device_type: Mapped[str] = mapped_column(String(50), default="Chromebook", nullable=False)
+    assigned_to: Mapped[str] = mapped_column(String(255), default="", nullable=False)
+
     # State / health
     status: Mapped[Optional[str]] = mapped_column(String(50), index=True, nullable=True)  # e.g. active, lost, retired
     is_online: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    battery_percent: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     last_seen: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -109,22 +124,29 @@ class Device(Base):
 
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        # GET /alerts: newest first within a school
+        Index("ix_alerts_school_created_at", "school_id", "created_at"),
+        # GET /devices/{id}/timeline
+        Index("ix_alerts_device_created", "device_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    device_id: Mapped[int] = mapped_column(Integer, ForeignKey("devices.id"), nullable=False, index=True)
+    school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False)
+    device_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("devices.id"), nullable=True)
 
     # Alert details
+    alert_type: Mapped[str] = mapped_column(String(50), index=True, nullable=False)  # security, threshold, offline
     severity: Mapped[str] = mapped_column(String(20), index=True, nullable=False)  # e.g. low/medium/high
-    title: Mapped[str] = mapped_column(String(255), nullable=False)
-    message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    message: Mapped[str] = mapped_column(Text, nullable=False)
 
-    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    acknowledged: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
-    device: Mapped["Device"] = relationship("Device", back_populates="alerts")
+    device: Mapped[Optional["Device"]] = relationship("Device", back_populates="alerts")
 
 
 # ----------------------------
@@ -140,6 +162,7 @@ class SchoolApiKey(Base):
     school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False, index=True)
 
     # Store only hashed keys in production; for now keep as plain string if you must.
+    # The unique index on key already serves (school_id, key) lookups.
     key: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
 
     label: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
@@ -156,13 +179,16 @@ class ExternalDeviceId(Base):
     Example: Google Admin deviceId, GoGuardian device id, Jamf id, etc.
     """
     __tablename__ = "external_device_ids"
+    __table_args__ = (
+        Index("ix_external_device_ids_source_external_id", "source", "external_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
     device_id: Mapped[int] = mapped_column(Integer, ForeignKey("devices.id"), nullable=False, index=True)
 
-    source: Mapped[str] = mapped_column(String(50), index=True, nullable=False)  # google_chrome, goguardian, jamf
-    external_id: Mapped[str] = mapped_column(String(255), index=True, nullable=False)
+    source: Mapped[str] = mapped_column(String(50), nullable=False)  # google_chrome, goguardian, jamf
+    external_id: Mapped[str] = mapped_column(String(255), nullable=False)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
@@ -174,6 +200,21 @@ class DeviceNetworkIdentity(Base):
     Network identity info for a device (IP/MAC/hostname/source system, etc.)
     """
     __tablename__ = "device_network_identities"
+    __table_args__ = (
+        # Correlation fallbacks; most rows carry only one of the two
+        Index(
+            "ix_device_network_identities_mac_address",
+            "mac_address",
+            sqlite_where=text("mac_address IS NOT NULL"),
+            postgresql_where=text("mac_address IS NOT NULL"),
+        ),
+        Index(
+            "ix_device_network_identities_ip_address",
+            "ip_address",
+            sqlite_where=text("ip_address IS NOT NULL"),
+            postgresql_where=text("ip_address IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
@@ -190,29 +231,150 @@ class DeviceNetworkIdentity(Base):
     device: Mapped["Device"] = relationship("Device", back_populates="network_identities")
 
 
+class DeviceIpLease(Base):
+    """
+    One DHCP assignment of an IP, as reported by a firewall/DHCP log.
+    Append-only: a lease holds from start_at until end_at or the next lease
+    for the same IP, whichever is first. Releases are rows with no device.
+    """
+    __tablename__ = "device_ip_leases"
+    __table_args__ = (
+        Index("ix_device_ip_leases_school_ip_start", "school_id", "ip_address", "start_at"),
+        # Retention purge (app.leases.purge_leases)
+        Index("ix_device_ip_leases_start_at", "start_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False)
+    device_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("devices.id"), nullable=True)
+
+    ip_address: Mapped[str] = mapped_column(String(45), nullable=False)
+    mac_address: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    hostname: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    source: Mapped[str] = mapped_column(String(50), nullable=False)
+
+    start_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    end_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class DeviceStatusInterval(Base):
+    """
+    One stretch of a device's status (online, offline, ...). Append-only: an
+    interval holds from start_at until the next interval of the same device.
+    Written in bulk by the offline sweep, heartbeats and the Google sync
+    (see app.device_status).
+    """
+    __tablename__ = "device_status_intervals"
+    __table_args__ = (
+        Index("ix_device_status_intervals_device_start", "device_id", "start_at"),
+        Index("ix_device_status_intervals_school_start", "school_id", "start_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False)
+    device_id: Mapped[int] = mapped_column(Integer, ForeignKey("devices.id"), nullable=False)
+
+    status: Mapped[str] = mapped_column(String(50), nullable=False)
+    source: Mapped[str] = mapped_column(String(20), nullable=False)  # sweep, heartbeat, google, migration
+
+    start_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SchoolSubnet(Base):
+    """
+    Network prefix owned by a school. Firewall logs that carry only a source
+    address are attributed to the school with the longest matching prefix.
+    """
+    __tablename__ = "school_subnets"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False, index=True)
+
+    # Normalized network form, e.g. 10.12.0.0/16 or 2001:db8:12::/48
+    cidr: Mapped[str] = mapped_column(String(49), unique=True, nullable=False)
+    label: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Event(Base):
     """
     Generic event/telemetry ingestion table.
     Store payload as text to keep DB simple (SQLite/Postgres friendly).
     """
     __tablename__ = "events"
+    __table_args__ = (
+        # Idempotent ingest: retried deliveries collide here (NULL keys never do)
+        Index("ux_events_school_dedup_key", "school_id", "dedup_key", unique=True),
+        # GET /events: newest-first keyset scans per school, optionally narrowed
+        Index("ix_events_school_created", "school_id", "created_at", "id"),
+        Index("ix_events_school_device_created", "school_id", "device_id", "created_at", "id"),
+        Index("ix_events_school_domain_created", "school_id", "domain_id", "created_at", "id"),
+        Index("ix_events_school_type_created", "school_id", "event_type", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    school_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("schools.id"), nullable=True, index=True)
+    school_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("schools.id"), nullable=True)
     device_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("devices.id"), nullable=True, index=True)
 
-    source: Mapped[str] = mapped_column(String(50), index=True, nullable=False)  # goguardian, google_chrome, manual
+    # goguardian, google, webfilter sources...; names live in event_sources
+    source_id: Mapped[int] = mapped_column(Integer, ForeignKey("event_sources.id"), nullable=False)
     event_type: Mapped[str] = mapped_column(String(100), index=True, nullable=False)
 
+    severity: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+    message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Compact JSON without the fields held in columns (see app.event_fields)
     payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
+    # Extracted from payload["event"]; domain and category are interned (app.interning)
+    domain_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("event_domains.id"), nullable=True)
+    category_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("event_categories.id"), nullable=True)
+    action: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+
+    # sha256 hex of the client idempotency key or of the event content
+    dedup_key: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     school: Mapped[Optional["School"]] = relationship("School", back_populates="events")
     device: Mapped[Optional["Device"]] = relationship("Device", back_populates="events")
 
 
+# ----------------------------
+# Interned event values
+# ----------------------------
+# Append-only name <-> id dictionaries. Ids are never reused or deleted, so
+# every process can cache them indefinitely.
+
+class EventSource(Base):
+    __tablename__ = "event_sources"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+
+
+class EventDomain(Base):
+    __tablename__ = "event_domains"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+
+
+class EventCategory(Base):
+    __tablename__ = "event_categories"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+
+
 class PolicyRule(Base):
     """
     Policy engine rules to evaluate incoming events.
@@ -222,9 +384,16 @@ class PolicyRule(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    name: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
+    school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False, index=True)
+
+    name: Mapped[str] = mapped_column(String(255), index=True, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
 
+    # e.g. deny_domain with params {"domain": "example.com"}
+    rule_type: Mapped[str] = mapped_column(String(50), default="deny_domain", nullable=False)
+    params: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    severity: Mapped[str] = mapped_column(String(20), default="medium", nullable=False)
+
     # Matching logic
     source: Mapped[Optional[str]] = mapped_column(String(50), index=True, nullable=True)
     event_type: Mapped[Optional[str]] = mapped_column(String(100), index=True, nullable=True)
@@ -234,3 +403,45 @@ class PolicyRule(Base):
     action: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class EventHourlyRollup(Base):
+    """
+    Event counts per school, hour and (device, source, event_type, domain,
+    action). Filled incrementally from `events` by app.rollups; reports read
+    this instead of the raw history. Uncorrelated events count under
+    device_id 0 and missing domain/action under "".
+    """
+    __tablename__ = "event_hourly_rollups"
+    __table_args__ = (
+        Index(
+            "ux_event_hourly_rollups_key",
+            "school_id", "hour", "device_id", "source", "event_type", "domain", "action",
+            unique=True,
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    school_id: Mapped[int] = mapped_column(Integer, ForeignKey("schools.id"), nullable=False)
+    # Start of the UTC hour (events.created_at truncated)
+    hour: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    device_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    source: Mapped[str] = mapped_column(String(50), nullable=False)
+    event_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    domain: Mapped[str] = mapped_column(String(255), default="", nullable=False)
+    action: Mapped[str] = mapped_column(String(20), default="", nullable=False)
+
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class RollupCheckpoint(Base):
+    """
+    Highest events.id folded into a rollup, one row per rollup name.
+    """
+    __tablename__ = "rollup_checkpoints"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    last_event_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,16 +1,359 @@
+"""
+Policy evaluation.
+
+Each active PolicyRule is compiled once into a CompiledRule (a predicate
+closure over the event context plus a message builder), and a school's
+rules are indexed by (source, event_type). An event is only tested against
+the rules whose source/event_type match it or are unset. The compiled set is
+cached per school and rebuilt every POLICY_RULES_REFRESH_SECONDS, or
+immediately when rules are edited through this worker.
+
+Rule types:
+  - deny_domain: {"domain": "example.com"} on web_access/dns_query events
+  - expression: `condition` is a policy_expr expression
+  - window_count / window_distinct: thresholds over a sliding window of
+    matching events (see policy_windows)
+
+Any rule's `condition`, if set, must also hold for it to fire (for window
+rules: for the event to be counted).
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, NamedTuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from .config import settings
 from .models import Device
 from .models_ext import PolicyRule
 from .alerts import create_alert
+from .metrics import POLICY_EVAL_SECONDS
+from .policy_expr import CONTEXT_KEYS, PolicyExprError, compile_expr
+from .policy_windows import WINDOW_RULE_TYPES, WindowSpec, window_store
+
+
+logger = logging.getLogger("k12.policy")
+
+RULE_TYPES = ("deny_domain", "expression", *WINDOW_RULE_TYPES)
+DOMAIN_EVENT_TYPES = ("web_access", "dns_query")
+
+POLICY_TZ = timezone.utc if settings.policy_timezone.upper() == "UTC" else ZoneInfo(settings.policy_timezone)
+
+# Bounds the per-set memo of candidate lists for arbitrary client-sent pairs
+_MAX_CANDIDATE_KEYS = 1024
+# Below this many deny_domain candidates a plain scan beats slicing the haystack
+_DOMAIN_INDEX_MIN = 32
 
 
-def get_rules(db: Session, school_id: int) -> list[PolicyRule]:
-    return (
-        db.query(PolicyRule)
-        .filter(PolicyRule.school_id == school_id, PolicyRule.enabled == True)  # noqa: E712
-        .all()
+# -------------------------
+# Event context
+# -------------------------
+def build_context(
+    source: str | None,
+    event_type: str,
+    payload: dict,
+    device: Device | None = None,
+    at: datetime | None = None,
+) -> dict:
+    """
+    Flattens a normalized event into the dict compiled rules read. `at` is
+    naive UTC (event time when known); hour/minute/weekday are in
+    POLICY_TIMEZONE.
+    """
+    local = (at or datetime.utcnow()).replace(tzinfo=timezone.utc).astimezone(POLICY_TZ)
+    ctx = dict.fromkeys(CONTEXT_KEYS)
+    ctx.update(
+        source=source,
+        event_type=event_type,
+        domain=(payload.get("domain") or "").lower() or None,
+        url=(payload.get("url") or "").lower() or None,
+        category=payload.get("category"),
+        action=payload.get("action"),
+        hour=local.hour,
+        minute=local.minute,
+        weekday=local.weekday(),
     )
+    if device is not None:
+        ctx["device.id"] = device.id
+        ctx["device.status"] = device.status
+        ctx["device.device_type"] = device.device_type
+        ctx["device.assigned_to"] = device.assigned_to
+        ctx["device.battery_percent"] = device.battery_percent
+        ctx["device.asset_tag"] = device.asset_tag
+        ctx["device.serial_number"] = device.serial_number
+        ctx["device.is_online"] = device.is_online
+    return ctx
+
+
+# -------------------------
+# Compiled rules
+# -------------------------
+@dataclass(slots=True, frozen=True)
+class CompiledRule:
+    id: int
+    name: str
+    severity: str
+    # (source, event_type) index keys; None matches any value
+    keys: tuple[tuple[str | None, str | None], ...]
+    predicate: Callable[[dict], object]
+    describe: Callable[[dict], str]
+    # deny_domain only: the denied substring, used by the domain index
+    domain: str | None = None
+    # window rules only: the predicate selects events to count
+    window: WindowSpec | None = None
+
+
+class RuleRow(NamedTuple):
+    """
+    The rule columns compilation reads. Cached rule sets load these instead
+    of ORM objects; attribute access on either works the same.
+    """
+    id: int
+    name: str
+    rule_type: str
+    params: Any
+    severity: str
+    source: str | None
+    event_type: str | None
+    condition: str | None
+
+
+RULE_COLUMNS = (
+    PolicyRule.id,
+    PolicyRule.name,
+    PolicyRule.rule_type,
+    PolicyRule.params,
+    PolicyRule.severity,
+    PolicyRule.source,
+    PolicyRule.event_type,
+    PolicyRule.condition,
+)
+
+
+def _rule_signature(rule: PolicyRule) -> tuple:
+    return (rule.name, rule.rule_type, rule.params, rule.severity, rule.source, rule.event_type, rule.condition)
+
+
+def compile_rule(rule: PolicyRule) -> CompiledRule | None:
+    """
+    Accepts a PolicyRule or a RuleRow. Returns None for rules that can never fire (unknown type, empty domain).
+    Raises PolicyExprError for an invalid condition.
+    """
+    condition = compile_expr(rule.condition) if rule.condition and rule.condition.strip() else None
+    name = rule.name
+    window = None
+
+    if rule.rule_type == "deny_domain":
+        bad_domain = ((rule.params or {}).get("domain") or "").lower().strip()
+        if not bad_domain:
+            return None
+        event_types = (
+            [rule.event_type] if rule.event_type in DOMAIN_EVENT_TYPES
+            else [] if rule.event_type
+            else list(DOMAIN_EVENT_TYPES)
+        )
+        source = rule.source
+        keys = tuple((source, et) for et in event_types)
+
+        def predicate(ctx):
+            return bad_domain in (ctx["domain"] or ctx["url"] or "")
+
+        def describe(ctx):
+            return (
+                f"Policy '{name}' triggered. "
+                f"Denied domain '{bad_domain}'. Observed: {ctx['domain'] or ctx['url'] or ''}"
+            )
+
+    elif rule.rule_type == "expression":
+        if condition is None:
+            raise PolicyExprError("expression rules need a condition")
+        keys = ((rule.source, rule.event_type),)
+        predicate, condition = condition, None
+
+        def describe(ctx):
+            observed = ctx["domain"] or ctx["url"]
+            suffix = f" Observed: {observed}" if observed else ""
+            return f"Policy '{name}' triggered on {ctx['event_type']} from {ctx['source'] or 'unknown'}.{suffix}"
+
+    elif rule.rule_type in WINDOW_RULE_TYPES:
+        window = WindowSpec.from_params(rule.rule_type, rule.params)
+        keys = ((rule.source, rule.event_type),)
+        predicate, condition = (condition or _always), None
+
+        def describe(ctx):
+            return f"Policy '{name}' threshold exceeded."
+
+    else:
+        return None
+
+    if condition is not None:
+        base = predicate
+
+        def predicate(ctx):
+            return base(ctx) and condition(ctx)
+
+    domain = bad_domain if rule.rule_type == "deny_domain" else None
+    return CompiledRule(rule.id, name, rule.severity, keys, predicate, describe, domain, window)
+
+
+def _always(ctx) -> bool:
+    return True
+
+
+class _Candidates:
+    """
+    Rules applicable to one (source, event_type): `rules` are tested one by
+    one; deny_domain rules past _DOMAIN_INDEX_MIN are keyed by denied domain
+    and found by slicing the haystack at each distinct domain length.
+    """
+
+    __slots__ = ("rules", "domains", "lengths")
+
+    def __init__(self, rules: list[CompiledRule]):
+        domain_rules = [r for r in rules if r.domain]
+        if len(domain_rules) < _DOMAIN_INDEX_MIN:
+            domain_rules = []
+        indexed = {r.id for r in domain_rules}
+        self.rules = tuple(r for r in rules if r.id not in indexed)
+        self.domains: dict[str, list[CompiledRule]] = defaultdict(list)
+        for r in domain_rules:
+            self.domains[r.domain].append(r)
+        self.lengths = tuple(sorted({len(d) for d in self.domains}))
+
+    def __bool__(self) -> bool:
+        return bool(self.rules or self.domains)
+
+    def domain_hits(self, haystack: str) -> list[CompiledRule]:
+        domains = self.domains
+        hits: dict[int, CompiledRule] = {}
+        size = len(haystack)
+        for n in self.lengths:
+            if n > size:
+                break
+            for i in range(size - n + 1):
+                found = domains.get(haystack[i : i + n])
+                if found:
+                    for r in found:
+                        hits[r.id] = r
+        return list(hits.values())
+
+
+class RuleSet:
+    def __init__(self, rules: list[CompiledRule]):
+        self.rules = rules
+        self._index: dict[tuple, list[CompiledRule]] = defaultdict(list)
+        for rule in rules:
+            for key in rule.keys:
+                self._index[key].append(rule)
+        self._candidates: dict[tuple, _Candidates] = {}
+
+    def candidates(self, source: str | None, event_type: str) -> _Candidates:
+        key = (source, event_type)
+        hit = self._candidates.get(key)
+        if hit is not None:
+            return hit
+        found: dict[int, CompiledRule] = {}
+        for k in (key, (source, None), (None, event_type), (None, None)):
+            for rule in self._index.get(k, ()):
+                found[rule.id] = rule
+        hit = _Candidates(sorted(found.values(), key=lambda r: r.id))
+        if len(self._candidates) < _MAX_CANDIDATE_KEYS:
+            self._candidates[key] = hit
+        return hit
+
+    def match(self, ctx: dict) -> list[CompiledRule]:
+        """
+        Rules that fire for this context, in rule id order. Pure: no I/O.
+        """
+        candidates = self.candidates(ctx["source"], ctx["event_type"])
+        rules = candidates.rules
+        if candidates.domains:
+            hits = candidates.domain_hits(ctx["domain"] or ctx["url"] or "")
+            if hits:
+                rules = sorted((*rules, *hits), key=lambda r: r.id)
+        fired = []
+        for rule in rules:
+            try:
+                if rule.predicate(ctx):
+                    fired.append(rule)
+            except Exception:
+                logger.warning("policy rule %s failed to evaluate", rule.id, exc_info=True)
+        return fired
+
+
+def compile_rules(rules: list[PolicyRule] | list[RuleRow], previous: dict[int, tuple] | None = None) -> tuple[RuleSet, dict]:
+    """
+    Compiles rules into a RuleSet, reusing entries from `previous` (rule id
+    -> (signature, compiled)) for unchanged rules. Invalid rules are logged
+    and skipped. Returns the set and the new reuse map.
+    """
+    previous = previous or {}
+    compiled: dict[int, tuple] = {}
+    for rule in rules:
+        signature = _rule_signature(rule)
+        hit = previous.get(rule.id)
+        if hit is not None and hit[0] == signature:
+            compiled[rule.id] = hit
+            continue
+        try:
+            compiled[rule.id] = (signature, compile_rule(rule))
+        except PolicyExprError as e:
+            logger.warning("skipping policy rule %s (%s): %s", rule.id, rule.name, e)
+            compiled[rule.id] = (signature, None)
+    rule_set = RuleSet([c for _, c in compiled.values() if c is not None])
+    return rule_set, compiled
+
+
+class RuleSetCache:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        # school_id -> (loaded_at, rule set, reuse map)
+        self._sets: dict[int, tuple[float, RuleSet, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, school_id: int) -> RuleSet:
+        hit = self._sets.get(school_id)
+        if hit is not None and time.monotonic() - hit[0] < self.refresh_seconds:
+            return hit[1]
+        with self._lock:
+            # Another caller may have reloaded while this one waited
+            hit = self._sets.get(school_id)
+            if hit is not None and time.monotonic() - hit[0] < self.refresh_seconds:
+                return hit[1]
+            rows = [
+                RuleRow(*row)
+                for row in db.execute(
+                    select(*RULE_COLUMNS)
+                    .where(PolicyRule.school_id == school_id, PolicyRule.is_active == True)  # noqa: E712
+                    .order_by(PolicyRule.id)
+                )
+            ]
+            rule_set, compiled = compile_rules(rows, hit[2] if hit else None)
+            if hit is not None:
+                window_store.forget(school_id, hit[2].keys() - compiled.keys())
+            self._sets[school_id] = (time.monotonic(), rule_set, compiled)
+            return rule_set
+
+    def invalidate(self, school_id: int) -> None:
+        """
+        Forces a reload on next use; unchanged rules keep their compiled form.
+        """
+        hit = self._sets.get(school_id)
+        if hit is not None:
+            self._sets[school_id] = (float("-inf"), hit[1], hit[2])
+
+
+rule_sets = RuleSetCache(settings.policy_rules_refresh_seconds)
+
+
+def get_rules(db: Session, school_id: int) -> RuleSet:
+    return rule_sets.get(db, school_id)
 
 
 async def evaluate_event(
@@ -19,39 +362,40 @@ async def evaluate_event(
     device: Device | None,
     event_type: str,
     payload: dict,
+    rules: RuleSet | None = None,
+    source: str | None = None,
+    at: datetime | None = None,
 ) -> None:
     """
-    Evaluates normalized events against per-school PolicyRule records.
-
-    Currently supported:
-      - deny_domain: {"domain": "example.com"}
-    """
-    rules = get_rules(db, school_id)
-
-    # Apply deny_domain rules to web/dns events
-    if event_type in {"web_access", "dns_query"}:
-        url = (payload.get("url") or "").lower()
-        domain = (payload.get("domain") or "").lower()
-
-        for r in rules:
-            if r.rule_type != "deny_domain":
-                continue
-
-            bad_domain = (r.params or {}).get("domain", "")
-            bad_domain = (bad_domain or "").lower().strip()
-            if not bad_domain:
-                continue
-
-            haystack = domain or url
-            if bad_domain in haystack:
-                await create_alert(
-                    db=db,
-                    school_id=school_id,
-                    device_id=device.id if device else None,
-                    alert_type="security",
-                    severity=r.severity,
-                    message=(
-                        f"Policy '{r.name}' triggered. "
-                        f"Denied domain '{bad_domain}'. Observed: {domain or url}"
-                    ),
-                )
+    Evaluates a normalized event against the school's compiled rules and
+    raises an alert per rule that fires. Batch callers can pass `rules`
+    (from get_rules) to skip the cache lookup.
+    """
+    start = time.perf_counter()
+    try:
+        if rules is None:
+            rules = get_rules(db, school_id)
+        if not rules.candidates(source, event_type):
+            return
+        ctx = build_context(source, event_type, payload, device, at)
+        ts = None
+        for rule in rules.match(ctx):
+            if rule.window is None:
+                message = rule.describe(ctx)
+            else:
+                if ts is None:
+                    ts = (at or datetime.utcnow()).replace(tzinfo=timezone.utc).timestamp()
+                total = window_store.observe(school_id, rule.id, rule.window, ctx, ts)
+                if total is None:
+                    continue
+                message = rule.window.describe(rule.name, ctx, total)
+            await create_alert(
+                db=db,
+                school_id=school_id,
+                device_id=device.id if device else None,
+                alert_type="security",
+                severity=rule.severity,
+                message=message,
+            )
+    finally:
+        POLICY_EVAL_SECONDS.observe(time.perf_counter() - start)
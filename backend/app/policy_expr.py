@@ -0,0 +1,291 @@
+"""
+Policy condition expressions.
+
+PolicyRule.condition holds a small boolean expression over the normalized
+event, for example:
+
+    category == "games" and action != "blocked" and 8 <= hour < 15
+    endswith(domain, ".proxy.example") or matches(url, "vpn|unblock")
+    device.battery_percent < 10 and source in ["goguardian", "webfilter"]
+
+The text is parsed with Python's `ast` and only a whitelist is accepted:
+and/or/not, comparisons (chained, `in` / `not in`), string/number/bool/None
+literals and literal lists, the fields below and the functions in
+FUNCTIONS. Nothing is ever passed to eval(). Each node compiles once into a
+closure over the event context dict, so evaluating a rule does no parsing.
+
+Missing values are None. Ordering comparisons against None (or between
+incompatible types) are false; == and != compare normally.
+
+matches() patterns run on every ingested event, so they are limited to
+ones the backtracking `re` engine matches in polynomial time: at most
+MAX_PATTERN_LENGTH characters, no backreferences, and no repeated group
+that contains another repeat or an alternation (`(a+)+`, `(a|ab)*`).
+"""
+import ast
+import operator
+import re
+from re import _parser as sre_parse
+from typing import Any, Callable
+
+
+MAX_EXPR_LENGTH = 2000
+MAX_PATTERN_LENGTH = 200
+
+EVENT_FIELDS = frozenset(
+    {"source", "event_type", "domain", "url", "category", "action", "hour", "minute", "weekday"}
+)
+DEVICE_FIELDS = frozenset(
+    {"id", "status", "device_type", "assigned_to", "battery_percent", "asset_tag", "serial_number", "is_online"}
+)
+CONTEXT_KEYS = tuple(sorted(EVENT_FIELDS)) + tuple(f"device.{f}" for f in sorted(DEVICE_FIELDS))
+
+Evaluator = Callable[[dict], Any]
+
+
+class PolicyExprError(ValueError):
+    pass
+
+
+# -------------------------
+# Operators
+# -------------------------
+def _ordered(op):
+    def compare(a, b):
+        if a is None or b is None:
+            return False
+        try:
+            return op(a, b)
+        except TypeError:
+            return False
+
+    return compare
+
+
+def _contains(a, b):
+    if b is None:
+        return False
+    try:
+        return a in b
+    except TypeError:
+        return False
+
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: _ordered(operator.lt),
+    ast.LtE: _ordered(operator.le),
+    ast.Gt: _ordered(operator.gt),
+    ast.GtE: _ordered(operator.ge),
+    ast.In: _contains,
+    ast.NotIn: lambda a, b: not _contains(a, b),
+}
+
+
+# -------------------------
+# Functions
+# -------------------------
+def _str_fn(fn):
+    def call(value, arg):
+        return isinstance(value, str) and isinstance(arg, str) and fn(value, arg)
+
+    return call
+
+
+def _lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+FUNCTIONS: dict[str, tuple[int, Callable]] = {
+    "contains": (2, _str_fn(lambda s, sub: sub in s)),
+    "startswith": (2, _str_fn(str.startswith)),
+    "endswith": (2, _str_fn(str.endswith)),
+    "lower": (1, _lower),
+    # matches(value, "regex"): the pattern must be a literal and is compiled once
+    "matches": (2, None),
+}
+
+
+# -------------------------
+# Compiler
+# -------------------------
+_NO_VALUE = object()
+
+
+def _literal(node: ast.AST) -> Any:
+    """
+    Returns the value of a literal node (lists of literals included), or
+    _NO_VALUE if the node is not a literal.
+    """
+    if isinstance(node, ast.Constant) and (node.value is None or isinstance(node.value, (str, int, float, bool))):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        inner = _literal(node.operand)
+        if isinstance(inner, (int, float)) and not isinstance(inner, bool):
+            return -inner
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        values = [_literal(elt) for elt in node.elts]
+        if any(v is _NO_VALUE for v in values):
+            raise PolicyExprError("Lists may only contain literals")
+        try:
+            return frozenset(values)
+        except TypeError:
+            return tuple(values)
+    return _NO_VALUE
+
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, sre_parse.POSSESSIVE_REPEAT)
+
+
+def _check_pattern(items, repeated: bool = False) -> None:
+    """
+    Rejects constructs that can backtrack exponentially (see module
+    docstring). `repeated` is True inside a quantifier that allows more
+    than one match.
+    """
+    for op, av in items:
+        if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            raise PolicyExprError("matches() patterns may not use backreferences")
+        if op in _REPEATS:
+            _min, high, body = av
+            if high > 1 and repeated:
+                raise PolicyExprError("matches() patterns may not nest repeats, as in (a+)+")
+            _check_pattern(body, repeated or high > 1)
+        elif op is sre_parse.BRANCH:
+            if repeated:
+                raise PolicyExprError("matches() patterns may not repeat an alternation, as in (a|ab)*")
+            for branch in av[1]:
+                _check_pattern(branch, repeated)
+        elif op is sre_parse.SUBPATTERN:
+            _check_pattern(av[-1], repeated)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            _check_pattern(av[1], repeated)
+        elif op is sre_parse.ATOMIC_GROUP:
+            _check_pattern(av, repeated)
+
+
+def _compile_pattern(pattern: str):
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise PolicyExprError(f"matches() pattern longer than {MAX_PATTERN_LENGTH} characters")
+    try:
+        _check_pattern(sre_parse.parse(pattern))
+        return re.compile(pattern)
+    except re.error as e:
+        raise PolicyExprError(f"Invalid pattern {pattern!r}: {e}")
+
+
+def _compile_call(node: ast.Call) -> Evaluator:
+    name = node.func.id if isinstance(node.func, ast.Name) else None
+    if name not in FUNCTIONS:
+        raise PolicyExprError(f"Unknown function: {ast.unparse(node.func)}")
+    if node.keywords:
+        raise PolicyExprError(f"{name}() takes no keyword arguments")
+    arity, fn = FUNCTIONS[name]
+    if len(node.args) != arity:
+        raise PolicyExprError(f"{name}() takes {arity} argument(s)")
+
+    if name == "matches":
+        pattern = _literal(node.args[1])
+        if not isinstance(pattern, str):
+            raise PolicyExprError("matches() needs a string literal pattern")
+        search = _compile_pattern(pattern).search
+        value = _compile(node.args[0])
+        return lambda ctx: isinstance(v := value(ctx), str) and search(v) is not None
+
+    args = [_compile(a) for a in node.args]
+    if arity == 1:
+        (a,) = args
+        return lambda ctx: fn(a(ctx))
+    a, b = args
+    return lambda ctx: fn(a(ctx), b(ctx))
+
+
+def _compile_compare(node: ast.Compare) -> Evaluator:
+    ops = []
+    for op in node.ops:
+        fn = _COMPARE_OPS.get(type(op))
+        if fn is None:
+            raise PolicyExprError(f"Unsupported comparison: {type(op).__name__}")
+        ops.append(fn)
+    left = _compile(node.left)
+
+    if len(ops) == 1:
+        op = ops[0]
+        const = _literal(node.comparators[0])
+        if const is not _NO_VALUE:
+            return lambda ctx: op(left(ctx), const)
+        right = _compile(node.comparators[0])
+        return lambda ctx: op(left(ctx), right(ctx))
+
+    pairs = list(zip(ops, [_compile(c) for c in node.comparators]))
+
+    def chain(ctx):
+        a = left(ctx)
+        for op, right in pairs:
+            b = right(ctx)
+            if not op(a, b):
+                return False
+            a = b
+        return True
+
+    return chain
+
+
+def _compile(node: ast.AST) -> Evaluator:
+    const = _literal(node)
+    if const is not _NO_VALUE:
+        return lambda ctx: const
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+            if len(parts) == 2:
+                a, b = parts
+                return lambda ctx: bool(a(ctx)) and bool(b(ctx))
+            return lambda ctx: all(p(ctx) for p in parts)
+        if len(parts) == 2:
+            a, b = parts
+            return lambda ctx: bool(a(ctx)) or bool(b(ctx))
+        return lambda ctx: any(p(ctx) for p in parts)
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        inner = _compile(node.operand)
+        return lambda ctx: not inner(ctx)
+
+    if isinstance(node, ast.Compare):
+        return _compile_compare(node)
+
+    if isinstance(node, ast.Name):
+        if node.id not in EVENT_FIELDS:
+            raise PolicyExprError(f"Unknown field: {node.id}")
+        return operator.itemgetter(node.id)
+
+    if isinstance(node, ast.Attribute):
+        if not (isinstance(node.value, ast.Name) and node.value.id == "device"):
+            raise PolicyExprError(f"Unknown field: {ast.unparse(node)}")
+        if node.attr not in DEVICE_FIELDS:
+            raise PolicyExprError(f"Unknown device field: {node.attr}")
+        return operator.itemgetter(f"device.{node.attr}")
+
+    if isinstance(node, ast.Call):
+        return _compile_call(node)
+
+    raise PolicyExprError(f"Unsupported syntax: {type(node).__name__}")
+
+
+def compile_expr(text: str) -> Evaluator:
+    """
+    Compiles a condition into a callable over a context dict holding every
+    key in CONTEXT_KEYS. Raises PolicyExprError on invalid input.
+    """
+    text = (text or "").strip()
+    if not text:
+        raise PolicyExprError("Empty expression")
+    if len(text) > MAX_EXPR_LENGTH:
+        raise PolicyExprError(f"Expression longer than {MAX_EXPR_LENGTH} characters")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise PolicyExprError(f"Syntax error: {e.msg}")
+    return _compile(tree.body)
@@ -0,0 +1,400 @@
+"""
+Policy replay / what-if simulation.
+
+    python -m app.policy_replay --school-id 3 --since 2026-09-01 --until 2026-10-01 \\
+        --rules candidate_rules.json --include-current --workers 8 --out report.json
+
+Streams a school's stored events for a time range (server-side cursor,
+yield_per) and evaluates them against a candidate rule set: rules from a
+JSON file (a list shaped like POST /policies bodies) and/or the school's
+current active rules. Nothing is written; the output is a report of the
+alerts that would have fired, per rule, with counts, devices, per-day
+totals and the first few samples. Stored rules that no longer compile are
+listed with "valid": false and their error, and are not evaluated; an
+invalid candidate rule stops the run before it starts.
+
+Events are read in id order and fanned out in chunks to a process pool.
+Each worker compiles the rule set once, parses payloads and runs
+RuleSet.match, returning per-chunk aggregates. Window rules depend on
+event order, so workers only return their (key, value, time) observations
+and the parent feeds them, in order, through a private WindowStore. At
+most 2 x workers chunks are in flight, so memory stays bounded whatever
+the range size.
+
+Like live ingest, only events correlated to a device are evaluated.
+Device fields are the devices' current values, not those at event time.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .event_fields import lookup_names, unpack_payload
+from .leases import parse_event_time
+from .models import Device, Event, PolicyRule
+from .policy_engine import RULE_COLUMNS, RuleRow, build_context, compile_rule, compile_rules
+from .policy_expr import PolicyExprError
+from .policy_windows import WindowSpec, WindowStore
+from .schemas import PolicyRuleCreate
+
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_SAMPLES = 20
+
+EVENT_COLUMNS = (
+    Event.id, Event.source_id, Event.event_type, Event.payload, Event.device_id, Event.created_at,
+    Event.domain_id, Event.category_id,
+)
+
+
+class DeviceRow(NamedTuple):
+    """
+    The device fields build_context reads.
+    """
+    id: int
+    status: str | None
+    device_type: str
+    assigned_to: str
+    battery_percent: int | None
+    asset_tag: str | None
+    serial_number: str | None
+    is_online: bool
+
+
+DEVICE_COLUMNS = tuple(getattr(Device, name) for name in DeviceRow._fields)
+
+
+# -------------------------
+# Rules
+# -------------------------
+def load_candidate_rules(path: str) -> list[RuleRow]:
+    """
+    Reads a JSON list of rule objects. Candidate rules get negative ids so
+    they never collide with stored ones in the report.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    if not isinstance(doc, list):
+        raise ValueError("candidate rules file must hold a JSON list")
+    rows = []
+    for i, raw in enumerate(doc, start=1):
+        rule = PolicyRuleCreate.model_validate(raw)
+        if not rule.is_active:
+            continue
+        rows.append(
+            RuleRow(
+                -i, rule.name, rule.rule_type, rule.params, rule.severity,
+                rule.source, rule.event_type, rule.condition,
+            )
+        )
+    return rows
+
+
+def current_rules(db: Session, school_id: int) -> list[RuleRow]:
+    return [
+        RuleRow(*row)
+        for row in db.execute(
+            select(*RULE_COLUMNS)
+            .where(PolicyRule.school_id == school_id, PolicyRule.is_active == True)  # noqa: E712
+            .order_by(PolicyRule.id)
+        )
+    ]
+
+
+# -------------------------
+# Aggregates
+# -------------------------
+class RuleStats:
+    __slots__ = ("count", "devices", "first_at", "last_at", "by_day", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.devices: set[int] = set()
+        self.first_at: float | None = None
+        self.last_at: float | None = None
+        self.by_day: Counter = Counter()
+        self.samples: list[dict] = []
+
+    def add(self, event_id: int, device_id: int | None, ts: float, message: str, sample_size: int) -> None:
+        self.count += 1
+        if device_id is not None:
+            self.devices.add(device_id)
+        self.first_at = ts if self.first_at is None else min(self.first_at, ts)
+        self.last_at = ts if self.last_at is None else max(self.last_at, ts)
+        self.by_day[_iso(ts)[:10]] += 1
+        if len(self.samples) < sample_size:
+            self.samples.append({"event_id": event_id, "device_id": device_id, "at": _iso(ts), "message": message})
+
+    def merge(self, other: "RuleStats", sample_size: int) -> None:
+        self.count += other.count
+        self.devices |= other.devices
+        for ts in (other.first_at, other.last_at):
+            if ts is not None:
+                self.first_at = ts if self.first_at is None else min(self.first_at, ts)
+                self.last_at = ts if self.last_at is None else max(self.last_at, ts)
+        self.by_day.update(other.by_day)
+        self.samples.extend(other.samples[: max(0, sample_size - len(self.samples))])
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+# -------------------------
+# Worker side
+# -------------------------
+_worker: dict = {}
+
+
+def _init_worker(rules: list[RuleRow], devices: dict[int, DeviceRow], sample_size: int) -> None:
+    rule_set, _ = compile_rules(rules)
+    _worker.update(rule_set=rule_set, devices=devices, sample_size=sample_size)
+
+
+def _event_time(payload: dict, created_at: datetime) -> datetime:
+    ev = payload.get("event") if isinstance(payload.get("event"), dict) else {}
+    return parse_event_time(ev.get("observed_at") or ev.get("timestamp")) or created_at
+
+
+def _evaluate_chunk(rows: list[tuple]) -> tuple[int, dict[int, RuleStats], list[tuple]]:
+    """
+    Returns (events evaluated, stats per non-window rule, window
+    observations as (rule_id, event_id, device_id, ts, key, value)).
+    """
+    rule_set = _worker["rule_set"]
+    devices = _worker["devices"]
+    sample_size = _worker["sample_size"]
+    stats: dict[int, RuleStats] = {}
+    observations = []
+
+    for event_id, source, event_type, raw, device_id, created_at, domain, category in rows:
+        payload = unpack_payload(raw, source, event_type, domain, category)
+        if not isinstance(payload, dict):
+            payload = {}
+        ev = payload.get("event") if isinstance(payload.get("event"), dict) else {}
+        at = _event_time(payload, created_at)
+        ctx = build_context(source, event_type, ev, devices.get(device_id), at)
+        ts = None
+        for rule in rule_set.match(ctx):
+            if ts is None:
+                ts = at.replace(tzinfo=timezone.utc).timestamp()
+            spec = rule.window
+            if spec is None:
+                rule_stats = stats.get(rule.id)
+                if rule_stats is None:
+                    rule_stats = stats[rule.id] = RuleStats()
+                rule_stats.add(event_id, device_id, ts, rule.describe(ctx), sample_size)
+            else:
+                key = ctx[spec.group_by] if spec.group_by else None
+                value = ctx[spec.distinct] if spec.distinct else None
+                observations.append((rule.id, event_id, device_id, ts, key, value))
+    return len(rows), stats, observations
+
+
+# -------------------------
+# Driver
+# -------------------------
+def _named(db: Session, rows) -> list[tuple]:
+    """
+    Swaps interned ids for names so workers need no database access.
+    """
+    source_names, domain_names, category_names = lookup_names(db, rows)
+    return [
+        (
+            r.id, source_names[r.source_id], r.event_type, r.payload, r.device_id, r.created_at,
+            domain_names.get(r.domain_id), category_names.get(r.category_id),
+        )
+        for r in rows
+    ]
+
+
+def replay(
+    school_id: int,
+    since: datetime,
+    until: datetime,
+    rules: list[RuleRow],
+    workers: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    sample_size: int = DEFAULT_SAMPLES,
+) -> dict:
+    """
+    Runs the simulation and returns the report. workers=0 evaluates in this
+    process (small ranges, tests).
+    """
+    compiled = {}
+    errors = {}
+    for rule in rules:
+        try:
+            compiled[rule.id] = compile_rule(rule)
+        except PolicyExprError as e:
+            if rule.id < 0:
+                # Invalid candidates fail before any work is done
+                raise PolicyExprError(f"{rule.name}: {e}")
+            # Stored rules the live engine would skip are skipped here too,
+            # but stay in the report
+            compiled[rule.id] = None
+            errors[rule.id] = str(e)
+    evaluated = [r for r in rules if r.id not in errors]
+    names = {r.id: r for r in rules}
+    specs: dict[int, WindowSpec] = {rid: c.window for rid, c in compiled.items() if c is not None and c.window}
+
+    started = time.perf_counter()
+    stats: dict[int, RuleStats] = {r.id: RuleStats() for r in rules}
+    windows = WindowStore(settings.policy_window_max_keys)
+    scanned = 0
+
+    def merge(result) -> None:
+        nonlocal scanned
+        count, chunk_stats, observations = result
+        scanned += count
+        for rule_id, rule_stats in chunk_stats.items():
+            stats[rule_id].merge(rule_stats, sample_size)
+        for rule_id, event_id, device_id, ts, key, value in observations:
+            spec = specs[rule_id]
+            ctx = {spec.group_by: key, spec.distinct: value}
+            total = windows.observe(school_id, rule_id, spec, ctx, ts)
+            if total is not None:
+                message = spec.describe(names[rule_id].name, ctx, total)
+                stats[rule_id].add(event_id, device_id, ts, message, sample_size)
+
+    db = SessionLocal()
+    try:
+        devices = {
+            row[0]: DeviceRow(*row)
+            for row in db.execute(select(*DEVICE_COLUMNS).where(Device.school_id == school_id))
+        }
+        stmt = (
+            select(*EVENT_COLUMNS)
+            .where(
+                Event.school_id == school_id,
+                Event.device_id.is_not(None),
+                Event.created_at >= since,
+                Event.created_at < until,
+            )
+            .order_by(Event.id)
+            .execution_options(stream_results=True, yield_per=chunk_size)
+        )
+        partitions = db.execute(stmt).partitions()
+
+        if workers <= 0:
+            _init_worker(evaluated, devices, sample_size)
+            for partition in partitions:
+                merge(_evaluate_chunk(_named(db, partition)))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(evaluated, devices, sample_size),
+            ) as pool:
+                in_flight = deque()
+                for partition in partitions:
+                    in_flight.append(pool.submit(_evaluate_chunk, _named(db, partition)))
+                    if len(in_flight) >= workers * 2:
+                        merge(in_flight.popleft().result())
+                while in_flight:
+                    merge(in_flight.popleft().result())
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "school_id": school_id,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "events_evaluated": scanned,
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_sec": round(scanned / elapsed, 1) if elapsed > 0 else None,
+        "workers": workers,
+        "rules": [
+            {
+                "id": rule.id,
+                "name": rule.name,
+                "rule_type": rule.rule_type,
+                "severity": rule.severity,
+                "candidate": rule.id < 0,
+                "valid": rule.id not in errors,
+                "error": errors.get(rule.id),
+                "would_fire": stats[rule.id].count,
+                "devices": len(stats[rule.id].devices),
+                "first_at": _iso(stats[rule.id].first_at) if stats[rule.id].first_at is not None else None,
+                "last_at": _iso(stats[rule.id].last_at) if stats[rule.id].last_at is not None else None,
+                "by_day": dict(sorted(stats[rule.id].by_day.items())),
+                "samples": stats[rule.id].samples,
+            }
+            for rule in rules
+        ],
+    }
+
+
+def _parse_bound(value: str) -> datetime:
+    ts = parse_event_time(value)
+    if ts is None:
+        raise argparse.ArgumentTypeError(f"not an ISO-8601 time: {value}")
+    return ts
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay stored events against candidate policy rules.")
+    parser.add_argument("--school-id", type=int, required=True)
+    parser.add_argument("--since", type=_parse_bound, required=True, help="ISO-8601, inclusive")
+    parser.add_argument("--until", type=_parse_bound, default=None, help="ISO-8601, exclusive (default: now)")
+    parser.add_argument("--rules", default=None, help="JSON list of candidate rules")
+    parser.add_argument("--include-current", action="store_true", help="Also replay the school's active rules")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="0 runs in-process")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="Sample alerts kept per rule")
+    parser.add_argument("--out", default=None, help="Report path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if not args.rules and not args.include_current:
+        parser.error("give --rules and/or --include-current")
+
+    rules: list[RuleRow] = []
+    try:
+        if args.rules:
+            rules.extend(load_candidate_rules(args.rules))
+    except (OSError, ValueError, ValidationError) as e:
+        parser.error(f"cannot load {args.rules}: {e}")
+    if args.include_current:
+        db = SessionLocal()
+        try:
+            rules.extend(current_rules(db, args.school_id))
+        finally:
+            db.close()
+
+    try:
+        report = replay(
+            args.school_id,
+            args.since,
+            args.until or datetime.utcnow(),
+            rules,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            sample_size=args.samples,
+        )
+    except PolicyExprError as e:
+        print(f"invalid rule: {e}", file=sys.stderr)
+        return 2
+
+    body = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(body)
+    else:
+        print(body)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
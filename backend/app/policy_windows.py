@@ -0,0 +1,345 @@
+"""
+Sliding-window threshold rules.
+
+  window_count:    {"threshold": 20, "window_seconds": 300, "group_by": "device"}
+      more than 20 matching events from one device within 5 minutes
+  window_distinct: {"threshold": 50, "window_seconds": 600, "group_by": "category", "distinct": "device"}
+      more than 50 different devices hitting one category within 10 minutes
+
+A rule keeps one state per group key. The window is a ring of up to
+MAX_BUCKETS time buckets: counts per bucket (window_count), or the set of
+values seen per bucket plus a per-value count of buckets holding it
+(window_distinct). The oldest buckets are cleared as time advances, so
+an event costs O(1) amortized and never queries `events`. The window is
+exact to one bucket width (window_seconds / buckets).
+
+A key fires when its total first exceeds the threshold, then stays quiet
+for one window. Keys idle for a whole window are evicted (LRU order), and
+each rule holds at most POLICY_WINDOW_MAX_KEYS keys, so memory is bounded.
+
+State is per process and only touched from the event loop. With
+POLICY_WINDOW_SNAPSHOT_PATH set, it is written to a JSON file every
+POLICY_WINDOW_SNAPSHOT_SECONDS and on shutdown, and restored on startup
+for rules whose window definition has not changed.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from .config import settings
+from .policy_expr import CONTEXT_KEYS, PolicyExprError
+
+
+logger = logging.getLogger("k12.policy_windows")
+
+WINDOW_RULE_TYPES = ("window_count", "window_distinct")
+MAX_BUCKETS = 60
+MAX_WINDOW_SECONDS = 7 * 86_400
+SNAPSHOT_VERSION = 1
+
+# Field aliases accepted in group_by / distinct
+_FIELD_ALIASES = {"device": "device.id", "school": None}
+
+
+def _field(params: dict, name: str, required: bool) -> str | None:
+    value = params.get(name)
+    if value is None:
+        if required:
+            raise PolicyExprError(f"{name} is required")
+        return None
+    if value in _FIELD_ALIASES:
+        return _FIELD_ALIASES[value]
+    if value not in CONTEXT_KEYS:
+        raise PolicyExprError(f"Unknown {name} field: {value}")
+    return value
+
+
+@dataclass(slots=True, frozen=True)
+class WindowSpec:
+    kind: str
+    threshold: int
+    window_seconds: int
+    group_by: str | None  # context key; None groups the whole school
+    distinct: str | None = None  # context key counted by window_distinct
+
+    @classmethod
+    def from_params(cls, rule_type: str, params: dict | None) -> "WindowSpec":
+        params = params or {}
+        try:
+            threshold = int(params["threshold"])
+            window_seconds = int(params["window_seconds"])
+        except KeyError as e:
+            raise PolicyExprError(f"{e.args[0]} is required")
+        except (TypeError, ValueError):
+            raise PolicyExprError("threshold and window_seconds must be integers")
+        if threshold < 1:
+            raise PolicyExprError("threshold must be at least 1")
+        if not 1 <= window_seconds <= MAX_WINDOW_SECONDS:
+            raise PolicyExprError(f"window_seconds must be between 1 and {MAX_WINDOW_SECONDS}")
+        return cls(
+            kind=rule_type,
+            threshold=threshold,
+            window_seconds=window_seconds,
+            group_by=_field(params, "group_by", required=False),
+            distinct=_field(params, "distinct", required=True) if rule_type == "window_distinct" else None,
+        )
+
+    def describe(self, name: str, ctx: dict, total: int) -> str:
+        key = ctx[self.group_by] if self.group_by else None
+        what = f"distinct {self.distinct}" if self.kind == "window_distinct" else "matching events"
+        scope = f" for {self.group_by}={key}" if self.group_by else ""
+        return (
+            f"Policy '{name}' triggered: {total} {what}{scope} "
+            f"within {self.window_seconds}s (threshold {self.threshold})."
+        )
+
+
+# -------------------------
+# Per-key ring state
+# -------------------------
+class _CountState:
+    __slots__ = ("last", "fired", "total", "counts")
+
+    def __init__(self, n: int):
+        self.last = -1  # newest bucket index seen
+        self.fired = None  # bucket index of the last alert
+        self.total = 0
+        self.counts = [0] * n
+
+    def clear(self, slot: int) -> None:
+        self.total -= self.counts[slot]
+        self.counts[slot] = 0
+
+    def add(self, slot: int, value) -> None:
+        self.counts[slot] += 1
+        self.total += 1
+
+    def size(self) -> int:
+        return self.total
+
+    def dump(self) -> list:
+        return self.counts
+
+    def load(self, data: list) -> None:
+        self.counts = list(data)
+        self.total = sum(self.counts)
+
+
+class _DistinctState:
+    __slots__ = ("last", "fired", "slots", "refs")
+
+    def __init__(self, n: int):
+        self.last = -1
+        self.fired = None
+        self.slots: list[set | None] = [None] * n
+        # value -> number of buckets holding it
+        self.refs: dict = {}
+
+    def clear(self, slot: int) -> None:
+        values = self.slots[slot]
+        if not values:
+            return
+        refs = self.refs
+        for v in values:
+            left = refs[v] - 1
+            if left:
+                refs[v] = left
+            else:
+                del refs[v]
+        self.slots[slot] = None
+
+    def add(self, slot: int, value) -> None:
+        if value is None:
+            return
+        values = self.slots[slot]
+        if values is None:
+            values = self.slots[slot] = set()
+        if value not in values:
+            values.add(value)
+            self.refs[value] = self.refs.get(value, 0) + 1
+
+    def size(self) -> int:
+        return len(self.refs)
+
+    def dump(self) -> list:
+        return [sorted(s, key=repr) if s else None for s in self.slots]
+
+    def load(self, data: list) -> None:
+        for slot, values in enumerate(data):
+            for v in values or ():
+                self.add(slot, v)
+
+
+class RuleWindow:
+    def __init__(self, spec: WindowSpec, max_keys: int):
+        self.spec = spec
+        self.n = min(MAX_BUCKETS, spec.window_seconds)
+        self.width = spec.window_seconds / self.n
+        self.max_keys = max_keys
+        self._state_cls = _DistinctState if spec.kind == "window_distinct" else _CountState
+        self.keys: OrderedDict = OrderedDict()
+
+    def observe(self, key, value, ts: float) -> int | None:
+        """
+        Adds one event at epoch time `ts`. Returns the window total when this
+        event makes the key fire, else None.
+        """
+        n = self.n
+        idx = int(ts // self.width)
+        state = self.keys.get(key)
+        if state is None:
+            state = self.keys[key] = self._state_cls(n)
+        else:
+            self.keys.move_to_end(key)
+
+        if idx > state.last:
+            if state.last >= 0:
+                # Buckets between the last event and this one fall out of the window
+                for j in range(state.last + 1, min(idx, state.last + n) + 1):
+                    state.clear(j % n)
+            state.last = idx
+        elif idx <= state.last - n:
+            # Older than the window
+            return None
+        state.add(idx % n, value)
+
+        fired = None
+        total = state.size()
+        if total > self.spec.threshold and (state.fired is None or idx >= state.fired + n):
+            state.fired = idx
+            fired = total
+        self._evict(idx)
+        return fired
+
+    def _evict(self, idx: int) -> None:
+        keys = self.keys
+        while keys:
+            key, state = next(iter(keys.items()))
+            if len(keys) > self.max_keys or state.last <= idx - self.n:
+                keys.popitem(last=False)
+            else:
+                break
+
+    def dump(self) -> list:
+        return [[key, s.last, s.fired, s.dump()] for key, s in self.keys.items()]
+
+    def load(self, rows: list) -> None:
+        for key, last, fired, data in rows:
+            state = self._state_cls(self.n)
+            state.load(data)
+            state.last, state.fired = last, fired
+            self.keys[key] = state
+
+
+# -------------------------
+# Store
+# -------------------------
+class WindowStore:
+    def __init__(self, max_keys: int, snapshot_path: str = "", snapshot_seconds: float = 60.0):
+        self.max_keys = max_keys
+        self.snapshot_path = snapshot_path
+        self.snapshot_seconds = snapshot_seconds
+        self._windows: dict[tuple[int, int], RuleWindow] = {}
+        # Snapshot entries not yet claimed by a rule: (school, rule) -> (spec repr, keys)
+        self._restored: dict[tuple[int, int], tuple[str, list]] = {}
+        self._task: asyncio.Task | None = None
+
+    def window(self, school_id: int, rule_id: int, spec: WindowSpec) -> RuleWindow:
+        key = (school_id, rule_id)
+        window = self._windows.get(key)
+        if window is None or window.spec != spec:
+            # New rule, or its window definition changed: start from zero
+            window = self._windows[key] = RuleWindow(spec, self.max_keys)
+            restored = self._restored.pop(key, None)
+            if restored is not None and restored[0] == repr(spec):
+                window.load(restored[1])
+        return window
+
+    def observe(self, school_id: int, rule_id: int, spec: WindowSpec, ctx: dict, ts: float) -> int | None:
+        key = ctx[spec.group_by] if spec.group_by else None
+        if spec.group_by and key is None:
+            return None
+        value = ctx[spec.distinct] if spec.distinct else None
+        return self.window(school_id, rule_id, spec).observe(key, value, ts)
+
+    def forget(self, school_id: int, rule_ids) -> None:
+        """
+        Drops state for rules that no longer exist or are inactive.
+        """
+        for rule_id in rule_ids:
+            self._windows.pop((school_id, rule_id), None)
+
+    # Snapshots
+    def snapshot(self) -> dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "rules": [
+                {"school_id": s, "rule_id": r, "spec": repr(w.spec), "keys": w.dump()}
+                for (s, r), w in self._windows.items()
+                if w.keys
+            ],
+        }
+
+    def save(self, doc: dict) -> None:
+        tmp = f"{self.snapshot_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f, separators=(",", ":"))
+        os.replace(tmp, self.snapshot_path)
+
+    def restore(self) -> int:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            if doc.get("version") != SNAPSHOT_VERSION:
+                return 0
+            for entry in doc["rules"]:
+                self._restored[(entry["school_id"], entry["rule_id"])] = (entry["spec"], entry["keys"])
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.exception("ignoring unreadable policy window snapshot %s", self.snapshot_path)
+            return 0
+        return len(self._restored)
+
+    async def _write_snapshot(self) -> None:
+        # Serialized on the loop (state is loop-owned), written off it
+        await asyncio.to_thread(self.save, self.snapshot())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_seconds)
+            try:
+                await self._write_snapshot()
+            except Exception:
+                logger.exception("policy window snapshot failed")
+
+    async def start(self) -> None:
+        if not self.snapshot_path:
+            return
+        restored = self.restore()
+        if restored:
+            logger.info("restored %d policy window(s) from %s", restored, self.snapshot_path)
+        self._task = asyncio.create_task(self._run(), name="policy-window-snapshots")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            await self._write_snapshot()
+        except Exception:
+            logger.exception("final policy window snapshot failed")
+
+
+window_store = WindowStore(
+    settings.policy_window_max_keys,
+    settings.policy_window_snapshot_path,
+    settings.policy_window_snapshot_seconds,
+)
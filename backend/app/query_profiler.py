@@ -0,0 +1,172 @@
+"""
+Per-request SQL profiler (opt-in via SQL_PROFILER_ENABLED).
+
+Hooks SQLAlchemy cursor events to count statements and DB time for the
+current request, flags statement shapes repeated above a threshold (the
+usual N+1 signature) and logs slow statements with normalized SQL.
+
+In development the summary is returned as X-DB-* response headers;
+elsewhere a sampled fraction of requests is logged instead. Repeated
+shapes are logged and counted (k12_sql_repeated_shapes_total) for every
+request, sampled or not.
+"""
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .metrics import SQL_REPEATED_SHAPES
+
+
+logger = logging.getLogger("k12.sql_profiler")
+
+_current: ContextVar["RequestProfile | None"] = ContextVar("sql_profile", default=None)
+
+
+# -------------------------
+# SQL normalization
+# -------------------------
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    """
+    Collapses literals, placeholders, IN lists and multi-row VALUES so that
+    statements differing only by parameters share one shape.
+    """
+    s = _STRING_LITERAL.sub("?", statement)
+    s = _NUMBER_LITERAL.sub("?", s)
+    s = _PLACEHOLDER.sub("?", s)
+    s = _IN_LIST.sub("(?...)", s)
+    s = _VALUES_LIST.sub(r"\1, ...", s)
+    return _WHITESPACE.sub(" ", s).strip()
+
+
+# -------------------------
+# Per-request accumulator
+# -------------------------
+class RequestProfile:
+    __slots__ = ("query_count", "db_seconds", "shapes")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def current_profile() -> "RequestProfile | None":
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_profiler_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+
+    profile = _current.get()
+    shape = None
+    if profile is not None:
+        shape = normalize_sql(statement)
+        profile.query_count += 1
+        profile.db_seconds += elapsed
+        profile.shapes[shape] += 1
+
+    if elapsed * 1000.0 >= settings.sql_profiler_slow_ms:
+        logger.warning(
+            "slow sql %.1fms: %s",
+            elapsed * 1000.0,
+            shape or normalize_sql(statement),
+        )
+
+
+def install(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# -------------------------
+# ASGI middleware
+# -------------------------
+class QueryProfilerMiddleware:
+    """
+    Opens a RequestProfile for each HTTP request. Sync endpoints run in the
+    threadpool with a copy of this context, so they write to the same object.
+    """
+
+    def __init__(self, app, attach_headers: bool | None = None):
+        self.app = app
+        if attach_headers is None:
+            attach_headers = settings.environment == "development"
+        self.attach_headers = attach_headers
+        self.threshold = settings.sql_profiler_repeat_threshold
+        self.sample_rate = settings.sql_profiler_log_sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+
+        async def send_wrapper(message):
+            if self.attach_headers and message["type"] == "http.response.start":
+                repeated = profile.repeated(self.threshold)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(profile.query_count).encode()))
+                headers.append((b"x-db-time-ms", f"{profile.db_seconds * 1000.0:.2f}".encode()))
+                headers.append((b"x-db-repeated-shapes", str(len(repeated)).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._report(scope, profile)
+
+    def _report(self, scope, profile: RequestProfile) -> None:
+        if profile.query_count == 0:
+            return
+
+        template = getattr(scope.get("route"), "path", None)
+        route = template or scope.get("path", "")
+        repeated = profile.repeated(self.threshold)
+        if repeated:
+            # Templates only, as in RouteLatencyMiddleware: raw paths are unbounded
+            SQL_REPEATED_SHAPES.labels(route=template or "unmatched").inc(len(repeated))
+            for shape, n in repeated:
+                logger.warning("possible N+1 on %s: %dx %s", route, n, shape)
+
+        if not self.attach_headers and random.random() >= self.sample_rate:
+            return
+        logger.info(
+            "sql profile %s %s: %d queries, %.1fms",
+            scope.get("method"),
+            route,
+            profile.query_count,
+            profile.db_seconds * 1000.0,
+        )
@@ -0,0 +1,149 @@
+"""
+Conditional GET and cached list bodies.
+
+Every school has a change generation. It is bumped after any commit that
+touched one of its devices or alerts; school rows bump the global
+generation (key 0). The generation is read before the query, so:
+
+  - a matching If-None-Match gets 304 without touching the database,
+  - otherwise the serialized body is served from an LRU keyed by
+    (school, endpoint, query params) while the generation is unchanged.
+
+Generations are in-process by default, which is only correct for a single
+worker: ETags include a per-process epoch, so a client is never given a 304
+for another worker's state, but each worker only sees its own writes. With
+RESPONSE_CACHE_BACKEND=redis, generations live in Redis (one INCR per
+commit, one GET per request) and are shared by all workers.
+
+Writes that bypass the ORM unit of work (executemany UPDATEs) must call
+generations.bump() themselves.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from fastapi import Request, Response
+
+from . import session_changes
+from .config import settings
+from .session_changes import Changes
+
+
+GLOBAL = 0
+
+
+# -------------------------
+# Generations
+# -------------------------
+class MemoryGenerations:
+    def __init__(self):
+        self.epoch = os.urandom(4).hex()
+        self._gens: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, school_id: int) -> int:
+        return self._gens.get(school_id, 0)
+
+    def bump(self, school_ids) -> None:
+        with self._lock:
+            for sid in school_ids:
+                self._gens[sid] = self._gens.get(sid, 0) + 1
+
+
+class RedisGenerations:
+    def __init__(self, redis_url: str):
+        import redis
+
+        self.epoch = "r"
+        self._redis = redis.Redis.from_url(redis_url)
+
+    def get(self, school_id: int) -> int:
+        value = self._redis.get(f"k12:gen:{school_id}")
+        return int(value) if value else 0
+
+    def bump(self, school_ids) -> None:
+        pipe = self._redis.pipeline(transaction=False)
+        for sid in school_ids:
+            pipe.incr(f"k12:gen:{sid}")
+        pipe.execute()
+
+
+generations = (
+    RedisGenerations(settings.redis_url)
+    if settings.response_cache_backend == "redis"
+    else MemoryGenerations()
+)
+
+
+def _changes_committed(changes: Changes) -> None:
+    touched = set(changes.schools)
+    if changes.school_rows:
+        touched.add(GLOBAL)
+    if touched:
+        generations.bump(touched)
+
+
+def install() -> None:
+    """
+    Bumps generations after every commit that wrote devices/alerts/schools.
+    """
+    session_changes.subscribe(_changes_committed)
+    session_changes.install()
+
+
+# -------------------------
+# Body cache
+# -------------------------
+class ResponseCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[int, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, generation: int) -> bytes | None:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None or hit[0] != generation:
+                return None
+            self._entries.move_to_end(key)
+            return hit[1]
+
+    def put(self, key: tuple, generation: int, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (generation, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+response_cache = ResponseCache(settings.response_cache_max_entries)
+
+
+def conditional_json(
+    request: Request,
+    school_id: int,
+    endpoint: str,
+    build: Callable[[], bytes],
+) -> Response:
+    """
+    Serves `build()` (serialized JSON) with an ETag derived from the school's
+    generation, answering 304 / cache hits without calling it.
+    """
+    generation = generations.get(school_id)
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    key = (school_id, endpoint, params)
+    variant = hashlib.blake2b(f"{endpoint}?{params}".encode(), digest_size=6).hexdigest()
+    etag = f'W/"{generations.epoch}-{school_id}-{generation}-{variant}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(key, generation)
+    if body is None:
+        body = build()
+        response_cache.put(key, generation, body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,290 @@
+"""
+Hourly event rollups and raw-event retention.
+
+`events` keeps every ingested record as a JSON payload. Reports read
+event_hourly_rollups instead: one row per (school, hour, device, source,
+event_type, domain, action) with a count.
+
+The rollup is incremental. rollup_checkpoints holds the highest events.id
+already folded in; each batch reads the next ids in order, aggregates them
+in memory, upserts the counts (count = count + excluded.count) and moves
+the checkpoint in the same transaction, so a batch is applied exactly once
+or not at all. The checkpoint update is a compare-and-set on the old value,
+so several app workers can run the loop and only one wins each batch.
+
+Ids are assigned before commit, so a row with a lower id can become
+visible after a higher one. Rows younger than ROLLUP_LAG_SECONDS are left
+for the next pass; a batch stops at the first such row.
+
+With EVENT_ARCHIVE_DIR set, counted events older than
+EVENT_ARCHIVE_AFTER_DAYS are then moved to the cold-tier archive (see
+app.event_archive).
+
+Retention: with EVENT_RETENTION_DAYS set, raw events older than that are
+deleted in batches of EVENT_RETENTION_BATCH_SIZE (one transaction each),
+and only up to the checkpoint, so nothing is deleted before it is counted.
+With the archive enabled, retention never deletes events younger than
+EVENT_ARCHIVE_AFTER_DAYS (those are still waiting to be archived).
+DHCP leases older than DHCP_LEASE_RETENTION_DAYS are purged in the same
+step (see app.leases).
+
+Runs in the app (every ROLLUP_INTERVAL_SECONDS) or once from the command
+line:
+
+    python -m app.rollups [--prune]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .event_archive import archive_events
+from .interning import domains, sources
+from .leases import purge_leases
+from .metrics import EVENTS_PRUNED, ROLLUP_EVENTS, ROLLUP_RUN_SECONDS
+from .models import Event, EventHourlyRollup, RollupCheckpoint
+
+
+logger = logging.getLogger("k12.rollups")
+
+CHECKPOINT = "event_hourly"
+
+_KEY_COLUMNS = ("school_id", "hour", "device_id", "source", "event_type", "domain", "action")
+
+
+# -------------------------
+# Aggregation
+# -------------------------
+def aggregate(rows, source_names: dict[int, str], domain_names: dict[int, str]) -> Counter:
+    """
+    Counts (id, school_id, device_id, source_id, event_type, created_at,
+    domain_id, action) rows by rollup key. Events without a school are not
+    counted.
+    """
+    counts: Counter = Counter()
+    for _id, school_id, device_id, source_id, event_type, created_at, domain_id, action in rows:
+        if school_id is None:
+            continue
+        hour = created_at.replace(minute=0, second=0, microsecond=0)
+        source = source_names[source_id]
+        domain = domain_names.get(domain_id, "")
+        counts[(school_id, hour, device_id or 0, source, event_type, domain, action or "")] += 1
+    return counts
+
+
+def _upsert_counts(db: Session, counts: Counter) -> None:
+    rows = [dict(zip(_KEY_COLUMNS, key), count=n) for key, n in counts.items()]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        _merge_counts(db, rows)
+        return
+    stmt = dialect_insert(EventHourlyRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_KEY_COLUMNS),
+        set_={"count": EventHourlyRollup.count + stmt.excluded["count"]},
+    )
+    db.execute(stmt, rows)
+
+
+def _merge_counts(db: Session, rows: list[dict]) -> None:
+    # Portable fallback: one lookup per key
+    for row in rows:
+        key = [getattr(EventHourlyRollup, c) == row[c] for c in _KEY_COLUMNS]
+        result = db.execute(
+            update(EventHourlyRollup).where(*key).values(count=EventHourlyRollup.count + row["count"])
+        )
+        if result.rowcount == 0:
+            db.execute(insert(EventHourlyRollup), [row])
+
+
+# -------------------------
+# Checkpointed batches
+# -------------------------
+def _checkpoint(db: Session) -> int:
+    last = db.scalar(select(RollupCheckpoint.last_event_id).where(RollupCheckpoint.name == CHECKPOINT))
+    if last is None:
+        db.add(RollupCheckpoint(name=CHECKPOINT, last_event_id=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker created it first
+            db.rollback()
+            return _checkpoint(db)
+        return 0
+    return last
+
+
+def rollup_batch(db: Session, batch_size: int, lag_seconds: float) -> int:
+    """
+    Folds the next batch of events into the hourly rollup. Returns the
+    number of events consumed (0 when caught up or another worker won).
+    """
+    last = _checkpoint(db)
+    cutoff = datetime.utcnow() - timedelta(seconds=lag_seconds)
+    rows = db.execute(
+        select(
+            Event.id, Event.school_id, Event.device_id, Event.source_id,
+            Event.event_type, Event.created_at, Event.domain_id, Event.action,
+        )
+        .where(Event.id > last)
+        .order_by(Event.id)
+        .limit(batch_size)
+    ).all()
+
+    settled = []
+    for row in rows:
+        if row.created_at >= cutoff:
+            break
+        settled.append(row)
+    if not settled:
+        db.rollback()
+        return 0
+
+    new_last = settled[-1].id
+    source_names = sources.names(db, {r.source_id for r in settled})
+    domain_names = domains.names(db, {r.domain_id for r in settled})
+    _upsert_counts(db, aggregate(settled, source_names, domain_names))
+    moved = db.execute(
+        update(RollupCheckpoint)
+        .where(RollupCheckpoint.name == CHECKPOINT, RollupCheckpoint.last_event_id == last)
+        .values(last_event_id=new_last, updated_at=datetime.utcnow())
+    ).rowcount
+    if moved != 1:
+        # Another worker advanced the checkpoint first; its counts stand
+        db.rollback()
+        return 0
+    db.commit()
+    ROLLUP_EVENTS.inc(len(settled))
+    return len(settled)
+
+
+def rollup(db: Session, batch_size: int | None = None, lag_seconds: float | None = None) -> int:
+    """
+    Runs batches until caught up. Returns the number of events folded in.
+    """
+    batch_size = batch_size or settings.rollup_batch_size
+    lag_seconds = settings.rollup_lag_seconds if lag_seconds is None else lag_seconds
+    total = 0
+    while True:
+        n = rollup_batch(db, batch_size, lag_seconds)
+        total += n
+        if n < batch_size:
+            return total
+
+
+def prune_events(db: Session, retention_days: int | None = None, batch_size: int | None = None) -> int:
+    """
+    Deletes raw events older than the retention age that the rollup has
+    already counted. With the archive enabled, the age is at least
+    EVENT_ARCHIVE_AFTER_DAYS, so nothing is deleted before it is archived.
+    Returns the number deleted.
+    """
+    retention_days = settings.event_retention_days if retention_days is None else retention_days
+    batch_size = batch_size or settings.event_retention_batch_size
+    if retention_days <= 0:
+        return 0
+    if settings.event_archive_dir and settings.event_archive_after_days > 0:
+        retention_days = max(retention_days, settings.event_archive_after_days)
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    last = _checkpoint(db)
+
+    total = 0
+    while True:
+        # Oldest rows come first in id order, so this walks the primary key
+        ids = db.scalars(
+            select(Event.id)
+            .where(Event.id <= last, Event.created_at < cutoff)
+            .order_by(Event.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+        db.execute(delete(Event).where(Event.id.in_(ids)))
+        db.commit()
+        EVENTS_PRUNED.inc(len(ids))
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+
+
+def run_once(prune: bool = True) -> tuple[int, int, int, int]:
+    """
+    One maintenance pass: rollup, then archive, then retention.
+    Returns (rolled up, archived, pruned, leases purged).
+    """
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        rolled = rollup(db)
+        archived = archive_events(db, up_to_id=_checkpoint(db))
+        pruned = prune_events(db) if prune else 0
+        leases = purge_leases(db) if prune else 0
+        return rolled, archived, pruned, leases
+    finally:
+        ROLLUP_RUN_SECONDS.observe(time.perf_counter() - start)
+        db.close()
+
+
+# -------------------------
+# Background worker
+# -------------------------
+class RollupWorker:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                rolled, archived, pruned, leases = await asyncio.to_thread(run_once)
+                if rolled or archived or pruned or leases:
+                    logger.info(
+                        "rolled up %d event(s), archived %d, pruned %d, purged %d lease(s)",
+                        rolled, archived, pruned, leases,
+                    )
+            except Exception:
+                logger.exception("event rollup failed; will retry next interval")
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run(), name="event-rollups")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+rollup_worker = RollupWorker(settings.rollup_interval_seconds)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Fold new events into hourly rollups and archive aged ones.")
+    parser.add_argument(
+        "--prune", action="store_true", help="also apply EVENT_RETENTION_DAYS and DHCP_LEASE_RETENTION_DAYS"
+    )
+    args = parser.parse_args(argv)
+    rolled, archived, pruned, leases = run_once(prune=args.prune)
+    print(f"rolled up {rolled} event(s), archived {archived}, pruned {pruned}, purged {leases} lease(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..config import settings
+from ..database import SessionLocal, get_db
 from ..models import Alert
 from ..schemas import AlertOut
-from ..auth import get_current_user
+from ..auth import create_stream_token, get_current_user, get_stream_user
+from ..alert_stream import alert_broker, format_sse, serialize_alert
+from ..response_cache import conditional_json
+from ..serialization import dump_alerts
 
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
@@ -12,15 +19,106 @@ router = APIRouter(prefix="/alerts", tags=["alerts"])
 
 @router.get("", response_model=list[AlertOut])
 def list_alerts(
+    request: Request,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    return (
+    return conditional_json(
+        request, user.school_id, "alerts", lambda: dump_alerts(db, user.school_id)
+    )
+
+
+def _replay_page(db: Session, school_id: int, after_id: int) -> list[dict]:
+    rows = (
         db.query(Alert)
-        .filter(Alert.school_id == user.school_id)
-        .order_by(Alert.created_at.desc())
+        .filter(Alert.school_id == school_id, Alert.id > after_id)
+        .order_by(Alert.id)
+        .limit(settings.alert_stream_replay_limit)
         .all()
     )
+    return [serialize_alert(a) for a in rows]
+
+
+@router.post("/stream-token")
+def stream_token(user=Depends(get_current_user)):
+    """
+    Token for GET /alerts/stream?stream_token=, valid for
+    ALERT_STREAM_TOKEN_SECONDS. Fetch a new one for every (re)connect.
+    """
+    return {"stream_token": create_stream_token(user.id), "expires_in": settings.alert_stream_token_seconds}
+
+
+@router.get("/stream")
+async def stream_alerts(
+    request: Request,
+    last_event_id: int | None = Header(default=None),
+    since_id: int | None = Query(default=None),
+    db: Session = Depends(get_db),
+    user=Depends(get_stream_user),
+):
+    """
+    Server-Sent Events feed of the user's school alerts.
+
+    Events: "alert" (new, id = alert id) and "ack" (acknowledged, no id).
+    Reconnects with Last-Event-ID (or ?since_id=) first replay every newer
+    alert from the database, ALERT_STREAM_REPLAY_LIMIT rows per query, before
+    live alerts. Browsers authenticate with ?stream_token= (POST
+    /alerts/stream-token) instead of the Authorization header. A comment line is sent every
+    ALERT_STREAM_HEARTBEAT_SECONDS to keep proxies from closing the stream.
+    """
+    school_id = user.school_id
+    # Subscribe before the replay query so nothing falls in between
+    sub = alert_broker.subscribe(school_id)
+
+    resume_from = last_event_id if last_event_id is not None else since_id
+    backlog = []
+    if resume_from is not None:
+        backlog = _replay_page(db, school_id, resume_from)
+    # The stream can stay open for hours; don't hold a pooled connection
+    db.close()
+
+    async def events():
+        last_sent = resume_from or 0
+        try:
+            yield "retry: 3000\n\n"
+            page = backlog
+            while page:
+                for data in page:
+                    last_sent = data["id"]
+                    yield format_sse("alert", data, data["id"])
+                if len(page) < settings.alert_stream_replay_limit:
+                    break
+                # Live alerts wait in the queue until the backlog is caught up
+                with SessionLocal() as page_db:
+                    page = _replay_page(page_db, school_id, last_sent)
+
+            while not sub.overflowed:
+                try:
+                    kind, data = await asyncio.wait_for(
+                        sub.queue.get(), settings.alert_stream_heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+
+                if kind == "alert":
+                    if data["id"] <= last_sent:
+                        continue  # already sent from the replay
+                    last_sent = data["id"]
+                    yield format_sse(kind, data, data["id"])
+                else:
+                    yield format_sse(kind, data)
+            # Overflowed: end the stream; the client resumes from its last id
+        finally:
+            alert_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/{alert_id}/ack", response_model=AlertOut)
@@ -36,4 +134,5 @@ def acknowledge_alert(
     alert.acknowledged = True
     db.commit()
     db.refresh(alert)
+    alert_broker.publish(alert.school_id, "ack", alert)
     return alert
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from ..auth import require_admin
+from ..config import settings
+from ..event_archive import archive_reader
+from ..leases import parse_event_time
+
+
+router = APIRouter(prefix="/archive", tags=["archive"])
+
+MAX_RANGE = timedelta(days=400)
+
+
+@router.get("/events")
+def archived_events(
+    since: str = Query(description="ISO-8601, inclusive"),
+    until: str | None = Query(default=None, description="ISO-8601, exclusive (default: now)"),
+    device_id: int | None = None,
+    limit: int = Query(default=1000, ge=1, le=10_000),
+    admin=Depends(require_admin),
+):
+    """
+    Raw events moved to the cold-tier archive, oldest first. With device_id
+    only that device's index range and blocks are read.
+    """
+    if not settings.event_archive_dir:
+        raise HTTPException(status_code=404, detail="Event archive is not enabled")
+    start = parse_event_time(since)
+    end = parse_event_time(until) if until else datetime.utcnow()
+    if start is None or end is None:
+        raise HTTPException(status_code=422, detail="since/until must be ISO-8601 times")
+    if start >= end:
+        raise HTTPException(status_code=422, detail="since must be before until")
+    if end - start > MAX_RANGE:
+        raise HTTPException(status_code=422, detail="Range is limited to 400 days")
+
+    events, segments = archive_reader.query(admin.school_id, start, end, device_id=device_id, limit=limit)
+    body = {"events": events, "segments_read": segments, "truncated": len(events) == limit}
+    return Response(content=orjson.dumps(body), media_type="application/json")
@@ -1,10 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import tempfile
+from typing import Literal
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
 
+from ..config import settings
 from ..database import get_db
-from ..models import Device
-from ..schemas import DeviceCreate, DeviceOut
-from ..auth import get_current_user
+from ..device_import import export_csv, export_ndjson, import_devices
+from ..cursors import CursorError, decode_cursor
+from ..device_timeline import KINDS, device_timeline
+from ..leases import parse_event_time
+from ..models import Device, ExternalDeviceId
+from ..schemas import DeviceCreate, DeviceImportResult, DeviceOut, TimelinePage
+from ..auth import get_current_user, require_admin
+from ..response_cache import conditional_json
+from ..serialization import dump_devices
 
 
 router = APIRouter(prefix="/devices", tags=["devices"])
@@ -30,22 +46,77 @@ def create_device(
     )
 
     db.add(device)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Device with this serial already exists")
     db.refresh(device)
     return device
 
 
 @router.get("", response_model=list[DeviceOut])
 def list_devices(
+    request: Request,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
     # Users only see devices in their school
-    return (
-        db.query(Device)
-        .filter(Device.school_id == user.school_id)
-        .order_by(Device.asset_tag)
-        .all()
+    return conditional_json(
+        request, user.school_id, "devices", lambda: dump_devices(db, user.school_id)
+    )
+
+
+_CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+
+
+@router.post("/import", response_model=DeviceImportResult)
+async def import_devices_bulk(
+    request: Request,
+    format: Literal["csv", "ndjson"] | None = Query(default=None, description="Default: from Content-Type"),
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    """
+    Creates or updates devices of the admin's school from a CSV (header row)
+    or NDJSON request body, keyed by serial_number. Columns: serial_number,
+    asset_tag, device_name, device_type, assigned_to. Valid rows are stored
+    even if others fail; failures are listed by line number.
+    """
+    fmt = format or _CONTENT_TYPES.get(request.headers.get("content-type", "").split(";")[0].strip().lower())
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+
+    # Spool the upload (memory first, then disk) while it streams in
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.device_import_max_bytes:
+                raise HTTPException(status_code=413, detail="Upload exceeds DEVICE_IMPORT_MAX_BYTES")
+            upload.write(chunk)
+        upload.seek(0)
+        return await asyncio.to_thread(import_devices, db, admin.school_id, upload, fmt)
+
+
+@router.get("/export")
+def export_devices(
+    format: Literal["csv", "ndjson"] = "csv",
+    user=Depends(get_current_user),
+):
+    """
+    Streams the user's school devices as CSV or NDJSON.
+    """
+    if format == "csv":
+        body, media_type = export_csv(user.school_id), "text/csv"
+    else:
+        body, media_type = export_ndjson(user.school_id), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="devices-{user.school_id}.{format}"'},
+        # Runs after the stream ends or the client disconnects: frees the export's connection
+        background=BackgroundTask(body.close),
     )
 
 
@@ -62,4 +133,51 @@ def get_device(
     return device
 
 
+@router.get("/{device_id}/timeline", response_model=TimelinePage)
+def get_device_timeline(
+    device_id: int,
+    kinds: list[str] = Query(default=list(KINDS), description="event, alert and/or status"),
+    since: str | None = Query(default=None, description="ISO-8601, inclusive"),
+    until: str | None = Query(default=None, description="ISO-8601, exclusive"),
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    """
+    The device's events, alerts and status changes, newest first, with its
+    external ids. Keyset-paginated: pass next_cursor back as ?cursor=.
+    """
+    device = db.get(Device, device_id)
+    if not device or device.school_id != admin.school_id:
+        raise HTTPException(status_code=404, detail="Device not found")
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown kinds: {', '.join(sorted(unknown))}")
+
+    times = {}
+    for name, value in (("since", since), ("until", until)):
+        times[name] = parse_event_time(value) if value is not None else None
+        if value is not None and times[name] is None:
+            raise HTTPException(status_code=422, detail=f"{name} must be an ISO-8601 time")
+    try:
+        position = decode_cursor(cursor, 3) if cursor else None
+    except CursorError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    items, next_cursor = device_timeline(
+        db, device, set(kinds), cursor=position, since=times["since"], until=times["until"], limit=limit
+    )
+    external_ids = db.execute(
+        select(ExternalDeviceId.source, ExternalDeviceId.external_id)
+        .where(ExternalDeviceId.device_id == device.id)
+        .order_by(ExternalDeviceId.source, ExternalDeviceId.external_id)
+    ).all()
+    body = {
+        "device_id": device.id,
+        "external_ids": [{"source": s, "external_id": e} for s, e in external_ids],
+        "items": items,
+        "next_cursor": next_cursor,
+    }
+    return Response(content=orjson.dumps(body), media_type="application/json")
 
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from ..auth import require_admin
+from ..cursors import CursorError, decode_cursor, encode_cursor
+from ..database import get_db
+from ..event_fields import normalize_action, normalize_domain
+from ..interning import domains, sources
+from ..leases import parse_event_time
+from ..models import Event
+from ..schemas import EventPage
+from ..serialization import EVENT_COLUMNS, events_to_dicts
+
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+def _page(items: list[dict], next_cursor: str | None) -> Response:
+    body = {"items": items, "next_cursor": next_cursor}
+    return Response(content=orjson.dumps(body), media_type="application/json")
+
+
+def _time(value: str | None, name: str) -> datetime | None:
+    if value is None:
+        return None
+    ts = parse_event_time(value)
+    if ts is None:
+        raise HTTPException(status_code=422, detail=f"{name} must be an ISO-8601 time")
+    return ts
+
+
+@router.get("", response_model=EventPage)
+def search_events(
+    device_id: int | None = None,
+    source: str | None = None,
+    event_type: str | None = None,
+    domain: str | None = None,
+    action: str | None = None,
+    since: str | None = Query(default=None, description="ISO-8601, inclusive"),
+    until: str | None = Query(default=None, description="ISO-8601, exclusive"),
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    """
+    Stored events of the admin's school, newest first.
+
+    Keyset pagination: each page is a range scan that continues below the
+    (created_at, id) of the previous page's last row, so page 1000 costs the
+    same as page 1. device_id, domain and event_type each have a
+    (school_id, <filter>, created_at, id) index; source and action narrow the
+    scan of whichever index applies. A source or domain never seen at ingest
+    matches nothing. Events moved to the archive are served by
+    /archive/events.
+    """
+    q = select(*EVENT_COLUMNS).where(Event.school_id == admin.school_id)
+    if device_id is not None:
+        q = q.where(Event.device_id == device_id)
+    if source:
+        source_id = sources.id(db, source, create=False)
+        if source_id is None:
+            return _page([], None)
+        q = q.where(Event.source_id == source_id)
+    if event_type:
+        q = q.where(Event.event_type == event_type)
+    if domain:
+        domain_id = domains.id(db, normalize_domain(domain), create=False)
+        if domain_id is None:
+            return _page([], None)
+        q = q.where(Event.domain_id == domain_id)
+    if action:
+        q = q.where(Event.action == normalize_action(action))
+
+    start, end = _time(since, "since"), _time(until, "until")
+    if start is not None:
+        q = q.where(Event.created_at >= start)
+    if end is not None:
+        q = q.where(Event.created_at < end)
+    if cursor:
+        try:
+            position = decode_cursor(cursor, 2)
+        except CursorError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        q = q.where(tuple_(Event.created_at, Event.id) < tuple_(*position))
+
+    rows = db.execute(q.order_by(Event.created_at.desc(), Event.id.desc()).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return _page(events_to_dicts(db, rows), next_cursor)
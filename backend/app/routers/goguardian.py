@@ -1,30 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from ..database import get_db
 from ..models import Device
-from ..models_ext import Event, SchoolApiKey, DeviceNetworkIdentity
+from ..models_ext import Event, DeviceNetworkIdentity
 from ..policy_engine import evaluate_event
+from ..metrics import CORRELATION_UNMATCHED, DUPLICATES_BY_SOURCE, INGEST_BY_SOURCE, record_correlation
+from ..dedup import event_dedup_key, is_stored, seen_events
+from ..event_fields import event_values
+from ..admission import admit, ingest_slot
+from ..ingest_buffer import ingest_buffer
+from ..leases import lease_index, parse_event_time
 
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
 
-def validate_api_key(db: Session, school_id: int, api_key: str) -> bool:
-    rec = (
-        db.query(SchoolApiKey)
-        .filter(
-            SchoolApiKey.school_id == school_id,
-            SchoolApiKey.key == api_key,
-            SchoolApiKey.enabled == True,  # noqa: E712
-        )
-        .first()
-    )
-    return rec is not None
-
-
 @router.post("/goguardian")
-async def ingest_goguardian(request: Request, db: Session = Depends(get_db)):
+async def ingest_goguardian(
+    request: Request,
+    _slot: None = Depends(ingest_slot),  # declared first so it also covers the session's lifetime
+    db: Session = Depends(get_db),
+):
     """
     Adapter-friendly GoGuardian endpoint.
 
@@ -34,8 +32,13 @@ async def ingest_goguardian(request: Request, db: Session = Depends(get_db)):
       "school_id":1,
       "device": {"serial_number":"", "asset_tag":"", "hostname":"", "ip":"", "mac":""},
       "user": {"email":"student@district.org"},
-      "event": {"url":"...", "domain":"...", "action":"blocked|allowed", "category":"...", "rule":"...", "timestamp":"..."}
+      "event": {"url":"...", "domain":"...", "action":"blocked|allowed", "category":"...", "rule":"...", "timestamp":"..."},
+      "idempotency_key": "..."  (optional; the Idempotency-Key header also works)
     }
+
+    Retried deliveries are acknowledged with {"ok": true, "duplicate": true}.
+    With INGEST_MODE=buffered the event is queued and 202 is returned.
+    Rate-limited or shed requests get 429 with Retry-After.
     """
     body = await request.json()
 
@@ -45,8 +48,7 @@ async def ingest_goguardian(request: Request, db: Session = Depends(get_db)):
     if not api_key or not school_id:
         raise HTTPException(status_code=400, detail="Missing api_key or school_id")
 
-    if not validate_api_key(db, school_id, api_key):
-        raise HTTPException(status_code=401, detail="Invalid API key")
+    await admit(db, school_id, api_key)
 
     dev = body.get("device") or {}
     usr = body.get("user") or {}
@@ -65,31 +67,18 @@ async def ingest_goguardian(request: Request, db: Session = Depends(get_db)):
     rule = ev.get("rule")
     timestamp = ev.get("timestamp")
 
-    # Device correlation order: serial -> asset -> MAC -> IP
-    device = None
-    if serial:
-        device = (
-            db.query(Device)
-            .filter(Device.school_id == school_id, Device.serial_number == serial)
-            .first()
-        )
-
-    if not device and asset:
-        device = (
-            db.query(Device)
-            .filter(Device.school_id == school_id, Device.asset_tag == asset)
-            .first()
-        )
-
-    if not device and mac:
-        dni = db.query(DeviceNetworkIdentity).filter(DeviceNetworkIdentity.mac == mac).first()
-        if dni:
-            device = db.get(Device, dni.device_id)
-
-    if not device and ip:
-        dni = db.query(DeviceNetworkIdentity).filter(DeviceNetworkIdentity.last_ip == ip).first()
-        if dni:
-            device = db.get(Device, dni.device_id)
+    dedup_key = event_dedup_key(
+        school_id,
+        "goguardian",
+        request.headers.get("idempotency-key") or body.get("idempotency_key"),
+        (serial, asset, mac, ip),
+        url or domain,
+        action,
+        timestamp,
+    )
+    if dedup_key and seen_events.seen(dedup_key):
+        DUPLICATES_BY_SOURCE["goguardian"].inc()
+        return {"ok": True, "duplicate": True}
 
     severity = "info" if action == "allowed" else "medium" if action == "blocked" else "info"
 
@@ -108,18 +97,98 @@ async def ingest_goguardian(request: Request, db: Session = Depends(get_db)):
         "source": "goguardian",
     }
 
+    message = f"GoGuardian {action}: {domain or url or ''}"
+    policy_payload = {
+        "url": url,
+        "domain": domain,
+        "action": action,
+        "category": category,
+    }
+
+    if ingest_buffer.enabled:
+        return await ingest_buffer.accept(
+            {
+                "school_id": school_id,
+                "source": "goguardian",
+                "event_type": "web_access",
+                "severity": severity,
+                "message": message,
+                "payload": payload,
+                "policy": policy_payload,
+                "dedup_key": dedup_key,
+                "observed_at": timestamp,
+                "ids": {"serial": serial, "asset": asset, "mac": mac, "ip": ip},
+            }
+        )
+
+    # Device correlation order: serial -> asset -> MAC -> IP (lease at event time, else static identity)
+    device = None
+    if serial:
+        device = (
+            db.query(Device)
+            .filter(Device.school_id == school_id, Device.serial_number == serial)
+            .first()
+        )
+        record_correlation("serial", device is not None)
+
+    if not device and asset:
+        device = (
+            db.query(Device)
+            .filter(Device.school_id == school_id, Device.asset_tag == asset)
+            .first()
+        )
+        record_correlation("asset", device is not None)
+
+    if not device and mac:
+        device = (
+            db.query(Device)
+            .join(DeviceNetworkIdentity, DeviceNetworkIdentity.device_id == Device.id)
+            .filter(Device.school_id == school_id, DeviceNetworkIdentity.mac_address == mac)
+            .first()
+        )
+        record_correlation("mac", device is not None)
+
+    if not device and ip:
+        # DHCP leases resolve the IP as of the event time; static identities are the fallback
+        covered, lease_device_id = lease_index.lookup(db, school_id, ip, parse_event_time(timestamp))
+        if covered:
+            device = db.get(Device, lease_device_id) if lease_device_id else None
+        else:
+            device = (
+                db.query(Device)
+                .join(DeviceNetworkIdentity, DeviceNetworkIdentity.device_id == Device.id)
+                .filter(Device.school_id == school_id, DeviceNetworkIdentity.ip_address == ip)
+                .first()
+            )
+        record_correlation("ip", device is not None)
+
+    if not device:
+        CORRELATION_UNMATCHED.inc()
+
+    (values,) = event_values(db, [("goguardian", "web_access", payload)])
     db.add(
         Event(
             school_id=school_id,
             device_id=device.id if device else None,
             event_type="web_access",
             severity=severity,
-            source="goguardian",
-            message=f"GoGuardian {action}: {domain or url or ''}",
-            payload=payload,
+            message=message,
+            dedup_key=dedup_key,
+            **values,
         )
     )
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not is_stored(db, school_id, dedup_key):
+            raise
+        # Another worker stored the same delivery first
+        DUPLICATES_BY_SOURCE["goguardian"].inc()
+        return {"ok": True, "duplicate": True}
+    if dedup_key:
+        seen_events.add(dedup_key)
+    INGEST_BY_SOURCE["goguardian"].inc()
 
     if device:
         await evaluate_event(
@@ -127,12 +196,9 @@ async def ingest_goguardian(request: Request, db: Session = Depends(get_db)):
             school_id=school_id,
             device=device,
             event_type="web_access",
-            payload={
-                "url": url,
-                "domain": domain,
-                "action": action,
-                "category": category,
-            },
+            payload=policy_payload,
+            source="goguardian",
+            at=parse_event_time(timestamp),
         )
 
     return {"ok": True}
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..schemas import HeartbeatBatchIn, HeartbeatIn
+from ..admission import admit, ingest_slot
+from ..heartbeats import heartbeat_tracker
+
+
+router = APIRouter(prefix="/heartbeat", tags=["heartbeat"])
+
+
+@router.post("")
+async def heartbeat(
+    payload: HeartbeatIn,
+    _slot: None = Depends(ingest_slot),
+    db: Session = Depends(get_db),
+):
+    """
+    Single device check-in, authenticated with a school API key.
+    Updates are coalesced in memory and written on the next flush.
+    """
+    await admit(db, payload.school_id, payload.api_key)
+
+    accepted, unknown = heartbeat_tracker.accept(db, payload.school_id, [payload])
+    if unknown:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return {"ok": True}
+
+
+@router.post("/batch")
+async def heartbeat_batch(
+    payload: HeartbeatBatchIn,
+    _slot: None = Depends(ingest_slot),
+    db: Session = Depends(get_db),
+):
+    """
+    Batched check-ins (e.g. from an agent relay). A batch costs one rate-limit
+    token. Unknown serial numbers are reported back rather than failing the batch.
+    """
+    await admit(db, payload.school_id, payload.api_key)
+
+    accepted, unknown = heartbeat_tracker.accept(db, payload.school_id, payload.heartbeats)
+    return {"ok": True, "accepted": accepted, "unknown_serials": unknown}
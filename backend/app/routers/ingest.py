@@ -1,30 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from ..database import get_db
 from ..models import Device
-from ..models_ext import Event, SchoolApiKey, DeviceNetworkIdentity
+from ..models_ext import Event, DeviceNetworkIdentity
 from ..policy_engine import evaluate_event
+from ..metrics import CORRELATION_UNMATCHED, record_correlation, record_duplicate, record_ingest
+from ..dedup import event_dedup_key, is_stored, seen_events
+from ..event_fields import event_values
+from ..admission import admit, ingest_slot
+from ..ingest_buffer import ingest_buffer
+from ..leases import ingest_leases, lease_index, parse_event_time
+from ..schemas import DhcpLeaseBatch
 
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
 
-def validate_api_key(db: Session, school_id: int, api_key: str) -> bool:
-    rec = (
-        db.query(SchoolApiKey)
-        .filter(
-            SchoolApiKey.school_id == school_id,
-            SchoolApiKey.key == api_key,
-            SchoolApiKey.enabled == True,  # noqa: E712
-        )
-        .first()
-    )
-    return rec is not None
-
-
 @router.post("/webfilter")
-async def ingest_webfilter(request: Request, db: Session = Depends(get_db)):
+async def ingest_webfilter(
+    request: Request,
+    _slot: None = Depends(ingest_slot),  # declared first so it also covers the session's lifetime
+    db: Session = Depends(get_db),
+):
     """
     Generic normalized ingest endpoint for firewall/web filter events.
 
@@ -35,8 +34,18 @@ async def ingest_webfilter(request: Request, db: Session = Depends(get_db)):
       "source": "sonicwall|goguardian|lightspeed|securly|umbrella|other",
       "device": {"asset_tag":"", "serial_number":"", "hostname":"", "ip":""},
       "user": {"email":""},
-      "event": {"type":"web_access", "url":"...", "domain":"...", "action":"blocked|allowed|observed", "category":"..."}
+      "event": {"type":"web_access", "url":"...", "domain":"...", "action":"blocked|allowed|observed", "category":"...", "observed_at":"..."},
+      "idempotency_key": "..."  (optional; the Idempotency-Key header also works)
     }
+
+    With INGEST_MODE=buffered the event is queued and 202 {"ok": true,
+    "queued": true} is returned; storage and policy evaluation happen in a
+    background batch.
+
+    Retried deliveries (same idempotency key, or same content and observed_at)
+    are acknowledged with {"ok": true, "duplicate": true} and not stored again.
+    An exhausted per-key rate limit or an overloaded worker returns 429 with
+    Retry-After.
     """
     body = await request.json()
 
@@ -47,8 +56,7 @@ async def ingest_webfilter(request: Request, db: Session = Depends(get_db)):
     if not api_key or not school_id:
         raise HTTPException(status_code=400, detail="Missing api_key or school_id")
 
-    if not validate_api_key(db, school_id, api_key):
-        raise HTTPException(status_code=401, detail="Invalid API key")
+    await admit(db, school_id, api_key)
 
     dev = body.get("device") or {}
     usr = body.get("user") or {}
@@ -64,27 +72,20 @@ async def ingest_webfilter(request: Request, db: Session = Depends(get_db)):
     domain = ev.get("domain")
     action = (ev.get("action") or "").lower().strip()
     category = ev.get("category")
-
-    # Device correlation order: serial -> asset tag -> IP (best effort)
-    device = None
-    if serial:
-        device = (
-            db.query(Device)
-            .filter(Device.school_id == school_id, Device.serial_number == serial)
-            .first()
-        )
-
-    if not device and asset_tag:
-        device = (
-            db.query(Device)
-            .filter(Device.school_id == school_id, Device.asset_tag == asset_tag)
-            .first()
-        )
-
-    if not device and ip:
-        dni = db.query(DeviceNetworkIdentity).filter(DeviceNetworkIdentity.last_ip == ip).first()
-        if dni:
-            device = db.get(Device, dni.device_id)
+    observed_at = ev.get("observed_at") or ev.get("timestamp")
+
+    dedup_key = event_dedup_key(
+        school_id,
+        source,
+        request.headers.get("idempotency-key") or body.get("idempotency_key"),
+        (serial, asset_tag, ip),
+        url or domain,
+        action,
+        observed_at,
+    )
+    if dedup_key and seen_events.seen(dedup_key):
+        record_duplicate(source)
+        return {"ok": True, "duplicate": True}
 
     # Normalize severity for event table
     severity = "info"
@@ -100,22 +101,94 @@ async def ingest_webfilter(request: Request, db: Session = Depends(get_db)):
             "domain": domain,
             "action": action,
             "category": category,
+            "observed_at": observed_at,
         },
         "source": source,
     }
 
+    message = f"{event_type} {action}: {domain or url or ''}"
+    policy_payload = {
+        "url": url,
+        "domain": domain,
+        "action": action,
+        "category": category,
+    }
+
+    if ingest_buffer.enabled:
+        return await ingest_buffer.accept(
+            {
+                "school_id": school_id,
+                "source": source,
+                "event_type": event_type,
+                "severity": severity,
+                "message": message,
+                "payload": payload,
+                "policy": policy_payload,
+                "dedup_key": dedup_key,
+                "observed_at": observed_at,
+                "ids": {"serial": serial, "asset": asset_tag, "ip": ip},
+            }
+        )
+
+    # Device correlation order: serial -> asset tag -> IP (lease at event time, else static identity)
+    device = None
+    if serial:
+        device = (
+            db.query(Device)
+            .filter(Device.school_id == school_id, Device.serial_number == serial)
+            .first()
+        )
+        record_correlation("serial", device is not None)
+
+    if not device and asset_tag:
+        device = (
+            db.query(Device)
+            .filter(Device.school_id == school_id, Device.asset_tag == asset_tag)
+            .first()
+        )
+        record_correlation("asset", device is not None)
+
+    if not device and ip:
+        # DHCP leases resolve the IP as of the event time; static identities are the fallback
+        covered, lease_device_id = lease_index.lookup(db, school_id, ip, parse_event_time(observed_at))
+        if covered:
+            device = db.get(Device, lease_device_id) if lease_device_id else None
+        else:
+            device = (
+                db.query(Device)
+                .join(DeviceNetworkIdentity, DeviceNetworkIdentity.device_id == Device.id)
+                .filter(Device.school_id == school_id, DeviceNetworkIdentity.ip_address == ip)
+                .first()
+            )
+        record_correlation("ip", device is not None)
+
+    if not device:
+        CORRELATION_UNMATCHED.inc()
+
+    (values,) = event_values(db, [(source, event_type, payload)])
     db.add(
         Event(
             school_id=school_id,
             device_id=device.id if device else None,
             event_type=event_type,
             severity=severity,
-            source=source,
-            message=f"{event_type} {action}: {domain or url or ''}",
-            payload=payload,
+            message=message,
+            dedup_key=dedup_key,
+            **values,
         )
     )
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not is_stored(db, school_id, dedup_key):
+            raise
+        # Another worker stored the same delivery first
+        record_duplicate(source)
+        return {"ok": True, "duplicate": True}
+    if dedup_key:
+        seen_events.add(dedup_key)
+    record_ingest(source)
 
     # Policy evaluation (deny domains, etc.)
     if device:
@@ -124,12 +197,30 @@ async def ingest_webfilter(request: Request, db: Session = Depends(get_db)):
             school_id=school_id,
             device=device,
             event_type=event_type,
-            payload={
-                "url": url,
-                "domain": domain,
-                "action": action,
-                "category": category,
-            },
+            payload=policy_payload,
+            source=source,
+            at=parse_event_time(observed_at),
         )
 
     return {"ok": True}
+
+
+@router.post("/dhcp")
+async def ingest_dhcp(
+    payload: DhcpLeaseBatch,
+    _slot: None = Depends(ingest_slot),
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk DHCP lease ingest (e.g. parsed firewall DHCP logs).
+
+    Each lease is {"ip", "mac", "hostname", "start", "end" | "lease_seconds",
+    "action": "assign|release"}. MACs resolve to devices through their
+    network identities; leases for unknown MACs are still stored so the IP
+    is not misattributed to an earlier holder.
+    """
+    await admit(db, payload.school_id, payload.api_key)
+
+    result = ingest_leases(db, payload.school_id, payload.source, payload.leases)
+    return {"ok": True, **result}
+
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..auth import require_admin
+from ..database import get_db
+from ..models import PolicyRule
+from ..policy_engine import compile_rule, rule_sets
+from ..policy_expr import PolicyExprError
+from ..schemas import PolicyRuleCreate, PolicyRuleOut, PolicyRuleUpdate
+
+
+router = APIRouter(prefix="/policies", tags=["policies"])
+
+
+def _validate(rule: PolicyRule) -> None:
+    try:
+        compile_rule(rule)
+    except PolicyExprError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid rule: {e}")
+
+
+def _get_rule(db: Session, rule_id: int, school_id: int) -> PolicyRule:
+    rule = db.get(PolicyRule, rule_id)
+    if rule is None or rule.school_id != school_id:
+        raise HTTPException(status_code=404, detail="Policy rule not found")
+    return rule
+
+
+@router.get("", response_model=list[PolicyRuleOut])
+def list_policies(db: Session = Depends(get_db), admin=Depends(require_admin)):
+    return (
+        db.query(PolicyRule)
+        .filter(PolicyRule.school_id == admin.school_id)
+        .order_by(PolicyRule.id)
+        .all()
+    )
+
+
+@router.post("", response_model=PolicyRuleOut)
+def create_policy(payload: PolicyRuleCreate, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    rule = PolicyRule(school_id=admin.school_id, **payload.model_dump())
+    _validate(rule)
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    rule_sets.invalidate(admin.school_id)
+    return rule
+
+
+@router.patch("/{rule_id}", response_model=PolicyRuleOut)
+def update_policy(
+    rule_id: int,
+    payload: PolicyRuleUpdate,
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    rule = _get_rule(db, rule_id, admin.school_id)
+    for field, value in payload.model_dump(exclude_unset=True).items():
+        setattr(rule, field, value)
+    _validate(rule)
+    db.commit()
+    db.refresh(rule)
+    rule_sets.invalidate(admin.school_id)
+    return rule
+
+
+@router.delete("/{rule_id}")
+def delete_policy(rule_id: int, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    rule = _get_rule(db, rule_id, admin.school_id)
+    db.delete(rule)
+    db.commit()
+    rule_sets.invalidate(admin.school_id)
+    return {"ok": True}
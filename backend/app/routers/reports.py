@@ -0,0 +1,145 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from ..auth import get_current_user
+from ..database import get_db
+from ..device_status import availability_ratio, status_seconds
+from ..leases import parse_event_time
+from ..models import EventHourlyRollup
+from ..schemas import ActivityBucket, AvailabilityReport, DomainCount
+
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+# Event reports read event_hourly_rollups only; counts trail ingest by up to
+# ROLLUP_INTERVAL_SECONDS + ROLLUP_LAG_SECONDS. Availability reads
+# device_status_intervals.
+MAX_RANGE = timedelta(days=366)
+
+
+def _parse_range(since: str | None, until: str | None) -> tuple[datetime, datetime]:
+    end = parse_event_time(until) if until else datetime.utcnow()
+    start = parse_event_time(since) if since else end - timedelta(days=7)
+    if start is None or end is None:
+        raise HTTPException(status_code=422, detail="since/until must be ISO-8601 times")
+    if start >= end:
+        raise HTTPException(status_code=422, detail="since must be before until")
+    if end - start > MAX_RANGE:
+        raise HTTPException(status_code=422, detail="Range is limited to 366 days")
+    return start, end
+
+
+def _range(since: str | None, until: str | None) -> tuple[datetime, datetime]:
+    start, end = _parse_range(since, until)
+    # Rollup rows are whole hours; include the hour `since` falls in
+    return start.replace(minute=0, second=0, microsecond=0), end
+
+
+def _filtered(db: Session, school_id: int, start: datetime, end: datetime, **filters):
+    q = db.query().select_from(EventHourlyRollup).filter(
+        EventHourlyRollup.school_id == school_id,
+        EventHourlyRollup.hour >= start,
+        EventHourlyRollup.hour < end,
+    )
+    for column, value in filters.items():
+        if value is not None:
+            q = q.filter(getattr(EventHourlyRollup, column) == value)
+    return q
+
+
+@router.get("/activity", response_model=list[ActivityBucket])
+def activity(
+    since: str | None = Query(default=None, description="ISO-8601, default 7 days before until"),
+    until: str | None = Query(default=None, description="ISO-8601, default now"),
+    bucket: Literal["hour", "day"] = "hour",
+    device_id: int | None = None,
+    source: str | None = None,
+    event_type: str | None = None,
+    domain: str | None = None,
+    action: str | None = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Event counts per hour or per UTC day, oldest first. Empty buckets are omitted.
+    """
+    start, end = _range(since, until)
+    rows = (
+        _filtered(
+            db, user.school_id, start, end,
+            device_id=device_id, source=source, event_type=event_type,
+            domain=domain.lower() if domain else None, action=action.lower() if action else None,
+        )
+        .add_columns(EventHourlyRollup.hour, func.sum(EventHourlyRollup.count))
+        .group_by(EventHourlyRollup.hour)
+        .order_by(EventHourlyRollup.hour)
+        .all()
+    )
+    if bucket == "hour":
+        return [{"start": hour, "count": count} for hour, count in rows]
+
+    days: dict[datetime, int] = {}
+    for hour, count in rows:
+        day = hour.replace(hour=0)
+        days[day] = days.get(day, 0) + count
+    return [{"start": day, "count": count} for day, count in days.items()]
+
+
+@router.get("/top-domains", response_model=list[DomainCount])
+def top_domains(
+    since: str | None = Query(default=None, description="ISO-8601, default 7 days before until"),
+    until: str | None = Query(default=None, description="ISO-8601, default now"),
+    limit: int = Query(default=20, ge=1, le=500),
+    device_id: int | None = None,
+    source: str | None = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Most visited domains with how many of those visits were blocked.
+    """
+    start, end = _range(since, until)
+    total = func.sum(EventHourlyRollup.count)
+    blocked = func.sum(case((EventHourlyRollup.action == "blocked", EventHourlyRollup.count), else_=0))
+    rows = (
+        _filtered(db, user.school_id, start, end, device_id=device_id, source=source)
+        .filter(EventHourlyRollup.domain != "")
+        .add_columns(EventHourlyRollup.domain, total, blocked)
+        .group_by(EventHourlyRollup.domain)
+        .order_by(total.desc(), EventHourlyRollup.domain)
+        .limit(limit)
+        .all()
+    )
+    return [{"domain": d, "count": c, "blocked": b} for d, c, b in rows]
+
+
+@router.get("/availability", response_model=AvailabilityReport)
+def availability(
+    since: str | None = Query(default=None, description="ISO-8601, default 7 days before until"),
+    until: str | None = Query(default=None, description="ISO-8601, default now"),
+    device_id: int | None = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Time each device spent online, offline, etc. and the resulting
+    availability, per device and for the whole school.
+    """
+    start, end = _parse_range(since, until)
+    per_device = status_seconds(db, user.school_id, start, end, device_id=device_id)
+    school = Counter()
+    devices = []
+    for dev, seconds in sorted(per_device.items()):
+        school.update(seconds)
+        devices.append({"device_id": dev, "seconds": dict(seconds), "availability": availability_ratio(seconds)})
+    return {
+        "since": start,
+        "until": end,
+        "school": {"seconds": dict(school), "availability": availability_ratio(school)},
+        "devices": devices,
+    }
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
+from ..auth import get_current_user
 from ..database import get_db
+from ..fleet_health import fleet_health
 from ..models import School
-from ..schemas import SchoolCreate, SchoolOut
+from ..schemas import SchoolCreate, SchoolHealth, SchoolOut
+from ..response_cache import GLOBAL, conditional_json
+from ..serialization import dump_schools
 
 
 router = APIRouter(prefix="/schools", tags=["schools"])
@@ -19,5 +23,23 @@ def create_school(payload: SchoolCreate, db: Session = Depends(get_db)):
 
 
 @router.get("", response_model=list[SchoolOut])
-def list_schools(db: Session = Depends(get_db)):
-    return db.query(School).all()
+def list_schools(request: Request, db: Session = Depends(get_db)):
+    return conditional_json(request, GLOBAL, "schools", lambda: dump_schools(db))
+
+
+@router.get("/{school_id}/health", response_model=SchoolHealth)
+def school_health(
+    school_id: int,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Device and open-alert counts, served from in-memory counters (see
+    app.fleet_health).
+    """
+    if school_id != user.school_id:
+        if not user.is_admin:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        if db.get(School, school_id) is None:
+            raise HTTPException(status_code=404, detail="School not found")
+    return fleet_health.snapshot(school_id)
@@ -0,0 +1,88 @@
+import hashlib
+import hmac
+import ipaddress
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..auth import require_admin
+from ..config import settings
+from ..database import get_db
+from ..models import School, SchoolSubnet
+from ..schemas import SubnetCreate, SubnetOut
+
+
+router = APIRouter(prefix="/subnets", tags=["subnets"])
+
+
+def _normalize(cidr: str) -> str:
+    try:
+        return str(ipaddress.ip_network(cidr.strip(), strict=False))
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid CIDR: {cidr}")
+
+
+@router.get("", response_model=list[SubnetOut])
+def list_subnets(db: Session = Depends(get_db), admin=Depends(require_admin)):
+    return (
+        db.query(SchoolSubnet)
+        .filter(SchoolSubnet.school_id == admin.school_id)
+        .order_by(SchoolSubnet.cidr)
+        .all()
+    )
+
+
+@router.post("", response_model=SubnetOut)
+def create_subnet(payload: SubnetCreate, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    # Admins manage their own school's subnets only, as in list and delete
+    school_id = admin.school_id
+    if school_id is None or payload.school_id not in (None, school_id) or db.get(School, school_id) is None:
+        raise HTTPException(status_code=404, detail="School not found")
+
+    subnet = SchoolSubnet(school_id=school_id, cidr=_normalize(payload.cidr), label=payload.label)
+    db.add(subnet)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Subnet already mapped")
+    db.refresh(subnet)
+    return subnet
+
+
+@router.delete("/{subnet_id}")
+def delete_subnet(subnet_id: int, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    subnet = db.get(SchoolSubnet, subnet_id)
+    if subnet is None or subnet.school_id != admin.school_id:
+        raise HTTPException(status_code=404, detail="Subnet not found")
+    db.delete(subnet)
+    db.commit()
+    return {"ok": True}
+
+
+@router.get("/export", include_in_schema=False)
+def export_subnets(
+    request: Request,
+    db: Session = Depends(get_db),
+    authorization: str | None = Header(default=None),
+):
+    """
+    Full prefix -> school map for syslog_ingest. Pollers send the previous
+    ETag and get 304 until a mapping changes.
+    """
+    token = settings.subnet_export_token
+    supplied = (authorization or "").removeprefix("Bearer ").strip()
+    if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    rows = db.execute(
+        select(SchoolSubnet.cidr, SchoolSubnet.school_id).order_by(SchoolSubnet.id)
+    ).all()
+    body = orjson.dumps({"subnets": [{"cidr": cidr, "school_id": school_id} for cidr, school_id in rows]})
+    etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
@@ -1,5 +1,7 @@
 from datetime import datetime
-from pydantic import BaseModel, EmailStr
+from typing import Literal
+
+from pydantic import BaseModel, EmailStr, Field
 
 
 # -------------------------
@@ -18,6 +20,17 @@ class SchoolOut(BaseModel):
         from_attributes = True
 
 
+class SchoolHealth(BaseModel):
+    school_id: int
+    devices: int
+    online: int
+    offline: int
+    low_battery: int
+    open_alerts: dict[str, int]  # unacknowledged, by severity
+    open_alerts_total: int
+    reconciled_at: datetime | None  # last rebuild from the database
+
+
 # -------------------------
 # Users / Auth
 # -------------------------
@@ -55,6 +68,20 @@ class DeviceCreate(BaseModel):
     assigned_to: str = ""
 
 
+class DeviceImportError(BaseModel):
+    line: int
+    serial_number: str | None = None
+    error: str
+
+
+class DeviceImportResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    errors: list[DeviceImportError]
+    errors_truncated: bool  # more rows failed than DEVICE_IMPORT_MAX_ERRORS
+
+
 class DeviceOut(BaseModel):
     id: int
     school_id: int
@@ -119,3 +146,183 @@ class WebFilterIngest(BaseModel):
     device: IngestDevice = IngestDevice()
     user: IngestUser = IngestUser()
     event: IngestEvent = IngestEvent()
+
+
+class DhcpLease(BaseModel):
+    ip: str
+    mac: str | None = None
+    hostname: str | None = None
+    start: str | None = None  # ISO-8601; defaults to receive time
+    end: str | None = None
+    lease_seconds: int | None = None  # used when end is not given
+    action: Literal["assign", "release"] = "assign"
+
+
+class DhcpLeaseBatch(BaseModel):
+    api_key: str
+    school_id: int
+    source: str = "dhcp"
+    leases: list[DhcpLease] = Field(max_length=10000)
+
+
+# -------------------------
+# Policies
+# -------------------------
+class PolicyRuleCreate(BaseModel):
+    name: str
+    rule_type: Literal["deny_domain", "expression", "window_count", "window_distinct"] = "expression"
+    params: dict | None = None
+    severity: str = "medium"
+    source: str | None = None  # None matches any source
+    event_type: str | None = None  # None matches any event type
+    condition: str | None = None
+    action: str | None = None
+    is_active: bool = True
+
+
+class PolicyRuleUpdate(BaseModel):
+    name: str | None = None
+    params: dict | None = None
+    severity: str | None = None
+    source: str | None = None
+    event_type: str | None = None
+    condition: str | None = None
+    action: str | None = None
+    is_active: bool | None = None
+
+
+class PolicyRuleOut(BaseModel):
+    id: int
+    school_id: int
+    name: str
+    rule_type: str
+    params: dict | None = None
+    severity: str
+    source: str | None = None
+    event_type: str | None = None
+    condition: str | None = None
+    action: str | None = None
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# -------------------------
+# Subnets
+# -------------------------
+class SubnetCreate(BaseModel):
+    cidr: str
+    school_id: int | None = None  # the admin's school; any other is rejected
+    label: str | None = None
+
+
+class SubnetOut(BaseModel):
+    id: int
+    school_id: int
+    cidr: str
+    label: str | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# -------------------------
+# Heartbeats
+# -------------------------
+class Heartbeat(BaseModel):
+    serial_number: str
+    battery_percent: int | None = Field(default=None, ge=0, le=100)
+    ip: str | None = None
+    observed_at: datetime | None = None  # defaults to receive time
+
+
+class HeartbeatIn(Heartbeat):
+    api_key: str
+    school_id: int
+
+
+class HeartbeatBatchIn(BaseModel):
+    api_key: str
+    school_id: int
+    heartbeats: list[Heartbeat] = Field(max_length=5000)
+
+
+# -------------------------
+# Reports (hourly rollups)
+# -------------------------
+class ActivityBucket(BaseModel):
+    start: datetime
+    count: int
+
+
+class DomainCount(BaseModel):
+    domain: str
+    count: int
+    blocked: int
+
+
+# -------------------------
+# Reports (device status history)
+# -------------------------
+class Availability(BaseModel):
+    seconds: dict[str, float]  # time in each status within the range
+    availability: float | None  # online / (online + offline); None without either
+
+
+class DeviceAvailability(Availability):
+    device_id: int
+
+
+class AvailabilityReport(BaseModel):
+    since: datetime
+    until: datetime
+    school: Availability
+    devices: list[DeviceAvailability]
+
+
+# -------------------------
+# Event search
+# -------------------------
+class EventOut(BaseModel):
+    id: int
+    school_id: int | None = None
+    device_id: int | None = None
+    source: str
+    event_type: str
+    severity: str | None = None
+    message: str | None = None
+    domain: str | None = None
+    category: str | None = None
+    action: str | None = None
+    payload: dict | list | str | None = None
+    created_at: datetime
+
+
+class EventPage(BaseModel):
+    items: list[EventOut]
+    next_cursor: str | None = None  # pass back as ?cursor= for the next (older) page
+
+
+# -------------------------
+# Device timeline
+# -------------------------
+class ExternalIdOut(BaseModel):
+    source: str
+    external_id: str
+
+
+class TimelineItem(BaseModel):
+    kind: str  # event, alert, status
+    id: int
+    at: datetime
+    data: dict  # EventOut / AlertOut fields, or {"status", "source"}
+
+
+class TimelinePage(BaseModel):
+    device_id: int
+    external_ids: list[ExternalIdOut]
+    items: list[TimelineItem]
+    next_cursor: str | None = None  # pass back as ?cursor= for the next (older) page
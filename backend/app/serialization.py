@@ -0,0 +1,84 @@
+"""
+Fast JSON for large list endpoints.
+
+Selects only the response model's fields as plain row tuples (no ORM
+identity map, no per-row Pydantic validation) and encodes them with orjson.
+Field names and order come from the response schema, so the wire format
+matches `response_model=list[...]` byte for byte for valid rows.
+"""
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .event_fields import lookup_names, unpack_payload
+from .models import Alert, Device, Event, School
+from .schemas import AlertOut, DeviceOut, SchoolOut
+
+
+def _columns(model, schema: type[BaseModel]) -> tuple[tuple[str, ...], list]:
+    names = tuple(schema.model_fields)
+    return names, [getattr(model, name) for name in names]
+
+
+DEVICE_FIELDS, DEVICE_COLUMNS = _columns(Device, DeviceOut)
+ALERT_FIELDS, ALERT_COLUMNS = _columns(Alert, AlertOut)
+SCHOOL_FIELDS, SCHOOL_COLUMNS = _columns(School, SchoolOut)
+# Events hold interned ids; events_to_dicts swaps them for names
+EVENT_COLUMNS = [
+    Event.id, Event.school_id, Event.device_id, Event.source_id, Event.event_type, Event.severity,
+    Event.message, Event.domain_id, Event.category_id, Event.action, Event.payload, Event.created_at,
+]
+
+
+def rows_to_json(names: tuple[str, ...], rows) -> bytes:
+    return orjson.dumps([dict(zip(names, row)) for row in rows])
+
+
+def dump_devices(db: Session, school_id: int) -> bytes:
+    rows = db.execute(
+        select(*DEVICE_COLUMNS).where(Device.school_id == school_id).order_by(Device.asset_tag)
+    ).all()
+    return rows_to_json(DEVICE_FIELDS, rows)
+
+
+def dump_alerts(db: Session, school_id: int) -> bytes:
+    rows = db.execute(
+        select(*ALERT_COLUMNS).where(Alert.school_id == school_id).order_by(Alert.created_at.desc())
+    ).all()
+    return rows_to_json(ALERT_FIELDS, rows)
+
+
+def dump_schools(db: Session) -> bytes:
+    rows = db.execute(select(*SCHOOL_COLUMNS)).all()
+    return rows_to_json(SCHOOL_FIELDS, rows)
+
+
+def events_to_dicts(db: Session, rows) -> list[dict]:
+    """
+    EventOut dicts for EVENT_COLUMNS rows: names looked up in bulk, payload
+    rebuilt as ingested.
+    """
+    source_names, domain_names, category_names = lookup_names(db, rows)
+    out = []
+    for r in rows:
+        source = source_names[r.source_id]
+        domain = domain_names.get(r.domain_id)
+        category = category_names.get(r.category_id)
+        out.append(
+            {
+                "id": r.id,
+                "school_id": r.school_id,
+                "device_id": r.device_id,
+                "source": source,
+                "event_type": r.event_type,
+                "severity": r.severity,
+                "message": r.message,
+                "domain": domain,
+                "category": category,
+                "action": r.action,
+                "payload": unpack_payload(r.payload, source, r.event_type, domain, category),
+                "created_at": r.created_at,
+            }
+        )
+    return out
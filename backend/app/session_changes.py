@@ -0,0 +1,125 @@
+"""
+Committed device, alert and school writes, for modules that keep derived
+state in memory (response cache generations, fleet health counters, the
+API key cache).
+
+One set of session hooks collects what each flush wrote into a Changes
+object kept in session.info: after_flush adds to it (attribute history is
+only available then), after_commit hands it to every subscriber, and a
+rollback drops it.
+
+Writes that bypass the ORM unit of work (executemany UPDATEs, Core bulk
+statements) are not seen here; their callers notify the affected modules
+themselves.
+"""
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Callable
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from .models import Alert, Device, School, SchoolApiKey
+
+
+logger = logging.getLogger("k12.session_changes")
+
+_PENDING_KEY = "k12_session_changes"
+
+
+@dataclass
+class Changes:
+    # Written devices: id -> (school_id, status, battery_percent)
+    devices: dict[int, tuple[int, str | None, int | None]] = field(default_factory=dict)
+    # Deleted devices: id -> school_id
+    removed_devices: dict[int, int] = field(default_factory=dict)
+    # Unacknowledged alert deltas by (school_id, severity)
+    open_alerts: Counter = field(default_factory=Counter)
+    # Schools whose devices or alerts were written
+    schools: set[int] = field(default_factory=set)
+    school_rows: bool = False
+    api_keys: bool = False
+
+
+_subscribers: list[Callable[[Changes], None]] = []
+
+
+def subscribe(callback: Callable[[Changes], None]) -> None:
+    """
+    Calls `callback(changes)` after every commit that wrote a device,
+    alert, school or API key.
+    """
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+
+
+def _alert_delta(session: Session, alert: Alert) -> int:
+    if alert in session.new:
+        return 0 if alert.acknowledged else 1
+    history = inspect(alert).attrs.acknowledged.history
+    if history.deleted and history.added:
+        # Unloaded old values are left for the next fleet health reconcile
+        return bool(history.deleted[0]) - bool(history.added[0])
+    return 0
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    changes = session.info.get(_PENDING_KEY)
+    if changes is None:
+        changes = session.info[_PENDING_KEY] = Changes()
+
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, Device):
+            changes.devices[obj.id] = (obj.school_id, obj.status, obj.battery_percent)
+            changes.removed_devices.pop(obj.id, None)
+            changes.schools.add(obj.school_id)
+        elif isinstance(obj, Alert):
+            delta = _alert_delta(session, obj)
+            if delta:
+                changes.open_alerts[(obj.school_id, obj.severity)] += delta
+            changes.schools.add(obj.school_id)
+        elif isinstance(obj, School):
+            changes.school_rows = True
+        elif isinstance(obj, SchoolApiKey):
+            changes.api_keys = True
+    for obj in session.deleted:
+        if isinstance(obj, Device):
+            changes.devices.pop(obj.id, None)
+            changes.removed_devices[obj.id] = obj.school_id
+            changes.schools.add(obj.school_id)
+        elif isinstance(obj, Alert):
+            if not obj.acknowledged:
+                changes.open_alerts[(obj.school_id, obj.severity)] -= 1
+            changes.schools.add(obj.school_id)
+        elif isinstance(obj, School):
+            changes.school_rows = True
+        elif isinstance(obj, SchoolApiKey):
+            changes.api_keys = True
+
+
+def _after_commit(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes is None:
+        return
+    for callback in _subscribers:
+        try:
+            callback(changes)
+        except Exception:
+            logger.exception("session change subscriber %r failed", callback)
+
+
+def _after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def install() -> None:
+    """
+    Tracks device/alert/school/API key writes on every ORM Session.
+    """
+    if event.contains(Session, "after_flush", _after_flush):
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -0,0 +1,131 @@
+"""
+syslog_ingest's subnet -> school routing: build time and lookups/sec of the
+compiled CIDR index over a few thousand nested IPv4/IPv6 prefixes, against
+a linear longest-prefix scan of the same table.
+
+A sample of lookups is checked against the linear scan, so a routing
+error fails the run.
+"""
+import ipaddress
+import random
+import sys
+import time
+
+from .common import SYSLOG_DIR, BenchContext
+
+
+def build_prefixes(n: int, seed: int) -> list[tuple[str, int]]:
+    """
+    Districts own an IPv4 /16 and an IPv6 /48; schools get nested /20-/28
+    and /56-/64 blocks inside them.
+    """
+    rng = random.Random(f"{seed}-cidr")
+    out: dict[str, int] = {}
+    school = 0
+    while len(out) < n:
+        school += 1
+        if rng.random() < 0.75:
+            a, b = rng.randrange(1, 224), rng.randrange(256)
+            if rng.random() < 0.1:
+                out.setdefault(f"{a}.{b}.0.0/16", school)
+            else:
+                plen = rng.randrange(20, 29)
+                addr = ipaddress.IPv4Address((a << 24) | (b << 16) | rng.randrange(1 << 16))
+                out.setdefault(str(ipaddress.IPv4Network(f"{addr}/{plen}", strict=False)), school)
+        else:
+            site = rng.randrange(1 << 16)
+            plen = rng.choice((48, 56, 60, 64))
+            addr = ipaddress.IPv6Address((0x2001_0DB8 << 96) | (site << 80) | (rng.getrandbits(16) << 64))
+            out.setdefault(str(ipaddress.IPv6Network(f"{addr}/{plen}", strict=False)), school)
+    return list(out.items())
+
+
+def build_queries(prefixes: list[tuple[str, int]], n: int, seed: int) -> list[str]:
+    """
+    SonicWall `src` values: ~90% inside a mapped prefix, the rest random.
+    """
+    rng = random.Random(f"{seed}-cidr-queries")
+    networks = [ipaddress.ip_network(cidr) for cidr, _ in prefixes]
+    out = []
+    for _ in range(n):
+        if rng.random() < 0.9:
+            net = rng.choice(networks)
+            addr = net.network_address + rng.randrange(min(net.num_addresses, 1 << 32))
+        elif rng.random() < 0.8:
+            addr = ipaddress.IPv4Address(rng.getrandbits(32))
+        else:
+            addr = ipaddress.IPv6Address((0x2001_0DB8 << 96) | rng.getrandbits(96))
+        port = rng.randrange(1024, 65535)
+        out.append(f"{addr}:{port}:X0" if addr.version == 4 else f"[{addr}]:{port}:X0")
+    return out
+
+
+class LinearScan:
+    def __init__(self, prefixes: list[tuple[str, int]]):
+        self.networks = [(ipaddress.ip_network(cidr), school) for cidr, school in prefixes]
+
+    def lookup(self, address: str):
+        if address.startswith("["):
+            addr = ipaddress.ip_address(address[1 : address.index("]")])
+        else:
+            addr = ipaddress.ip_address(address.split(":", 1)[0])
+        best, best_len = None, -1
+        for net, school in self.networks:
+            if net.version == addr.version and net.prefixlen > best_len and addr in net:
+                best, best_len = school, net.prefixlen
+        return best
+
+
+def _best_of(fn, queries: list[str], rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for q in queries:
+            fn(q)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(ctx: BenchContext) -> dict:
+    if str(SYSLOG_DIR) not in sys.path:
+        sys.path.insert(0, str(SYSLOG_DIR))
+    from cidr_index import CidrIndex
+
+    n_prefixes = 1_000 if ctx.quick else 5_000
+    n_queries = 20_000 if ctx.quick else 200_000
+    prefixes = build_prefixes(n_prefixes, ctx.seed)
+    queries = build_queries(prefixes, n_queries, ctx.seed)
+
+    start = time.perf_counter()
+    index = CidrIndex(prefixes)
+    build_seconds = time.perf_counter() - start
+
+    linear = LinearScan(prefixes)
+    sample = queries[: 500 if ctx.quick else 2_000]
+    matched = 0
+    for q in sample:
+        expected = linear.lookup(q)
+        if index.lookup(q) != expected:
+            raise AssertionError(f"CIDR index disagrees with linear scan for {q}")
+        matched += expected is not None
+
+    index_best = _best_of(index.lookup, queries, 3)
+    linear_best = _best_of(linear.lookup, sample, 1)
+
+    return {
+        "prefixes": len(prefixes),
+        "lookups": n_queries,
+        "build_seconds": round(build_seconds, 6),
+        "sample_match_rate": round(matched / len(sample), 3),
+        "index": {
+            "lookups_per_sec": round(n_queries / index_best, 1),
+            "us_per_lookup": round(index_best / n_queries * 1e6, 3),
+        },
+        "linear_scan": {
+            "lookups": len(sample),
+            "lookups_per_sec": round(len(sample) / linear_best, 1),
+            "us_per_lookup": round(linear_best / len(sample) * 1e6, 3),
+        },
+        "speedup": round((linear_best / len(sample)) / (index_best / n_queries), 1),
+    }
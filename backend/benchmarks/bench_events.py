@@ -0,0 +1,165 @@
+"""
+GET /events latency per filter combination, through the API.
+
+Populates the database with `benchmarks.synthetic` when it holds no events
+(or runs against an existing dataset), then searches the school with the
+most events as its admin. Domains are sampled from that school's most and
+least common ones, so both ends of the index range are covered; "deep_page"
+is the 20th page of the unfiltered timeline, reached through the cursor.
+
+    python -m benchmarks.run events
+    python -m benchmarks.run --database-url sqlite:///./synthetic.db events
+"""
+import random
+import time
+
+from .common import BenchContext, summarize_latencies
+
+
+SIZES = {"quick": 20_000, "full": 1_000_000}
+DEEP_PAGES = 20
+
+
+def _dataset(ctx: BenchContext) -> int:
+    from sqlalchemy import func, select
+
+    from app.database import engine
+    from app.models import Event
+
+    from .synthetic import generate
+
+    with engine.connect() as conn:
+        count = conn.execute(select(func.count()).select_from(Event.__table__)).scalar()
+    if count:
+        return count
+    events = SIZES["quick" if ctx.quick else "full"]
+    generate(
+        schools=5 if ctx.quick else 20,
+        devices=events // 50,
+        events=events,
+        alerts=0,
+        rules_per_school=0,
+        seed=ctx.seed,
+    )
+    return events
+
+
+def _admin_headers(school_id: int) -> dict:
+    from app.auth import create_access_token
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        user = User(
+            email=f"bench-events-{time.time_ns()}@bench.local",
+            password_hash="x",
+            is_admin=True,
+            school_id=school_id,
+        )
+        db.add(user)
+        db.commit()
+        return {"Authorization": f"Bearer {create_access_token(user.id)}"}
+    finally:
+        db.close()
+
+
+def _cases(rng: random.Random, n: int) -> tuple[int, dict[str, list[dict]]]:
+    from sqlalchemy import func, select
+
+    from app.database import SessionLocal
+    from app.interning import domains, sources
+    from app.models import Event
+
+    db = SessionLocal()
+    try:
+        school_id, _ = db.execute(
+            select(Event.school_id, func.count()).group_by(Event.school_id).order_by(func.count().desc()).limit(1)
+        ).one()
+        in_school = Event.school_id == school_id
+        domain_counts = db.execute(
+            select(Event.domain_id, func.count())
+            .where(in_school, Event.domain_id.is_not(None))
+            .group_by(Event.domain_id)
+            .order_by(func.count().desc())
+        ).all()
+        domain_names = domains.names(db, [d for d, _ in domain_counts])
+        head = [domain_names[d] for d, _ in domain_counts[:10]]
+        tail = [domain_names[d] for d, _ in domain_counts[-50:]]
+        source_ids = db.scalars(select(Event.source_id).where(in_school).distinct()).all()
+        source_names = [name for name in sources.names(db, source_ids).values() if name != "google"]
+        device_ids = db.scalars(select(Event.device_id).where(in_school, Event.device_id.is_not(None)).distinct()).all()
+        first, last = db.execute(select(func.min(Event.created_at), func.max(Event.created_at)).where(in_school)).one()
+    finally:
+        db.close()
+
+    def window() -> dict:
+        since = first + (last - first) * rng.random()
+        return {"since": since.isoformat(), "until": (since + (last - first) / 30).isoformat()}
+
+    cases = {
+        "school": [{} for _ in range(n)],
+        "device": [{"device_id": rng.choice(device_ids)} for _ in range(n)],
+        "domain_head": [{"domain": rng.choice(head)} for _ in range(n)],
+        "domain_tail": [{"domain": rng.choice(tail)} for _ in range(n)],
+        "action_blocked": [{"action": "blocked"} for _ in range(n)],
+        "domain_head_blocked": [{"domain": rng.choice(head), "action": "blocked"} for _ in range(n)],
+        "domain_tail_allowed": [{"domain": rng.choice(tail), "action": "allowed"} for _ in range(n)],
+        "source_blocked": [{"source": rng.choice(source_names), "action": "blocked"} for _ in range(n)],
+        "event_type": [{"event_type": "dns_query"} for _ in range(n)],
+        "window_blocked": [{**window(), "action": "blocked"} for _ in range(n)],
+    }
+    return school_id, cases
+
+
+def _time_case(client, headers: dict, param_sets: list[dict]) -> dict:
+    latencies = []
+    rows = 0
+    wall_start = time.perf_counter()
+    for params in param_sets:
+        start = time.perf_counter()
+        resp = client.get("/events", params=params, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        resp.raise_for_status()
+        rows += len(resp.json()["items"])
+    summary = summarize_latencies(latencies, time.perf_counter() - wall_start)
+    summary["avg_rows"] = round(rows / len(param_sets), 1)
+    return summary
+
+
+def _time_deep_page(client, headers: dict, repeats: int) -> dict:
+    latencies = []
+    wall_start = time.perf_counter()
+    for _ in range(repeats):
+        params: dict = {}
+        for _ in range(DEEP_PAGES):
+            start = time.perf_counter()
+            resp = client.get("/events", params=params, headers=headers)
+            elapsed = time.perf_counter() - start
+            resp.raise_for_status()
+            params = {"cursor": resp.json()["next_cursor"]}
+            if params["cursor"] is None:
+                break
+        latencies.append(elapsed)
+    return summarize_latencies(latencies, time.perf_counter() - wall_start)
+
+
+def run(ctx: BenchContext) -> dict:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    events = _dataset(ctx)
+    rng = random.Random(f"{ctx.seed}-events")
+    n = 50 if ctx.quick else 300
+    school_id, cases = _cases(rng, n)
+    headers = _admin_headers(school_id)
+    # Not used as a context manager: the lifespan's background workers stay off
+    client = TestClient(app)
+
+    _time_case(client, headers, cases["school"][:10])  # warm-up
+    results: dict = {"events": events, "school_id": school_id}
+    for name, param_sets in cases.items():
+        results[name] = _time_case(client, headers, param_sets)
+    results["deep_page"] = _time_deep_page(client, headers, max(5, n // 10))
+    return results
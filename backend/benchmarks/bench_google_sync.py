@@ -0,0 +1,90 @@
+"""
+Google Chromebook sync against an in-memory fake of the Directory API.
+
+Measures the initial sync (all devices new) and a re-sync (all devices
+already present), which are the two shapes seen in production.
+"""
+import random
+import time
+from unittest import mock
+
+from .common import BenchContext
+
+
+class _Request:
+    def __init__(self, resp: dict):
+        self._resp = resp
+
+    def execute(self) -> dict:
+        return self._resp
+
+
+class FakeChromeOSDevices:
+    def __init__(self, devices: list[dict]):
+        self.devices = devices
+        self.calls = 0
+
+    def list(self, customerId, maxResults, pageToken=None, projection=None, orderBy=None):
+        self.calls += 1
+        start = int(pageToken or 0)
+        end = start + maxResults
+        resp = {"chromeosdevices": self.devices[start:end]}
+        if end < len(self.devices):
+            resp["nextPageToken"] = str(end)
+        return _Request(resp)
+
+
+class FakeDirectoryService:
+    def __init__(self, devices: list[dict]):
+        self._devices = FakeChromeOSDevices(devices)
+
+    def chromeosdevices(self):
+        return self._devices
+
+
+def build_devices(n: int, seed: int) -> list[dict]:
+    rng = random.Random(f"{seed}-google")
+    models = ["Lenovo 100e Chromebook Gen 3", "HP Chromebook 11 G9 EE", "Acer Chromebook 311"]
+    return [
+        {
+            "deviceId": f"gdev-{i:08x}",
+            "serialNumber": f"GSN{i:08d}",
+            "annotatedAssetId": f"G{i:06d}" if rng.random() < 0.9 else "",
+            "model": rng.choice(models),
+            "osVersion": f"12{rng.randrange(0, 6)}.0.{rng.randrange(6000, 6500)}.0",
+            "orgUnitPath": f"/Students/Grade{rng.randrange(3, 13)}",
+            "lastSync": f"2026-01-{rng.randrange(1, 28):02d}T{rng.randrange(24):02d}:00:00.000Z",
+        }
+        for i in range(n)
+    ]
+
+
+def run(ctx: BenchContext) -> dict:
+    from app.connectors import google_chrome
+    from app.database import SessionLocal
+    from app.models import School
+
+    n = 2_000 if ctx.quick else 20_000
+    fake = FakeDirectoryService(build_devices(n, ctx.seed))
+
+    db = SessionLocal()
+    try:
+        school = School(name=f"Bench Google School {time.time_ns()}")
+        db.add(school)
+        db.commit()
+        school_id = school.id
+
+        results: dict = {"devices": n}
+        with mock.patch.object(google_chrome, "_google_clients", return_value=(fake, None)):
+            for phase in ("initial", "resync"):
+                start = time.perf_counter()
+                google_chrome.sync_chromebooks_for_customer(db=db, school_id=school_id)
+                elapsed = time.perf_counter() - start
+                results[phase] = {
+                    "seconds": round(elapsed, 4),
+                    "devices_per_sec": round(n / elapsed, 1),
+                }
+        results["api_pages"] = fake.chromeosdevices().calls
+        return results
+    finally:
+        db.close()
@@ -0,0 +1,176 @@
+"""
+Throughput and latency of /ingest/webfilter and /ingest/goguardian at
+several client concurrency levels.
+
+The bench school is seeded with a rate limit high enough not to interfere.
+Concurrency above INGEST_MAX_CONCURRENCY is shed with 429 by the admission
+gate; those responses are reported as "shed", not as errors.
+"""
+import asyncio
+import random
+import time
+
+import httpx
+
+from .common import BenchContext, summarize_latencies
+
+
+API_KEY = "bench-ingest-key"
+DOMAINS = [
+    "classroom.google.com",
+    "docs.google.com",
+    "youtube.com",
+    "khanacademy.org",
+    "wikipedia.org",
+    "quizlet.com",
+    "tiktok.com",
+    "roblox.com",
+]
+DENIED_DOMAINS = ["bad-proxy.example", "casino.example", "warez.example"]
+
+
+def seed(n_devices: int) -> dict:
+    from app.database import SessionLocal
+    from app.models import Device, PolicyRule, School, SchoolApiKey
+
+    db = SessionLocal()
+    try:
+        school = School(
+            name=f"Bench Ingest School {time.time_ns()}",
+            ingest_rate_per_sec=1_000_000.0,
+            ingest_burst=1_000_000,
+        )
+        db.add(school)
+        db.flush()
+
+        db.add(SchoolApiKey(school_id=school.id, key=f"{API_KEY}-{school.id}", label="bench"))
+        for domain in DENIED_DOMAINS:
+            db.add(
+                PolicyRule(
+                    school_id=school.id,
+                    name=f"deny {domain}",
+                    rule_type="deny_domain",
+                    params={"domain": domain},
+                    severity="high",
+                )
+            )
+
+        db.bulk_insert_mappings(
+            Device,
+            [
+                {
+                    "school_id": school.id,
+                    "asset_tag": f"A{i:06d}",
+                    "serial_number": f"SN{i:08d}",
+                    "device_type": "Chromebook",
+                    "assigned_to": "",
+                    "status": "online",
+                }
+                for i in range(n_devices)
+            ],
+        )
+        db.commit()
+        return {"school_id": school.id, "api_key": f"{API_KEY}-{school.id}", "n_devices": n_devices}
+    finally:
+        db.close()
+
+
+def _device_ref(rng: random.Random, n_devices: int) -> dict:
+    roll = rng.random()
+    i = rng.randrange(n_devices)
+    if roll < 0.7:
+        return {"serial_number": f"SN{i:08d}"}
+    if roll < 0.9:
+        return {"asset_tag": f"A{i:06d}"}
+    return {"serial_number": f"UNKNOWN{i}", "ip": f"10.{i % 250}.{(i // 250) % 250}.{i % 200 + 1}"}
+
+
+def _domain(rng: random.Random) -> str:
+    if rng.random() < 0.01:
+        return rng.choice(DENIED_DOMAINS)
+    return rng.choice(DOMAINS)
+
+
+def build_payloads(kind: str, seeded: dict, n: int, seed: int) -> list[dict]:
+    rng = random.Random(f"{seed}-{kind}")
+    out = []
+    for i in range(n):
+        domain = _domain(rng)
+        action = "blocked" if rng.random() < 0.15 else "allowed"
+        body = {
+            "api_key": seeded["api_key"],
+            "school_id": seeded["school_id"],
+            "device": _device_ref(rng, seeded["n_devices"]),
+            "user": {"email": f"student{rng.randrange(5000)}@district.example"},
+            "event": {
+                "url": f"https://{domain}/path/{i}",
+                "domain": domain,
+                "action": action,
+                "category": "education" if "google" in domain else "general",
+            },
+        }
+        if kind == "webfilter":
+            body["source"] = "sonicwall"
+            body["event"]["type"] = "web_access"
+        else:
+            body["event"]["timestamp"] = f"2026-01-01T08:{(i // 60) % 60:02d}:{i % 60:02d}Z"
+        out.append(body)
+    return out
+
+
+async def _drive(client: httpx.AsyncClient, path: str, payloads: list[dict], concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+    shed = 0
+
+    async def one(body: dict):
+        nonlocal errors, shed
+        async with sem:
+            start = time.perf_counter()
+            resp = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - start)
+            if resp.status_code == 429:
+                shed += 1
+            elif resp.status_code >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(b) for b in payloads))
+    wall = time.perf_counter() - wall_start
+
+    summary = summarize_latencies(latencies, wall)
+    summary["concurrency"] = concurrency
+    summary["errors"] = errors
+    summary["shed"] = shed
+    return summary
+
+
+def _client(ctx: BenchContext) -> httpx.AsyncClient:
+    if ctx.base_url:
+        return httpx.AsyncClient(base_url=ctx.base_url, timeout=30.0)
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30.0)
+
+
+def run(ctx: BenchContext) -> dict:
+    n_devices = 500 if ctx.quick else 5000
+    per_level = 200 if ctx.quick else 2000
+    levels = ctx.extra.get("concurrency") or ([1, 4, 8, 32] if ctx.quick else [1, 4, 8, 32, 128])
+
+    seeded = seed(n_devices)
+    results: dict = {"devices": n_devices, "requests_per_level": per_level}
+
+    async def main():
+        async with _client(ctx) as client:
+            for kind, path in (("webfilter", "/ingest/webfilter"), ("goguardian", "/ingest/goguardian")):
+                payloads = build_payloads(kind, seeded, per_level, ctx.seed)
+                # Warm up connection pool, caches and code paths
+                await _drive(client, path, payloads[:20], 4)
+                results[kind] = [await _drive(client, path, payloads, c) for c in levels]
+
+    asyncio.run(main())
+    return results
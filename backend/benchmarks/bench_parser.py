@@ -0,0 +1,58 @@
+"""
+Lines/sec of syslog_ingest's parse_sonicwall_line over a synthetic corpus.
+"""
+import random
+import sys
+import time
+
+from .common import SYSLOG_DIR, BenchContext
+
+
+def build_corpus(n: int, seed: int) -> list[str]:
+    rng = random.Random(f"{seed}-sonicwall")
+    months = ["Jan", "Feb", "Mar", "Sep", "Oct", "Nov"]
+    out = []
+    for i in range(n):
+        src = f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+        dst = f"142.250.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+        kv = (
+            f'id=firewall sn=C0EAE4000000 time="2026-01-01 08:00:{i % 60:02d}" fw=203.0.113.1 '
+            f"pri=6 c=1024 m=97 app=49175 n={i} src={src}:{rng.randrange(1024, 65535)}:X0 "
+            f"dst={dst}:443:X1 proto=tcp/https op=1 sent={rng.randrange(100, 9000)} "
+            f'rcvd={rng.randrange(100, 90000)} result=200 dstname=www.example{rng.randrange(500)}.com '
+            f'arg=/index.html code=27 Category="Education" note="Policy: Students"'
+        )
+        if rng.random() < 0.8:
+            line = f"{rng.choice(months)}  {rng.randrange(1, 28)} 08:{rng.randrange(60):02d}:{rng.randrange(60):02d} fw01 {kv}"
+        else:
+            line = kv
+        out.append(line)
+    return out
+
+
+def run(ctx: BenchContext) -> dict:
+    if str(SYSLOG_DIR) not in sys.path:
+        sys.path.insert(0, str(SYSLOG_DIR))
+    from sonicwall_parser import parse_sonicwall_line
+
+    n = 20_000 if ctx.quick else 200_000
+    corpus = build_corpus(n, ctx.seed)
+
+    # Warm-up (regex compilation, allocator)
+    for line in corpus[:1000]:
+        parse_sonicwall_line(line)
+
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for line in corpus:
+            parse_sonicwall_line(line)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {
+        "lines": n,
+        "best_seconds": round(best, 6),
+        "lines_per_sec": round(n / best, 1),
+        "us_per_line": round(best / n * 1e6, 3),
+    }
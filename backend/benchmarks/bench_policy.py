@@ -0,0 +1,93 @@
+"""
+Per-event cost of policy_engine.evaluate_event as the rule set grows.
+"""
+import asyncio
+import random
+import time
+
+from .common import BenchContext, summarize_latencies
+
+
+RULE_COUNTS = (10, 1_000, 50_000)
+
+
+def seed(n_rules: int, seed: int) -> int:
+    from app.database import SessionLocal
+    from app.models import Device, PolicyRule, School
+
+    rng = random.Random(f"{seed}-rules-{n_rules}")
+    db = SessionLocal()
+    try:
+        school = School(name=f"Bench Policy School {n_rules} {time.time_ns()}")
+        db.add(school)
+        db.flush()
+        db.add(
+            Device(
+                school_id=school.id,
+                asset_tag="POLICY-1",
+                serial_number="POLICY-SN-1",
+                status="online",
+            )
+        )
+        db.bulk_insert_mappings(
+            PolicyRule,
+            [
+                {
+                    "school_id": school.id,
+                    "name": f"deny-{n_rules}-{i}",
+                    "is_active": True,
+                    "rule_type": "deny_domain",
+                    "params": {"domain": f"blocked{rng.randrange(10**9)}.example"},
+                    "severity": "medium",
+                }
+                for i in range(n_rules)
+            ],
+        )
+        db.commit()
+        return school.id
+    finally:
+        db.close()
+
+
+def run(ctx: BenchContext) -> dict:
+    from app.database import SessionLocal
+    from app.models import Device
+    from app.policy_engine import evaluate_event
+
+    counts = RULE_COUNTS[:2] if ctx.quick else RULE_COUNTS
+    results: dict = {}
+
+    for n_rules in counts:
+        school_id = seed(n_rules, ctx.seed)
+        iterations = max(5, min(500, 200_000 // n_rules))
+        if ctx.quick:
+            iterations = max(5, iterations // 5)
+
+        db = SessionLocal()
+        try:
+            device = db.query(Device).filter(Device.school_id == school_id).one()
+            payload = {
+                "url": "https://classroom.google.com/c/abc",
+                "domain": "classroom.google.com",
+                "action": "allowed",
+                "category": "education",
+            }
+
+            async def loop():
+                latencies = []
+                wall_start = time.perf_counter()
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await evaluate_event(db, school_id, device, "web_access", payload)
+                    latencies.append(time.perf_counter() - start)
+                return latencies, time.perf_counter() - wall_start
+
+            latencies, wall = asyncio.run(loop())
+        finally:
+            db.close()
+
+        summary = summarize_latencies(latencies, wall)
+        summary["rules"] = n_rules
+        results[str(n_rules)] = summary
+
+    return results
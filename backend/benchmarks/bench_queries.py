@@ -0,0 +1,115 @@
+"""
+Latency of the hot lookup shapes against an existing (synthetic) dataset.
+
+Run against a database populated by `benchmarks.synthetic`, before and after
+`alembic upgrade head`, to measure index changes:
+
+    python -m benchmarks.run --database-url sqlite:///./synthetic.db queries
+"""
+import random
+import time
+
+from sqlalchemy import func, select, text
+
+from .common import BenchContext, summarize_latencies
+
+
+def _explain(conn, sql: str, params: dict) -> list[str]:
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+        return [r[-1] for r in rows]
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(text(f"EXPLAIN {sql}"), params).all()
+        return [r[0] for r in rows]
+    return []
+
+
+def _time_shape(conn, sql: str, param_sets: list[dict]) -> dict:
+    stmt = text(sql)
+    latencies = []
+    wall_start = time.perf_counter()
+    for params in param_sets:
+        start = time.perf_counter()
+        conn.execute(stmt, params).all()
+        latencies.append(time.perf_counter() - start)
+    summary = summarize_latencies(latencies, time.perf_counter() - wall_start)
+    summary["plan"] = _explain(conn, sql, param_sets[0])
+    return summary
+
+
+def run(ctx: BenchContext) -> dict:
+    from app.database import engine
+    from app.models import Alert, Device, DeviceNetworkIdentity, ExternalDeviceId, SchoolApiKey
+
+    n = 200 if ctx.quick else 2_000
+    rng = random.Random(f"{ctx.seed}-queries")
+
+    with engine.connect() as conn:
+        device_count = conn.execute(select(func.count()).select_from(Device.__table__)).scalar()
+        if not device_count:
+            return {"skipped": "no devices; populate with benchmarks.synthetic first"}
+
+        max_id = conn.execute(select(func.max(Device.__table__.c.id))).scalar()
+        ids = [rng.randrange(1, max_id + 1) for _ in range(n)]
+        sample = conn.execute(
+            select(
+                Device.__table__.c.school_id,
+                Device.__table__.c.serial_number,
+                Device.__table__.c.asset_tag,
+                DeviceNetworkIdentity.__table__.c.mac_address,
+                DeviceNetworkIdentity.__table__.c.ip_address,
+                ExternalDeviceId.__table__.c.external_id,
+            )
+            .select_from(Device.__table__)
+            .join(DeviceNetworkIdentity.__table__, DeviceNetworkIdentity.__table__.c.device_id == Device.__table__.c.id)
+            .join(ExternalDeviceId.__table__, ExternalDeviceId.__table__.c.device_id == Device.__table__.c.id)
+            .where(Device.__table__.c.id.in_(ids))
+        ).all()
+        keys = conn.execute(
+            select(SchoolApiKey.__table__.c.school_id, SchoolApiKey.__table__.c.key)
+        ).all()
+        school_ids = sorted({r.school_id for r in sample})
+
+        results: dict = {"devices": device_count, "lookups_per_shape": len(sample)}
+
+        results["device_by_serial"] = _time_shape(
+            conn,
+            "SELECT id FROM devices WHERE school_id = :school_id AND serial_number = :serial LIMIT 1",
+            [{"school_id": r.school_id, "serial": r.serial_number} for r in sample],
+        )
+        results["device_by_asset_tag"] = _time_shape(
+            conn,
+            "SELECT id FROM devices WHERE school_id = :school_id AND asset_tag = :asset LIMIT 1",
+            [{"school_id": r.school_id, "asset": r.asset_tag} for r in sample],
+        )
+        results["device_by_mac"] = _time_shape(
+            conn,
+            "SELECT d.id FROM devices d JOIN device_network_identities n ON n.device_id = d.id "
+            "WHERE d.school_id = :school_id AND n.mac_address = :mac LIMIT 1",
+            [{"school_id": r.school_id, "mac": r.mac_address} for r in sample],
+        )
+        results["device_by_ip"] = _time_shape(
+            conn,
+            "SELECT d.id FROM devices d JOIN device_network_identities n ON n.device_id = d.id "
+            "WHERE d.school_id = :school_id AND n.ip_address = :ip LIMIT 1",
+            [{"school_id": r.school_id, "ip": r.ip_address} for r in sample],
+        )
+        results["external_id"] = _time_shape(
+            conn,
+            "SELECT id FROM external_device_ids WHERE source = 'google' AND external_id = :ext LIMIT 1",
+            [{"ext": r.external_id} for r in sample],
+        )
+        results["api_key"] = _time_shape(
+            conn,
+            "SELECT id FROM school_api_keys WHERE school_id = :school_id AND key = :key AND is_active LIMIT 1",
+            [{"school_id": k.school_id, "key": k.key} for k in rng.choices(keys, k=len(sample))],
+        )
+        results["recent_alerts_page"] = _time_shape(
+            conn,
+            "SELECT id FROM alerts WHERE school_id = :school_id ORDER BY created_at DESC LIMIT 100",
+            [{"school_id": rng.choice(school_ids)} for _ in range(min(len(sample), 200))],
+        )
+        if Alert.__table__.c.get("created_at") is not None:
+            results["alerts_total"] = conn.execute(select(func.count()).select_from(Alert.__table__)).scalar()
+
+    return results
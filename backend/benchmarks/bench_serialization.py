@@ -0,0 +1,129 @@
+"""
+GET /devices and /alerts body construction: the original
+`response_model=list[...]` path (ORM rows -> Pydantic validation ->
+jsonable_encoder -> json) versus the column-tuple + orjson fast path.
+
+Both outputs are decoded and compared, so a contract drift fails loudly.
+"""
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from .common import BenchContext, summarize_latencies
+
+
+SIZES = (1_000, 30_000)
+
+
+def seed(n: int, seed: int) -> int:
+    from app.database import SessionLocal
+    from app.models import Alert, Device, School
+
+    rng = random.Random(f"{seed}-serialization-{n}")
+    base = datetime(2026, 1, 1)
+    db = SessionLocal()
+    try:
+        school = School(name=f"Bench Serialization School {n} {time.time_ns()}")
+        db.add(school)
+        db.flush()
+        db.bulk_insert_mappings(
+            Device,
+            [
+                {
+                    "school_id": school.id,
+                    "asset_tag": f"SER{i:07d}",
+                    "serial_number": f"SERSN{i:09d}",
+                    "device_type": "Chromebook",
+                    "assigned_to": f"student{i}@district.example",
+                    "status": rng.choice(("online", "offline", "unknown")),
+                    "battery_percent": rng.randrange(101),
+                    "last_seen": base + timedelta(seconds=rng.randrange(86_400 * 30), microseconds=rng.randrange(10**6)),
+                    "created_at": base,
+                }
+                for i in range(n)
+            ],
+        )
+        db.bulk_insert_mappings(
+            Alert,
+            [
+                {
+                    "school_id": school.id,
+                    "device_id": None,
+                    "alert_type": "security",
+                    "severity": "medium",
+                    "message": f"Policy 'deny' triggered for bench alert {i}",
+                    "acknowledged": bool(i % 3),
+                    "created_at": base + timedelta(seconds=i),
+                }
+                for i in range(n)
+            ],
+        )
+        db.commit()
+        return school.id
+    finally:
+        db.close()
+
+
+def _legacy_devices(db, school_id: int) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+    from app.models import Device
+    from app.schemas import DeviceOut
+
+    rows = db.query(Device).filter(Device.school_id == school_id).order_by(Device.asset_tag).all()
+    return json.dumps(jsonable_encoder([DeviceOut.model_validate(r) for r in rows])).encode()
+
+
+def _legacy_alerts(db, school_id: int) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+    from app.models import Alert
+    from app.schemas import AlertOut
+
+    rows = db.query(Alert).filter(Alert.school_id == school_id).order_by(Alert.created_at.desc()).all()
+    return json.dumps(jsonable_encoder([AlertOut.model_validate(r) for r in rows])).encode()
+
+
+def _time(fn, repeats: int) -> tuple[dict, bytes]:
+    from app.database import SessionLocal
+
+    latencies = []
+    body = b""
+    wall_start = time.perf_counter()
+    for _ in range(repeats):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            body = fn(db)
+            latencies.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    return summarize_latencies(latencies, time.perf_counter() - wall_start), body
+
+
+def run(ctx: BenchContext) -> dict:
+    from app.serialization import dump_alerts, dump_devices
+
+    sizes = SIZES[:1] if ctx.quick else SIZES
+    repeats = 3 if ctx.quick else 5
+    results: dict = {}
+
+    for n in sizes:
+        school_id = seed(n, ctx.seed)
+        level = {}
+        for name, legacy, fast in (
+            ("devices", _legacy_devices, dump_devices),
+            ("alerts", _legacy_alerts, dump_alerts),
+        ):
+            legacy_summary, legacy_body = _time(lambda db: legacy(db, school_id), repeats)
+            fast_summary, fast_body = _time(lambda db: fast(db, school_id), repeats)
+            if json.loads(legacy_body) != json.loads(fast_body):
+                raise AssertionError(f"fast path output differs from response_model output for {name}")
+            level[name] = {
+                "legacy": legacy_summary,
+                "fast": fast_summary,
+                "bytes": len(fast_body),
+                "speedup_p50": round(legacy_summary["p50_ms"] / max(fast_summary["p50_ms"], 1e-6), 2),
+            }
+        results[str(n)] = level
+
+    return results
@@ -0,0 +1,119 @@
+"""
+Shared helpers for the benchmark suite.
+
+The backend reads DATABASE_URL when `app.database` is imported, so
+`configure_database()` must run before anything under `app` is imported.
+"""
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+REPO_DIR = BACKEND_DIR.parent
+SYSLOG_DIR = REPO_DIR / "syslog_ingest"
+
+
+@dataclass
+class BenchContext:
+    database_url: str
+    seed: int = 1337
+    quick: bool = False
+    base_url: str | None = None
+    extra: dict = field(default_factory=dict)
+
+
+def configure_database(database_url: str | None) -> str:
+    """
+    Points the app at `database_url`, or at a fresh SQLite file in a temp dir.
+    """
+    if not database_url:
+        tmp = tempfile.mkdtemp(prefix="k12-bench-")
+        database_url = f"sqlite:///{tmp}/bench.db"
+
+    os.environ["DATABASE_URL"] = database_url
+    # Never talk to a real SMTP server from a benchmark
+    os.environ.pop("SMTP_HOST", None)
+
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    return database_url
+
+
+def create_schema() -> None:
+    from app import models  # noqa: F401
+    from app.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+
+
+# -------------------------
+# Timing helpers
+# -------------------------
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct * len(sorted_values) / 100.0) - 1))
+    return sorted_values[k]
+
+
+def summarize_latencies(latencies: list[float], wall_seconds: float) -> dict:
+    values = sorted(latencies)
+    n = len(values)
+    return {
+        "count": n,
+        "wall_seconds": round(wall_seconds, 6),
+        "throughput_per_sec": round(n / wall_seconds, 2) if wall_seconds > 0 else None,
+        "p50_ms": round(percentile(values, 50) * 1000.0, 3),
+        "p90_ms": round(percentile(values, 90) * 1000.0, 3),
+        "p99_ms": round(percentile(values, 99) * 1000.0, 3),
+        "max_ms": round(values[-1] * 1000.0, 3) if values else 0.0,
+    }
+
+
+class Stopwatch:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+
+# -------------------------
+# Run metadata
+# -------------------------
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_metadata(ctx: BenchContext) -> dict:
+    dialect = ctx.database_url.split(":", 1)[0]
+    return {
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": dialect,
+        "seed": ctx.seed,
+        "quick": ctx.quick,
+        "target": ctx.base_url or "in-process",
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
@@ -0,0 +1,65 @@
+"""
+Compares two benchmark JSON files and flags regressions.
+
+    python -m benchmarks.compare old.json new.json [--threshold 0.10]
+
+Metrics ending in `_ms` or `seconds` are lower-is-better; metrics ending in
+`_per_sec` are higher-is-better. Exit status is 1 if anything regressed by
+more than the threshold.
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+def _flatten(obj, prefix: str = "") -> dict[str, float]:
+    out: dict[str, float] = {}
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            out.update(_flatten(v, f"{prefix}.{k}" if prefix else str(k)))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            key = f"c{v['concurrency']}" if isinstance(v, dict) and "concurrency" in v else str(i)
+            out.update(_flatten(v, f"{prefix}.{key}"))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        out[prefix] = float(obj)
+    return out
+
+
+def _direction(key: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if informational."""
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_sec"):
+        return 1
+    if leaf.endswith("_ms") or leaf.endswith("seconds"):
+        return -1
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    old = _flatten(json.loads(Path(args.old).read_text())["results"])
+    new = _flatten(json.loads(Path(args.new).read_text())["results"])
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        direction = _direction(key)
+        if direction == 0 or old[key] == 0:
+            continue
+        change = (new[key] - old[key]) / old[key]
+        worse = change * direction < -args.threshold
+        better = change * direction > args.threshold
+        marker = "REGRESSION" if worse else "improved" if better else ""
+        regressions += worse
+        print(f"{key:60s} {old[key]:>14.3f} -> {new[key]:>14.3f} {change:+7.1%} {marker}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
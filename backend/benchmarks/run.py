@@ -0,0 +1,96 @@
+"""
+Offline benchmark runner.
+
+Usage (from backend/):
+    python -m benchmarks.run                       # all suites, fresh SQLite file
+    python -m benchmarks.run --quick ingest policy # subset, smaller sizes
+    python -m benchmarks.run events                # GET /events on a generated 1M-event dataset
+    python -m benchmarks.run --database-url postgresql+psycopg://localhost/k12_bench
+    python -m benchmarks.run --base-url http://127.0.0.1:8000 --concurrency 1,32,128 ingest
+
+Results are written as JSON (default: benchmarks/results/<rev>-<ts>.json);
+compare two runs with `python -m benchmarks.compare old.json new.json`.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from .common import BenchContext, configure_database, create_schema, run_metadata
+
+
+SUITES = ("parser", "cidr", "policy", "ingest", "google_sync", "serialization", "queries", "events")
+
+
+def _load_suite(name: str):
+    if name == "parser":
+        from . import bench_parser as mod
+    elif name == "cidr":
+        from . import bench_cidr as mod
+    elif name == "policy":
+        from . import bench_policy as mod
+    elif name == "ingest":
+        from . import bench_ingest as mod
+    elif name == "google_sync":
+        from . import bench_google_sync as mod
+    elif name == "serialization":
+        from . import bench_serialization as mod
+    elif name == "queries":
+        from . import bench_queries as mod
+    elif name == "events":
+        from . import bench_events as mod
+    else:
+        raise ValueError(f"Unknown suite: {name}")
+    return mod
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="K12 Asset Guardian benchmarks")
+    parser.add_argument("suites", nargs="*", help=f"Subset of: {', '.join(SUITES)}")
+    parser.add_argument("--database-url", default=None, help="Defaults to a fresh SQLite file")
+    parser.add_argument("--base-url", default=None, help="Drive a running server instead of in-process ASGI")
+    parser.add_argument("--seed", type=int, default=1337)
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes for a fast smoke run")
+    parser.add_argument("--concurrency", default=None, help="Ingest client concurrency levels, e.g. 1,8,32")
+    parser.add_argument("--out", default=None, help="Output JSON path")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.suites if s not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    database_url = configure_database(args.database_url)
+    create_schema()
+
+    ctx = BenchContext(
+        database_url=database_url,
+        seed=args.seed,
+        quick=args.quick,
+        base_url=args.base_url,
+    )
+    if args.concurrency:
+        ctx.extra["concurrency"] = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    report = {"meta": run_metadata(ctx), "results": {}}
+    # "queries" needs a pre-populated dataset and "events" generates a large
+    # one, so they only run when asked for
+    for name in args.suites or [s for s in SUITES if s not in ("queries", "events")]:
+        print(f"[bench] {name} ...", file=sys.stderr, flush=True)
+        start = time.perf_counter()
+        report["results"][name] = _load_suite(name).run(ctx)
+        print(f"[bench] {name} done in {time.perf_counter() - start:.1f}s", file=sys.stderr, flush=True)
+
+    out = Path(args.out) if args.out else (
+        Path(__file__).resolve().parent
+        / "results"
+        / f"{report['meta']['git_revision'] or 'norev'}-{time.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, sort_keys=True))
+    print(json.dumps(report["results"], indent=2, sort_keys=True))
+    print(f"[bench] wrote {out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,463 @@
+"""
+Deterministic synthetic district generator.
+
+Creates schools, devices (serials, asset tags, network identities, Google
+external ids), SchoolApiKeys, PolicyRules, and large volumes of Event and
+Alert rows with skewed, production-like distributions:
+
+  - school sizes are log-normally spread (a few big high schools, many
+    small elementaries)
+  - device activity is Pareto-skewed (some Chromebooks are used all day)
+  - domains follow a Zipf distribution over a fixed vocabulary
+  - event timestamps follow school hours on weekdays
+
+Rows are written with Core bulk inserts in fixed-size batches and explicit
+primary keys, so the same seed always produces the same rows.
+
+Usage (from backend/):
+    python -m benchmarks.synthetic --database-url sqlite:///./synthetic.db \\
+        --schools 50 --devices 200000 --events 50000000 --alerts 500000 --seed 42
+"""
+import argparse
+import bisect
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from .common import configure_database, create_schema
+
+
+# -------------------------
+# Vocabularies
+# -------------------------
+HEAD_DOMAINS = [
+    ("classroom.google.com", "education"),
+    ("docs.google.com", "productivity"),
+    ("drive.google.com", "productivity"),
+    ("www.google.com", "search"),
+    ("www.youtube.com", "video"),
+    ("khanacademy.org", "education"),
+    ("quizlet.com", "education"),
+    ("www.wikipedia.org", "reference"),
+    ("kahoot.it", "education"),
+    ("canva.com", "productivity"),
+    ("clever.com", "education"),
+    ("ixl.com", "education"),
+    ("desmos.com", "education"),
+    ("newsela.com", "education"),
+    ("www.coolmathgames.com", "games"),
+    ("www.roblox.com", "games"),
+    ("www.tiktok.com", "social"),
+    ("www.instagram.com", "social"),
+    ("discord.com", "social"),
+    ("spotify.com", "music"),
+]
+TAIL_CATEGORIES = [
+    "education", "reference", "news", "games", "shopping", "social",
+    "video", "music", "sports", "technology", "proxy", "adult", "gambling",
+]
+BLOCK_RATES = {
+    "games": 0.45, "social": 0.55, "proxy": 0.98, "adult": 0.99,
+    "gambling": 0.99, "video": 0.15, "music": 0.2,
+}
+SOURCES = [("goguardian", 0.45), ("sonicwall", 0.35), ("lightspeed", 0.17), ("google", 0.03)]
+MODELS = ["Lenovo 100e Chromebook Gen 3", "HP Chromebook 11 G9 EE", "Acer Chromebook 311", "Dell Chromebook 3110"]
+
+
+def build_domains(rng: random.Random, n_tail: int) -> list[tuple[str, str]]:
+    domains = list(HEAD_DOMAINS)
+    for i in range(n_tail):
+        cat = rng.choice(TAIL_CATEGORIES)
+        domains.append((f"{cat}-site{i:05d}.example", cat))
+    return domains
+
+
+def zipf_cum_weights(n: int, s: float = 1.1) -> list[float]:
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def school_hours_offsets(rng: random.Random, days: int, k: int) -> list[float]:
+    """
+    Seconds-from-start offsets clustered into weekday school hours (7:30-15:30)
+    with a small share of evening/weekend traffic.
+    """
+    out = []
+    for _ in range(k):
+        day = rng.randrange(days)
+        if rng.random() < 0.9:
+            while day % 7 in (5, 6):  # start date is a Monday
+                day = rng.randrange(days)
+            second = 27_000 + int(rng.triangular(0, 28_800, 12_000))
+        else:
+            second = rng.randrange(86_400)
+        out.append(day * 86_400 + second)
+    return out
+
+
+# -------------------------
+# Bulk writer
+# -------------------------
+class BulkWriter:
+    def __init__(self, engine, table, batch_size: int, label: str):
+        self.engine = engine
+        self.table = table
+        self.batch_size = batch_size
+        self.label = label
+        self.rows: list[dict] = []
+        self.written = 0
+        self.started = time.perf_counter()
+
+    def add(self, row: dict) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert(), self.rows)
+        self.written += len(self.rows)
+        self.rows = []
+        if self.written % (self.batch_size * 50) == 0:
+            self.report()
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = self.written / elapsed if elapsed else 0.0
+        print(f"[synthetic] {self.label}: {self.written:,} rows ({rate:,.0f}/s)", file=sys.stderr, flush=True)
+
+    def close(self) -> None:
+        self.flush()
+        self.report()
+
+
+def _next_id(conn, table) -> int:
+    from sqlalchemy import func, select
+
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _sync_postgres_sequences(engine, tables) -> None:
+    if engine.dialect.name != "postgresql":
+        return
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        for t in tables:
+            conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{t.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {t.name}), 1))"
+                )
+            )
+
+
+# -------------------------
+# Generator
+# -------------------------
+def generate(
+    schools: int,
+    devices: int,
+    events: int,
+    alerts: int,
+    rules_per_school: int = 20,
+    days: int = 30,
+    seed: int = 42,
+    batch_size: int = 10_000,
+    start: datetime | None = None,
+) -> dict:
+    from app.database import SessionLocal, engine
+    from app.event_fields import event_values
+    from app.models import (
+        Alert,
+        Device,
+        DeviceNetworkIdentity,
+        Event,
+        ExternalDeviceId,
+        PolicyRule,
+        School,
+        SchoolApiKey,
+    )
+
+    if devices < schools:
+        raise ValueError(f"devices ({devices}) must be at least schools ({schools}): every school gets one")
+    rng = random.Random(seed)
+    start = start or datetime(2026, 1, 5)  # a Monday
+    created_at = start - timedelta(days=90)
+
+    t_school = School.__table__
+    t_device = Device.__table__
+    t_dni = DeviceNetworkIdentity.__table__
+    t_ext = ExternalDeviceId.__table__
+    t_key = SchoolApiKey.__table__
+    t_rule = PolicyRule.__table__
+    t_event = Event.__table__
+    t_alert = Alert.__table__
+    all_tables = (t_school, t_device, t_dni, t_ext, t_key, t_rule, t_event, t_alert)
+
+    with engine.connect() as conn:
+        next_id = {t.name: _next_id(conn, t) for t in all_tables}
+
+    def writer(table, label):
+        return BulkWriter(engine, table, batch_size, label)
+
+    # Schools: log-normal share of the fleet
+    school_ids = list(range(next_id["schools"], next_id["schools"] + schools))
+    w = writer(t_school, "schools")
+    for n, sid in enumerate(school_ids):
+        w.add({
+            "id": sid,
+            "name": f"Synthetic School {n:04d} (seed {seed})",
+            "district": f"Synthetic District {n // 25:02d}",
+            "customer_code": f"syn-{seed}-{n:04d}",
+            "created_at": created_at,
+        })
+    w.close()
+
+    shares = [rng.lognormvariate(0, 0.8) for _ in school_ids]
+    total_share = sum(shares)
+    # One device each, the rest by share; the rounding remainder goes to the first
+    spare = devices - schools
+    per_school = [1 + int(spare * s / total_share) for s in shares]
+    per_school[0] += devices - sum(per_school)
+
+    # API keys: two per school (primary + forwarder)
+    w = writer(t_key, "school_api_keys")
+    kid = next_id["school_api_keys"]
+    for sid in school_ids:
+        for label in ("primary", "forwarder"):
+            w.add({
+                "id": kid,
+                "school_id": sid,
+                "key": f"syn-{seed}-{sid}-{rng.getrandbits(96):024x}",
+                "label": label,
+                "is_active": True,
+                "created_at": created_at,
+            })
+            kid += 1
+    w.close()
+
+    domains = build_domains(rng, n_tail=5_000)
+    domain_cw = zipf_cum_weights(len(domains))
+    risky = [d for d, cat in domains if cat in ("proxy", "adult", "gambling")]
+
+    # Policy rules: deny_domain over the risky tail
+    w = writer(t_rule, "policy_rules")
+    rid = next_id["policy_rules"]
+    for sid in school_ids:
+        for j in range(rules_per_school):
+            w.add({
+                "id": rid,
+                "school_id": sid,
+                "name": f"deny-{sid}-{j}",
+                "is_active": rng.random() < 0.95,
+                "rule_type": "deny_domain",
+                "params": {"domain": rng.choice(risky)},
+                "severity": rng.choice(("low", "medium", "high")),
+                "source": None,
+                "event_type": None,
+                "condition": None,
+                "action": None,
+                "created_at": created_at,
+            })
+            rid += 1
+    w.close()
+
+    # Devices + network identities + Google external ids
+    fleet: list[tuple] = []  # (device_id, school_id, serial, asset_tag, ip, mac)
+    w_dev = writer(t_device, "devices")
+    w_dni = writer(t_dni, "device_network_identities")
+    w_ext = writer(t_ext, "external_device_ids")
+    did = next_id["devices"]
+    nid = next_id["device_network_identities"]
+    xid = next_id["external_device_ids"]
+    for sid, count in zip(school_ids, per_school):
+        for _ in range(count):
+            serial = f"SYN{seed % 1000:03d}{did:09d}"
+            asset = f"{sid:04d}-{did:07d}"
+            ip = f"10.{sid % 256}.{(did >> 8) % 256}.{did % 254 + 1}"
+            mac = ":".join(f"{b:02x}" for b in did.to_bytes(6, "big"))
+            last_seen = start + timedelta(days=days) - timedelta(minutes=rng.expovariate(1 / 600))
+            status = "online" if (start + timedelta(days=days) - last_seen) < timedelta(minutes=20) else "offline"
+            w_dev.add({
+                "id": did,
+                "school_id": sid,
+                "asset_tag": asset,
+                "serial_number": serial,
+                "device_name": f"CB-{asset}",
+                "device_type": "Chromebook",
+                "assigned_to": f"student{did}@district{sid}.example",
+                "status": status,
+                "is_online": status == "online",
+                "battery_percent": rng.randrange(3, 101),
+                "last_seen": last_seen,
+                "created_at": created_at,
+            })
+            w_dni.add({
+                "id": nid,
+                "device_id": did,
+                "source": "goguardian",
+                "ip_address": ip,
+                "mac_address": mac,
+                "hostname": f"cb-{did}",
+                "last_seen": last_seen,
+                "created_at": created_at,
+            })
+            w_ext.add({
+                "id": xid,
+                "device_id": did,
+                "source": "google",
+                "external_id": f"gdev-{seed}-{did:010x}",
+                "created_at": created_at,
+            })
+            fleet.append((did, sid, serial, asset, ip, mac))
+            did += 1
+            nid += 1
+            xid += 1
+    for w in (w_dev, w_dni, w_ext):
+        w.close()
+
+    # Pareto-skewed device activity
+    activity_cw = list(itertools.accumulate(rng.paretovariate(1.3) for _ in fleet))
+    source_names = [s for s, _ in SOURCES]
+    source_cw = list(itertools.accumulate(p for _, p in SOURCES))
+
+    w = writer(t_event, "events")
+    eid = next_id["events"]
+    remaining = events
+    db = SessionLocal()
+    while remaining > 0:
+        k = min(batch_size, remaining)
+        devs = rng.choices(fleet, cum_weights=activity_cw, k=k)
+        doms = rng.choices(domains, cum_weights=domain_cw, k=k)
+        srcs = rng.choices(source_names, cum_weights=source_cw, k=k)
+        offsets = school_hours_offsets(rng, days, k)
+        batch = []
+        for (dev_id, sid, serial, asset, ip, mac), (domain, cat), source, off in zip(devs, doms, srcs, offsets):
+            ts = start + timedelta(seconds=off)
+            if source == "google":
+                event_type = "inventory_sync"
+                action = ""
+                payload = {"serial": serial, "asset_tag": asset, "model": MODELS[dev_id % len(MODELS)]}
+            else:
+                event_type = "web_access" if rng.random() < 0.97 else "dns_query"
+                action = "blocked" if rng.random() < BLOCK_RATES.get(cat, 0.02) else "allowed"
+                payload = {
+                    "device": {"serial_number": serial, "asset_tag": asset, "hostname": "", "ip": ip, "mac": mac},
+                    "user": {"email": f"student{dev_id}@district{sid}.example"},
+                    "event": {
+                        "type": event_type,
+                        "url": f"https://{domain}/{rng.randrange(1000)}",
+                        "domain": domain,
+                        "action": action,
+                        "category": cat,
+                        "timestamp": ts.isoformat() + "Z",
+                    },
+                    "source": source,
+                }
+            batch.append(((source, event_type, payload), {
+                "id": eid,
+                "school_id": sid,
+                "device_id": dev_id,
+                "event_type": event_type,
+                "severity": "medium" if action == "blocked" else "info",
+                "message": f"{event_type} {action}: {domain}",
+                "created_at": ts,
+            }))
+            eid += 1
+        # Interned ids, search columns and packed payload, as ingest stores them
+        for (_, row), values in zip(batch, event_values(db, [record for record, _ in batch])):
+            w.add({**row, **values})
+        remaining -= k
+    db.close()
+    w.close()
+
+    # Alerts: mostly security (denied domains), some threshold/offline
+    w = writer(t_alert, "alerts")
+    aid = next_id["alerts"]
+    end = start + timedelta(days=days)
+    for _ in range(alerts):
+        dev_id, sid, _, asset, _, _ = fleet[bisect.bisect_left(activity_cw, rng.random() * activity_cw[-1])]
+        ts = start + timedelta(seconds=rng.randrange(days * 86_400))
+        roll = rng.random()
+        if roll < 0.8:
+            alert_type, severity = "security", rng.choice(("medium", "high"))
+            message = f"Policy triggered. Denied domain '{rng.choice(risky)}'."
+        elif roll < 0.95:
+            alert_type, severity = "threshold", "medium"
+            message = f"Device {asset} battery is low ({rng.randrange(1, 15)}%)."
+        else:
+            alert_type, severity = "offline", "low"
+            message = f"Device {asset} has been offline for over 20 minutes."
+        age_days = (end - ts).total_seconds() / 86_400
+        w.add({
+            "id": aid,
+            "school_id": sid,
+            "device_id": dev_id,
+            "alert_type": alert_type,
+            "severity": severity,
+            "message": message,
+            "acknowledged": rng.random() < min(0.95, 1 - math.exp(-age_days / 2)),
+            "created_at": ts,
+        })
+        aid += 1
+    w.close()
+
+    _sync_postgres_sequences(engine, all_tables)
+
+    return {
+        "schools": schools,
+        "devices": len(fleet),
+        "api_keys": schools * 2,
+        "policy_rules": schools * rules_per_school,
+        "events": events,
+        "alerts": alerts,
+        "seed": seed,
+        "school_ids": [school_ids[0], school_ids[-1]],
+        "largest_school_devices": max(per_school),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic district dataset")
+    parser.add_argument("--database-url", default=None, help="Defaults to a fresh SQLite file")
+    parser.add_argument("--schools", type=int, default=20)
+    parser.add_argument("--devices", type=int, default=20_000)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--alerts", type=int, default=20_000)
+    parser.add_argument("--rules-per-school", type=int, default=20)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    if args.devices < args.schools:
+        parser.error("--devices must be at least --schools")
+
+    url = configure_database(args.database_url)
+    create_schema()
+    print(f"[synthetic] target {url}", file=sys.stderr)
+
+    started = time.perf_counter()
+    summary = generate(
+        schools=args.schools,
+        devices=args.devices,
+        events=args.events,
+        alerts=args.alerts,
+        rules_per_school=args.rules_per_school,
+        days=args.days,
+        seed=args.seed,
+        batch_size=args.batch_size,
+    )
+    summary["seconds"] = round(time.perf_counter() - started, 1)
+    summary["database_url"] = url
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
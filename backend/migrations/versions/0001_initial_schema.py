@@ -0,0 +1,191 @@
+"""initial schema
+
+Baseline matching app.models at the time Alembic was introduced.
+Databases previously created by Base.metadata.create_all() should be
+stamped rather than upgraded: `alembic stamp 0001`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('schools',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('district', sa.String(length=255), nullable=True),
+    sa.Column('customer_code', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_schools_customer_code', 'schools', ['customer_code'], unique=True)
+    op.create_index('ix_schools_id', 'schools', ['id'], unique=False)
+    op.create_index('ix_schools_name', 'schools', ['name'], unique=True)
+
+    op.create_table('devices',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('asset_tag', sa.String(length=100), nullable=True),
+    sa.Column('serial_number', sa.String(length=128), nullable=True),
+    sa.Column('device_name', sa.String(length=255), nullable=True),
+    sa.Column('device_type', sa.String(length=50), nullable=False),
+    sa.Column('assigned_to', sa.String(length=255), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('is_online', sa.Boolean(), nullable=False),
+    sa.Column('battery_percent', sa.Integer(), nullable=True),
+    sa.Column('last_seen', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_devices_asset_tag', 'devices', ['asset_tag'], unique=False)
+    op.create_index('ix_devices_device_name', 'devices', ['device_name'], unique=False)
+    op.create_index('ix_devices_id', 'devices', ['id'], unique=False)
+    op.create_index('ix_devices_school_id', 'devices', ['school_id'], unique=False)
+    op.create_index('ix_devices_serial_number', 'devices', ['serial_number'], unique=False)
+    op.create_index('ix_devices_status', 'devices', ['status'], unique=False)
+
+    op.create_table('policy_rules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('rule_type', sa.String(length=50), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=True),
+    sa.Column('severity', sa.String(length=20), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=True),
+    sa.Column('event_type', sa.String(length=100), nullable=True),
+    sa.Column('condition', sa.Text(), nullable=True),
+    sa.Column('action', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_policy_rules_event_type', 'policy_rules', ['event_type'], unique=False)
+    op.create_index('ix_policy_rules_id', 'policy_rules', ['id'], unique=False)
+    op.create_index('ix_policy_rules_name', 'policy_rules', ['name'], unique=False)
+    op.create_index('ix_policy_rules_school_id', 'policy_rules', ['school_id'], unique=False)
+    op.create_index('ix_policy_rules_source', 'policy_rules', ['source'], unique=False)
+
+    op.create_table('school_api_keys',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('label', sa.String(length=100), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_school_api_keys_id', 'school_api_keys', ['id'], unique=False)
+    op.create_index('ix_school_api_keys_key', 'school_api_keys', ['key'], unique=True)
+    op.create_index('ix_school_api_keys_school_id', 'school_api_keys', ['school_id'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=True),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('is_admin', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_school_id', 'users', ['school_id'], unique=False)
+
+    op.create_table('alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=True),
+    sa.Column('alert_type', sa.String(length=50), nullable=False),
+    sa.Column('severity', sa.String(length=20), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('acknowledged', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_alerts_alert_type', 'alerts', ['alert_type'], unique=False)
+    op.create_index('ix_alerts_device_id', 'alerts', ['device_id'], unique=False)
+    op.create_index('ix_alerts_id', 'alerts', ['id'], unique=False)
+    op.create_index('ix_alerts_school_id', 'alerts', ['school_id'], unique=False)
+    op.create_index('ix_alerts_severity', 'alerts', ['severity'], unique=False)
+
+    op.create_table('device_network_identities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('mac_address', sa.String(length=32), nullable=True),
+    sa.Column('hostname', sa.String(length=255), nullable=True),
+    sa.Column('last_seen', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_device_network_identities_device_id', 'device_network_identities', ['device_id'], unique=False)
+    op.create_index('ix_device_network_identities_id', 'device_network_identities', ['id'], unique=False)
+    op.create_index('ix_device_network_identities_source', 'device_network_identities', ['source'], unique=False)
+
+    op.create_table('events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=True),
+    sa.Column('device_id', sa.Integer(), nullable=True),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('event_type', sa.String(length=100), nullable=False),
+    sa.Column('severity', sa.String(length=20), nullable=True),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_events_device_id', 'events', ['device_id'], unique=False)
+    op.create_index('ix_events_event_type', 'events', ['event_type'], unique=False)
+    op.create_index('ix_events_id', 'events', ['id'], unique=False)
+    op.create_index('ix_events_school_id', 'events', ['school_id'], unique=False)
+    op.create_index('ix_events_source', 'events', ['source'], unique=False)
+
+    op.create_table('external_device_ids',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('external_id', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_external_device_ids_device_id', 'external_device_ids', ['device_id'], unique=False)
+    op.create_index('ix_external_device_ids_external_id', 'external_device_ids', ['external_id'], unique=False)
+    op.create_index('ix_external_device_ids_id', 'external_device_ids', ['id'], unique=False)
+    op.create_index('ix_external_device_ids_source', 'external_device_ids', ['source'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('external_device_ids')
+    op.drop_table('events')
+    op.drop_table('device_network_identities')
+    op.drop_table('alerts')
+    op.drop_table('users')
+    op.drop_table('school_api_keys')
+    op.drop_table('policy_rules')
+    op.drop_table('devices')
+    op.drop_table('schools')
@@ -0,0 +1,85 @@
+"""hot query indexes
+
+Composite and partial indexes for the lookups made on every ingest request
+and every alert list, replacing single-column indexes they make redundant.
+School API key validation is already served by the unique index on key.
+
+ix_devices_school_serial and ix_external_device_ids_source_external_id are
+UNIQUE: resolve duplicate (school_id, serial_number) devices and duplicate
+(source, external_id) mappings before upgrading.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # devices: correlation by (school, serial) and (school, asset tag)
+    op.create_index('ix_devices_school_serial', 'devices', ['school_id', 'serial_number'], unique=True)
+    op.create_index('ix_devices_school_asset_tag', 'devices', ['school_id', 'asset_tag'], unique=False)
+    op.drop_index('ix_devices_school_id', table_name='devices')
+    op.drop_index('ix_devices_serial_number', table_name='devices')
+    op.drop_index('ix_devices_asset_tag', table_name='devices')
+
+    # device_network_identities: MAC / IP fallbacks (previously unindexed)
+    op.create_index(
+        'ix_device_network_identities_mac_address',
+        'device_network_identities',
+        ['mac_address'],
+        unique=False,
+        sqlite_where=sa.text('mac_address IS NOT NULL'),
+        postgresql_where=sa.text('mac_address IS NOT NULL'),
+    )
+    op.create_index(
+        'ix_device_network_identities_ip_address',
+        'device_network_identities',
+        ['ip_address'],
+        unique=False,
+        sqlite_where=sa.text('ip_address IS NOT NULL'),
+        postgresql_where=sa.text('ip_address IS NOT NULL'),
+    )
+
+    # alerts: newest-first listing per school
+    op.create_index('ix_alerts_school_created_at', 'alerts', ['school_id', 'created_at'], unique=False)
+    op.drop_index('ix_alerts_school_id', table_name='alerts')
+
+    # external_device_ids: one mapping per external identity
+    op.create_index(
+        'ix_external_device_ids_source_external_id',
+        'external_device_ids',
+        ['source', 'external_id'],
+        unique=True,
+    )
+    op.drop_index('ix_external_device_ids_source', table_name='external_device_ids')
+    op.drop_index('ix_external_device_ids_external_id', table_name='external_device_ids')
+
+
+def downgrade() -> None:
+    op.create_index('ix_external_device_ids_external_id', 'external_device_ids', ['external_id'], unique=False)
+    op.create_index('ix_external_device_ids_source', 'external_device_ids', ['source'], unique=False)
+    op.drop_index('ix_external_device_ids_source_external_id', table_name='external_device_ids')
+
+    op.create_index('ix_alerts_school_id', 'alerts', ['school_id'], unique=False)
+    op.drop_index('ix_alerts_school_created_at', table_name='alerts')
+
+    op.drop_index('ix_device_network_identities_ip_address', table_name='device_network_identities')
+    op.drop_index('ix_device_network_identities_mac_address', table_name='device_network_identities')
+
+    op.create_index('ix_devices_asset_tag', 'devices', ['asset_tag'], unique=False)
+    op.create_index('ix_devices_serial_number', 'devices', ['serial_number'], unique=False)
+    op.create_index('ix_devices_school_id', 'devices', ['school_id'], unique=False)
+    op.drop_index('ix_devices_school_asset_tag', table_name='devices')
+    op.drop_index('ix_devices_school_serial', table_name='devices')
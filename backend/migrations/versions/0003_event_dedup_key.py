@@ -0,0 +1,32 @@
+"""event dedup key
+
+Adds events.dedup_key and a unique (school_id, dedup_key) index so retried
+ingest deliveries cannot create duplicate rows. Existing rows keep NULL.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('dedup_key', sa.String(length=64), nullable=True))
+    op.create_index('ux_events_school_dedup_key', 'events', ['school_id', 'dedup_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_events_school_dedup_key', table_name='events')
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_column('dedup_key')
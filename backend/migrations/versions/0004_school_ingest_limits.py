@@ -0,0 +1,32 @@
+"""school ingest limits
+
+Adds nullable per-school ingest rate limits. NULL means the global
+INGEST_RATE_PER_SEC / INGEST_BURST defaults apply.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('schools', sa.Column('ingest_rate_per_sec', sa.Float(), nullable=True))
+    op.add_column('schools', sa.Column('ingest_burst', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('schools') as batch_op:
+        batch_op.drop_column('ingest_burst')
+        batch_op.drop_column('ingest_rate_per_sec')
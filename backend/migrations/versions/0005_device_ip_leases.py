@@ -0,0 +1,50 @@
+"""device ip leases
+
+Adds the append-only device_ip_leases table used for time-aware IP
+correlation.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'device_ip_leases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('school_id', sa.Integer(), nullable=False),
+        sa.Column('device_id', sa.Integer(), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=False),
+        sa.Column('mac_address', sa.String(length=32), nullable=True),
+        sa.Column('hostname', sa.String(length=255), nullable=True),
+        sa.Column('source', sa.String(length=50), nullable=False),
+        sa.Column('start_at', sa.DateTime(), nullable=False),
+        sa.Column('end_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.id']),
+        sa.ForeignKeyConstraint(['school_id'], ['schools.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_device_ip_leases_school_ip_start',
+        'device_ip_leases',
+        ['school_id', 'ip_address', 'start_at'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_device_ip_leases_school_ip_start', table_name='device_ip_leases')
+    op.drop_table('device_ip_leases')
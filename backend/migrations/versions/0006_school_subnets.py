@@ -0,0 +1,41 @@
+"""school subnets
+
+Adds school_subnets, the CIDR -> school map used to attribute firewall
+logs by source address.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'school_subnets',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('school_id', sa.Integer(), nullable=False),
+        sa.Column('cidr', sa.String(length=49), nullable=False),
+        sa.Column('label', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['school_id'], ['schools.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cidr'),
+    )
+    op.create_index(op.f('ix_school_subnets_school_id'), 'school_subnets', ['school_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_school_subnets_school_id'), table_name='school_subnets')
+    op.drop_table('school_subnets')
@@ -0,0 +1,57 @@
+"""event rollups
+
+Adds event_hourly_rollups and rollup_checkpoints for the incremental
+hourly aggregation of events.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'event_hourly_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('school_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('device_id', sa.Integer(), nullable=False),
+        sa.Column('source', sa.String(length=50), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('domain', sa.String(length=255), nullable=False),
+        sa.Column('action', sa.String(length=20), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['school_id'], ['schools.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ux_event_hourly_rollups_key',
+        'event_hourly_rollups',
+        ['school_id', 'hour', 'device_id', 'source', 'event_type', 'domain', 'action'],
+        unique=True,
+    )
+    op.create_table(
+        'rollup_checkpoints',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_event_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rollup_checkpoints')
+    op.drop_index('ux_event_hourly_rollups_key', table_name='event_hourly_rollups')
+    op.drop_table('event_hourly_rollups')
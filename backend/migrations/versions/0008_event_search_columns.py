@@ -0,0 +1,116 @@
+"""event search columns
+
+Adds events.domain / events.action (copied out of the JSON payload) and the
+composite indexes behind GET /events, then backfills the new columns in
+batches by id. ix_events_school_id is dropped: ix_events_school_created
+starts with school_id.
+
+The backfill reads every existing row once, BATCH rows per query; on a
+large table expect it to take a while. Like the rest of the upgrade it runs
+in the migration's single transaction, so an interrupted run leaves nothing
+behind and is simply run again.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+"""
+import json
+from typing import Sequence, Union
+from urllib.parse import urlsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 10_000
+
+events = sa.table(
+    'events',
+    sa.column('id', sa.Integer),
+    sa.column('payload', sa.Text),
+    sa.column('domain', sa.String),
+    sa.column('action', sa.String),
+)
+
+
+def _extract(payload):
+    # Same normalization as app.event_fields at the time of this revision
+    try:
+        event = json.loads(payload).get('event')
+    except (TypeError, ValueError, AttributeError):
+        return None, None
+    if not isinstance(event, dict):
+        return None, None
+    domain = event.get('domain')
+    if not domain and event.get('url'):
+        try:
+            domain = urlsplit(str(event['url'])).hostname
+        except ValueError:
+            domain = None
+    action = event.get('action')
+    domain = (str(domain).strip().lower()[:255] or None) if domain else None
+    action = (str(action).strip().lower()[:20] or None) if action else None
+    return domain, action
+
+
+def _backfill() -> None:
+    conn = op.get_bind()
+    update = (
+        events.update()
+        .where(events.c.id == sa.bindparam('b_id'))
+        .values(domain=sa.bindparam('b_domain'), action=sa.bindparam('b_action'))
+    )
+    last = 0
+    while True:
+        rows = conn.execute(
+            sa.select(events.c.id, events.c.payload)
+            .where(events.c.id > last, events.c.payload.isnot(None))
+            .order_by(events.c.id)
+            .limit(BATCH)
+        ).all()
+        if not rows:
+            return
+        changes = []
+        for event_id, payload in rows:
+            domain, action = _extract(payload)
+            if domain or action:
+                changes.append({'b_id': event_id, 'b_domain': domain, 'b_action': action})
+        if changes:
+            conn.execute(update, changes)
+        last = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('domain', sa.String(length=255), nullable=True))
+    op.add_column('events', sa.Column('action', sa.String(length=20), nullable=True))
+    _backfill()
+
+    op.create_index('ix_events_school_created', 'events', ['school_id', 'created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_events_school_device_created', 'events', ['school_id', 'device_id', 'created_at', 'id'], unique=False
+    )
+    op.create_index(
+        'ix_events_school_domain_created', 'events', ['school_id', 'domain', 'created_at', 'id'], unique=False
+    )
+    op.create_index(
+        'ix_events_school_type_created', 'events', ['school_id', 'event_type', 'created_at', 'id'], unique=False
+    )
+    op.drop_index('ix_events_school_id', table_name='events')
+
+
+def downgrade() -> None:
+    op.create_index('ix_events_school_id', 'events', ['school_id'], unique=False)
+    op.drop_index('ix_events_school_type_created', table_name='events')
+    op.drop_index('ix_events_school_domain_created', table_name='events')
+    op.drop_index('ix_events_school_device_created', table_name='events')
+    op.drop_index('ix_events_school_created', table_name='events')
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_column('action')
+        batch_op.drop_column('domain')
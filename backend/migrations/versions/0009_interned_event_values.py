@@ -0,0 +1,240 @@
+"""interned event values
+
+Replaces events.source / events.domain text with ids into the new
+event_sources / event_domains dictionaries, adds events.category_id
+(event_categories), and rewrites stored payloads as compact JSON without
+the values those columns now hold (see app.event_fields).
+
+Existing rows are converted in id batches in Python; on a large table
+expect this to take a while. ix_events_source goes away with the column;
+ix_events_school_domain_created is rebuilt on domain_id.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 10_000
+
+events = sa.table(
+    'events',
+    sa.column('id', sa.Integer),
+    sa.column('source', sa.String),
+    sa.column('event_type', sa.String),
+    sa.column('domain', sa.String),
+    sa.column('payload', sa.Text),
+    sa.column('source_id', sa.Integer),
+    sa.column('domain_id', sa.Integer),
+    sa.column('category_id', sa.Integer),
+)
+
+
+def _lookup_table(name: str) -> sa.Table:
+    return sa.table(name, sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+class _Interner:
+    def __init__(self, conn, table_name: str):
+        self.conn = conn
+        self.table = _lookup_table(table_name)
+        self.ids = {name: id_ for id_, name in conn.execute(sa.select(self.table.c.id, self.table.c.name))}
+
+    def __call__(self, name):
+        if name is None:
+            return None
+        id_ = self.ids.get(name)
+        if id_ is None:
+            self.conn.execute(self.table.insert().values(name=name))
+            id_ = self.ids[name] = self.conn.scalar(sa.select(self.table.c.id).where(self.table.c.name == name))
+        return id_
+
+
+def _pack(payload, source, event_type, domain):
+    # Same packing as app.event_fields at the time of this revision
+    try:
+        doc = json.loads(payload)
+    except (TypeError, ValueError):
+        return payload, None
+    if not isinstance(doc, dict):
+        return payload, None
+    if doc.get('source') == source:
+        del doc['source']
+    category = None
+    event = doc.get('event')
+    if isinstance(event, dict):
+        raw = event.get('category')
+        if isinstance(raw, str) and raw:
+            category = raw[:100]
+        for key, value in (('type', event_type), ('domain', domain), ('category', category)):
+            if key in event and event[key] == value and value is not None:
+                del event[key]
+    return json.dumps(doc, separators=(',', ':')), category
+
+
+def _unpack(payload, source, event_type, domain, category):
+    try:
+        doc = json.loads(payload)
+    except (TypeError, ValueError):
+        return payload
+    if not isinstance(doc, dict) or not isinstance(doc.get('event'), dict):
+        return payload
+    doc.setdefault('source', source)
+    doc['event'].setdefault('type', event_type)
+    doc['event'].setdefault('domain', domain)
+    doc['event'].setdefault('category', category)
+    return json.dumps(doc)
+
+
+def _convert() -> None:
+    conn = op.get_bind()
+    sources = _Interner(conn, 'event_sources')
+    domains = _Interner(conn, 'event_domains')
+    categories = _Interner(conn, 'event_categories')
+    update = (
+        events.update()
+        .where(events.c.id == sa.bindparam('b_id'))
+        .values(
+            source_id=sa.bindparam('b_source_id'),
+            domain_id=sa.bindparam('b_domain_id'),
+            category_id=sa.bindparam('b_category_id'),
+            payload=sa.bindparam('b_payload'),
+        )
+    )
+    last = 0
+    while True:
+        rows = conn.execute(
+            sa.select(events.c.id, events.c.source, events.c.event_type, events.c.domain, events.c.payload)
+            .where(events.c.id > last)
+            .order_by(events.c.id)
+            .limit(BATCH)
+        ).all()
+        if not rows:
+            return
+        changes = []
+        for event_id, source, event_type, domain, payload in rows:
+            packed, category = _pack(payload, source, event_type, domain) if payload else (payload, None)
+            changes.append({
+                'b_id': event_id,
+                'b_source_id': sources(source),
+                'b_domain_id': domains(domain),
+                'b_category_id': categories(category),
+                'b_payload': packed,
+            })
+        conn.execute(update, changes)
+        last = rows[-1][0]
+
+
+def _restore() -> None:
+    conn = op.get_bind()
+    names = {
+        table: {id_: name for id_, name in conn.execute(sa.select(t.c.id, t.c.name))}
+        for table, t in ((n, _lookup_table(n)) for n in ('event_sources', 'event_domains', 'event_categories'))
+    }
+    update = (
+        events.update()
+        .where(events.c.id == sa.bindparam('b_id'))
+        .values(source=sa.bindparam('b_source'), domain=sa.bindparam('b_domain'), payload=sa.bindparam('b_payload'))
+    )
+    last = 0
+    while True:
+        rows = conn.execute(
+            sa.select(
+                events.c.id, events.c.source_id, events.c.event_type, events.c.domain_id,
+                events.c.category_id, events.c.payload,
+            )
+            .where(events.c.id > last)
+            .order_by(events.c.id)
+            .limit(BATCH)
+        ).all()
+        if not rows:
+            return
+        changes = []
+        for event_id, source_id, event_type, domain_id, category_id, payload in rows:
+            source = names['event_sources'][source_id]
+            domain = names['event_domains'].get(domain_id)
+            category = names['event_categories'].get(category_id)
+            changes.append({
+                'b_id': event_id,
+                'b_source': source,
+                'b_domain': domain,
+                'b_payload': _unpack(payload, source, event_type, domain, category) if payload else payload,
+            })
+        conn.execute(update, changes)
+        last = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.create_table(
+        'event_sources',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_table(
+        'event_domains',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_table(
+        'event_categories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.add_column('events', sa.Column('source_id', sa.Integer(), nullable=True))
+    op.add_column('events', sa.Column('domain_id', sa.Integer(), nullable=True))
+    op.add_column('events', sa.Column('category_id', sa.Integer(), nullable=True))
+    _convert()
+
+    op.drop_index('ix_events_school_domain_created', table_name='events')
+    op.drop_index('ix_events_source', table_name='events')
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_column('domain')
+        batch_op.drop_column('source')
+        batch_op.alter_column('source_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_events_source_id', 'event_sources', ['source_id'], ['id'])
+        batch_op.create_foreign_key('fk_events_domain_id', 'event_domains', ['domain_id'], ['id'])
+        batch_op.create_foreign_key('fk_events_category_id', 'event_categories', ['category_id'], ['id'])
+    op.create_index(
+        'ix_events_school_domain_created', 'events', ['school_id', 'domain_id', 'created_at', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_school_domain_created', table_name='events')
+    op.add_column('events', sa.Column('source', sa.String(length=50), nullable=True))
+    op.add_column('events', sa.Column('domain', sa.String(length=255), nullable=True))
+    _restore()
+
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_constraint('fk_events_category_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_events_domain_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_events_source_id', type_='foreignkey')
+        batch_op.drop_column('category_id')
+        batch_op.drop_column('domain_id')
+        batch_op.drop_column('source_id')
+        batch_op.alter_column('source', existing_type=sa.String(length=50), nullable=False)
+    op.create_index('ix_events_source', 'events', ['source'], unique=False)
+    op.create_index(
+        'ix_events_school_domain_created', 'events', ['school_id', 'domain', 'created_at', 'id'], unique=False
+    )
+    op.drop_table('event_categories')
+    op.drop_table('event_domains')
+    op.drop_table('event_sources')
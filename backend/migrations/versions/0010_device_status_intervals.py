@@ -0,0 +1,59 @@
+"""device status intervals
+
+Adds device_status_intervals, the append-only history of device status
+changes, and starts each existing device's history with its current
+status from its last_seen (or created_at).
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'device_status_intervals',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('school_id', sa.Integer(), nullable=False),
+        sa.Column('device_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('start_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.id']),
+        sa.ForeignKeyConstraint(['school_id'], ['schools.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_device_status_intervals_device_start',
+        'device_status_intervals',
+        ['device_id', 'start_at'],
+    )
+    op.create_index(
+        'ix_device_status_intervals_school_start',
+        'device_status_intervals',
+        ['school_id', 'start_at'],
+    )
+    op.execute(
+        "INSERT INTO device_status_intervals (school_id, device_id, status, source, start_at, created_at) "
+        "SELECT school_id, id, status, 'migration', COALESCE(last_seen, created_at), CURRENT_TIMESTAMP "
+        "FROM devices WHERE status IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_device_status_intervals_school_start', table_name='device_status_intervals')
+    op.drop_index('ix_device_status_intervals_device_start', table_name='device_status_intervals')
+    op.drop_table('device_status_intervals')
@@ -0,0 +1,30 @@
+"""alert device timeline index
+
+Replaces ix_alerts_device_id with (device_id, created_at) so a device's
+alerts can be read newest first by range scan for GET /devices/{id}/timeline.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_alerts_device_created', 'alerts', ['device_id', 'created_at'], unique=False)
+    op.drop_index('ix_alerts_device_id', table_name='alerts')
+
+
+def downgrade() -> None:
+    op.create_index('ix_alerts_device_id', 'alerts', ['device_id'], unique=False)
+    op.drop_index('ix_alerts_device_created', table_name='alerts')
@@ -0,0 +1,28 @@
+"""device ip lease start index
+
+Adds ix_device_ip_leases_start_at so the maintenance pass can find leases
+older than DHCP_LEASE_RETENTION_DAYS without scanning the table.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_device_ip_leases_start_at', 'device_ip_leases', ['start_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_device_ip_leases_start_at', table_name='device_ip_leases')
@@ -0,0 +1,102 @@
+"""
+Shared fixtures. Tests run against a throwaway SQLite file; DATABASE_URL is
+set before anything imports app.config.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="k12-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+
+from datetime import datetime  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.auth import create_access_token  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.event_fields import event_values  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Event, School, User  # noqa: E402
+
+# Interned ids are cached per process and never reused, so those tables stay
+_KEEP = {"event_sources", "event_domains", "event_categories"}
+
+
+@pytest.fixture(autouse=True)
+def _clean_tables():
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            if table.name not in _KEEP:
+                conn.execute(table.delete())
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    # Not used as a context manager: the lifespan's background workers stay off
+    return TestClient(app)
+
+
+@pytest.fixture
+def school(db):
+    school = School(name="Test School")
+    db.add(school)
+    db.commit()
+    return school
+
+
+@pytest.fixture
+def admin(db, school):
+    user = User(email="admin@test.local", password_hash="x", is_admin=True, school_id=school.id)
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def auth_headers(admin):
+    return {"Authorization": f"Bearer {create_access_token(admin.id)}"}
+
+
+@pytest.fixture
+def add_events(db):
+    """
+    Stores events the way ingest does. Each item is (created_at, device_id,
+    payload event dict); returns the new ids in order.
+    """
+
+    def add(school_id: int, items: list[tuple[datetime, int | None, dict]], source: str = "webfilter") -> list[int]:
+        payloads = [{"event": dict(event), "source": source} for _, _, event in items]
+        values = event_values(db, [(source, "web_access", p) for p in payloads])
+        ids = []
+        for (created_at, device_id, event), v in zip(items, values):
+            ids.append(
+                db.execute(
+                    insert(Event)
+                    .values(
+                        school_id=school_id,
+                        device_id=device_id,
+                        event_type="web_access",
+                        severity="info",
+                        message=f"web_access {event.get('action')}",
+                        created_at=created_at,
+                        **v,
+                    )
+                    .returning(Event.id)
+                ).scalar_one()
+            )
+        db.commit()
+        return ids
+
+    return add
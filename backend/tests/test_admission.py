@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.admission import TokenBucket, admit, api_keys
+from app.config import settings
+from app.models import SchoolApiKey
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    api_keys.invalidate()
+    yield
+    api_keys.invalidate()
+
+
+def _add_key(db, school, key="k1"):
+    row = SchoolApiKey(school_id=school.id, key=key)
+    db.add(row)
+    db.commit()
+    return row
+
+
+def test_new_key_is_accepted_after_a_miss(db, school):
+    assert api_keys.get(db, school.id, "k1") is None
+    _add_key(db, school)
+    assert api_keys.get(db, school.id, "k1") is not None
+
+
+def test_revoked_key_is_rejected_at_once(db, school):
+    row = _add_key(db, school)
+    assert api_keys.get(db, school.id, "k1") is not None
+    row.is_active = False
+    db.commit()
+    assert api_keys.get(db, school.id, "k1") is None
+
+
+def test_school_limits_fall_back_only_when_unset(db, school):
+    _add_key(db, school)
+    grant = api_keys.get(db, school.id, "k1")
+    assert (grant.rate_per_sec, grant.burst) == (settings.ingest_rate_per_sec, settings.ingest_burst)
+
+    school.ingest_rate_per_sec = 0.0
+    school.ingest_burst = 0
+    db.commit()
+    grant = api_keys.get(db, school.id, "k1")
+    assert (grant.rate_per_sec, grant.burst) == (0.0, 0)
+
+
+def test_zero_rate_school_is_rejected(db, school):
+    _add_key(db, school)
+    school.ingest_rate_per_sec = 0.0
+    db.commit()
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(admit(db, school.id, "k1"))
+    assert e.value.status_code == 429
+
+
+def test_unknown_key_is_401(db, school):
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(admit(db, school.id, "nope"))
+    assert e.value.status_code == 401
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(burst=2, now=0.0)
+    assert bucket.take(1.0, 2, 0.0) == 0.0
+    assert bucket.take(1.0, 2, 0.0) == 0.0
+    assert bucket.take(1.0, 2, 0.0) == pytest.approx(1.0)
+    assert bucket.take(1.0, 2, 1.0) == 0.0
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.alert_stream import SUBSCRIBER_QUEUE_SIZE, AlertBroker, format_sse
+from app.auth import get_stream_user
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Alert
+from app.routers.alerts import stream_alerts
+
+
+def _alert(db, school, message="m") -> Alert:
+    alert = Alert(school_id=school.id, alert_type="security", severity="high", message=message)
+    db.add(alert)
+    db.commit()
+    return alert
+
+
+def test_format_sse():
+    assert format_sse("alert", {"id": 3}, 3) == 'id: 3\nevent: alert\ndata: {"id":3}\n\n'
+    assert format_sse("ack", {"id": 3}) == 'event: ack\ndata: {"id":3}\n\n'
+
+
+def test_broker_delivers_per_school_from_loop_and_threads(db, school):
+    alert = _alert(db, school)
+
+    async def scenario():
+        broker = AlertBroker()
+        await broker.start()
+        mine, other = broker.subscribe(school.id), broker.subscribe(school.id + 1)
+        broker.publish(school.id, "alert", alert)
+        thread = threading.Thread(target=broker.publish, args=(school.id, "ack", alert))
+        thread.start()
+        thread.join()
+        first = await asyncio.wait_for(mine.queue.get(), 1)
+        second = await asyncio.wait_for(mine.queue.get(), 1)
+        broker.unsubscribe(mine)
+        broker.unsubscribe(other)
+        return first, second, other.queue.qsize(), broker.subscriber_count()
+
+    first, second, other_size, remaining = asyncio.run(scenario())
+    assert (first[0], first[1]["id"]) == ("alert", alert.id)
+    assert (second[0], second[1]["id"]) == ("ack", alert.id)
+    assert (other_size, remaining) == (0, 0)
+
+
+def test_slow_subscriber_overflows_instead_of_blocking(db, school):
+    alert = _alert(db, school)
+
+    async def scenario():
+        broker = AlertBroker()
+        await broker.start()
+        sub = broker.subscribe(school.id)
+        for _ in range(SUBSCRIBER_QUEUE_SIZE + 1):
+            broker.publish(school.id, "alert", alert)
+        return sub
+
+    sub = asyncio.run(scenario())
+    assert sub.overflowed and sub.queue.full()
+
+
+class _DisconnectedRequest:
+    async def is_disconnected(self) -> bool:
+        return True
+
+
+@pytest.fixture
+def fast_heartbeat(monkeypatch):
+    monkeypatch.setattr(settings, "alert_stream_heartbeat_seconds", 0.01)
+
+
+def test_stream_replays_alerts_after_last_event_id(db, school, admin, fast_heartbeat):
+    seen = _alert(db, school, "seen")
+    missed = [_alert(db, school, f"missed {i}") for i in range(2)]
+
+    async def scenario():
+        resp = await stream_alerts(
+            request=_DisconnectedRequest(), last_event_id=seen.id, since_id=None, db=SessionLocal(), user=admin
+        )
+        return [chunk async for chunk in resp.body_iterator]
+
+    chunks = asyncio.run(scenario())
+    assert chunks[0] == "retry: 3000\n\n"
+    assert [c.split("\n", 1)[0] for c in chunks[1:]] == [f"id: {a.id}" for a in missed]
+
+
+def test_stream_replays_a_backlog_longer_than_one_page(db, school, admin, fast_heartbeat, monkeypatch):
+    monkeypatch.setattr(settings, "alert_stream_replay_limit", 2)
+    seen = _alert(db, school, "seen")
+    missed = [_alert(db, school, f"missed {i}") for i in range(5)]
+
+    async def scenario():
+        resp = await stream_alerts(
+            request=_DisconnectedRequest(), last_event_id=seen.id, since_id=None, db=SessionLocal(), user=admin
+        )
+        return [chunk async for chunk in resp.body_iterator]
+
+    chunks = asyncio.run(scenario())
+    assert [c.split("\n", 1)[0] for c in chunks[1:]] == [f"id: {a.id}" for a in missed]
+
+
+def test_stream_query_accepts_only_stream_tokens(client, admin, auth_headers):
+    full_token = auth_headers["Authorization"].split()[1]
+    assert client.get("/alerts/stream", params={"stream_token": full_token}).status_code == 401
+
+    issued = client.post("/alerts/stream-token", headers=auth_headers).json()
+    assert issued["expires_in"] == settings.alert_stream_token_seconds
+    user = get_stream_user(token=None, stream_token=issued["stream_token"], db=SessionLocal())
+    assert user.id == admin.id
+    # Not usable as a bearer token anywhere else
+    assert client.get("/alerts", headers={"Authorization": f"Bearer {issued['stream_token']}"}).status_code == 401
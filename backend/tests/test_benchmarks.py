@@ -0,0 +1,44 @@
+import json
+
+from benchmarks import compare
+from benchmarks.common import percentile, summarize_latencies
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_latencies():
+    summary = summarize_latencies([0.003, 0.001, 0.002], wall_seconds=0.5)
+    assert summary["count"] == 3
+    assert summary["p50_ms"] == 2.0
+    assert summary["max_ms"] == 3.0
+    assert summary["throughput_per_sec"] == 6.0
+
+
+def test_flatten_keys_lists_by_concurrency():
+    flat = compare._flatten({"ingest": {"webfilter": [{"concurrency": 8, "p99_ms": 5}], "ok": True}})
+    assert flat == {"ingest.webfilter.c8.concurrency": 8.0, "ingest.webfilter.c8.p99_ms": 5.0}
+
+
+def _report(tmp_path, name, results):
+    path = tmp_path / name
+    path.write_text(json.dumps({"meta": {}, "results": results}))
+    return str(path)
+
+
+def test_compare_exit_status(tmp_path, capsys):
+    old = _report(tmp_path, "old.json", {"s": {"p99_ms": 10.0, "throughput_per_sec": 100.0, "rules": 10}})
+    same = _report(tmp_path, "same.json", {"s": {"p99_ms": 10.5, "throughput_per_sec": 95.0, "rules": 50}})
+    slower = _report(tmp_path, "slower.json", {"s": {"p99_ms": 12.0, "throughput_per_sec": 100.0}})
+    fewer = _report(tmp_path, "fewer.json", {"s": {"p99_ms": 10.0, "throughput_per_sec": 80.0}})
+
+    assert compare.main([old, same]) == 0
+    assert compare.main([old, slower]) == 1
+    assert compare.main([old, fewer]) == 1
+    assert compare.main([old, slower, "--threshold", "0.25"]) == 0
+    assert "REGRESSION" in capsys.readouterr().out
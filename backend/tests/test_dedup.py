@@ -0,0 +1,109 @@
+import sys
+import threading
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.admission import api_keys
+from app.dedup import SeenSet, event_dedup_key
+from app.models import Event, SchoolApiKey
+from app.routers import ingest as ingest_router
+
+
+def test_content_key_needs_timestamp():
+    assert event_dedup_key(1, "webfilter", None, ("s1",), "example.com", "allowed", None) is None
+    a = event_dedup_key(1, "webfilter", None, ("s1",), "example.com", "allowed", "2026-01-01T00:00:00Z")
+    b = event_dedup_key(1, "webfilter", None, ("s1",), "example.com", "allowed", "2026-01-01T00:00:01Z")
+    assert len(a) == 64 and a != b
+
+
+def test_client_key_ignores_content():
+    a = event_dedup_key(1, "webfilter", "k1", ("s1",), "a.com", "allowed", None)
+    b = event_dedup_key(1, "webfilter", "k1", ("s2",), "b.com", "blocked", "2026-01-01T00:00:00Z")
+    assert a == b
+    assert a != event_dedup_key(2, "webfilter", "k1", ("s1",), "a.com", "allowed", None)
+
+
+def test_seen_set_add_and_seen():
+    seen = SeenSet(window_seconds=60, max_keys=600)
+    seen.add("a" * 64)
+    assert seen.seen("a" * 64)
+    assert not seen.seen("b" * 64)
+
+
+def test_seen_set_drops_oldest_bucket_when_full():
+    seen = SeenSet(window_seconds=60, max_keys=6, n_buckets=3)
+    keys = [f"{i:02d}" + "0" * 62 for i in range(20)]
+    for k in keys:
+        seen.add(k)
+    assert len(seen) <= 6
+    assert seen.seen(keys[-1])
+    assert not seen.seen(keys[0])
+
+
+def test_seen_set_concurrent_add_and_seen():
+    # Small buckets so add() rotates the deque constantly while others read
+    seen = SeenSet(window_seconds=60, max_keys=12, n_buckets=6)
+    errors = []
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            seen.add(f"{i:032x}" * 2)
+            i += 1
+
+    def reader():
+        try:
+            for _ in range(20_000):
+                seen.seen("f" * 64)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer) for _ in range(2)]
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for t in threads + readers:
+            t.start()
+        for t in readers:
+            t.join()
+        stop.set()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+
+
+@pytest.fixture
+def ingest_key(db, school, monkeypatch):
+    api_keys.invalidate()
+    db.add(SchoolApiKey(school_id=school.id, key="k1"))
+    db.commit()
+    # A fresh seen-set, so retries reach the database as after a restart
+    monkeypatch.setattr(ingest_router, "seen_events", SeenSet(window_seconds=60, max_keys=600))
+    yield {"api_key": "k1", "school_id": school.id, "source": "webfilter", "event": {"domain": "example.com"}}
+    api_keys.invalidate()
+
+
+def test_lost_insert_race_is_a_duplicate(client, db, ingest_key, monkeypatch):
+    body = {**ingest_key, "idempotency_key": "delivery-1"}
+    assert client.post("/ingest/webfilter", json=body).json()["ok"] is True
+    # Another worker stored it: this one's seen-set does not have the key
+    monkeypatch.setattr(ingest_router, "seen_events", SeenSet(window_seconds=60, max_keys=600))
+    assert client.post("/ingest/webfilter", json=body).json() == {"ok": True, "duplicate": True}
+    assert db.scalar(select(func.count()).select_from(Event)) == 1
+
+
+@pytest.mark.parametrize("idempotency_key", ["delivery-2", None])
+def test_other_integrity_errors_are_not_acknowledged(client, db, ingest_key, monkeypatch, idempotency_key):
+    def fail(session):
+        raise IntegrityError("INSERT INTO events", {}, Exception("NOT NULL constraint failed"))
+
+    monkeypatch.setattr(Session, "commit", fail)
+    with pytest.raises(IntegrityError):
+        client.post("/ingest/webfilter", json={**ingest_key, "idempotency_key": idempotency_key})
@@ -0,0 +1,83 @@
+import csv
+import io
+
+import orjson
+from sqlalchemy import select
+
+from app import device_import
+from app.device_import import export_csv, import_devices
+from app.fleet_health import fleet_health
+from app.models import Device
+
+
+def _import(db, school, text: str, fmt: str = "csv", **kwargs) -> dict:
+    return import_devices(db, school.id, io.BytesIO(text.encode()), fmt, **kwargs)
+
+
+def _devices(db, school) -> dict:
+    rows = db.execute(
+        select(Device.serial_number, Device.asset_tag, Device.device_type, Device.assigned_to)
+        .where(Device.school_id == school.id)
+    ).all()
+    return {r.serial_number: tuple(r[1:]) for r in rows}
+
+
+def test_import_creates_then_updates_only_provided_fields(db, school):
+    fleet_health.reconcile(db)
+    report = _import(db, school, "serial_number,asset_tag,assigned_to\nSN1,A1,kim\nSN2,,lee\n", batch_size=1)
+    assert (report["created"], report["updated"], report["failed"]) == (2, 0, 0)
+    assert _devices(db, school) == {"SN1": ("A1", "Chromebook", "kim"), "SN2": ("SN2", "Chromebook", "lee")}
+    assert fleet_health.snapshot(school.id)["devices"] == 2
+
+    report = _import(db, school, '{"serial_number": "SN1", "assigned_to": "max"}\n{"serial_number": "SN3"}\n', "ndjson")
+    assert (report["created"], report["updated"]) == (1, 1)
+    assert _devices(db, school)["SN1"] == ("A1", "Chromebook", "max")
+
+
+def test_import_reports_bad_rows_by_line(db, school):
+    text = "serial_number,device_type\nSN1,\nSN1,Laptop\n,Laptop\nSN2," + "x" * 60 + "\n"
+    report = _import(db, school, text, max_errors=2)
+    assert (report["created"], report["failed"]) == (1, 3)
+    assert [e["line"] for e in report["errors"]] == [3, 4]
+    assert report["errors"][0]["error"].startswith("Duplicate serial_number")
+    assert report["errors_truncated"] is True
+
+
+def test_import_ndjson_rejects_non_objects(db, school):
+    report = _import(db, school, '[1, 2]\nnot json\n{"serial_number": "SN1"}\n', "ndjson")
+    assert report["created"] == 1
+    assert [e["error"] for e in report["errors"]] == ["Expected a JSON object", "Invalid JSON"]
+
+
+def test_export_round_trips_through_import(client, auth_headers, db, school):
+    _import(db, school, "serial_number,asset_tag,device_name\nSN1,A1,Cart 1\nSN2,A2,\n")
+    resp = client.get("/devices/export", params={"format": "csv"}, headers=auth_headers)
+    assert resp.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert [(r["serial_number"], r["device_name"]) for r in rows] == [("SN1", "Cart 1"), ("SN2", "")]
+
+    resp = client.get("/devices/export", params={"format": "ndjson"}, headers=auth_headers)
+    assert [orjson.loads(line)["asset_tag"] for line in resp.content.splitlines()] == ["A1", "A2"]
+
+    resp = client.post("/devices/import", content=resp.content,
+                       headers={**auth_headers, "Content-Type": "application/x-ndjson"})
+    assert resp.json()["updated"] == 2
+
+
+def test_abandoned_export_closes_its_session(db, school, monkeypatch):
+    _import(db, school, "serial_number\n" + "".join(f"SN{i}\n" for i in range(2500)))
+    closed = []
+    session_factory = device_import.SessionLocal
+
+    def tracking_session():
+        session = session_factory()
+        original = session.close
+        session.close = lambda: (closed.append(True), original())
+        return session
+
+    monkeypatch.setattr(device_import, "SessionLocal", tracking_session)
+    stream = export_csv(school.id)
+    next(stream)
+    assert closed == []
+    stream.close()  # what the route's background task does on disconnect
+    assert closed == [True]
@@ -0,0 +1,96 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.device_status import availability_ratio, record_status, status_seconds
+from app.models import Device, DeviceStatusInterval
+
+
+T0 = (datetime.utcnow() - timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+
+@pytest.fixture
+def devices(db, school):
+    items = [Device(school_id=school.id, serial_number=f"SN{i}", status="unknown") for i in range(2)]
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+def _history(db, device_id):
+    return db.execute(
+        select(DeviceStatusInterval.status, DeviceStatusInterval.start_at)
+        .where(DeviceStatusInterval.device_id == device_id)
+        .order_by(DeviceStatusInterval.id)
+    ).all()
+
+
+def test_record_status_keeps_history_ordered(db, school, devices):
+    dev = devices[0].id
+    written = record_status(db, [
+        (dev, school.id, "online", T0),
+        (dev, school.id, "online", T0 + timedelta(minutes=5)),  # no change
+        (dev, school.id, "offline", T0 + timedelta(hours=1)),
+    ], "heartbeat")
+    assert written == 2
+    # A later call with nothing new, and a late report moved up to the latest interval
+    assert record_status(db, [(dev, school.id, "offline", T0 + timedelta(hours=2))], "sweep") == 0
+    assert record_status(db, [(dev, school.id, "online", T0 + timedelta(minutes=30))], "sync") == 1
+    db.commit()
+    assert _history(db, dev) == [
+        ("online", T0),
+        ("offline", T0 + timedelta(hours=1)),
+        ("online", T0 + timedelta(hours=1)),
+    ]
+
+
+def test_future_start_is_clamped_to_now(db, school, devices):
+    record_status(db, [(devices[0].id, school.id, "online", datetime.utcnow() + timedelta(days=1))], "sync")
+    db.commit()
+    assert _history(db, devices[0].id)[0][1] <= datetime.utcnow()
+
+
+def test_status_seconds_over_a_range(db, school, devices):
+    a, b = devices[0].id, devices[1].id
+    record_status(db, [
+        (a, school.id, "online", T0 - timedelta(hours=5)),  # in effect at since
+        (a, school.id, "offline", T0 + timedelta(hours=1)),
+        (a, school.id, "online", T0 + timedelta(hours=3)),
+        (b, school.id, "offline", T0 + timedelta(hours=2)),  # nothing known before
+    ], "heartbeat")
+    db.commit()
+
+    totals = status_seconds(db, school.id, T0, T0 + timedelta(hours=4))
+    assert totals[a] == Counter({"online": 2 * 3600, "offline": 2 * 3600})
+    assert totals[b] == Counter({"offline": 2 * 3600})
+    assert set(status_seconds(db, school.id, T0, T0 + timedelta(hours=4), device_id=b)) == {b}
+    # Nothing is counted past now
+    future = datetime.utcnow() + timedelta(hours=1)
+    assert status_seconds(db, school.id, future, future + timedelta(days=1)) == {}
+
+
+def test_availability_ratio():
+    assert availability_ratio(Counter({"online": 3, "offline": 1, "unknown": 10})) == 0.75
+    assert availability_ratio(Counter({"unknown": 10})) is None
+
+
+def test_availability_report(client, auth_headers, db, school, devices):
+    a, b = devices[0].id, devices[1].id
+    record_status(db, [
+        (a, school.id, "online", T0),
+        (b, school.id, "online", T0),
+        (b, school.id, "offline", T0 + timedelta(hours=3)),
+    ], "heartbeat")
+    db.commit()
+    params = {"since": T0.isoformat(), "until": (T0 + timedelta(hours=4)).isoformat()}
+
+    body = client.get("/reports/availability", params=params, headers=auth_headers).json()
+    assert body["school"] == {"seconds": {"online": 7 * 3600, "offline": 3600}, "availability": 0.875}
+    assert [(d["device_id"], d["availability"]) for d in body["devices"]] == [(a, 1.0), (b, 0.75)]
+
+    one = client.get("/reports/availability", params={**params, "device_id": b}, headers=auth_headers).json()
+    assert [d["device_id"] for d in one["devices"]] == [b]
+    bad = client.get("/reports/availability", params={"since": params["until"], "until": params["since"]}, headers=auth_headers)
+    assert bad.status_code == 422
@@ -0,0 +1,46 @@
+from sqlalchemy import func, select
+
+from app.connectors import google_chrome
+from app.models import Device
+
+
+def test_duplicate_serial_is_409(client, auth_headers, school):
+    body = {"school_id": school.id, "asset_tag": "A1", "serial_number": "SN1"}
+    assert client.post("/devices", json=body, headers=auth_headers).status_code == 200
+    resp = client.post("/devices", json={**body, "asset_tag": "A2"}, headers=auth_headers)
+    assert resp.status_code == 409
+    assert resp.json()["detail"] == "Device with this serial already exists"
+
+
+class _FakeDirectory:
+    def __init__(self, items):
+        self.items = items
+
+    def chromeosdevices(self):
+        return self
+
+    def list(self, **kwargs):
+        return self
+
+    def execute(self):
+        return {"chromeosdevices": self.items}
+
+
+def test_sync_uses_a_device_created_since_the_lookup(db, school, monkeypatch):
+    items = [{"serialNumber": "SN1", "deviceId": "g-1", "lastSync": "2026-10-01T08:00:00Z"}]
+    monkeypatch.setattr(google_chrome, "_google_clients", lambda: (_FakeDirectory(items), None))
+    insert_device = google_chrome._insert_device
+
+    def created_elsewhere_first(session, device):
+        # An import commits the same serial between the lookup and the insert
+        other = Device(school_id=school.id, serial_number="SN1", asset_tag="TAG", status="unknown")
+        session.add(other)
+        session.commit()
+        return insert_device(session, device)
+
+    monkeypatch.setattr(google_chrome, "_insert_device", created_elsewhere_first)
+    assert google_chrome.sync_chromebooks_for_customer(db, school.id) == {"synced": 1}
+
+    devices = db.scalars(select(Device).where(Device.school_id == school.id)).all()
+    assert [(d.serial_number, d.status) for d in devices] == [("SN1", "online")]
+    assert db.scalar(select(func.count()).select_from(Device)) == 1
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.event_archive import ArchiveReader, archive_events
+from app.models import Device, Event
+from app.rollups import prune_events, rollup
+
+
+def _count(db) -> int:
+    return db.scalar(select(func.count()).select_from(Event))
+
+
+def test_archive_and_read_back(db, school, add_events, tmp_path):
+    device = Device(school_id=school.id, serial_number="SN1")
+    db.add(device)
+    db.commit()
+    old = datetime.utcnow() - timedelta(days=40)
+    ids = add_events(school.id, [
+        (old, device.id, {"domain": "a.example.com", "action": "allowed", "category": "news"}),
+        (old + timedelta(minutes=1), None, {"domain": "b.example.com", "action": "blocked"}),
+        (old + timedelta(minutes=2), device.id, {"domain": "c.example.com", "action": "allowed"}),
+        (datetime.utcnow(), device.id, {"domain": "new.example.com", "action": "allowed"}),
+    ])
+
+    moved = archive_events(db, up_to_id=max(ids), archive_dir=str(tmp_path), after_days=30, block_rows=2)
+    assert moved == 3
+    assert _count(db) == 1
+
+    reader = ArchiveReader(str(tmp_path))
+    since, until = old - timedelta(hours=1), old + timedelta(hours=1)
+    events, segments = reader.query(school.id, since, until)
+    assert segments == 1
+    assert [e["id"] for e in events] == ids[:3]
+    assert events[0]["domain"] == "a.example.com"
+    assert events[0]["payload"]["event"]["category"] == "news"
+
+    events, _ = reader.query(school.id, since, until, device_id=device.id)
+    assert [e["id"] for e in events] == [ids[0], ids[2]]
+
+
+def test_archive_respects_up_to_id(db, school, add_events, tmp_path):
+    old = datetime.utcnow() - timedelta(days=40)
+    ids = add_events(school.id, [(old, None, {"domain": "a.com"}), (old, None, {"domain": "b.com"})])
+    assert archive_events(db, up_to_id=ids[0], archive_dir=str(tmp_path), after_days=30) == 1
+
+
+def test_retention_never_deletes_unarchived_events(db, school, add_events, tmp_path, monkeypatch):
+    add_events(school.id, [(datetime.utcnow() - timedelta(days=10), None, {"domain": "a.com"})])
+    rollup(db, lag_seconds=0)
+
+    monkeypatch.setattr(settings, "event_archive_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "event_archive_after_days", 30)
+    assert prune_events(db, retention_days=5) == 0
+    assert _count(db) == 1
+
+    monkeypatch.setattr(settings, "event_archive_dir", "")
+    assert prune_events(db, retention_days=5) == 1
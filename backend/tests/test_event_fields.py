@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import select
+
+from app.event_fields import (
+    event_values,
+    lookup_names,
+    normalize_action,
+    normalize_domain,
+    pack_payload,
+    unpack_payload,
+)
+from app.interning import InternTable, sources
+from app.models import EventSource
+
+
+def test_normalize():
+    assert normalize_domain(None, "https://Docs.Google.com/x?y") == "docs.google.com"
+    assert normalize_domain(" Example.COM ") == "example.com"
+    assert normalize_domain("", "not a url") is None
+    assert normalize_action(" Blocked ") == "blocked"
+    assert normalize_action("") is None
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"source": "webfilter", "event": {"type": "web_access", "domain": "a.com", "category": "news", "x": 1}},
+        {"source": "webfilter", "event": {"type": "other", "domain": "b.com", "category": None}},
+        {"source": "webfilter", "event": {"type": "web_access", "url": "https://c.com/", "domain": None}},
+        {"source": "webfilter", "event": {"type": "web_access", "domain": "C.com", "category": ""}},
+        {"source": "webfilter", "serial": "SN1"},
+        {"serial": "SN1"},
+    ],
+)
+def test_pack_unpack_round_trip(payload):
+    event = payload.get("event", {})
+    domain = normalize_domain(event.get("domain"), event.get("url"))
+    category = event.get("category")
+    raw = pack_payload(payload, "webfilter", "web_access", domain, category)
+    assert unpack_payload(raw, "webfilter", "web_access", domain, category) == payload
+
+
+def test_pack_drops_values_held_in_columns():
+    payload = {"source": "webfilter", "event": {"type": "web_access", "domain": "a.com", "category": "news"}}
+    assert pack_payload(payload, "webfilter", "web_access", "a.com", "news") == '{"event":{}}'
+
+
+def test_unpack_passes_non_objects_through():
+    assert unpack_payload("not json", "s", "t", None, None) == "not json"
+    assert unpack_payload("[1]", "s", "t", None, None) == [1]
+    assert unpack_payload(None, "s", "t", None, None) is None
+
+
+def test_event_values_interns_names(db):
+    payloads = [
+        {"source": "webfilter", "event": {"domain": "A.com", "action": "Blocked", "category": "games"}},
+        {"source": "webfilter", "event": {"url": "https://a.com/x"}},
+    ]
+    first, second = event_values(db, [("webfilter", "web_access", p) for p in payloads])
+    assert first["source_id"] == second["source_id"]
+    assert first["domain_id"] == second["domain_id"] is not None
+    assert (first["action"], second["action"], second["category_id"]) == ("blocked", None, None)
+
+    class Row:
+        source_id, domain_id, category_id = first["source_id"], first["domain_id"], first["category_id"]
+
+    source_names, domain_names, category_names = lookup_names(db, [Row])
+    assert source_names[Row.source_id] == "webfilter"
+    assert domain_names[Row.domain_id] == "a.com"
+    assert category_names[Row.category_id] == "games"
+
+
+def test_intern_table_lru_reloads_evicted_names(db):
+    table = InternTable(EventSource, max_entries=2)
+    ids = table.ids(db, ["s-a", "s-b", "s-c"])
+    assert len(set(ids.values())) == 3
+    assert table.ids(db, ["s-a"]) == {"s-a": ids["s-a"]}
+    assert table.names(db, [ids["s-a"], None]) == {ids["s-a"]: "s-a"}
+    assert table.id(db, "never-seen", create=False) is None
+    assert db.scalar(select(EventSource.id).where(EventSource.name == "s-c")) == ids["s-c"]
+    assert sources.id(db, "s-c", create=False) == ids["s-c"]
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import School
+
+
+T0 = datetime(2026, 10, 1, 8, 0, 0)
+
+
+@pytest.fixture
+def events(school, add_events):
+    items = [
+        (T0, None, {"domain": "Games.example", "action": "Blocked", "category": "games"}),
+        (T0 + timedelta(minutes=1), None, {"url": "https://games.example/play", "domain": None, "action": "allowed"}),
+        (T0 + timedelta(minutes=2), None, {"domain": "news.example", "action": "allowed"}),
+        (T0 + timedelta(minutes=3), None, {"domain": "news.example", "action": "blocked"}),
+    ]
+    return add_events(school.id, items)
+
+
+def _search(client, headers, **params):
+    resp = client.get("/events", params=params, headers=headers)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def test_domain_and_action_filters(client, auth_headers, events):
+    games = _search(client, auth_headers, domain="GAMES.example")["items"]
+    assert [e["id"] for e in games] == [events[1], events[0]]
+    assert {e["domain"] for e in games} == {"games.example"}
+
+    blocked = _search(client, auth_headers, action="BLOCKED")["items"]
+    assert [e["id"] for e in blocked] == [events[3], events[0]]
+
+    both = _search(client, auth_headers, domain="news.example", action="allowed")["items"]
+    assert [e["id"] for e in both] == [events[2]]
+
+
+def test_unknown_names_match_nothing(client, auth_headers, events):
+    assert _search(client, auth_headers, domain="never.example") == {"items": [], "next_cursor": None}
+    assert _search(client, auth_headers, source="never")["items"] == []
+    assert len(_search(client, auth_headers, source="webfilter")["items"]) == 4
+
+
+def test_time_range_and_payload(client, auth_headers, events):
+    items = _search(
+        client, auth_headers,
+        since=(T0 + timedelta(minutes=1)).isoformat(), until=(T0 + timedelta(minutes=3)).isoformat(),
+    )["items"]
+    assert [e["id"] for e in items] == [events[2], events[1]]
+    # The payload reads back as ingested, not as the normalized columns
+    assert items[1]["payload"] == {
+        "source": "webfilter",
+        "event": {"type": "web_access", "url": "https://games.example/play", "domain": None, "action": "allowed"},
+    }
+
+
+def test_other_schools_events_are_not_returned(client, auth_headers, db, add_events, events):
+    other = School(name="Other School")
+    db.add(other)
+    db.commit()
+    add_events(other.id, [(T0, None, {"domain": "games.example", "action": "blocked"})])
+    assert len(_search(client, auth_headers, domain="games.example")["items"]) == 2
+
+
+def test_keyset_pages_cover_ties_once(client, auth_headers, school, add_events):
+    # Equal timestamps: the cursor's id breaks the tie
+    ids = add_events(school.id, [(T0 + timedelta(minutes=i // 3), None, {"domain": "a.example"}) for i in range(7)])
+    seen, cursor = [], None
+    while True:
+        body = _search(client, auth_headers, limit=2, **({"cursor": cursor} if cursor else {}))
+        seen += [e["id"] for e in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(ids, key=lambda i: (ids.index(i) // 3, i), reverse=True)
+
+
+@pytest.mark.parametrize("params", [{"cursor": "nope"}, {"since": "yesterday"}])
+def test_bad_cursor_or_time_is_422(client, auth_headers, params):
+    assert client.get("/events", params=params, headers=auth_headers).status_code == 422
+
+
+def test_requires_admin(client):
+    assert client.get("/events").status_code == 401
@@ -0,0 +1,91 @@
+from collections import Counter
+
+import pytest
+
+from app.fleet_health import FleetHealth, fleet_health
+from app.models import Alert, Device
+from app.response_cache import generations
+
+
+@pytest.fixture(autouse=True)
+def _reset_counters(db):
+    fleet_health.reconcile(db)
+
+
+def test_orm_writes_update_counters(db, school):
+    db.add_all([
+        Device(school_id=school.id, serial_number="SN1", status="online", battery_percent=80),
+        Device(school_id=school.id, serial_number="SN2", status="offline", battery_percent=5),
+    ])
+    db.commit()
+
+    health = fleet_health.snapshot(school.id)
+    assert (health["devices"], health["online"], health["offline"], health["low_battery"]) == (2, 1, 1, 1)
+
+
+def test_alert_create_and_acknowledge(db, school):
+    alert = Alert(school_id=school.id, alert_type="security", severity="high", message="m")
+    db.add(alert)
+    db.commit()
+    assert fleet_health.snapshot(school.id)["open_alerts"] == {"high": 1}
+
+    assert alert.acknowledged is False  # loaded, as the acknowledge route does
+    alert.acknowledged = True
+    db.commit()
+    assert fleet_health.snapshot(school.id)["open_alerts_total"] == 0
+
+
+def test_rollback_is_not_applied(db, school):
+    generation = generations.get(school.id)
+    db.add(Device(school_id=school.id, serial_number="SN1", status="online"))
+    db.flush()
+    db.rollback()
+
+    assert fleet_health.snapshot(school.id)["devices"] == 0
+    assert generations.get(school.id) == generation
+
+
+def test_commit_bumps_school_generation(db, school):
+    generation = generations.get(school.id)
+    db.add(Device(school_id=school.id, serial_number="SN1", status="online"))
+    db.commit()
+    assert generations.get(school.id) == generation + 1
+
+
+def test_device_delete(db, school):
+    device = Device(school_id=school.id, serial_number="SN1", status="online")
+    db.add(device)
+    db.commit()
+    db.delete(device)
+    db.commit()
+    assert fleet_health.snapshot(school.id)["devices"] == 0
+
+
+def test_reconcile_counts_drift(db, school):
+    db.add(Device(school_id=school.id, serial_number="SN1", status="online"))
+    db.commit()
+    fleet_health.devices_changed([(999_999, school.id, "online", None)])
+    assert fleet_health.reconcile(db) == 1
+    assert fleet_health.snapshot(school.id)["devices"] == 1
+
+
+def test_updates_during_reconcile_are_kept(db, school, monkeypatch):
+    health = FleetHealth(reconcile_interval=0)
+    health.reconcile(db)
+    device = Device(school_id=school.id, serial_number="SN1", status="offline")
+    db.add(device)
+    db.commit()
+    scan = health._scan
+
+    def racing_scan(session):
+        result = scan(session)
+        # Committed after the scan read its rows
+        health.devices_changed([(device.id, school.id, "online", 5)])
+        health.apply({}, set(), Counter({(school.id, "high"): 1}))
+        return result
+
+    monkeypatch.setattr(health, "_scan", racing_scan)
+    assert health.reconcile(db) == 0
+    snapshot = health.snapshot(school.id)
+    assert (snapshot["online"], snapshot["offline"], snapshot["low_battery"]) == (1, 0, 1)
+    assert snapshot["open_alerts"] == {"high": 1}
@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select
+
+from app import heartbeats
+from app.heartbeats import HeartbeatTracker
+from app.models import Alert, Device, DeviceNetworkIdentity, DeviceStatusInterval, SchoolApiKey
+from app.schemas import Heartbeat
+
+
+@pytest.fixture
+def device(db, school):
+    device = Device(
+        school_id=school.id, serial_number="SN1", asset_tag="A1", status="offline",
+        battery_percent=80, last_seen=datetime.utcnow() - timedelta(hours=2),
+    )
+    db.add(device)
+    db.commit()
+    return device
+
+
+def test_beats_coalesce_into_one_write(db, school, device):
+    tracker = HeartbeatTracker(flush_interval=60)
+    now = datetime.utcnow()
+    beats = [
+        Heartbeat(serial_number="SN1", battery_percent=70, observed_at=now - timedelta(seconds=30)),
+        Heartbeat(serial_number="SN1", observed_at=now - timedelta(seconds=10)),
+        Heartbeat(serial_number="SN1", battery_percent=10, observed_at=now - timedelta(seconds=20)),  # stale
+        Heartbeat(serial_number="NOPE"),
+    ]
+    assert tracker.accept(db, school.id, beats) == (2, ["NOPE"])
+    assert asyncio.run(tracker.flush()) == 1
+    assert asyncio.run(tracker.flush()) == 0
+
+    db.expire_all()
+    device = db.get(Device, device.id)
+    assert (device.status, device.battery_percent) == ("online", 70)
+    assert device.last_seen == now - timedelta(seconds=10)
+
+
+def test_transitions_record_status_and_alert_once(db, school, device):
+    tracker = HeartbeatTracker(flush_interval=60)
+    tracker.accept(db, school.id, [Heartbeat(serial_number="SN1", battery_percent=5, ip="10.0.0.7")])
+    asyncio.run(tracker.flush())
+    tracker.accept(db, school.id, [Heartbeat(serial_number="SN1", battery_percent=4, ip="10.0.0.7")])
+    asyncio.run(tracker.flush())
+
+    statuses = db.scalars(select(DeviceStatusInterval.status).where(DeviceStatusInterval.device_id == device.id)).all()
+    # Silent for longer than the offline threshold: offline from the last beat, then back online
+    assert statuses == ["offline", "online"]
+    # Low battery alerts fire on the crossing, not on every flush below it
+    alerts = db.scalars(select(Alert.alert_type).where(Alert.device_id == device.id)).all()
+    assert alerts == ["threshold"]
+    ips = db.scalars(
+        select(DeviceNetworkIdentity.ip_address).where(DeviceNetworkIdentity.source == "heartbeat")
+    ).all()
+    assert ips == ["10.0.0.7"]
+
+
+def test_batch_endpoint_reports_unknown_serials(client, db, school, device, monkeypatch):
+    tracker = HeartbeatTracker(flush_interval=60)
+    monkeypatch.setattr("app.routers.heartbeats.heartbeat_tracker", tracker)
+    db.add(SchoolApiKey(school_id=school.id, key="k-heartbeat", label="t", is_active=True))
+    db.commit()
+    resp = client.post(
+        "/heartbeat/batch",
+        json={"api_key": "k-heartbeat", "school_id": school.id,
+              "heartbeats": [{"serial_number": "SN1"}, {"serial_number": "NOPE"}]},
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {"ok": True, "accepted": 1, "unknown_serials": ["NOPE"]}
+    # Written on the next flush, not by the request
+    db.expire_all()
+    assert db.get(Device, device.id).status == "offline"
+    assert asyncio.run(tracker.flush()) == 1
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = HeartbeatTracker(flush_interval=60)
+    monkeypatch.setattr(heartbeats, "heartbeat_tracker", tracker)
+    heartbeats.install()
+    return tracker
+
+
+def test_reconnect_below_threshold_does_not_alert_again(db, school, device, tracker):
+    device.battery_percent = 5
+    db.commit()
+    tracker.accept(db, school.id, [Heartbeat(serial_number="SN1", battery_percent=5)])
+    asyncio.run(tracker.flush())
+    assert db.scalars(select(Alert).where(Alert.device_id == device.id)).all() == []
+
+
+def test_committed_device_writes_evict_the_cache(db, school, device, tracker):
+    tracker.accept(db, school.id, [Heartbeat(serial_number="SN1")])
+    device.serial_number = "SN2"
+    db.commit()
+    assert tracker.accept(db, school.id, [Heartbeat(serial_number="SN1")]) == (0, ["SN1"])
+    assert tracker.accept(db, school.id, [Heartbeat(serial_number="SN2")]) == (1, [])
+
+    db.delete(device)
+    db.commit()
+    # Pending heartbeats of a deleted device are dropped at flush
+    assert asyncio.run(tracker.flush()) == 0
+    assert tracker.accept(db, school.id, [Heartbeat(serial_number="SN2")]) == (0, ["SN2"])
+
+
+def test_failed_flush_drops_deleted_devices(db, school, device, tracker):
+    other = Device(school_id=school.id, serial_number="SN9", status="online")
+    db.add(other)
+    db.commit()
+    tracker.accept(db, school.id, [Heartbeat(serial_number="SN1"), Heartbeat(serial_number="SN9")])
+    # A Core delete is not seen by the session hooks
+    db.execute(delete(Device).where(Device.id == other.id))
+    db.commit()
+    with pytest.raises(Exception):
+        asyncio.run(tracker.flush())
+    assert asyncio.run(tracker.flush()) == 1
+    db.expire_all()
+    assert db.get(Device, device.id).status == "online"
+
+
+def test_cache_is_bounded(db, school):
+    tracker = HeartbeatTracker(flush_interval=60, max_devices=2)
+    db.add_all(Device(school_id=school.id, serial_number=f"SN{i}", status="online") for i in range(3))
+    db.commit()
+    beats = [Heartbeat(serial_number=f"SN{i}") for i in range(3)]
+    assert tracker.accept(db, school.id, beats) == (3, [])
+    assert len(tracker._known) == len(tracker._serials) == 2
+    # The evicted device is reloaded for the write
+    assert asyncio.run(tracker.flush()) == 3
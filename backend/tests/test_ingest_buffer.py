@@ -0,0 +1,104 @@
+import asyncio
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from app import ingest_buffer as ib
+from app.dedup import seen_events
+from app.models import Event
+
+
+def _record(school_id: int, key: str) -> dict:
+    return {
+        "school_id": school_id,
+        "source": "webfilter",
+        "event_type": "web_access",
+        "severity": "info",
+        "message": "web_access allowed: example.com",
+        "payload": {
+            "device": {"serial_number": "SN1"},
+            "event": {"type": "web_access", "domain": "example.com", "action": "allowed"},
+            "source": "webfilter",
+        },
+        "policy": {"domain": "example.com", "action": "allowed"},
+        "dedup_key": key,
+        "observed_at": None,
+        "ids": {"serial": "SN1", "asset": None, "ip": None},
+    }
+
+
+def _buffer() -> ib.IngestBuffer:
+    buffer = ib.IngestBuffer()
+    buffer._queue = ib.MemoryQueue(10)
+    return buffer
+
+
+def test_queued_retry_is_acknowledged_as_duplicate(school):
+    async def run():
+        buffer = _buffer()
+        first = await buffer.accept(_record(school.id, "a" * 64))
+        retry = await buffer.accept(_record(school.id, "a" * 64))
+        return first.status_code, retry.status_code, await buffer._queue.size()
+
+    assert asyncio.run(run()) == (202, 200, 1)
+
+
+def test_failed_flush_lets_retries_through(school, monkeypatch):
+    def fail(db, records):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(ib, "_store_batch", fail)
+    key = "b" * 64
+
+    async def run():
+        buffer = _buffer()
+        await buffer.accept(_record(school.id, key))
+        await buffer.flush(await buffer._queue.take(10, 0.01))
+        return (await buffer.accept(_record(school.id, key))).status_code
+
+    assert asyncio.run(run()) == 202
+    assert not seen_events.seen(key)
+
+
+def test_stored_record_is_marked_seen(db, school):
+    key = "c" * 64
+
+    async def run():
+        buffer = _buffer()
+        await buffer.accept(_record(school.id, key))
+        await buffer.flush(await buffer._queue.take(10, 0.01))
+        return buffer._queued
+
+    assert asyncio.run(run()) == set()
+    assert seen_events.seen(key)
+    assert db.scalar(select(func.count()).select_from(Event)) == 1
+
+
+def test_unavailable_database_keeps_the_batch(db, school, monkeypatch):
+    store = ib._store_batch
+    calls = []
+
+    def down_once(session, records):
+        calls.append(len(records))
+        if len(calls) == 1:
+            raise OperationalError("INSERT", {}, Exception("server closed the connection"))
+        return store(session, records)
+
+    monkeypatch.setattr(ib, "_store_batch", down_once)
+    keys = ["d" * 64, "e" * 64]
+
+    async def run():
+        buffer = _buffer()
+        for key in keys:
+            await buffer.accept(_record(school.id, key))
+        await buffer.flush(await buffer._next_batch(buffer._queue, 0.01))
+        held = len(buffer._pending)
+        # Still queued in this process: a client retry is not stored twice
+        retry = (await buffer.accept(_record(school.id, keys[0]))).status_code
+        await buffer.flush(await buffer._next_batch(buffer._queue, 0.01))
+        return held, retry, buffer._pending
+
+    assert asyncio.run(run()) == (2, 200, [])
+    # Retried as one batch, not record by record
+    assert calls == [2, 2]
+    assert db.scalar(select(func.count()).select_from(Event)) == 2
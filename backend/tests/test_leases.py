@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app.leases import LeaseIndex, parse_event_time, purge_leases
+from app.models import Device, DeviceIpLease
+
+
+def _lease(school_id, ip, start, device_id, end=None):
+    return {
+        "school_id": school_id,
+        "device_id": device_id,
+        "ip_address": ip,
+        "source": "dhcp",
+        "start_at": start,
+        "end_at": end,
+    }
+
+
+def _devices(db, school, n):
+    devices = [Device(school_id=school.id, serial_number=f"SN{i}") for i in range(n)]
+    db.add_all(devices)
+    db.commit()
+    return [d.id for d in devices]
+
+
+def test_parse_event_time_normalizes_to_naive_utc():
+    assert parse_event_time("2026-01-01T02:00:00+02:00") == datetime(2026, 1, 1, 0, 0)
+    assert parse_event_time("2026-01-01T00:00:00Z") == datetime(2026, 1, 1, 0, 0)
+    assert parse_event_time("not a time") is None
+
+
+def test_lookup_resolves_as_of_event_time(db, school):
+    a, b = _devices(db, school, 2)
+    t0 = datetime.utcnow() - timedelta(hours=3)
+    db.execute(insert(DeviceIpLease), [
+        _lease(school.id, "10.0.0.5", t0, a),
+        _lease(school.id, "10.0.0.5", t0 + timedelta(hours=1), b, end=t0 + timedelta(hours=2)),
+    ])
+    db.commit()
+    index = LeaseIndex(retention_days=7, refresh_seconds=0)
+
+    assert index.lookup(db, school.id, "10.0.0.5", t0 + timedelta(minutes=30)) == (True, a)
+    assert index.lookup(db, school.id, "10.0.0.5", t0 + timedelta(minutes=90)) == (True, b)
+    assert index.lookup(db, school.id, "10.0.0.5", t0 + timedelta(hours=2)) == (True, None)
+    assert index.lookup(db, school.id, "10.0.0.6", t0) == (False, None)
+
+
+def test_refresh_evicts_leases_outside_retention(db, school):
+    (a,) = _devices(db, school, 1)
+    old = datetime.utcnow() - timedelta(days=1, minutes=-1)
+    db.execute(insert(DeviceIpLease), [_lease(school.id, "10.0.0.5", old, a)])
+    db.commit()
+    index = LeaseIndex(retention_days=1, refresh_seconds=0)
+    assert index.lookup(db, school.id, "10.0.0.5", None) == (True, a)
+
+    # The same lease, a few minutes later, has aged out of the window
+    index.retention = timedelta(minutes=30)
+    assert index.lookup(db, school.id, "10.0.0.5", None) == (False, None)
+    assert index._schools[school.id].timelines == {}
+
+
+def test_purge_leases_deletes_only_aged_rows(db, school):
+    (a,) = _devices(db, school, 1)
+    now = datetime.utcnow()
+    db.execute(insert(DeviceIpLease), [
+        _lease(school.id, "10.0.0.5", now - timedelta(days=10), a),
+        _lease(school.id, "10.0.0.6", now - timedelta(days=1), a),
+    ])
+    db.commit()
+
+    assert purge_leases(db, retention_days=7, batch_size=1) == 1
+    assert db.scalar(select(func.count()).select_from(DeviceIpLease)) == 1
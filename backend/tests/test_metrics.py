@@ -0,0 +1,45 @@
+from prometheus_client import REGISTRY
+
+from app.metrics import record_alert, record_correlation, record_ingest
+
+
+def _value(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_unknown_label_values_fold_into_other():
+    before = _value("k12_ingest_events_total", source="other")
+    known = _value("k12_ingest_events_total", source="goguardian")
+    record_ingest("goguardian")
+    record_ingest("made-up-source")
+    assert _value("k12_ingest_events_total", source="goguardian") == known + 1
+    assert _value("k12_ingest_events_total", source="other") == before + 1
+    assert REGISTRY.get_sample_value("k12_ingest_events_total", {"source": "made-up-source"}) is None
+
+    alerts = _value("k12_alerts_created_total", alert_type="other")
+    record_alert("made-up-type")
+    assert _value("k12_alerts_created_total", alert_type="other") == alerts + 1
+
+    hits = _value("k12_device_correlation_total", method="mac", result="hit")
+    record_correlation("mac", True)
+    assert _value("k12_device_correlation_total", method="mac", result="hit") == hits + 1
+
+
+def test_latency_is_labelled_by_route_template(client, auth_headers):
+    labels = {"method": "GET", "route": "/devices/{device_id}/timeline", "status_class": "4xx"}
+    before = _value("k12_http_request_duration_seconds_count", **labels)
+    for device_id in (101, 102):
+        assert client.get(f"/devices/{device_id}/timeline", headers=auth_headers).status_code == 404
+    assert _value("k12_http_request_duration_seconds_count", **labels) == before + 2
+
+    unmatched = {"method": "GET", "route": "unmatched", "status_class": "4xx"}
+    before = _value("k12_http_request_duration_seconds_count", **unmatched)
+    client.get("/no/such/path")
+    assert _value("k12_http_request_duration_seconds_count", **unmatched) == before + 1
+
+
+def test_metrics_endpoint_exposes_text_format(client):
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert "k12_ingest_events_total" in resp.text
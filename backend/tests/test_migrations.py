@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _alembic(database_url: str, *args: str) -> subprocess.CompletedProcess:
+    # env.py reads DATABASE_URL through app.config, so each run gets its own process
+    return subprocess.run(
+        [sys.executable, "-m", "alembic", *args],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "DATABASE_URL": database_url},
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_migrations_match_models_and_downgrade(tmp_path):
+    url = f"sqlite:///{tmp_path}/migrations.db"
+    for args in (("upgrade", "head"), ("check",), ("downgrade", "base"), ("upgrade", "head")):
+        result = _alembic(url, *args)
+        assert result.returncode == 0, f"alembic {' '.join(args)}:\n{result.stdout}{result.stderr}"
@@ -0,0 +1,42 @@
+from app.policy_engine import RuleRow, build_context, compile_rules
+
+
+def _rule(id, rule_type="deny_domain", params=None, source=None, event_type=None, condition=None):
+    return RuleRow(id, f"rule-{id}", rule_type, params, "medium", source, event_type, condition)
+
+
+def _fired(rule_set, source, event_type, **payload):
+    return [r.id for r in rule_set.match(build_context(source, event_type, payload))]
+
+
+def test_rules_are_indexed_by_source_and_event_type():
+    rule_set, _ = compile_rules([
+        _rule(1, params={"domain": "bad.example"}),
+        _rule(2, params={"domain": "bad.example"}, source="goguardian"),
+        _rule(3, "expression", condition='action == "blocked"', event_type="web_access"),
+        _rule(4, "expression", condition="true_ish == 1"),  # invalid: skipped
+        _rule(5, params={"domain": ""}),  # can never fire
+    ])
+    assert [r.id for r in rule_set.rules] == [1, 2, 3]
+    assert _fired(rule_set, "webfilter", "web_access", domain="www.bad.example", action="blocked") == [1, 3]
+    assert _fired(rule_set, "goguardian", "dns_query", domain="bad.example") == [1, 2]
+    # deny_domain only applies to web_access / dns_query events
+    assert not rule_set.candidates("goguardian", "inventory_sync")
+
+
+def test_domain_index_finds_the_same_rules_as_a_scan():
+    rows = [_rule(i, params={"domain": f"site{i}.example"}) for i in range(1, 101)]
+    rows.append(_rule(101, params={"domain": "site7.example"}, condition='action == "blocked"'))
+    rule_set, _ = compile_rules(rows)
+    assert rule_set.candidates("webfilter", "web_access").domains  # indexed, not scanned
+    assert _fired(rule_set, "webfilter", "web_access", url="https://www.site7.example/x", action="blocked") == [7, 101]
+    assert _fired(rule_set, "webfilter", "web_access", domain="site70.example") == [70]
+    assert _fired(rule_set, "webfilter", "web_access", domain="nothing.example") == []
+
+
+def test_unchanged_rules_keep_their_compiled_form():
+    rows = [_rule(1, params={"domain": "a.example"}), _rule(2, params={"domain": "b.example"})]
+    _, first = compile_rules(rows)
+    _, second = compile_rules([rows[0], _rule(2, params={"domain": "c.example"})], first)
+    assert second[1][1] is first[1][1]
+    assert second[2][1] is not first[2][1]
@@ -0,0 +1,80 @@
+import pytest
+
+from app.policy_expr import CONTEXT_KEYS, PolicyExprError, compile_expr
+
+
+def _ctx(**values) -> dict:
+    ctx = dict.fromkeys(CONTEXT_KEYS)
+    ctx.update(values)
+    return ctx
+
+
+@pytest.mark.parametrize(
+    "text, ctx, expected",
+    [
+        ('category == "games" and action != "blocked"', {"category": "games", "action": "allowed"}, True),
+        ('category == "games" and action != "blocked"', {"category": "games", "action": "blocked"}, False),
+        ("8 <= hour < 15", {"hour": 8}, True),
+        ("8 <= hour < 15", {"hour": 15}, False),
+        ('source in ["goguardian", "webfilter"]', {"source": "webfilter"}, True),
+        ('source not in ("goguardian",)', {"source": None}, True),
+        ('endswith(domain, ".proxy.example") or matches(url, "vpn|unblock")', {"url": "https://x/unblock"}, True),
+        ('contains(lower(url), "vpn")', {"url": "HTTPS://VPN.example"}, True),
+        ("device.battery_percent < 10", {"device.battery_percent": 5}, True),
+        # Missing values are None; ordering against None is false, equality is normal
+        ("device.battery_percent < 10", {}, False),
+        ("not device.battery_percent >= 10", {}, True),
+        ("domain == None", {}, True),
+        ('hour > "x"', {"hour": 3}, False),
+        ("weekday in [5, 6] or minute == -1", {"weekday": 6, "minute": 0}, True),
+        # Patterns without nested repeats, repeated alternation or backreferences
+        (r'matches(domain, "^(www\\.)?vpn[0-9]+\\.(com|net)$")', {"domain": "www.vpn42.net"}, True),
+        (r'matches(url, "(ab){2,3}[a-z]*")', {"url": "x/abab"}, True),
+    ],
+)
+def test_evaluates(text, ctx, expected):
+    assert compile_expr(text)(_ctx(**ctx)) is expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "__import__('os').system('true')",
+        "open('/etc/passwd')",
+        "domain.__class__",
+        "device.__dict__",
+        "device.password",
+        "().__class__.__bases__",
+        "unknown_field == 1",
+        "domain[0] == 'a'",
+        "lambda: 1",
+        "[x for x in url]",
+        "domain + 'x' == 'ax'",
+        "domain is None",
+        "matches(url, domain)",
+        "matches(url, 'a' + 'b')",
+        "matches(url, '(unclosed')",
+        "matches(domain, '(a+)+$')",
+        r"matches(url, '(\\w+\\s?)*$')",
+        "matches(url, '(a|ab)*c')",
+        "matches(url, '(x+x+)+y')",
+        r"matches(url, '(\\w)\\1')",
+        "matches(url, '" + "a" * 201 + "')",
+        "contains(url)",
+        "contains(url, x='a')",
+        "source in [domain]",
+        "",
+        "and",
+        "1 == " + "1" * 2000,
+    ],
+)
+def test_rejects(text):
+    with pytest.raises(PolicyExprError):
+        compile_expr(text)
+
+
+def test_policy_api_rejects_backtracking_patterns(client, auth_headers):
+    rule = {"name": "r", "condition": "matches(domain, '(a+)+$')", "action": "alert"}
+    resp = client.post("/policies", json=rule, headers=auth_headers)
+    assert resp.status_code == 422
+    assert "nest repeats" in resp.json()["detail"]
@@ -0,0 +1,100 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Alert, Device, PolicyRule
+from app.policy_engine import RuleRow
+from app.policy_expr import PolicyExprError
+from app.policy_replay import current_rules, load_candidate_rules, replay
+
+
+T0 = datetime(2026, 10, 5, 9, 0)
+
+
+@pytest.fixture
+def devices(db, school):
+    rows = [Device(school_id=school.id, serial_number=f"SN{i}", asset_tag=f"A{i}", status="online") for i in range(2)]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+@pytest.fixture
+def events(school, devices, add_events):
+    a, b = devices
+    return add_events(school.id, [
+        (T0, a.id, {"domain": "bad.example", "action": "blocked"}),
+        (T0 + timedelta(minutes=1), a.id, {"domain": "bad.example", "action": "allowed"}),
+        (T0 + timedelta(days=1), b.id, {"domain": "www.bad.example", "action": "blocked"}),
+        (T0 + timedelta(days=1, minutes=1), b.id, {"domain": "good.example", "action": "blocked"}),
+        (T0 + timedelta(days=1, minutes=2), None, {"domain": "bad.example", "action": "blocked"}),  # no device
+    ])
+
+
+def _candidate(id, rule_type, **fields):
+    return RuleRow(id, f"candidate {-id}", rule_type, fields.get("params"), "high",
+                   fields.get("source"), fields.get("event_type"), fields.get("condition"))
+
+
+def _by_name(report):
+    return {r["name"]: r for r in report["rules"]}
+
+
+def test_replay_reports_would_fire_without_writing(db, school, devices, events):
+    rules = [
+        _candidate(-1, "deny_domain", params={"domain": "bad.example"}),
+        _candidate(-2, "expression", condition='action == "blocked"'),
+        _candidate(-3, "window_count", params={"threshold": 1, "window_seconds": 600, "group_by": "device"}),
+    ]
+    report = replay(school.id, T0, T0 + timedelta(days=2), rules, workers=0, chunk_size=2)
+    assert report["events_evaluated"] == 4
+
+    rules = _by_name(report)
+    deny = rules["candidate 1"]
+    assert (deny["would_fire"], deny["devices"]) == (3, 2)
+    assert deny["by_day"] == {"2026-10-05": 2, "2026-10-06": 1}
+    assert [s["event_id"] for s in deny["samples"]] == events[:3]
+    assert rules["candidate 2"]["would_fire"] == 3
+    # Second event per device within ten minutes
+    assert rules["candidate 3"]["would_fire"] == 2
+    assert db.query(Alert).count() == 0
+
+
+def test_worker_pool_matches_in_process(school, devices, events):
+    rules = [
+        _candidate(-1, "deny_domain", params={"domain": "bad.example"}),
+        _candidate(-2, "window_distinct", params={"threshold": 1, "window_seconds": 86_400 * 2, "distinct": "domain"}),
+    ]
+    inline = replay(school.id, T0, T0 + timedelta(days=2), rules, workers=0, chunk_size=1)
+    pooled = replay(school.id, T0, T0 + timedelta(days=2), rules, workers=2, chunk_size=1)
+    for report in (inline, pooled):
+        for rule in report["rules"]:
+            rule.pop("samples")
+        report.pop("elapsed_seconds"), report.pop("events_per_sec"), report.pop("workers")
+    assert inline == pooled
+
+
+def test_invalid_rules(db, school, devices, events):
+    with pytest.raises(PolicyExprError):
+        replay(school.id, T0, T0 + timedelta(days=2), [_candidate(-1, "expression", condition="os.system")])
+
+    db.add(PolicyRule(school_id=school.id, name="stored bad", rule_type="expression", condition="nope(", is_active=True))
+    db.add(PolicyRule(school_id=school.id, name="stored off", rule_type="expression", condition="1 == 1", is_active=False))
+    db.commit()
+    report = replay(school.id, T0, T0 + timedelta(days=2), current_rules(db, school.id))
+    # The live engine skips invalid stored rules, and so does replay, but they
+    # are reported as skipped; inactive ones are not loaded
+    assert [(r["name"], r["valid"], r["would_fire"]) for r in report["rules"]] == [("stored bad", False, 0)]
+    assert report["rules"][0]["error"]
+
+
+def test_load_candidate_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([
+        {"name": "a", "rule_type": "deny_domain", "params": {"domain": "x.example"}},
+        {"name": "off", "condition": "1 == 1", "is_active": False},
+        {"name": "b", "condition": 'category == "games"'},
+    ]))
+    rows = load_candidate_rules(str(path))
+    assert [(r.id, r.name) for r in rows] == [(-1, "a"), (-3, "b")]
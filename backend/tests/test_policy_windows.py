@@ -0,0 +1,85 @@
+import pytest
+
+from app.policy_expr import PolicyExprError
+from app.policy_windows import RuleWindow, WindowSpec, WindowStore
+
+
+def _count(threshold=3, window_seconds=60, group_by="device"):
+    return WindowSpec.from_params(
+        "window_count", {"threshold": threshold, "window_seconds": window_seconds, "group_by": group_by}
+    )
+
+
+def test_count_fires_once_per_window_then_slides():
+    window = RuleWindow(_count(), max_keys=100)
+    T = 1_000_000.0
+    assert [window.observe(1, None, T + s) for s in (0, 10, 20)] == [None, None, None]
+    assert window.observe(1, None, T + 30) == 4
+    # Quiet for one window after firing
+    assert window.observe(1, None, T + 40) is None
+    # Events older than the window are ignored
+    assert window.observe(1, None, T - 120) is None
+    # Still over the threshold, but within one window of the alert
+    assert [window.observe(1, None, T + s) for s in (70, 80, 89)] == [None, None, None]
+    # The event at 30 has slid out; 40, 70, 80, 89 and 90 remain
+    assert window.observe(1, None, T + 90) == 5
+
+
+def test_groups_are_counted_separately_and_bounded():
+    window = RuleWindow(_count(threshold=1), max_keys=2)
+    T = 1_000_000.0
+    window.observe("a", None, T)
+    window.observe("b", None, T)
+    assert window.observe("a", None, T + 1) == 2
+    window.observe("c", None, T + 2)
+    assert list(window.keys) == ["a", "c"]  # b was least recently used
+
+
+def test_distinct_counts_each_value_once_while_in_window():
+    spec = WindowSpec.from_params(
+        "window_distinct", {"threshold": 2, "window_seconds": 10, "group_by": "category", "distinct": "device"}
+    )
+    assert spec.distinct == "device.id"
+    window = RuleWindow(spec, max_keys=100)
+    T = 1_000_000.0
+    assert [window.observe("games", d, T + i) for i, d in enumerate((1, 1, 2, 2, None))] == [None] * 5
+    assert window.observe("games", 3, T + 5) == 3
+    # 1 and 2 expire; 3 is still there
+    assert window.observe("games", 4, T + 14) is None
+    assert window.keys["games"].size() == 2
+
+
+@pytest.mark.parametrize(
+    "rule_type, params",
+    [
+        ("window_count", {"window_seconds": 60}),
+        ("window_count", {"threshold": 0, "window_seconds": 60}),
+        ("window_count", {"threshold": "x", "window_seconds": 60}),
+        ("window_count", {"threshold": 1, "window_seconds": 8 * 86_400}),
+        ("window_count", {"threshold": 1, "window_seconds": 60, "group_by": "password"}),
+        ("window_distinct", {"threshold": 1, "window_seconds": 60}),
+    ],
+)
+def test_invalid_specs(rule_type, params):
+    with pytest.raises(PolicyExprError):
+        WindowSpec.from_params(rule_type, params)
+
+
+def test_store_groups_by_context_and_restores_snapshots(tmp_path):
+    path = str(tmp_path / "windows.json")
+    spec = _count(threshold=2)
+    store = WindowStore(max_keys=100, snapshot_path=path)
+    T = 1_000_000.0
+    ctx = {"device.id": 7}
+    assert store.observe(1, 10, spec, {"device.id": None}, T) is None  # no group key: not counted
+    store.observe(1, 10, spec, ctx, T)
+    store.observe(1, 10, spec, ctx, T + 1)
+    store.observe(1, 11, spec, ctx, T + 1)
+    store.save(store.snapshot())
+
+    restored = WindowStore(max_keys=100, snapshot_path=path)
+    assert restored.restore() == 2
+    assert restored.observe(1, 10, spec, ctx, T + 2) == 3
+    # A changed definition starts from zero
+    assert restored.observe(1, 11, _count(threshold=2, window_seconds=120), ctx, T + 2) is None
+    assert restored.window(1, 11, _count(threshold=2, window_seconds=120)).keys[7].size() == 1
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from app import query_profiler
+from app.database import engine
+from app.metrics import SQL_REPEATED_SHAPES
+from app.query_profiler import QueryProfilerMiddleware, RequestProfile, current_profile, normalize_sql
+
+
+def test_normalize_sql_collapses_parameters():
+    a = normalize_sql("SELECT * FROM devices WHERE id IN (?, ?, ?) AND name = 'x'")
+    b = normalize_sql("SELECT  *  FROM devices WHERE id IN (?, ?) AND name = 'yy'")
+    assert a == b == "SELECT * FROM devices WHERE id IN (?...) AND name = ?"
+    assert normalize_sql("INSERT INTO t (a) VALUES (1), (2), (3)") == "INSERT INTO t (a) VALUES (?), ..."
+
+
+def test_repeated_threshold():
+    profile = RequestProfile()
+    profile.shapes.update({"a": 12, "b": 3})
+    assert profile.repeated(10) == [("a", 12)]
+
+
+def _run(middleware, n_queries: int):
+    async def app(scope, receive, send):
+        with engine.connect() as conn:
+            for i in range(n_queries):
+                conn.execute(text("SELECT :i"), {"i": i})
+        assert current_profile().query_count == n_queries
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    mw = middleware(app)
+    asyncio.run(mw({"type": "http", "method": "GET", "path": "/x"}, receive, send))
+    return dict(sent[0]["headers"])
+
+
+def test_headers_in_development():
+    query_profiler.install(engine)
+    headers = _run(lambda app: QueryProfilerMiddleware(app, attach_headers=True), 12)
+    assert headers[b"x-db-query-count"] == b"12"
+    assert headers[b"x-db-repeated-shapes"] == b"1"
+
+
+def test_repeats_reported_when_not_sampled(monkeypatch, caplog):
+    query_profiler.install(engine)
+    monkeypatch.setattr(query_profiler.settings, "sql_profiler_log_sample_rate", 0.0)
+    counter = SQL_REPEATED_SHAPES.labels(route="unmatched")
+    before = counter._value.get()
+
+    with caplog.at_level(logging.INFO, logger="k12.sql_profiler"):
+        _run(lambda app: QueryProfilerMiddleware(app, attach_headers=False), 12)
+
+    assert counter._value.get() == before + 1
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith("possible N+1") for m in messages)
+    assert not any(m.startswith("sql profile") for m in messages)
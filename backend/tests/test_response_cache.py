@@ -0,0 +1,50 @@
+from app.models import Device, School
+from app.response_cache import ResponseCache
+
+
+def _list(client, headers, etag=None):
+    return client.get("/devices", headers={**headers, **({"If-None-Match": etag} if etag else {})})
+
+
+def test_etag_304_until_a_device_of_the_school_changes(client, auth_headers, db, school):
+    db.add(Device(school_id=school.id, serial_number="SN1", asset_tag="A1", status="online"))
+    db.commit()
+
+    first = _list(client, auth_headers)
+    etag = first.headers["ETag"]
+    assert [d["serial_number"] for d in first.json()] == ["SN1"]
+    assert _list(client, auth_headers, etag).status_code == 304
+    assert _list(client, auth_headers, f'W/"other", {etag}').status_code == 304
+
+    # Another school's write leaves this school's ETag alone
+    other = School(name="Other")
+    db.add(other)
+    db.commit()
+    db.add(Device(school_id=other.id, serial_number="SN9", asset_tag="A9"))
+    db.commit()
+    assert _list(client, auth_headers, etag).status_code == 304
+
+    db.add(Device(school_id=school.id, serial_number="SN2", asset_tag="A2"))
+    db.commit()
+    changed = _list(client, auth_headers, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert sorted(d["serial_number"] for d in changed.json()) == ["SN1", "SN2"]
+
+
+def test_query_params_get_their_own_etag(client, auth_headers):
+    plain = _list(client, auth_headers).headers["ETag"]
+    with_params = client.get("/devices?x=1", headers=auth_headers).headers["ETag"]
+    assert plain != with_params
+
+
+def test_body_cache_is_per_generation_and_bounded():
+    cache = ResponseCache(max_entries=2)
+    cache.put(("a",), 1, b"a1")
+    assert cache.get(("a",), 1) == b"a1"
+    assert cache.get(("a",), 2) is None
+    cache.put(("b",), 1, b"b1")
+    cache.get(("a",), 1)  # a is now most recently used
+    cache.put(("c",), 1, b"c1")
+    assert cache.get(("b",), 1) is None
+    assert cache.get(("a",), 1) == b"a1" and cache.get(("c",), 1) == b"c1"
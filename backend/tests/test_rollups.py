@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app import rollups
+from app.models import Event, EventHourlyRollup, RollupCheckpoint
+from app.rollups import prune_events, rollup, rollup_batch
+
+
+H0 = (datetime.utcnow() - timedelta(days=2)).replace(minute=0, second=0, microsecond=0)
+
+
+def _counts(db) -> dict:
+    return {
+        (r.hour, r.domain, r.action): r.count
+        for r in db.scalars(select(EventHourlyRollup))
+    }
+
+
+def test_rollup_is_incremental_and_exactly_once(db, school, add_events):
+    add_events(school.id, [
+        (H0 + timedelta(minutes=5), None, {"domain": "A.example", "action": "Blocked"}),
+        (H0 + timedelta(minutes=50), None, {"domain": "a.example", "action": "blocked"}),
+        (H0 + timedelta(minutes=70), None, {"domain": "a.example", "action": "allowed"}),
+    ])
+    assert rollup(db, batch_size=2, lag_seconds=0) == 3
+    assert rollup(db, lag_seconds=0) == 0
+    assert _counts(db) == {
+        (H0, "a.example", "blocked"): 2,
+        (H0 + timedelta(hours=1), "a.example", "allowed"): 1,
+    }
+
+    ids = add_events(school.id, [(H0 + timedelta(minutes=10), None, {"domain": "a.example", "action": "blocked"})])
+    assert rollup(db, lag_seconds=0) == 1
+    assert _counts(db)[(H0, "a.example", "blocked")] == 3
+    assert db.scalar(select(RollupCheckpoint.last_event_id)) == ids[0]
+
+
+def test_recent_events_wait_for_the_lag(db, school, add_events):
+    add_events(school.id, [
+        (H0, None, {"domain": "a.example"}),
+        (datetime.utcnow(), None, {"domain": "b.example"}),
+        (H0, None, {"domain": "c.example"}),  # behind the recent one in id order
+    ])
+    assert rollup(db, lag_seconds=600) == 1
+    assert {domain for _, domain, _ in _counts(db)} == {"a.example"}
+
+
+def test_losing_the_checkpoint_race_writes_nothing(db, school, add_events, monkeypatch):
+    add_events(school.id, [(H0, None, {"domain": "a.example"})])
+    rollup(db, lag_seconds=0)
+    add_events(school.id, [(H0, None, {"domain": "a.example"})])
+    # This worker still sees the checkpoint from before the other's batch
+    monkeypatch.setattr(rollups, "_checkpoint", lambda db: 0)
+    assert rollup_batch(db, batch_size=10, lag_seconds=0) == 0
+    assert _counts(db)[(H0, "a.example", "")] == 1
+
+
+def test_prune_only_deletes_counted_events(db, school, add_events):
+    old = datetime.utcnow() - timedelta(days=30)
+    add_events(school.id, [(old, None, {"domain": "a.example"})])
+    assert prune_events(db, retention_days=7) == 0
+    rollup(db, lag_seconds=0)
+    add_events(school.id, [(old, None, {"domain": "b.example"})])
+    assert prune_events(db, retention_days=7) == 1
+    assert db.scalar(select(func.count()).select_from(Event)) == 1
+
+
+def test_reports_read_the_rollup(client, auth_headers, db, school, add_events):
+    add_events(school.id, [
+        (H0, None, {"domain": "a.example", "action": "blocked"}),
+        (H0 + timedelta(minutes=1), None, {"domain": "a.example", "action": "allowed"}),
+        (H0 + timedelta(hours=1), None, {"domain": "b.example", "action": "allowed"}),
+    ])
+    rollup(db, lag_seconds=0)
+    params = {"since": (H0 + timedelta(minutes=30)).isoformat(), "until": (H0 + timedelta(hours=3)).isoformat()}
+
+    activity = client.get("/reports/activity", params=params, headers=auth_headers).json()
+    assert [b["count"] for b in activity] == [2, 1]
+    top = client.get("/reports/top-domains", params=params, headers=auth_headers).json()
+    assert top == [{"domain": "a.example", "count": 2, "blocked": 1}, {"domain": "b.example", "count": 1, "blocked": 0}]
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Alert, Device, School
+from app.schemas import AlertOut, DeviceOut, SchoolOut
+from app.serialization import dump_alerts, dump_devices, dump_schools
+
+
+def _legacy(schema, rows) -> list:
+    # What response_model=list[schema] produced from ORM rows
+    return orjson.loads(orjson.dumps(jsonable_encoder([schema.model_validate(r) for r in rows])))
+
+
+def test_fast_path_matches_response_models(db, school):
+    db.add_all([
+        Device(school_id=school.id, serial_number="SN2", asset_tag="B", status="online", battery_percent=55,
+               last_seen=datetime(2026, 10, 19, 8, 30, 1, 250)),
+        Device(school_id=school.id, serial_number="SN1", asset_tag="A", status="unknown", battery_percent=None),
+    ])
+    db.add_all([
+        Alert(school_id=school.id, alert_type="security", severity="high", message="first",
+              created_at=datetime(2026, 10, 19, 8, 0)),
+        Alert(school_id=school.id, alert_type="offline", severity="low", message="ünïcode ✓",
+              acknowledged=True, created_at=datetime(2026, 10, 19, 9, 0)),
+    ])
+    db.commit()
+
+    devices = db.query(Device).filter(Device.school_id == school.id).order_by(Device.asset_tag).all()
+    assert orjson.loads(dump_devices(db, school.id)) == _legacy(DeviceOut, devices)
+
+    alerts = db.query(Alert).filter(Alert.school_id == school.id).order_by(Alert.created_at.desc()).all()
+    assert orjson.loads(dump_alerts(db, school.id)) == _legacy(AlertOut, alerts)
+    assert [a["message"] for a in orjson.loads(dump_alerts(db, school.id))] == ["ünïcode ✓", "first"]
+
+    assert orjson.loads(dump_schools(db)) == _legacy(SchoolOut, db.query(School).all())
+
+
+def test_field_order_follows_the_schema(db, school):
+    db.add(Device(school_id=school.id, serial_number="SN1", asset_tag="A", status="unknown"))
+    db.commit()
+    (device,) = orjson.loads(dump_devices(db, school.id))
+    assert tuple(device) == tuple(DeviceOut.model_fields)
@@ -0,0 +1,38 @@
+from app.config import settings
+from app.models import School
+
+
+def test_create_list_delete(client, auth_headers, school):
+    resp = client.post("/subnets", json={"cidr": "10.1.2.3/16", "label": "main"}, headers=auth_headers)
+    assert resp.status_code == 200
+    subnet = resp.json()
+    assert (subnet["cidr"], subnet["school_id"]) == ("10.1.0.0/16", school.id)
+
+    assert client.post("/subnets", json={"cidr": "10.1.0.0/16"}, headers=auth_headers).status_code == 409
+    assert [s["cidr"] for s in client.get("/subnets", headers=auth_headers).json()] == ["10.1.0.0/16"]
+    assert client.delete(f"/subnets/{subnet['id']}", headers=auth_headers).json() == {"ok": True}
+
+
+def test_invalid_cidr(client, auth_headers):
+    assert client.post("/subnets", json={"cidr": "10.1.2"}, headers=auth_headers).status_code == 422
+
+
+def test_cannot_create_for_another_school(client, auth_headers, db):
+    other = School(name="Other School")
+    db.add(other)
+    db.commit()
+    resp = client.post("/subnets", json={"cidr": "10.2.0.0/16", "school_id": other.id}, headers=auth_headers)
+    assert resp.status_code == 404
+
+
+def test_export_requires_token(client, auth_headers, monkeypatch):
+    client.post("/subnets", json={"cidr": "10.1.0.0/16"}, headers=auth_headers)
+    assert client.get("/subnets/export").status_code == 403
+
+    monkeypatch.setattr(settings, "subnet_export_token", "secret")
+    resp = client.get("/subnets/export", headers={"Authorization": "Bearer secret"})
+    assert resp.status_code == 200
+    assert [s["cidr"] for s in resp.json()["subnets"]] == ["10.1.0.0/16"]
+    etag = resp.headers["ETag"]
+    resp = client.get("/subnets/export", headers={"Authorization": "Bearer secret", "If-None-Match": etag})
+    assert resp.status_code == 304
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from sqlalchemy import func, select
+
+from app.database import Base, engine
+from app.event_fields import lookup_names, unpack_payload
+from app.models import Device, Event, School
+from benchmarks.synthetic import generate, school_hours_offsets
+
+
+def _snapshot(db) -> tuple:
+    schools = db.execute(select(School.id, School.name).order_by(School.id)).all()
+    devices = db.execute(
+        select(Device.id, Device.school_id, Device.serial_number, Device.status, Device.battery_percent)
+        .order_by(Device.id)
+    ).all()
+    events = db.execute(
+        select(Event.id, Event.device_id, Event.event_type, Event.domain_id, Event.action, Event.created_at, Event.payload)
+        .order_by(Event.id)
+    ).all()
+    return schools, devices, events
+
+
+def _clear() -> None:
+    # As the conftest cleanup does: interned names stay
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            if table.name not in ("event_sources", "event_domains", "event_categories"):
+                conn.execute(table.delete())
+
+
+def test_same_seed_same_rows(db):
+    generate(schools=3, devices=30, events=300, alerts=20, rules_per_school=2, days=7, seed=7, batch_size=64)
+    first = _snapshot(db)
+    db.rollback()
+    _clear()
+    generate(schools=3, devices=30, events=300, alerts=20, rules_per_school=2, days=7, seed=7, batch_size=64)
+    assert _snapshot(db) == first
+    assert len(first[1]) == 30 and len(first[2]) == 300
+
+
+def test_school_hours_offsets_cluster_on_weekdays():
+    offsets = school_hours_offsets(random.Random(1), days=14, k=5_000)
+    in_hours = [
+        o for o in offsets
+        if (o // 86_400) % 7 < 5 and 27_000 <= o % 86_400 < 27_000 + 28_800
+    ]
+    assert all(0 <= o < 14 * 86_400 for o in offsets)
+    assert len(in_hours) / len(offsets) > 0.88
+
+
+def test_generated_events_fill_search_columns(db):
+    generate(schools=2, devices=20, events=200, alerts=10, rules_per_school=2, days=2)
+
+    assert db.scalar(select(func.count()).select_from(Event)) == 200
+    assert db.scalar(select(func.count()).where(Event.source_id.is_(None))) == 0
+
+    web = db.execute(select(Event).where(Event.event_type != "inventory_sync")).scalars().all()
+    assert web and all(e.domain_id is not None and e.action in ("allowed", "blocked") for e in web)
+
+    sources, domains, categories = lookup_names(db, web)
+    for e in web[:20]:
+        payload = unpack_payload(
+            e.payload, sources[e.source_id], e.event_type, domains[e.domain_id], categories.get(e.category_id)
+        )
+        assert payload["source"] == sources[e.source_id]
+        assert payload["event"]["domain"] == domains[e.domain_id]
+        assert payload["event"]["action"] == e.action
+
+
+def test_every_school_gets_a_device(db):
+    summary = generate(schools=4, devices=5, events=0, alerts=0, rules_per_school=0, days=1)
+    counts = db.execute(select(Device.school_id, func.count()).group_by(Device.school_id)).all()
+    assert len(counts) == 4 and sum(n for _, n in counts) == 5
+    assert summary["largest_school_devices"] == max(n for _, n in counts)
+
+
+def test_fewer_devices_than_schools_is_rejected():
+    with pytest.raises(ValueError):
+        generate(schools=3, devices=2, events=0, alerts=0)
@@ -0,0 +1,237 @@
+"""
+Longest-prefix-match routing of source addresses to schools.
+
+CidrIndex is a compiled multibit radix trie with an 8-bit stride: each
+node holds 256 value slots and 256 child slots, one per possible byte.
+A prefix whose length is not a multiple of 8 is expanded over the slots it
+covers at its last level, and prefixes are inserted shortest first, so a
+longer prefix overwrites the slots it shares with a shorter one. A lookup
+walks one node per address byte (at most 4 for IPv4, 16 for IPv6) and
+keeps the last value it passed, which is the longest match.
+
+SubnetMap keeps the current index and rebuilds it when the mapping file
+(SUBNET_MAP_PATH) or the backend export (SUBNET_MAP_URL) changes. Readers
+never see a partially built index: the new index is swapped in with one
+assignment.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import threading
+from ipaddress import ip_network
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import requests
+
+from metrics import SUBNET_MAP_PREFIXES, SUBNET_MAP_RELOAD_ERRORS, SUBNET_MAP_RELOADS
+
+
+logger = logging.getLogger("syslog_ingest.subnets")
+
+_Node = Tuple[list, list]  # (values[256], children[256])
+
+
+def _new_node() -> _Node:
+    return ([None] * 256, [None] * 256)
+
+
+def packed_address(address: str) -> Optional[bytes]:
+    """
+    Packs a bare IPv4/IPv6 address, or a SonicWall endpoint such as
+    "10.1.2.3:51515:X0" or "[2001:db8::1]:443:X1". None if unparseable.
+    """
+    address = address.strip()
+    if address.startswith("["):
+        address = address[1 : address.find("]")]
+    else:
+        head = address.split(":", 1)[0]
+        if "." in head:
+            # IPv4, possibly followed by ":port:interface". IPv6 text never
+            # has a dot before its first colon (embedded IPv4 comes last).
+            address = head
+    try:
+        return socket.inet_pton(socket.AF_INET, address)
+    except OSError:
+        pass
+    try:
+        return socket.inet_pton(socket.AF_INET6, address)
+    except OSError:
+        # IPv6 followed by ":port:interface"
+        head = address.rsplit(":", 2)[0]
+        try:
+            return socket.inet_pton(socket.AF_INET6, head)
+        except OSError:
+            return None
+
+
+class CidrIndex:
+    def __init__(self, mappings: Iterable[Tuple[str, Any]] = ()):
+        self._roots: Dict[int, _Node] = {4: _new_node(), 16: _new_node()}
+        self._defaults: Dict[int, Any] = {}
+        self.size = 0
+
+        networks = [(ip_network(cidr.strip(), strict=False), value) for cidr, value in mappings]
+        networks.sort(key=lambda item: item[0].prefixlen)
+        for network, value in networks:
+            self._insert(network.network_address.packed, network.prefixlen, value)
+            self.size += 1
+
+    def _insert(self, packed: bytes, prefixlen: int, value: Any) -> None:
+        if prefixlen == 0:
+            self._defaults[len(packed)] = value
+            return
+        full, rem = divmod(prefixlen, 8)
+        if rem == 0:
+            # An octet-aligned prefix is one slot on its last octet's level
+            full, rem = full - 1, 8
+        node = self._roots[len(packed)]
+        for byte in packed[:full]:
+            children = node[1]
+            child = children[byte]
+            if child is None:
+                child = children[byte] = _new_node()
+            node = child
+        span = 1 << (8 - rem)
+        base = packed[full] & (0x100 - span)
+        values = node[0]
+        for byte in range(base, base + span):
+            values[byte] = value
+
+    def lookup_packed(self, packed: bytes) -> Any:
+        best = self._defaults.get(len(packed))
+        node = self._roots.get(len(packed))
+        if node is None:
+            return None
+        for byte in packed:
+            value = node[0][byte]
+            if value is not None:
+                best = value
+            node = node[1][byte]
+            if node is None:
+                break
+        return best
+
+    def lookup(self, address: str) -> Any:
+        packed = packed_address(address)
+        return None if packed is None else self.lookup_packed(packed)
+
+
+def parse_mappings(doc: Any) -> list:
+    """
+    Accepts {"subnets": [{"cidr": ..., "school_id": ...}]} (the backend
+    export) or the bare list.
+    """
+    rows = doc.get("subnets", []) if isinstance(doc, dict) else doc
+    return [(row["cidr"], int(row["school_id"])) for row in rows]
+
+
+class SubnetMap:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        url: Optional[str] = None,
+        token: Optional[str] = None,
+        refresh_seconds: float = 30.0,
+    ):
+        self.path = path
+        self.url = url
+        self.token = token
+        self.refresh_seconds = refresh_seconds
+        self.index = CidrIndex()
+        self._version: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "SubnetMap":
+        return cls(
+            path=os.getenv("SUBNET_MAP_PATH") or None,
+            url=os.getenv("SUBNET_MAP_URL") or None,
+            token=os.getenv("SUBNET_MAP_TOKEN") or None,
+            refresh_seconds=float(os.getenv("SUBNET_MAP_REFRESH_SECONDS", "30")),
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.path or self.url)
+
+    def _fetch(self) -> Optional[Tuple[str, bytes]]:
+        """
+        Returns (version, raw JSON), or None when unchanged since the last load.
+        """
+        if self.path:
+            st = os.stat(self.path)
+            version = f"{st.st_mtime_ns}:{st.st_size}"
+            if version == self._version:
+                return None
+            with open(self.path, "rb") as f:
+                return version, f.read()
+
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if self._version:
+            headers["If-None-Match"] = self._version
+        resp = requests.get(self.url, headers=headers, timeout=10)
+        if resp.status_code == 304:
+            return None
+        resp.raise_for_status()
+        return resp.headers.get("ETag") or "", resp.content
+
+    def reload(self) -> bool:
+        """
+        Rebuilds the index if the source changed. On error the current index
+        stays in place.
+        """
+        if not self.configured:
+            return False
+        try:
+            fetched = self._fetch()
+        except Exception:
+            SUBNET_MAP_RELOAD_ERRORS.inc()
+            logger.exception("subnet map fetch failed; keeping %d prefixes", self.index.size)
+            return False
+        if fetched is None:
+            return False
+        version, raw = fetched
+        try:
+            index = CidrIndex(parse_mappings(json.loads(raw)))
+        except Exception:
+            # Remember the bad version so it is reported once, not every poll
+            self._version = version
+            SUBNET_MAP_RELOAD_ERRORS.inc()
+            logger.exception("invalid subnet map; keeping %d prefixes", self.index.size)
+            return False
+        self.index = index
+        self._version = version
+        SUBNET_MAP_RELOADS.inc()
+        SUBNET_MAP_PREFIXES.set(index.size)
+        logger.info("subnet map loaded: %d prefixes", index.size)
+        return True
+
+    def lookup(self, address: str) -> Optional[int]:
+        return self.index.lookup(address)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_seconds):
+            self.reload()
+
+    def start(self) -> None:
+        if not self.configured or self._thread is not None:
+            return
+        self.reload()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="subnet-map-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+subnet_map = SubnetMap.from_env()
@@ -3,16 +3,37 @@ from __future__ import annotations
 import json
 import os
 import socket
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse
 
+from cidr_index import subnet_map
+from metrics import (
+    PARSE_SECONDS,
+    SONICWALL_PARSED,
+    SONICWALL_UNPARSED,
+    SUBNET_MATCHED,
+    SUBNET_UNMATCHED,
+    RouteLatencyMiddleware,
+    render_latest,
+)
 from sonicwall_parser import parse_sonicwall_line
 
 
-app = FastAPI(title="Syslog Ingest", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Subnet -> school map (SUBNET_MAP_PATH / SUBNET_MAP_URL), polled for changes
+    subnet_map.start()
+    yield
+    subnet_map.stop()
+
+
+app = FastAPI(title="Syslog Ingest", version="0.1.0", lifespan=lifespan)
+app.add_middleware(RouteLatencyMiddleware)
 
 
 def _utc_now_iso() -> str:
@@ -35,6 +56,12 @@ def health() -> Dict[str, str]:
     return {"status": "ok", "ts": _utc_now_iso()}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
 @app.post("/ingest/sonicwall")
 async def ingest_sonicwall(request: Request) -> JSONResponse:
     """
@@ -70,17 +97,39 @@ async def ingest_sonicwall(request: Request) -> JSONResponse:
     customer_id = request.headers.get("x-customer-id") or os.getenv("CUSTOMER_ID")
 
     events: list[Dict[str, Any]] = []
+    parsed_ok = 0
+    routed = 0
+    unrouted = 0
+    index = subnet_map.index
+    start = time.perf_counter()
     for line in raw_lines:
         parsed = parse_sonicwall_line(line)
+        fields = parsed.get("fields")
+        school_id: Optional[int] = None
+        if fields:
+            parsed_ok += 1
+            src = fields.get("src")
+            if src and index.size:
+                school_id = index.lookup(src)
+                if school_id is None:
+                    unrouted += 1
+                else:
+                    routed += 1
         event: Dict[str, Any] = {
             "source": "sonicwall",
             "received_at": _utc_now_iso(),
             "customer_id": customer_id,
+            "school_id": school_id,
             "ingest_host": host,
             "raw": line,
             "parsed": _safe_json(parsed),
         }
         events.append(event)
+    PARSE_SECONDS.observe(time.perf_counter() - start)
+    SONICWALL_PARSED.inc(parsed_ok)
+    SONICWALL_UNPARSED.inc(len(raw_lines) - parsed_ok)
+    SUBNET_MATCHED.inc(routed)
+    SUBNET_UNMATCHED.inc(unrouted)
 
     return JSONResponse({"count": len(events), "events": events})
 
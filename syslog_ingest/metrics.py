@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "syslog_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status_class"),
+    buckets=LATENCY_BUCKETS,
+)
+
+LINES_RECEIVED = Counter(
+    "syslog_lines_total",
+    "Syslog lines received, by parse outcome.",
+    ("source", "result"),
+)
+
+PARSE_SECONDS = Histogram(
+    "syslog_parse_batch_duration_seconds",
+    "Time spent parsing one POSTed batch of lines.",
+    buckets=LATENCY_BUCKETS,
+)
+
+SUBNET_ROUTES = Counter(
+    "syslog_subnet_routes_total",
+    "Parsed events attributed to a school by source subnet, by outcome.",
+    ("result",),
+)
+
+SUBNET_MAP_PREFIXES = Gauge(
+    "syslog_subnet_map_prefixes",
+    "Prefixes in the active subnet -> school index.",
+)
+
+SUBNET_MAP_LOADS = Counter(
+    "syslog_subnet_map_loads_total",
+    "Subnet map reload attempts that found a change, by outcome.",
+    ("result",),
+)
+
+# Pre-bound children for the hot path
+SONICWALL_PARSED = LINES_RECEIVED.labels(source="sonicwall", result="parsed")
+SONICWALL_UNPARSED = LINES_RECEIVED.labels(source="sonicwall", result="unparsed")
+SUBNET_MATCHED = SUBNET_ROUTES.labels(result="matched")
+SUBNET_UNMATCHED = SUBNET_ROUTES.labels(result="unmatched")
+SUBNET_MAP_RELOADS = SUBNET_MAP_LOADS.labels(result="ok")
+SUBNET_MAP_RELOAD_ERRORS = SUBNET_MAP_LOADS.labels(result="error")
+
+_STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+class RouteLatencyMiddleware:
+    """
+    Observes request latency keyed by route template; children are bound
+    the first time a (method, route, status class) is seen.
+    """
+
+    def __init__(self, app, histogram: Histogram = HTTP_REQUEST_SECONDS):
+        self.app = app
+        self.histogram = histogram
+        self._children: dict = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            key = (scope["method"], path, status_holder[0] // 100)
+            child = self._children.get(key)
+            if child is None:
+                status_class = _STATUS_CLASSES[key[2] - 1] if 1 <= key[2] <= 5 else "5xx"
+                child = self.histogram.labels(method=key[0], route=path, status_class=status_class)
+                self._children[key] = child
+            child.observe(elapsed)
+
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# syslog_ingest runs as a script directory (`python main.py`), not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
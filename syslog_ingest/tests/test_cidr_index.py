@@ -0,0 +1,51 @@
+import socket
+
+import pytest
+
+from cidr_index import CidrIndex, packed_address, parse_mappings
+
+
+@pytest.mark.parametrize(
+    "address, expected",
+    [
+        ("10.1.2.3", "10.1.2.3"),
+        ("10.1.2.3:51515", "10.1.2.3"),
+        ("10.1.2.3:51515:X0", "10.1.2.3"),
+        ("fe80::1", "fe80::1"),
+        ("::1", "::1"),
+        ("2001::1", "2001::1"),
+        ("2001:db8::1", "2001:db8::1"),
+        ("[2001:db8::1]:443:X1", "2001:db8::1"),
+        ("2001:db8::1:443:X1", "2001:db8::1"),
+        ("::ffff:10.1.2.3", "::ffff:10.1.2.3"),
+    ],
+)
+def test_packed_address(address, expected):
+    family = socket.AF_INET6 if ":" in expected else socket.AF_INET
+    assert packed_address(address) == socket.inet_pton(family, expected)
+
+
+@pytest.mark.parametrize("address", ["", "bogus", "10.1.2", "10.1.2.3.4:80"])
+def test_packed_address_rejects_garbage(address):
+    assert packed_address(address) is None
+
+
+def test_longest_prefix_wins():
+    index = CidrIndex([("10.0.0.0/8", 1), ("10.1.0.0/16", 2), ("10.1.2.0/23", 3), ("10.1.2.3/32", 4)])
+    assert index.lookup("10.9.9.9") == 1
+    assert index.lookup("10.1.9.9") == 2
+    assert index.lookup("10.1.3.200:443:X0") == 3
+    assert index.lookup("10.1.2.3") == 4
+    assert index.lookup("192.168.0.1") is None
+
+
+def test_ipv6_and_default_routes():
+    index = CidrIndex([("::/0", 9), ("2001:db8::/32", 7), ("0.0.0.0/0", 5)])
+    assert index.lookup("2001:db8::1") == 7
+    assert index.lookup("fe80::1") == 9
+    assert index.lookup("172.16.0.1") == 5
+
+
+def test_parse_mappings_accepts_export_and_list():
+    row = {"cidr": "10.0.0.0/8", "school_id": "3"}
+    assert parse_mappings({"subnets": [row]}) == parse_mappings([row]) == [("10.0.0.0/8", 3)]
@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from main import app
+
+LINE = 'id=firewall sn=0017C5 time="2026-10-19 08:00:00" fw=1.2.3.4 pri=6 src=10.1.2.3:5000:X0 dst=8.8.8.8:53:X1'
+
+
+def _lines(result: str) -> float:
+    return REGISTRY.get_sample_value("syslog_lines_total", {"source": "sonicwall", "result": result}) or 0.0
+
+
+def test_ingest_counts_parsed_and_unparsed_lines():
+    client = TestClient(app)
+    parsed, unparsed = _lines("parsed"), _lines("unparsed")
+    resp = client.post("/ingest/sonicwall", content=f"{LINE}\nnot a sonicwall line\n")
+    assert resp.json()["count"] == 2
+    assert _lines("parsed") == parsed + 1
+    assert _lines("unparsed") == unparsed + 1
+
+    body = client.get("/metrics").text
+    assert 'syslog_http_request_duration_seconds_count{method="POST",route="/ingest/sonicwall",status_class="2xx"}' in body